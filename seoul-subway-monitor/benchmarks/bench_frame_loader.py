@@ -0,0 +1,123 @@
+"""
+분석 프레임 로딩 벤치마크: 기존 pd.DataFrame(data) + 반복 파싱 경로 vs frame_loader
+
+사용법 (seoul-subway-monitor 디렉터리에서 실행):
+    python -m benchmarks.bench_frame_loader --days 7            # 전 호선 1주일 (메모리 수 GB 필요)
+    python -m benchmarks.bench_frame_loader --days 1 --output frame_loader.json
+
+기존 경로는 fetch_train_data 결과와 같은 문자열(object) 컬럼 프레임을 만든 뒤,
+분석기들이 하던 대로 pd.to_datetime / astype(str) 비교를 수행합니다.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from src.analysis.frame_loader import load_positions_frame
+
+def make_raw_frame(days: int, lines: int, trains: int, poll_seconds: int, stations: int = 50, seed: int = 7):
+    """
+    API/REST 응답과 같은 문자열 컬럼으로 구성된 합성 위치 데이터를 생성합니다.
+    """
+    rng = np.random.default_rng(seed)
+    polls = days * 86400 // poll_seconds
+    n = polls * lines * trains
+
+    poll_index = np.repeat(np.arange(polls), lines * trains)
+    line_index = np.tile(np.repeat(np.arange(lines), trains), polls)
+    train_index = np.tile(np.arange(trains), polls * lines)
+    station_index = (poll_index // 2 + train_index * 3) % stations
+
+    start = pd.Timestamp("2026-10-12T00:00:00+00:00")
+    created_at = (start + pd.to_timedelta(poll_index * poll_seconds, unit="s")).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+    line_ids = np.array([f"10{i + 1:02d}" for i in range(lines)], dtype=object)
+    return pd.DataFrame({
+        "id": np.arange(n, dtype=np.int64),
+        "line_id": line_ids[line_index],
+        "line_name": np.array([f"{i + 1}호선" for i in range(lines)], dtype=object)[line_index],
+        "station_id": (line_ids[line_index] + "000" + station_index.astype(str).astype(object)),
+        "station_name": np.array([f"역{i}" for i in range(stations)], dtype=object)[station_index],
+        "train_number": (line_index * 1000 + train_index).astype(str).astype(object),
+        "direction_type": (train_index % 2).astype(str).astype(object),
+        "train_status_code": rng.integers(0, 3, n).astype(str).astype(object),
+        "is_express": np.where(train_index % 5 == 0, "1", "0").astype(object),
+        "is_last_train": np.full(n, "0", dtype=object),
+        "created_at": np.asarray(created_at, dtype=object),
+    })
+
+def legacy_interval(df):
+    """
+    기존 분석기 방식: 매번 시각 파싱, 문자열 비교, object 키 그룹화
+    """
+    df = df.copy()
+    df["created_at"] = pd.to_datetime(df["created_at"])
+    df["train_status_code"] = df["train_status_code"].astype(str)
+    arrivals = df[df["train_status_code"] == "1"].sort_values(["station_name", "direction_type", "created_at"])
+    arrivals["prev"] = arrivals.groupby(["station_name", "direction_type"])["created_at"].shift(1)
+    return (arrivals["created_at"] - arrivals["prev"]).dt.total_seconds().mean()
+
+def compact_interval(df):
+    """
+    frame_loader 방식: 파싱된 시각, int8 비교, 미리 계산한 정수 키 그룹화
+    """
+    arrivals = df[df["train_status_code"] == 1].sort_values(["station_dir_key", "created_at"])
+    arrivals["prev"] = arrivals.groupby("station_dir_key")["created_at"].shift(1)
+    return (arrivals["created_at"] - arrivals["prev"]).dt.total_seconds().mean()
+
+def measure(func, *args):
+    """
+    실행 시간과 최대 할당 메모리를 측정합니다.
+    (tracemalloc은 실행을 크게 느리게 하므로 시간은 별도 실행으로 측정)
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame loader memory/runtime benchmark")
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--lines", type=int, default=12)
+    parser.add_argument("--trains", type=int, default=50)
+    parser.add_argument("--poll-seconds", type=int, default=60)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    raw = make_raw_frame(args.days, args.lines, args.trains, args.poll_seconds)
+    raw_bytes = int(raw.memory_usage(deep=True).sum())
+    print(f"[Benchmark] {len(raw):,} rows ({args.days} day(s), {args.lines} lines)")
+
+    compact, load_seconds, load_peak = measure(load_positions_frame, raw)
+    compact_bytes = int(compact.memory_usage(deep=True).sum())
+
+    _, legacy_seconds, legacy_peak = measure(legacy_interval, raw)
+    _, compact_seconds, compact_peak = measure(compact_interval, compact)
+
+    results = {
+        "rows": len(raw),
+        "legacy_frame_mb": round(raw_bytes / 1e6, 1),
+        "compact_frame_mb": round(compact_bytes / 1e6, 1),
+        "load_seconds": round(load_seconds, 3),
+        "load_peak_mb": round(load_peak / 1e6, 1),
+        "legacy_interval_seconds": round(legacy_seconds, 3),
+        "legacy_interval_peak_mb": round(legacy_peak / 1e6, 1),
+        "compact_interval_seconds": round(compact_seconds, 3),
+        "compact_interval_peak_mb": round(compact_peak / 1e6, 1),
+    }
+    for key, value in results.items():
+        print(f"- {key:<28} {value}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[Benchmark] Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
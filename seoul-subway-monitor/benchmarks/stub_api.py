@@ -0,0 +1,107 @@
+"""
+서울시 실시간 위치 API 로컬 스텁: 합성 노선망(SyntheticNetwork)의 위치를 실제 API와 같은 URL/응답 형식으로 제공합니다.
+
+    GET /{인증키}/json/realtimePosition/{시작}/{끝}/{호선명}
+
+- 응답 시각은 스텁 시계(set_time/advance)로 정하므로 같은 시각을 여러 번 재현할 수 있습니다.
+- latency_ms로 응답 지연을 흉내 낼 수 있습니다.
+
+사용 예:
+    stub = StubSeoulAPI(SyntheticNetwork(), start="2026-10-12T08:00:00+09:00")
+    stub.start()
+    api = SeoulMetroAPI(PooledHttpClient(stub.base_url, "bench"))
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+import pandas as pd
+
+class StubSeoulAPI:
+    def __init__(self, network, start, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0):
+        self.network = network
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self._now = pd.Timestamp(start)
+        self._cache = {}  # (시각, 호선명) -> 행 리스트 (페이지 조회/같은 시각 재요청 시 다시 계산하지 않음)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def set_time(self, at):
+        with self._lock:
+            self._now = pd.Timestamp(at)
+
+    def preload(self, times):
+        """
+        주어진 시각들의 응답을 미리 계산합니다. (측정 구간에서 위치 계산 비용 제외)
+        """
+        for at in times:
+            at = pd.Timestamp(at)
+            for line_name, line in self.network.lines.items():
+                self._cache[(at, line_name)] = line.snapshot(at)
+
+    def advance(self, seconds: float):
+        self.set_time(self._now + pd.Timedelta(seconds=seconds))
+
+    def _rows(self, line_name: str) -> list:
+        with self._lock:
+            key = (self._now, line_name)
+            if key not in self._cache:
+                if len(self._cache) > 10000:
+                    self._cache.clear()
+                line = self.network.lines.get(line_name)
+                self._cache[key] = line.snapshot(self._now) if line is not None else None
+            return self._cache[key]
+
+    def response(self, path: str):
+        """
+        API 경로에 대한 응답 본문(dict). 실제 API처럼 시작/끝 위치는 1부터 세는 닫힌 구간입니다.
+        """
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        if len(parts) < 6 or parts[2] != "realtimePosition":
+            return {"status": 500, "code": "ERROR-500", "message": "unsupported service"}
+        start_index, end_index, line_name = int(parts[3]), int(parts[4]), parts[5]
+        rows = self._rows(line_name)
+        if not rows:
+            return {"status": 500, "code": "INFO-200", "message": "해당하는 데이터가 없습니다."}
+        first = max(start_index, 1) - 1
+        return {
+            "errorMessage": {"status": 200, "code": "INFO-000", "message": "정상 처리되었습니다.", "total": len(rows)},
+            "realtimePositionList": rows[first:end_index],
+        }
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+                body = json.dumps(stub.response(self.path), ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="stub-api", daemon=True).start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,249 @@
+"""
+합성 노선망: Config.TARGET_LINES 전 호선의 열차 운행을 시각표 기반으로 시뮬레이션합니다.
+
+- 시간대별 배차 간격(첨두 2.5분, 평시 5분, 심야 8분), 역간 주행/정차 시간에 열차별 편차 적용
+- 각 열차는 기점 → 종점 → (회차 대기) → 기점 왕복 운행, 순환선(2호선)은 한 바퀴 운행
+- 급행 운영 호선(Config.EXPRESS_LINE_IDS)은 세 번째 열차마다 급행(세 역마다 정차, 통과역은 정차 없이 통과)
+- 같은 시각의 위치를 API 응답 형식(snapshot) 또는 적재된 표준 스키마 프레임(frame)으로 만들 수 있습니다.
+
+사용 예:
+    network = SyntheticNetwork(seed=7)
+    rows = network.snapshot("2026-10-12T08:00:00+09:00")["2호선"]   # realtimePositionList 행
+    df = network.line("9호선").frame("2026-10-12", days=7)        # 1주일 위치 데이터 (30초 폴링)
+"""
+import numpy as np
+import pandas as pd
+from src.config import Config
+from src.row_codec import COLUMNS
+
+KST = "Asia/Seoul"
+
+# 호선명 -> (역 수, 순환선 여부). 지선은 생략하고 본선 역 수만 근사
+LINE_STATIONS = {
+    "1호선": (62, False),
+    "2호선": (43, True),
+    "3호선": (44, False),
+    "4호선": (51, False),
+    "5호선": (51, False),
+    "6호선": (39, False),
+    "7호선": (53, False),
+    "8호선": (18, False),
+    "9호선": (38, False),
+    "신분당선": (16, False),
+    "경의중앙선": (57, False),
+    "공항철도": (14, False),
+}
+# 시간대(시작 시각)별 배차 간격(초)
+HEADWAYS = ((5.5, 420), (7, 150), (9.5, 300), (18, 150), (20, 300), (22, 480))
+SERVICE_START_HOUR, SERVICE_END_HOUR = 5.5, 23.5
+SEGMENT_SECONDS = 110         # 역간 주행 시간 (정차 제외)
+EXPRESS_SEGMENT_SECONDS = 85  # 급행 역간 주행 시간
+DWELL_SECONDS = 30
+TURNAROUND_SECONDS = 360
+EXPRESS_EVERY = 3             # 급행: 세 번째 열차마다, 세 역마다 정차
+APPROACH_SECONDS = 25         # 다음 역 진입(0)으로 보고하는 도착 전 시간
+
+def _as_kst(value) -> pd.Timestamp:
+    # 시간대가 없으면 한국 표준시로 간주
+    value = pd.Timestamp(value)
+    return value.tz_localize(KST) if value.tzinfo is None else value.tz_convert(KST)
+
+def _kst_dates(ticks: np.ndarray) -> np.ndarray:
+    # 'YYYYMMDD' 문자열 (행마다 strftime하지 않고 날짜별로 한 번만 변환)
+    days = ((ticks + 9 * 3600) // 86400).astype(np.int64)
+    unique, inverse = np.unique(days, return_inverse=True)
+    labels = pd.to_datetime(unique, unit="D").strftime("%Y%m%d").to_numpy(dtype=object)
+    return labels[inverse]
+
+class SyntheticLine:
+    """
+    한 호선의 운행(trip) 시각표와 임의 시각의 열차 위치 계산
+    """
+
+    def __init__(self, line_name: str, line_id: str, stations: int, loop: bool = False,
+                 express: bool = False, seed: int = 7):
+        self.line_name = line_name
+        self.line_id = line_id
+        self.stations = stations
+        self.loop = loop
+        self.express = express
+        self.seed = seed
+        self.station_ids = np.array([f"{line_id}000{101 + i}" for i in range(stations)], dtype=object)
+        self.station_names = np.array([f"{line_name[:2]}{i + 1:02d}역" for i in range(stations)], dtype=object)
+
+    def trips(self, day) -> pd.DataFrame:
+        """
+        하루 운행 시각표: 운행별 출발 시각(초, epoch), 방향, 급행 여부, 열차 번호, 역당 소요/정차 시간
+        """
+        day = _as_kst(day).normalize()
+        rng = np.random.default_rng([self.seed, int(self.line_id), day.toordinal()])
+        midnight = day.timestamp()
+
+        departures = []
+        t = SERVICE_START_HOUR * 3600
+        while t < SERVICE_END_HOUR * 3600:
+            departures.append(t)
+            headway = next(seconds for hour, seconds in reversed(HEADWAYS) if t >= hour * 3600)
+            t += headway * rng.uniform(0.9, 1.1)
+        departures = np.array(departures) + midnight
+        count = len(departures)
+
+        express = np.zeros(count, dtype=bool)
+        if self.express:
+            express[EXPRESS_EVERY - 1::EXPRESS_EVERY] = True
+        segment = np.where(express, EXPRESS_SEGMENT_SECONDS, SEGMENT_SECONDS) * rng.uniform(0.95, 1.12, count)
+        dwell = DWELL_SECONDS * rng.uniform(0.7, 1.6, count)
+        numbers = np.array([f"{i + 1:04d}" for i in range(count)], dtype=object)
+
+        outbound = pd.DataFrame({
+            "departure": departures, "direction": 1, "is_express": express,
+            "train_number": numbers, "segment": segment, "dwell": dwell,
+        })
+        if self.loop:
+            # 순환선: 내선(0)/외선(1) 각각 한 바퀴
+            inner = outbound.assign(direction=0, departure=departures + rng.uniform(0, 120, count),
+                                    train_number=np.array([f"{i + 5001:04d}" for i in range(count)], dtype=object))
+            return pd.concat([outbound, inner], ignore_index=True)
+        # 종점 회차 후 같은 열차 번호로 반대 방향 운행
+        duration = (self.stations - 1) * (segment + dwell)
+        inbound = outbound.assign(
+            direction=0,
+            departure=departures + duration + TURNAROUND_SECONDS * rng.uniform(0.8, 1.5, count),
+        )
+        return pd.concat([outbound, inbound], ignore_index=True)
+
+    def _legs(self) -> int:
+        return self.stations if self.loop else self.stations - 1
+
+    def _locate(self, trips: pd.DataFrame, trip_index: np.ndarray, times: np.ndarray) -> pd.DataFrame:
+        """
+        (운행, 시각) 쌍마다 보고 역과 상태 코드(0 진입, 1 도착, 2 출발)를 계산합니다.
+        """
+        elapsed = times - trips["departure"].to_numpy()[trip_index]
+        express = trips["is_express"].to_numpy()[trip_index]
+        segment = trips["segment"].to_numpy()[trip_index]
+        dwell = trips["dwell"].to_numpy()[trip_index]
+        leg_seconds = segment + dwell
+
+        leg = np.floor(elapsed / leg_seconds).astype(np.int64)
+        phase = elapsed - leg * leg_seconds
+        # 급행은 세 역마다 정차 (통과역은 정차 시간 없이 바로 출발 상태)
+        stops = ~express | (leg % EXPRESS_EVERY == 0)
+        stop_seconds = np.where(stops, dwell, 0.0)
+        status = np.where(phase < stop_seconds, 1, np.where(phase > leg_seconds - APPROACH_SECONDS, 0, 2))
+        # 진입(0)은 다음 역 기준으로 보고
+        index = np.minimum(leg + (status == 0), self._legs())
+
+        forward = trips["direction"].to_numpy()[trip_index] == 1
+        if self.loop:
+            station = np.where(forward, index, -index) % self.stations
+        else:
+            station = np.where(forward, index, self.stations - 1 - index)
+        terminal = np.where(forward, self.stations - 1, 0) if not self.loop else station
+        return pd.DataFrame({
+            "trip": trip_index,
+            "station": station,
+            "status": status,
+            "terminal": terminal,
+        })
+
+    def _active(self, trips: pd.DataFrame):
+        # 운행 종료 시각: 마지막 역 도착 후 정차 시간까지
+        duration = self._legs() * (trips["segment"] + trips["dwell"])
+        return trips["departure"].to_numpy(), (trips["departure"] + duration).to_numpy()
+
+    def snapshot(self, at) -> list:
+        """
+        시각 at의 운행 중 열차 위치를 realtimePositionList 행(dict) 리스트로 반환합니다.
+        """
+        at = _as_kst(at)
+        trips = pd.concat([self.trips(at.normalize() - pd.Timedelta(days=1)), self.trips(at.normalize())],
+                          ignore_index=True)
+        start, end = self._active(trips)
+        now = at.timestamp()
+        active = np.nonzero((start <= now) & (now < end))[0]
+        located = self._locate(trips, active, np.full(len(active), now))
+        received = at.strftime("%Y-%m-%d %H:%M:%S")
+        rows = []
+        for trip, station, status, terminal in located.itertuples(index=False):
+            rows.append({
+                "subwayId": self.line_id,
+                "subwayNm": self.line_name,
+                "statnId": self.station_ids[station],
+                "statnNm": self.station_names[station],
+                "trainNo": trips.at[trip, "train_number"],
+                "lastRecptnDt": at.strftime("%Y%m%d"),
+                "recptnDt": received,
+                "updnLine": str(trips.at[trip, "direction"]),
+                "statnTid": self.station_ids[terminal],
+                "statnTnm": self.station_names[terminal],
+                "trainSttus": str(status),
+                "directAt": "1" if trips.at[trip, "is_express"] else "0",
+                "lstcarAt": "0",
+            })
+        return rows
+
+    def frame(self, start, days: float = 1, poll_seconds: int = 30) -> pd.DataFrame:
+        """
+        start부터 days일 동안 poll_seconds 간격으로 수집했을 때의 적재 행(표준 스키마 + created_at, id)
+        """
+        start = _as_kst(start)
+        end = start + pd.Timedelta(days=days)
+        day_count = int(np.ceil(days)) + 1
+        trips = pd.concat([self.trips(start.normalize() + pd.Timedelta(days=offset - 1)) for offset in range(day_count + 1)],
+                          ignore_index=True)
+        trip_start, trip_end = self._active(trips)
+        trip_start = np.maximum(trip_start, start.timestamp())
+        trip_end = np.minimum(trip_end, end.timestamp())
+
+        # 운행별 폴링 시각 (같은 tick에 수집된 것처럼 poll_seconds 격자에 맞춤)
+        first = np.ceil((trip_start - start.timestamp()) / poll_seconds).astype(np.int64)
+        last = np.ceil((trip_end - start.timestamp()) / poll_seconds).astype(np.int64)
+        counts = np.maximum(last - first, 0)
+        trip_index = np.repeat(np.arange(len(trips)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        ticks = (np.repeat(first, counts) + offsets) * poll_seconds + start.timestamp()
+
+        located = self._locate(trips, trip_index, ticks)
+        created_at = pd.to_datetime(ticks, unit="s", utc=True)
+        df = pd.DataFrame({
+            "line_id": self.line_id,
+            "line_name": self.line_name,
+            "station_id": self.station_ids[located["station"]],
+            "station_name": self.station_names[located["station"]],
+            "train_number": trips["train_number"].to_numpy()[trip_index],
+            "last_received_date": _kst_dates(ticks),
+            "last_received_time": created_at.tz_convert(KST).tz_localize(None),
+            "direction_type": trips["direction"].to_numpy()[trip_index],
+            "destination_station_id": self.station_ids[located["terminal"]],
+            "destination_station_name": self.station_names[located["terminal"]],
+            "train_status_code": located["status"].to_numpy(),
+            "is_express": trips["is_express"].to_numpy()[trip_index],
+            "is_last_train": False,
+            "created_at": created_at,
+        })
+        df = df.sort_values("created_at", kind="stable").reset_index(drop=True)
+        df.insert(0, "id", np.arange(len(df), dtype=np.int64))
+        return df[["id", *COLUMNS, "created_at"]]
+
+class SyntheticNetwork:
+    """
+    Config.TARGET_LINES 전 호선의 합성 노선망
+    """
+
+    def __init__(self, seed: int = 7, line_names: list = None):
+        self.lines = {}
+        for line_name in line_names or Config.TARGET_LINES:
+            stations, loop = LINE_STATIONS.get(line_name, (40, False))
+            line_id = Config.LINE_IDS[line_name]
+            self.lines[line_name] = SyntheticLine(line_name, line_id, stations, loop,
+                                                  express=line_id in Config.EXPRESS_LINE_IDS, seed=seed)
+
+    def line(self, line_name: str) -> SyntheticLine:
+        return self.lines[line_name]
+
+    def snapshot(self, at) -> dict:
+        """
+        호선명 -> realtimePositionList 행 리스트
+        """
+        return {line_name: line.snapshot(at) for line_name, line in self.lines.items()}
@@ -0,0 +1 @@
+# pytest가 이 디렉터리를 sys.path에 추가하도록 두는 루트 conftest (테스트는 src 패키지를 그대로 import)
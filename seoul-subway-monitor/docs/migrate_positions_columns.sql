@@ -0,0 +1,95 @@
+-- realtime_subway_positions 컬럼 이름/타입 변환 마이그레이션 (기존 배포용)
+-- docs/schema.sql은 CREATE TABLE IF NOT EXISTS라서 이미 있는 테이블의 컬럼을 바꾸지 않습니다.
+-- 이 스크립트가 기존 테이블을 표준 스키마(src/row_codec.py의 COLUMNS)로 변환합니다.
+--
+-- 1) 초기 스키마 컬럼 이름 변경: last_rec_date, last_rec_time, dest_station_id, dest_station_name, train_status
+-- 2) 타입 변환 (값 변환 규칙은 row_codec과 동일)
+--    last_received_time  문자열 → TIMESTAMP (빈 문자열은 NULL)
+--    direction_type      문자열 → INTEGER   (숫자가 아니면 0)
+--    train_status_code   문자열 → INTEGER   (숫자가 아니면 NULL)
+--    is_express          문자열/BOOLEAN → SMALLINT 코드 (0:일반, 1:급행, 7:특급)
+--                        BOOLEAN으로 저장된 값은 true → 1 (이미 급행/특급 구분이 없어진 데이터)
+--    is_last_train       문자열 → BOOLEAN   ('1', 'true' → true)
+-- 3) train_events, position_rollup_train_minute의 is_express BOOLEAN → SMALLINT
+-- 4) 반환 타입이 바뀐 station_visits 함수와 v_station_visits 뷰 삭제 (docs/schema.sql을 다시 실행하면 재생성)
+--
+-- 실행 순서: 수집기 중지 → 스풀(spool/) 반영 완료 확인 → 이 스크립트 → docs/schema.sql → (선택) docs/partition_positions.sql
+--   psql "$DATABASE_URL" -f docs/migrate_positions_columns.sql -f docs/schema.sql
+-- 이전 버전이 스풀에 남긴 행(is_express true/false)은 SMALLINT 컬럼에 COPY할 수 없으므로 먼저 반영해야 합니다.
+-- 여러 번 실행해도 안전합니다. (이미 변환된 컬럼은 건너뜀) 변환은 DO 블록 하나(한 트랜잭션)라 실패하면 아무것도 바뀌지 않습니다.
+
+CREATE OR REPLACE FUNCTION pg_temp.position_column_type(p_table TEXT, p_column TEXT)
+RETURNS TEXT
+LANGUAGE sql STABLE AS $$
+    SELECT data_type FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = p_table AND column_name = p_column
+$$;
+
+DO $$
+DECLARE
+    r RECORD;
+    v_type TEXT;
+BEGIN
+    IF to_regclass('realtime_subway_positions') IS NULL THEN
+        RAISE NOTICE 'realtime_subway_positions does not exist, nothing to migrate (run docs/schema.sql)';
+        RETURN;
+    END IF;
+
+    -- 1) 컬럼 이름 변경
+    FOR r IN SELECT * FROM (VALUES
+        ('last_rec_date', 'last_received_date'),
+        ('last_rec_time', 'last_received_time'),
+        ('dest_station_id', 'destination_station_id'),
+        ('dest_station_name', 'destination_station_name'),
+        ('train_status', 'train_status_code')
+    ) AS m(old_name, new_name)
+    LOOP
+        CONTINUE WHEN pg_temp.position_column_type('realtime_subway_positions', r.old_name) IS NULL;
+        IF pg_temp.position_column_type('realtime_subway_positions', r.new_name) IS NOT NULL THEN
+            RAISE EXCEPTION 'realtime_subway_positions has both % and %: merge them into % and drop % first',
+                r.old_name, r.new_name, r.new_name, r.old_name;
+        END IF;
+        EXECUTE format('ALTER TABLE realtime_subway_positions RENAME COLUMN %I TO %I', r.old_name, r.new_name);
+        RAISE NOTICE 'Renamed realtime_subway_positions.% to %', r.old_name, r.new_name;
+    END LOOP;
+
+    -- 2), 3) 타입 변환 (USING 식은 원본을 text로 바꿔 비교하므로 문자열/정수/불리언 어느 타입에서도 동작)
+    FOR r IN SELECT * FROM (VALUES
+        ('realtime_subway_positions', 'last_received_time', 'timestamp without time zone', 'TIMESTAMP',
+         'NULLIF(btrim(last_received_time::TEXT), '''')::TIMESTAMP'),
+        ('realtime_subway_positions', 'direction_type', 'integer', 'INTEGER',
+         'CASE WHEN btrim(direction_type::TEXT) ~ ''^[0-9]+$'' THEN btrim(direction_type::TEXT)::INTEGER ELSE 0 END'),
+        ('realtime_subway_positions', 'train_status_code', 'integer', 'INTEGER',
+         'CASE WHEN btrim(train_status_code::TEXT) ~ ''^[0-9]+$'' THEN btrim(train_status_code::TEXT)::INTEGER END'),
+        ('realtime_subway_positions', 'is_express', 'smallint', 'SMALLINT',
+         'CASE WHEN lower(btrim(is_express::TEXT)) IN (''true'', ''t'') THEN 1 '
+         'WHEN btrim(is_express::TEXT) ~ ''^[0-9]+$'' THEN btrim(is_express::TEXT)::SMALLINT ELSE 0 END'),
+        ('realtime_subway_positions', 'is_last_train', 'boolean', 'BOOLEAN',
+         'lower(btrim(is_last_train::TEXT)) IN (''1'', ''true'', ''t'')'),
+        ('train_events', 'is_express', 'smallint', 'SMALLINT',
+         'CASE WHEN lower(btrim(is_express::TEXT)) IN (''true'', ''t'') THEN 1 '
+         'WHEN btrim(is_express::TEXT) ~ ''^[0-9]+$'' THEN btrim(is_express::TEXT)::SMALLINT ELSE 0 END'),
+        ('position_rollup_train_minute', 'is_express', 'smallint', 'SMALLINT',
+         'CASE WHEN lower(btrim(is_express::TEXT)) IN (''true'', ''t'') THEN 1 '
+         'WHEN btrim(is_express::TEXT) ~ ''^[0-9]+$'' THEN btrim(is_express::TEXT)::SMALLINT ELSE 0 END')
+    ) AS t(table_name, column_name, target_type, ddl_type, using_expr)
+    LOOP
+        v_type := pg_temp.position_column_type(r.table_name, r.column_name);
+        CONTINUE WHEN v_type IS NULL OR v_type = r.target_type;
+        EXECUTE format('ALTER TABLE %I ALTER COLUMN %I TYPE %s USING %s',
+                       r.table_name, r.column_name, r.ddl_type, r.using_expr);
+        RAISE NOTICE 'Converted %.% from % to %', r.table_name, r.column_name, v_type, r.ddl_type;
+    END LOOP;
+
+    -- 4) 반환 타입(is_express)이 바뀐 함수는 CREATE OR REPLACE로 교체할 수 없으므로 삭제 후 docs/schema.sql로 재생성
+    IF EXISTS (
+        SELECT 1 FROM pg_proc p
+        WHERE p.proname = 'station_visits' AND p.pronamespace = current_schema()::REGNAMESPACE
+          AND 'boolean'::REGTYPE::OID = ANY (p.proallargtypes)
+    ) THEN
+        DROP VIEW IF EXISTS v_station_visits;
+        DROP FUNCTION station_visits(TIMESTAMPTZ, TIMESTAMPTZ);
+        RAISE NOTICE 'Dropped station_visits and v_station_visits: run docs/schema.sql to recreate them';
+    END IF;
+END;
+$$;
@@ -0,0 +1,269 @@
+-- realtime_subway_positions 일별 파티션 전환 마이그레이션
+-- 하루 약 12개 호선 × 50개 열차 × 1440회 수집 → 단일 힙 테이블은 무한히 커지고,
+-- 단일 컬럼 인덱스로는 fetch_train_data의 eq(line_id).order(created_at desc)를 한 인덱스로 처리할 수 없습니다.
+--
+-- 1) created_at 기준 일별(한국 시간 자정) RANGE 파티션 테이블로 전환 (기존 데이터 이관)
+-- 2) 복합 인덱스 (line_id, created_at, id), (line_id, train_number, created_at) + created_at BRIN
+-- 3) 보존 기간이 지난 파티션은 분 단위 롤업 테이블로 다운샘플링한 뒤 삭제
+--
+-- 실행: psql "$DATABASE_URL" -f docs/schema.sql -f docs/partition_positions.sql
+-- 초기 스키마 컬럼 이름(last_rec_date, dest_station_id, train_status 등)이 남아 있으면 전환하지 않고 중단합니다.
+-- 이 경우 docs/migrate_positions_columns.sql을 먼저 실행하세요. 컬럼 타입(문자열/정수/불리언)은 이관 시 변환합니다.
+-- 여러 번 실행해도 안전합니다. (이미 파티션 테이블이면 전환 단계는 건너뜀)
+-- 주기 실행 예 (pg_cron): SELECT cron.schedule('30 3 * * *', 'SELECT maintain_position_partitions()');
+
+-- 일별 파티션 생성 (경계는 한국 시간 자정, 이름: realtime_subway_positions_pYYYYMMDD)
+CREATE OR REPLACE FUNCTION create_position_partition(p_day DATE)
+RETURNS TEXT
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_name TEXT := 'realtime_subway_positions_p' || to_char(p_day, 'YYYYMMDD');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF realtime_subway_positions FOR VALUES FROM (%L) TO (%L)',
+        v_name,
+        p_day::TIMESTAMP AT TIME ZONE 'Asia/Seoul',
+        (p_day + 1)::TIMESTAMP AT TIME ZONE 'Asia/Seoul'
+    );
+    RETURN v_name;
+END;
+$$;
+
+-- 1) 파티션 테이블 전환
+DO $$
+DECLARE
+    v_first DATE;
+    v_day DATE;
+    v_today DATE := (now() AT TIME ZONE 'Asia/Seoul')::DATE;
+    v_legacy_columns TEXT;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'realtime_subway_positions'::regclass) = 'p' THEN
+        RAISE NOTICE 'realtime_subway_positions is already partitioned, skipping conversion';
+        RETURN;
+    END IF;
+
+    -- 이관 SELECT는 표준 컬럼 이름을 전제로 함 (타입 차이는 아래 변환 식으로 처리)
+    SELECT string_agg(column_name::TEXT, ', ') INTO v_legacy_columns
+    FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = 'realtime_subway_positions'
+      AND column_name IN ('last_rec_date', 'last_rec_time', 'dest_station_id', 'dest_station_name', 'train_status');
+    IF v_legacy_columns IS NOT NULL THEN
+        RAISE EXCEPTION 'realtime_subway_positions still has legacy columns (%): run docs/migrate_positions_columns.sql first',
+            v_legacy_columns;
+    END IF;
+
+    ALTER TABLE realtime_subway_positions RENAME TO realtime_subway_positions_legacy;
+
+    -- 파티션 테이블은 PK에 파티션 키가 포함되어야 하며, IDENTITY 대신 시퀀스 기본값을 사용 (PostgreSQL 16 이하 호환)
+    CREATE SEQUENCE IF NOT EXISTS realtime_subway_positions_part_id_seq;
+    CREATE TABLE realtime_subway_positions (
+        id BIGINT NOT NULL DEFAULT nextval('realtime_subway_positions_part_id_seq'),
+        line_id VARCHAR(50) NOT NULL,
+        line_name VARCHAR(100) NOT NULL,
+        station_id VARCHAR(50) NOT NULL,
+        station_name VARCHAR(100) NOT NULL,
+        train_number VARCHAR(50) NOT NULL,
+        last_received_date VARCHAR(20),
+        last_received_time TIMESTAMP,
+        direction_type INTEGER,
+        destination_station_id VARCHAR(50),
+        destination_station_name VARCHAR(100),
+        train_status_code INTEGER,
+        is_express SMALLINT,
+        is_last_train BOOLEAN,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    ALTER SEQUENCE realtime_subway_positions_part_id_seq OWNED BY realtime_subway_positions.id;
+
+    -- 기존 데이터 기간 + 향후 7일 파티션 생성
+    -- DEFAULT 파티션은 두지 않음: DEFAULT 파티션이 있으면 최근 N건 조회가 모든 파티션을 병합(Merge Append)해야 함.
+    -- 파티션이 없는 시각의 적재는 실패하지만 쓰기 선행 스풀(src/spool.py)에 남아 파티션 생성 후 재반영됩니다.
+    SELECT (MIN(created_at) AT TIME ZONE 'Asia/Seoul')::DATE INTO v_first FROM realtime_subway_positions_legacy;
+    v_day := LEAST(COALESCE(v_first, v_today), v_today);
+    WHILE v_day <= v_today + 7 LOOP
+        PERFORM create_position_partition(v_day);
+        v_day := v_day + 1;
+    END LOOP;
+
+    INSERT INTO realtime_subway_positions (
+        id, line_id, line_name, station_id, station_name, train_number, last_received_date,
+        last_received_time, direction_type, destination_station_id, destination_station_name,
+        train_status_code, is_express, is_last_train, created_at
+    )
+    -- 초기 스키마는 direction_type, train_status_code, is_express 등이 문자열(VARCHAR)이므로
+    -- 원본을 text로 바꿔 변환 (row_codec 및 docs/migrate_positions_columns.sql과 같은 규칙, 이미 새 타입이어도 동작)
+    SELECT l.id, l.line_id, l.line_name, l.station_id, l.station_name, l.train_number, l.last_received_date,
+           v.received_at,
+           CASE WHEN btrim(l.direction_type::TEXT) ~ '^[0-9]+$' THEN btrim(l.direction_type::TEXT)::INTEGER ELSE 0 END,
+           l.destination_station_id, l.destination_station_name,
+           CASE WHEN btrim(l.train_status_code::TEXT) ~ '^[0-9]+$' THEN btrim(l.train_status_code::TEXT)::INTEGER END,
+           CASE WHEN lower(btrim(l.is_express::TEXT)) IN ('true', 't') THEN 1
+                WHEN btrim(l.is_express::TEXT) ~ '^[0-9]+$' THEN btrim(l.is_express::TEXT)::SMALLINT
+                ELSE 0 END,
+           lower(btrim(l.is_last_train::TEXT)) IN ('1', 'true', 't'),
+           COALESCE(l.created_at, v.received_at AT TIME ZONE 'Asia/Seoul', now())
+    FROM realtime_subway_positions_legacy l,
+         LATERAL (SELECT NULLIF(btrim(l.last_received_time::TEXT), '')::TIMESTAMP AS received_at) v;
+
+    PERFORM setval('realtime_subway_positions_part_id_seq',
+                   COALESCE((SELECT MAX(id) FROM realtime_subway_positions_legacy), 0) + 1, false);
+
+    -- Supabase REST(PostgREST) 역할 권한 유지
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+        GRANT ALL ON realtime_subway_positions TO service_role;
+        GRANT USAGE, SELECT ON SEQUENCE realtime_subway_positions_part_id_seq TO service_role;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        GRANT SELECT, INSERT ON realtime_subway_positions TO anon, authenticated;
+        GRANT USAGE, SELECT ON SEQUENCE realtime_subway_positions_part_id_seq TO anon, authenticated;
+    END IF;
+
+    RAISE NOTICE 'Converted realtime_subway_positions to daily partitions (legacy table kept as realtime_subway_positions_legacy)';
+END;
+$$;
+
+-- 2) 인덱스 (부모 테이블에 생성하면 모든 파티션에 자동 적용)
+-- 최근 N건 조회(eq line_id, order created_at desc) 및 키셋 페이지네이션(created_at, id)
+CREATE INDEX IF NOT EXISTS idx_positions_line_created_at ON realtime_subway_positions(line_id, created_at, id);
+-- 열차별 시간순 조회 (윈도 함수 뷰, 회차/체류 분석)
+CREATE INDEX IF NOT EXISTS idx_positions_line_train_created_at ON realtime_subway_positions(line_id, train_number, created_at);
+-- 적재 순서(id) 기준 증분 조회: 늦게 반영된 스풀 행까지 포함 (캐시 동기화, 분석 서비스 수위)
+CREATE INDEX IF NOT EXISTS idx_positions_line_id_id ON realtime_subway_positions(line_id, id);
+-- 호선 조건 없는 시간 범위 조회 (집계 증분 갱신, 캐시 동기화): 적재 순서와 created_at이 일치하므로 BRIN이 작고 효과적
+CREATE INDEX IF NOT EXISTS idx_positions_created_at_brin ON realtime_subway_positions USING BRIN (created_at);
+
+COMMENT ON TABLE realtime_subway_positions IS '서울시 실시간 지하철 위치 정보 (created_at 일별 파티션)';
+
+-- 3) 분 단위 롤업 테이블
+-- 열차별: 분마다 마지막 관측 상태 (궤적 재구성용)
+CREATE TABLE IF NOT EXISTS position_rollup_train_minute (
+    line_id VARCHAR(50) NOT NULL,
+    train_number VARCHAR(50) NOT NULL,
+    minute_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    station_id VARCHAR(50),
+    station_name VARCHAR(100),
+    direction_type INTEGER,
+    train_status_code INTEGER,
+    is_express SMALLINT,
+    destination_station_id VARCHAR(50),
+    sample_count INTEGER NOT NULL,        -- 해당 분의 원본 행 수
+    PRIMARY KEY (line_id, train_number, minute_start)
+);
+
+-- 역·방향별: 분마다 관측된 열차 수와 도착/출발 수 (혼잡도/배차 추이용)
+CREATE TABLE IF NOT EXISTS position_rollup_station_minute (
+    line_id VARCHAR(50) NOT NULL,
+    station_id VARCHAR(50) NOT NULL,
+    direction_type INTEGER NOT NULL,
+    minute_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    station_name VARCHAR(100),
+    train_count INTEGER NOT NULL,         -- 관측된 서로 다른 열차 수
+    arrival_count INTEGER NOT NULL,       -- 도착(1) 상태 열차 수
+    departure_count INTEGER NOT NULL,     -- 출발(2) 상태 열차 수
+    express_count INTEGER NOT NULL,       -- 급행 열차 수
+    PRIMARY KEY (line_id, station_id, direction_type, minute_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_rollup_train_minute_line_time ON position_rollup_train_minute(line_id, minute_start);
+CREATE INDEX IF NOT EXISTS idx_rollup_station_minute_line_time ON position_rollup_station_minute(line_id, minute_start);
+
+COMMENT ON TABLE position_rollup_train_minute IS '보존 기간이 지난 위치 데이터의 열차별 분 단위 롤업';
+COMMENT ON TABLE position_rollup_station_minute IS '보존 기간이 지난 위치 데이터의 역·방향별 분 단위 롤업';
+
+-- 파티션 하나를 분 단위 롤업 테이블로 다운샘플링 (다시 실행해도 중복 적재되지 않음)
+-- 반환값: 롤업한 원본 행 수
+CREATE OR REPLACE FUNCTION rollup_position_partition(p_partition REGCLASS)
+RETURNS BIGINT
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_rows BIGINT;
+BEGIN
+    EXECUTE format('SELECT COUNT(*) FROM %s', p_partition) INTO v_rows;
+
+    EXECUTE format($sql$
+        INSERT INTO position_rollup_train_minute (
+            line_id, train_number, minute_start, station_id, station_name, direction_type,
+            train_status_code, is_express, destination_station_id, sample_count
+        )
+        SELECT DISTINCT ON (line_id, train_number, date_trunc('minute', created_at))
+               line_id, train_number, date_trunc('minute', created_at), station_id, station_name, direction_type,
+               train_status_code, is_express, destination_station_id,
+               COUNT(*) OVER (PARTITION BY line_id, train_number, date_trunc('minute', created_at))
+        FROM %s
+        ORDER BY line_id, train_number, date_trunc('minute', created_at), created_at DESC, id DESC
+        ON CONFLICT DO NOTHING
+    $sql$, p_partition);
+
+    EXECUTE format($sql$
+        INSERT INTO position_rollup_station_minute (
+            line_id, station_id, direction_type, minute_start, station_name,
+            train_count, arrival_count, departure_count, express_count
+        )
+        SELECT line_id, station_id, direction_type, date_trunc('minute', created_at), MIN(station_name),
+               COUNT(DISTINCT train_number),
+               COUNT(DISTINCT train_number) FILTER (WHERE train_status_code = 1),
+               COUNT(DISTINCT train_number) FILTER (WHERE train_status_code = 2),
+               COUNT(DISTINCT train_number) FILTER (WHERE is_express > 0)
+        FROM %s
+        WHERE direction_type IS NOT NULL
+        GROUP BY line_id, station_id, direction_type, date_trunc('minute', created_at)
+        ON CONFLICT DO NOTHING
+    $sql$, p_partition);
+
+    RETURN v_rows;
+END;
+$$;
+
+-- 보존 기간(p_keep_days일)이 지난 일별 파티션을 롤업한 뒤 분리(DETACH)하고 삭제합니다.
+-- 반환값: 삭제한 파티션 수
+CREATE OR REPLACE FUNCTION apply_position_retention(p_keep_days INTEGER DEFAULT 30, p_now TIMESTAMPTZ DEFAULT now())
+RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_cutoff DATE := (p_now AT TIME ZONE 'Asia/Seoul')::DATE - p_keep_days;
+    v_dropped INTEGER := 0;
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT c.oid::REGCLASS AS partition, c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'realtime_subway_positions'::REGCLASS
+          AND c.relname ~ '_p[0-9]{8}$'
+        ORDER BY c.relname
+    LOOP
+        -- 파티션 날짜 + 1일(상한)이 기준일 이전이면 보존 기간 경과
+        IF to_date(right(r.relname, 8), 'YYYYMMDD') + 1 <= v_cutoff THEN
+            PERFORM rollup_position_partition(r.partition);
+            EXECUTE format('ALTER TABLE realtime_subway_positions DETACH PARTITION %s', r.partition);
+            EXECUTE format('DROP TABLE %s', r.partition);
+            v_dropped := v_dropped + 1;
+        END IF;
+    END LOOP;
+    RETURN v_dropped;
+END;
+$$;
+
+-- 정기 유지보수: 향후 p_days_ahead일 파티션 생성 + 보존 기간 적용
+-- 반환값: {"created": 생성 확인한 파티션 수, "dropped": 삭제한 파티션 수}
+CREATE OR REPLACE FUNCTION maintain_position_partitions(
+    p_keep_days INTEGER DEFAULT 30,
+    p_days_ahead INTEGER DEFAULT 7,
+    p_now TIMESTAMPTZ DEFAULT now()
+)
+RETURNS JSONB
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_today DATE := (p_now AT TIME ZONE 'Asia/Seoul')::DATE;
+    v_created INTEGER := 0;
+BEGIN
+    -- 동시 실행 방지
+    PERFORM pg_advisory_xact_lock(hashtext('maintain_position_partitions'));
+    FOR i IN 0..p_days_ahead LOOP
+        PERFORM create_position_partition(v_today + i);
+        v_created := v_created + 1;
+    END LOOP;
+    RETURN jsonb_build_object('created', v_created, 'dropped', apply_position_retention(p_keep_days, p_now));
+END;
+$$;
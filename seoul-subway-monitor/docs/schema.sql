@@ -1,4 +1,8 @@
 -- 테이블 생성: realtime_subway_positions
+-- 컬럼 구성은 src/row_codec.py의 COLUMNS(표준 스키마)와 동일하게 유지합니다.
+-- 운영 환경에서는 docs/partition_positions.sql로 일별 파티션 테이블로 전환합니다.
+-- 이미 있는 테이블에는 CREATE TABLE IF NOT EXISTS가 적용되지 않으므로, 초기 스키마(last_rec_*, dest_*, train_status,
+-- 문자열 코드 컬럼)나 is_express BOOLEAN으로 만든 테이블은 먼저 docs/migrate_positions_columns.sql로 변환합니다.
 CREATE TABLE IF NOT EXISTS realtime_subway_positions (
     id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     line_id VARCHAR(50) NOT NULL,          -- subwayId: 지하철 호선 ID
@@ -6,21 +10,23 @@ CREATE TABLE IF NOT EXISTS realtime_subway_positions (
     station_id VARCHAR(50) NOT NULL,       -- statnId: 지하철 역 ID
     station_name VARCHAR(100) NOT NULL,    -- statnNm: 지하철 역명
     train_number VARCHAR(50) NOT NULL,     -- trainNo: 열차 번호
-    last_rec_date VARCHAR(20),             -- lastRecptnDt: 최종 수신 날짜
-    last_rec_time VARCHAR(20),             -- recptnDt: 최종 수신 시간
-    direction_type VARCHAR(10),             -- updnLine: 0:상행/내선, 1:하행/외선
-    dest_station_id VARCHAR(50),           -- statnTid: 종착역 ID
-    dest_station_name VARCHAR(100),        -- statnTnm: 종착역명
-    train_status VARCHAR(10),              -- trainSttus: 0:진입, 1:도착, 2:출발, ...
-    is_express VARCHAR(10),                -- directAt: 1:급행, 0:아님, 7:특급
+    last_received_date VARCHAR(20),        -- lastRecptnDt: 최종 수신 날짜
+    last_received_time TIMESTAMP,          -- recptnDt: 최종 수신 시간
+    direction_type INTEGER,                -- updnLine: 0:상행/내선, 1:하행/외선
+    destination_station_id VARCHAR(50),    -- statnTid: 종착역 ID
+    destination_station_name VARCHAR(100), -- statnTnm: 종착역명
+    train_status_code INTEGER,             -- trainSttus: 0:진입, 1:도착, 2:출발, ...
+    is_express SMALLINT,                   -- directAt: 0:일반, 1:급행, 7:특급
     is_last_train BOOLEAN,                 -- lstcarAt: 막차 여부
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT now() -- 데이터 적재 시간
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now() -- 수집 시각 (스풀을 거치면 수집기가 기록, 적재 순서는 id)
 );
 
 -- 인덱스 설정 (조회 성능 최적화)
 CREATE INDEX IF NOT EXISTS idx_realtime_positions_line_id ON realtime_subway_positions(line_id);
 CREATE INDEX IF NOT EXISTS idx_realtime_positions_train_number ON realtime_subway_positions(train_number);
 CREATE INDEX IF NOT EXISTS idx_realtime_positions_created_at ON realtime_subway_positions(created_at);
+-- 적재 순서(id) 기준 증분 조회 (캐시 동기화, 분석 서비스의 프레임 갱신과 수위 확인)
+CREATE INDEX IF NOT EXISTS idx_realtime_positions_line_id_id ON realtime_subway_positions(line_id, id);
 
 COMMENT ON TABLE realtime_subway_positions IS '서울시 실시간 지하철 위치 정보';
 COMMENT ON COLUMN realtime_subway_positions.line_id IS '지하철 호선 ID';
@@ -28,12 +34,352 @@ COMMENT ON COLUMN realtime_subway_positions.line_name IS '지하철 호선명';
 COMMENT ON COLUMN realtime_subway_positions.station_id IS '지하철 역 ID';
 COMMENT ON COLUMN realtime_subway_positions.station_name IS '지하철 역명';
 COMMENT ON COLUMN realtime_subway_positions.train_number IS '열차 번호';
-COMMENT ON COLUMN realtime_subway_positions.last_rec_date IS '최종 수신 날짜';
-COMMENT ON COLUMN realtime_subway_positions.last_rec_time IS '최종 수신 시간';
+COMMENT ON COLUMN realtime_subway_positions.last_received_date IS '최종 수신 날짜';
+COMMENT ON COLUMN realtime_subway_positions.last_received_time IS '최종 수신 시간';
 COMMENT ON COLUMN realtime_subway_positions.direction_type IS '0:상행/내선, 1:하행/외선';
-COMMENT ON COLUMN realtime_subway_positions.dest_station_id IS '종착역 ID';
-COMMENT ON COLUMN realtime_subway_positions.dest_station_name IS '종착역명';
-COMMENT ON COLUMN realtime_subway_positions.train_status IS '0:진입, 1:도착, 2:출발, ...';
-COMMENT ON COLUMN realtime_subway_positions.is_express IS '1:급행, 0:아님, 7:특급';
+COMMENT ON COLUMN realtime_subway_positions.destination_station_id IS '종착역 ID';
+COMMENT ON COLUMN realtime_subway_positions.destination_station_name IS '종착역명';
+COMMENT ON COLUMN realtime_subway_positions.train_status_code IS '0:진입, 1:도착, 2:출발, ...';
+COMMENT ON COLUMN realtime_subway_positions.is_express IS '급행 구분 (0:일반, 1:급행, 7:특급)';
 COMMENT ON COLUMN realtime_subway_positions.is_last_train IS '막차 여부';
 COMMENT ON COLUMN realtime_subway_positions.created_at IS '데이터 적재 시간';
+
+-- 테이블 생성: train_events
+-- 위치 스냅샷을 열차별 상태 머신(src/events.py)으로 변환한 이벤트 스트림
+CREATE TABLE IF NOT EXISTS train_events (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    event_type VARCHAR(20) NOT NULL,       -- enter:진입, arrive:도착, depart:출발, turnaround:회차
+    line_id VARCHAR(50) NOT NULL,          -- 지하철 호선 ID
+    train_number VARCHAR(50) NOT NULL,     -- 열차 번호
+    station_id VARCHAR(50),                -- 이벤트 발생 역 ID
+    station_name VARCHAR(100),             -- 이벤트 발생 역명
+    direction_type INTEGER,                -- 0:상행/내선, 1:하행/외선
+    is_express SMALLINT,                   -- 급행 구분 (0:일반, 1:급행, 7:특급)
+    destination_station_id VARCHAR(50),    -- 종착역 ID
+    visit_id VARCHAR(120) NOT NULL,        -- 역 방문 ID (호선:열차:역:방문 시작 epoch)
+    event_time TIMESTAMP WITH TIME ZONE NOT NULL, -- 이벤트 발생 시각
+    dwell_seconds DOUBLE PRECISION,        -- 출발 이벤트: 도착 → 출발 체류 시간(초)
+    turnaround_seconds DOUBLE PRECISION,   -- 회차 이벤트: 이전 방향 마지막 관측 → 새 방향 첫 관측(초)
+    from_station_id VARCHAR(50),           -- 회차 이벤트: 회차 전 마지막 역 ID
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_train_events_line_type_time ON train_events(line_id, event_type, event_time);
+CREATE INDEX IF NOT EXISTS idx_train_events_visit_id ON train_events(visit_id);
+
+COMMENT ON TABLE train_events IS '열차 이벤트 (진입/도착/출발/회차)';
+COMMENT ON COLUMN train_events.visit_id IS '역 방문 ID (같은 방문의 도착/출발 이벤트를 연결)';
+COMMENT ON COLUMN train_events.dwell_seconds IS '도착 → 출발 체류 시간(초)';
+COMMENT ON COLUMN train_events.turnaround_seconds IS '방향 전환 소요 시간(초)';
+
+-- =====================================================================
+-- 서버 측 집계: 체류 시간 / 배차 간격 / 회차 시간
+-- 분석기가 원본 위치 데이터를 내려받지 않고 역·방향·시간대별 집계 행만 조회하도록 합니다.
+--   1) 윈도 함수 뷰: 위치 스냅샷 → 역 방문(도착/출발), 회차
+--   2) 시간대별 집계 테이블: refresh_position_aggregates()로 증분 갱신
+--   3) 조회 함수: station_dwell_stats / station_headway_stats / turnaround_stats (Supabase RPC)
+-- =====================================================================
+
+-- 열차별 시간순 조회를 위한 인덱스 (윈도 함수의 PARTITION BY line_id, train_number ORDER BY created_at)
+CREATE INDEX IF NOT EXISTS idx_realtime_positions_line_train_time
+    ON realtime_subway_positions(line_id, train_number, created_at);
+
+-- 역 방문: 같은 열차가 같은 역에 연속으로 관측된 구간 하나가 한 번의 방문
+-- arrived_at: 방문 중 첫 도착(1) 관측, departed_at: 도착 이후 첫 출발(2) 관측
+-- headway_seconds: 같은 역·방향에 직전 열차가 도착한 뒤 경과 시간
+CREATE OR REPLACE FUNCTION station_visits(p_start TIMESTAMPTZ DEFAULT NULL, p_end TIMESTAMPTZ DEFAULT NULL)
+RETURNS TABLE (
+    line_id VARCHAR, train_number VARCHAR, station_id VARCHAR, station_name VARCHAR,
+    direction_type INTEGER, is_express SMALLINT,
+    arrived_at TIMESTAMPTZ, departed_at TIMESTAMPTZ,
+    dwell_seconds DOUBLE PRECISION, headway_seconds DOUBLE PRECISION
+)
+LANGUAGE sql STABLE AS $$
+    WITH ordered AS (
+        SELECT p.id, p.line_id, p.train_number, p.station_id, p.station_name, p.direction_type,
+               p.is_express, p.train_status_code, p.created_at,
+               LAG(p.station_id) OVER w AS prev_station_id,
+               LAG(p.direction_type) OVER w AS prev_direction_type
+        FROM realtime_subway_positions p
+        WHERE (p_start IS NULL OR p.created_at >= p_start)
+          AND (p_end IS NULL OR p.created_at < p_end)
+        WINDOW w AS (PARTITION BY p.line_id, p.train_number ORDER BY p.created_at, p.id)
+    ),
+    numbered AS (
+        -- 역 또는 방향이 바뀔 때마다 방문 번호 증가
+        SELECT o.*,
+               SUM(CASE WHEN o.station_id IS DISTINCT FROM o.prev_station_id
+                          OR o.direction_type IS DISTINCT FROM o.prev_direction_type
+                        THEN 1 ELSE 0 END)
+                   OVER (PARTITION BY o.line_id, o.train_number ORDER BY o.created_at, o.id
+                         ROWS UNBOUNDED PRECEDING) AS visit_no
+        FROM ordered o
+    ),
+    visits AS (
+        SELECT n.line_id, n.train_number, n.visit_no,
+               MIN(n.station_id) AS station_id, MIN(n.station_name) AS station_name,
+               MIN(n.direction_type) AS direction_type, MAX(n.is_express) AS is_express,
+               MIN(n.created_at) FILTER (WHERE n.train_status_code = 1) AS arrived_at,
+               MAX(n.created_at) FILTER (WHERE n.train_status_code = 1) AS last_arrival_at,
+               MIN(n.created_at) FILTER (WHERE n.train_status_code = 2) AS first_departure_at
+        FROM numbered n
+        GROUP BY n.line_id, n.train_number, n.visit_no
+    )
+    SELECT v.line_id, v.train_number, v.station_id, v.station_name, v.direction_type, v.is_express,
+           v.arrived_at,
+           CASE WHEN v.first_departure_at > v.last_arrival_at THEN v.first_departure_at END AS departed_at,
+           CASE WHEN v.first_departure_at > v.last_arrival_at
+                THEN EXTRACT(EPOCH FROM v.first_departure_at - v.arrived_at)::DOUBLE PRECISION END AS dwell_seconds,
+           EXTRACT(EPOCH FROM v.arrived_at - LAG(v.arrived_at) OVER (
+               PARTITION BY v.line_id, v.station_id, v.direction_type ORDER BY v.arrived_at
+           ))::DOUBLE PRECISION AS headway_seconds
+    FROM visits v
+    WHERE v.arrived_at IS NOT NULL
+$$;
+
+-- 회차: 같은 열차의 방향(direction_type)이 바뀐 시점
+-- turnaround_seconds: 이전 방향 마지막 관측 → 새 방향 첫 관측 (src/events.py의 회차 이벤트와 동일한 정의)
+CREATE OR REPLACE FUNCTION train_turnarounds(p_start TIMESTAMPTZ DEFAULT NULL, p_end TIMESTAMPTZ DEFAULT NULL)
+RETURNS TABLE (
+    line_id VARCHAR, train_number VARCHAR, station_id VARCHAR, station_name VARCHAR,
+    direction_type INTEGER, from_station_id VARCHAR,
+    turned_at TIMESTAMPTZ, turnaround_seconds DOUBLE PRECISION
+)
+LANGUAGE sql STABLE AS $$
+    SELECT t.line_id, t.train_number, t.station_id, t.station_name, t.direction_type,
+           t.prev_station_id, t.created_at,
+           EXTRACT(EPOCH FROM t.created_at - t.prev_created_at)::DOUBLE PRECISION
+    FROM (
+        SELECT p.line_id, p.train_number, p.station_id, p.station_name, p.direction_type, p.created_at,
+               LAG(p.station_id) OVER w AS prev_station_id,
+               LAG(p.direction_type) OVER w AS prev_direction_type,
+               LAG(p.created_at) OVER w AS prev_created_at
+        FROM realtime_subway_positions p
+        WHERE (p_start IS NULL OR p.created_at >= p_start)
+          AND (p_end IS NULL OR p.created_at < p_end)
+        WINDOW w AS (PARTITION BY p.line_id, p.train_number ORDER BY p.created_at, p.id)
+    ) t
+    WHERE t.prev_direction_type IS NOT NULL
+      AND t.direction_type IS DISTINCT FROM t.prev_direction_type
+$$;
+
+-- 전체 기간 뷰 (line_id 조건은 윈도 PARTITION BY 컬럼이므로 원본 조회 단계로 전달됨)
+CREATE OR REPLACE VIEW v_station_visits AS SELECT * FROM station_visits();
+CREATE OR REPLACE VIEW v_train_turnarounds AS SELECT * FROM train_turnarounds();
+
+-- 역·방향·시간대별 집계 (합계/제곱합을 저장하므로 여러 시간대를 다시 합칠 수 있음)
+CREATE TABLE IF NOT EXISTS agg_station_hourly (
+    line_id VARCHAR(50) NOT NULL,
+    station_id VARCHAR(50) NOT NULL,
+    direction_type INTEGER NOT NULL,
+    hour_start TIMESTAMP WITH TIME ZONE NOT NULL, -- 도착 시각 기준 시간대 (정시)
+    station_name VARCHAR(100),
+    arrival_count INTEGER NOT NULL DEFAULT 0,     -- 도착 방문 수
+    dwell_count INTEGER NOT NULL DEFAULT 0,
+    dwell_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    dwell_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    dwell_max DOUBLE PRECISION,
+    headway_count INTEGER NOT NULL DEFAULT 0,
+    headway_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    headway_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    headway_max DOUBLE PRECISION,
+    PRIMARY KEY (line_id, station_id, direction_type, hour_start)
+);
+
+CREATE TABLE IF NOT EXISTS agg_turnaround_hourly (
+    line_id VARCHAR(50) NOT NULL,
+    station_id VARCHAR(50) NOT NULL,              -- 회차 후 첫 관측 역
+    direction_type INTEGER NOT NULL,              -- 회차 후 방향
+    hour_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    station_name VARCHAR(100),
+    turnaround_count INTEGER NOT NULL DEFAULT 0,
+    turnaround_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    turnaround_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    turnaround_max DOUBLE PRECISION,
+    PRIMARY KEY (line_id, station_id, direction_type, hour_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_agg_station_hourly_line_hour ON agg_station_hourly(line_id, hour_start);
+CREATE INDEX IF NOT EXISTS idx_agg_turnaround_hourly_line_hour ON agg_turnaround_hourly(line_id, hour_start);
+
+-- 증분 갱신 상태: 마지막으로 반영한 원본 created_at
+CREATE TABLE IF NOT EXISTS aggregate_refresh_state (
+    name VARCHAR(50) PRIMARY KEY,
+    watermark TIMESTAMP WITH TIME ZONE,
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+COMMENT ON TABLE agg_station_hourly IS '역·방향·시간대별 체류 시간/배차 간격 집계';
+COMMENT ON TABLE agg_turnaround_hourly IS '회차 역·방향·시간대별 회차 시간 집계';
+COMMENT ON TABLE aggregate_refresh_state IS '집계 테이블 증분 갱신 워터마크';
+
+-- 집계 증분 갱신
+-- 마지막 워터마크가 속한 시간대(지연 적재를 고려해 p_settle만큼 앞당김)부터 다시 계산합니다.
+-- 윈도 함수의 직전 행(이전 도착/이전 방향)을 얻기 위해 p_context만큼 앞선 원본도 함께 읽습니다.
+-- 반환값: 다시 계산한 시간대 수
+-- 주기 실행 예 (pg_cron): SELECT cron.schedule('*/5 * * * *', 'SELECT refresh_position_aggregates()');
+CREATE OR REPLACE FUNCTION refresh_position_aggregates(
+    p_settle INTERVAL DEFAULT INTERVAL '15 minutes',
+    p_context INTERVAL DEFAULT INTERVAL '3 hours'
+)
+RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_watermark TIMESTAMPTZ;
+    v_latest TIMESTAMPTZ;
+    v_from TIMESTAMPTZ;
+    v_hours INTEGER;
+BEGIN
+    -- 동시 갱신 방지
+    PERFORM pg_advisory_xact_lock(hashtext('refresh_position_aggregates'));
+
+    SELECT watermark INTO v_watermark FROM aggregate_refresh_state WHERE name = 'position_aggregates';
+    -- 워터마크 이후만 조회 (파티션 테이블에서는 최근 파티션만 스캔)
+    SELECT MAX(created_at) INTO v_latest FROM realtime_subway_positions
+    WHERE created_at >= COALESCE(v_watermark, '-infinity'::TIMESTAMPTZ);
+    v_latest := GREATEST(v_latest, v_watermark);
+    IF v_latest IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    IF v_watermark IS NULL THEN
+        SELECT date_trunc('hour', MIN(created_at)) INTO v_from FROM realtime_subway_positions;
+    ELSE
+        v_from := date_trunc('hour', v_watermark - p_settle);
+    END IF;
+
+    DELETE FROM agg_station_hourly WHERE hour_start >= v_from;
+    DELETE FROM agg_turnaround_hourly WHERE hour_start >= v_from;
+
+    INSERT INTO agg_station_hourly (
+        line_id, station_id, direction_type, hour_start, station_name, arrival_count,
+        dwell_count, dwell_sum, dwell_sq_sum, dwell_max,
+        headway_count, headway_sum, headway_sq_sum, headway_max
+    )
+    SELECT v.line_id, v.station_id, v.direction_type, date_trunc('hour', v.arrived_at), MIN(v.station_name),
+           COUNT(*),
+           COUNT(v.dwell_seconds), COALESCE(SUM(v.dwell_seconds), 0),
+           COALESCE(SUM(v.dwell_seconds * v.dwell_seconds), 0), MAX(v.dwell_seconds),
+           COUNT(v.headway_seconds), COALESCE(SUM(v.headway_seconds), 0),
+           COALESCE(SUM(v.headway_seconds * v.headway_seconds), 0), MAX(v.headway_seconds)
+    FROM station_visits(v_from - p_context, NULL) v
+    WHERE v.arrived_at >= v_from
+      AND v.station_id IS NOT NULL AND v.direction_type IS NOT NULL
+    GROUP BY v.line_id, v.station_id, v.direction_type, date_trunc('hour', v.arrived_at);
+
+    INSERT INTO agg_turnaround_hourly (
+        line_id, station_id, direction_type, hour_start, station_name,
+        turnaround_count, turnaround_sum, turnaround_sq_sum, turnaround_max
+    )
+    SELECT t.line_id, t.station_id, t.direction_type, date_trunc('hour', t.turned_at), MIN(t.station_name),
+           COUNT(*), SUM(t.turnaround_seconds),
+           SUM(t.turnaround_seconds * t.turnaround_seconds), MAX(t.turnaround_seconds)
+    FROM train_turnarounds(v_from - p_context, NULL) t
+    WHERE t.turned_at >= v_from
+      AND t.station_id IS NOT NULL AND t.direction_type IS NOT NULL
+    GROUP BY t.line_id, t.station_id, t.direction_type, date_trunc('hour', t.turned_at);
+
+    INSERT INTO aggregate_refresh_state (name, watermark, refreshed_at)
+    VALUES ('position_aggregates', v_latest, now())
+    ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark, refreshed_at = EXCLUDED.refreshed_at;
+
+    v_hours := GREATEST(CEIL(EXTRACT(EPOCH FROM v_latest - v_from) / 3600.0)::INTEGER, 1);
+    RETURN v_hours;
+END;
+$$;
+
+-- 조회 함수: 구간 내 시간대 집계를 역·방향별로 합산 (p_by_hour=true면 시간대별 행 유지)
+-- 표준편차는 합계/제곱합으로 계산 (표본 표준편차, n-1)
+CREATE OR REPLACE FUNCTION station_dwell_stats(
+    p_line_id VARCHAR, p_start TIMESTAMPTZ DEFAULT NULL, p_end TIMESTAMPTZ DEFAULT NULL,
+    p_by_hour BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    station_id VARCHAR, station_name VARCHAR, direction_type INTEGER, hour_start TIMESTAMPTZ,
+    count BIGINT, total_seconds DOUBLE PRECISION, mean DOUBLE PRECISION, std DOUBLE PRECISION, max DOUBLE PRECISION
+)
+LANGUAGE sql STABLE AS $$
+    SELECT a.station_id, MIN(a.station_name)::VARCHAR, a.direction_type,
+           CASE WHEN p_by_hour THEN a.hour_start END,
+           SUM(a.dwell_count), SUM(a.dwell_sum),
+           SUM(a.dwell_sum) / NULLIF(SUM(a.dwell_count), 0),
+           CASE WHEN SUM(a.dwell_count) > 1
+                THEN SQRT(GREATEST((SUM(a.dwell_sq_sum) - SUM(a.dwell_sum) ^ 2 / SUM(a.dwell_count))
+                                   / (SUM(a.dwell_count) - 1), 0)) END,
+           MAX(a.dwell_max)
+    FROM agg_station_hourly a
+    WHERE a.line_id = p_line_id
+      AND (p_start IS NULL OR a.hour_start >= date_trunc('hour', p_start))
+      AND (p_end IS NULL OR a.hour_start < p_end)
+      AND a.dwell_count > 0
+    GROUP BY a.station_id, a.direction_type, CASE WHEN p_by_hour THEN a.hour_start END
+    ORDER BY 1, 3, 4
+$$;
+
+CREATE OR REPLACE FUNCTION station_headway_stats(
+    p_line_id VARCHAR, p_start TIMESTAMPTZ DEFAULT NULL, p_end TIMESTAMPTZ DEFAULT NULL,
+    p_by_hour BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    station_id VARCHAR, station_name VARCHAR, direction_type INTEGER, hour_start TIMESTAMPTZ,
+    count BIGINT, total_seconds DOUBLE PRECISION, mean DOUBLE PRECISION, std DOUBLE PRECISION, max DOUBLE PRECISION
+)
+LANGUAGE sql STABLE AS $$
+    SELECT a.station_id, MIN(a.station_name)::VARCHAR, a.direction_type,
+           CASE WHEN p_by_hour THEN a.hour_start END,
+           SUM(a.headway_count), SUM(a.headway_sum),
+           SUM(a.headway_sum) / NULLIF(SUM(a.headway_count), 0),
+           CASE WHEN SUM(a.headway_count) > 1
+                THEN SQRT(GREATEST((SUM(a.headway_sq_sum) - SUM(a.headway_sum) ^ 2 / SUM(a.headway_count))
+                                   / (SUM(a.headway_count) - 1), 0)) END,
+           MAX(a.headway_max)
+    FROM agg_station_hourly a
+    WHERE a.line_id = p_line_id
+      AND (p_start IS NULL OR a.hour_start >= date_trunc('hour', p_start))
+      AND (p_end IS NULL OR a.hour_start < p_end)
+      AND a.headway_count > 0
+    GROUP BY a.station_id, a.direction_type, CASE WHEN p_by_hour THEN a.hour_start END
+    ORDER BY 1, 3, 4
+$$;
+
+CREATE OR REPLACE FUNCTION turnaround_stats(
+    p_line_id VARCHAR, p_start TIMESTAMPTZ DEFAULT NULL, p_end TIMESTAMPTZ DEFAULT NULL,
+    p_by_hour BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    station_id VARCHAR, station_name VARCHAR, direction_type INTEGER, hour_start TIMESTAMPTZ,
+    count BIGINT, total_seconds DOUBLE PRECISION, mean DOUBLE PRECISION, std DOUBLE PRECISION, max DOUBLE PRECISION
+)
+LANGUAGE sql STABLE AS $$
+    SELECT a.station_id, MIN(a.station_name)::VARCHAR, a.direction_type,
+           CASE WHEN p_by_hour THEN a.hour_start END,
+           SUM(a.turnaround_count), SUM(a.turnaround_sum),
+           SUM(a.turnaround_sum) / NULLIF(SUM(a.turnaround_count), 0),
+           CASE WHEN SUM(a.turnaround_count) > 1
+                THEN SQRT(GREATEST((SUM(a.turnaround_sq_sum) - SUM(a.turnaround_sum) ^ 2 / SUM(a.turnaround_count))
+                                   / (SUM(a.turnaround_count) - 1), 0)) END,
+           MAX(a.turnaround_max)
+    FROM agg_turnaround_hourly a
+    WHERE a.line_id = p_line_id
+      AND (p_start IS NULL OR a.hour_start >= date_trunc('hour', p_start))
+      AND (p_end IS NULL OR a.hour_start < p_end)
+    GROUP BY a.station_id, a.direction_type, CASE WHEN p_by_hour THEN a.hour_start END
+    ORDER BY 1, 3, 4
+$$;
+
+-- 분산 수집 작업자 하트비트와 호선 임대 (SHARDING_ENABLED=true, src/sharding.py)
+-- 작업자는 LEASE_RENEW_SECONDS마다 하트비트를 갱신하고, 살아 있는 작업자 목록으로 계산한 자기 몫의 호선 임대를
+-- 획득/연장합니다. 하트비트가 LEASE_TTL_SECONDS 넘게 끊긴 작업자의 호선은 남은 작업자가 가져갑니다.
+CREATE TABLE IF NOT EXISTS collector_workers (
+    worker_id TEXT PRIMARY KEY,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS collector_line_leases (
+    line_name TEXT PRIMARY KEY,
+    worker_id TEXT,
+    lease_until TIMESTAMPTZ NOT NULL DEFAULT '-infinity',
+    acquired_at TIMESTAMPTZ,
+    generation BIGINT NOT NULL DEFAULT 0  -- 소유자가 바뀔 때마다 증가
+);
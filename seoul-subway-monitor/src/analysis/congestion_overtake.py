@@ -1,46 +1,72 @@
-from datetime import datetime
 import pandas as pd
+from ..config import Config
 from ..db_client import SubwayDB
+from ..events import load_events
+from .overtake import analyze_line, analyze_lines
 
 class CongestionAnalyzer:
-    def __init__(self):
-        self.db = SubwayDB()
+    def __init__(self, db: SubwayDB = None):
+        # 배치 실행기(runner)에서는 호선별로 DB 클라이언트 하나를 공유
+        self.db = db or SubwayDB()
 
-    def analyze_express_overtake(self, line_id: str):
+    def analyze_express_overtake(self, line_id: str, start=None, end=None):
         """
         급행/일반 열차 간섭 분석 (9호선 등 급행 운영 호선에 유효)
+        열차별 시간-위치 궤적에서 급행이 일반 열차를 추월한 지점과, 선행 일반 열차 때문에 급행이 감속한 구간을 찾습니다.
+        :param start, end: 분석 구간 (미지정 시 최근 Config.OVERTAKE_HISTORY_HOURS 시간)
         """
         print(f"--- Analyzing Express/Local Interference for Line {line_id} ---")
 
-        data = self.db.fetch_train_data(line_id, limit=3000)
-        if not data:
-            print("No data found.")
-            return
+        if Config.ANALYSIS_SOURCE == "events":
+            df = self.load_event_frame(line_id, start, end)
+            result = analyze_line(line_id, df=df, db=self.db) if not df.empty else {'line_id': line_id, 'error': 'no data'}
+        else:
+            result = analyze_line(line_id, start, end, db=self.db)
+        self._report(result)
+        return result
 
-        df = pd.DataFrame(data)
-        
-        # 급행(is_express='1')과 일반(is_express='0') 존재 여부 확인
-        if '1' not in df['is_express'].unique():
-            print("No express trains found in this line data.")
+    def load_event_frame(self, line_id: str, start=None, end=None) -> pd.DataFrame:
+        """
+        이벤트 스트림의 [start, end) 구간을 궤적 분석용 프레임으로 반환합니다.
+        반복 폴링 없이 열차 상태 변화만 집계하므로 도착/출발 시각(event_time)이 궤적의 관측점(created_at)입니다.
+        """
+        df = pd.DataFrame(load_events(line_id, db=self.db, start=start, end=end))
+        if 'event_time' in df:
+            df['created_at'] = df['event_time']
+        return df
+
+    def analyze_all_express_lines(self, start=None, end=None):
+        """
+        급행 운영 호선 전체(Config.EXPRESS_LINE_IDS)를 호선별 프로세스로 병렬 분석합니다.
+        """
+        print(f"--- Analyzing Express/Local Interference for Lines {', '.join(Config.EXPRESS_LINE_IDS)} ---")
+        results = analyze_lines(Config.EXPRESS_LINE_IDS, start, end)
+        for result in results.values():
+            self._report(result)
+        return results
+
+    @staticmethod
+    def _report(result):
+        line_id = result['line_id']
+        if result.get('error'):
+            print(f"[{line_id}] {result['error']}")
             return
+        if not result['express_runs']:
+            print(f"[{line_id}] No express trains found in this line data.")
+            return
+
+        overtakes = result['overtakes']
+        print(f"[{line_id}] Express runs: {result['express_runs']}, Local runs: {result['local_runs']}, "
+              f"Overtakes: {len(overtakes)}")
+        if not result['overtake_stations'].empty:
+            print("- Top overtake stations (by hour):")
+            print(result['overtake_stations'].head(10).to_string(index=False))
+        if not result['slowdowns'].empty:
+            print("- Express slowdown behind a leading local (by segment and hour):")
+            print(result['slowdowns'].head(10).round(2).to_string(index=False))
 
-        print("Express trains detected. Calculating average speeds...")
-        
-        # 간단히 역간 이동 속도(시간) 비교
-        # 여기서는 복잡한 공간 분석 대신, 급행과 일반의 역별 체류/이동 패턴 차이를 통계로 보여줌
-        
-        df['created_at'] = pd.to_datetime(df['created_at'])
-        
-        # 급행/일반 그룹 분리
-        express_trains = df[df['is_express'] == '1']
-        local_trains = df[df['is_express'] == '0']
-        
-        print(f"- Express Train Data Count: {len(express_trains)}")
-        print(f"- Local Train Data Count: {len(local_trains)}")
-        
-        # 추가 분석 로직은 데이터가 더 쌓여야 유의미하므로 기본 통계로 마무리
-        
 if __name__ == "__main__":
     analyzer = CongestionAnalyzer()
     # 9호선 ID 사용 (API 상 9호선은 '1009')
     analyzer.analyze_express_overtake("1009")
+    # analyzer.analyze_all_express_lines()
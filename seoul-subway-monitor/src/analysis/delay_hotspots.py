@@ -1,65 +1,127 @@
 from datetime import datetime
 import pandas as pd
+from ..config import Config
+from ..baselines import METRIC_DWELL, shared_store, slower_than_usual
 from ..db_client import SubwayDB
+from ..events import EVENT_DEPART, load_events
+from .frame_loader import load_positions_frame
 
 class DelayAnalyzer:
-    def __init__(self):
-        self.db = SubwayDB()
+    def __init__(self, db: SubwayDB = None):
+        # 배치 실행기(runner)에서는 호선별로 DB 클라이언트 하나를 공유
+        self.db = db or SubwayDB()
 
-    def analyze_station_dwell_time(self, line_id: str):
+    def analyze_station_dwell_time(self, line_id: str, start=None, end=None):
         """
         지연 발생 구간 탐지: 역별 체류 시간 분석
         :param line_id: 분석할 호선 ID
+        :param start, end: 분석 구간 (지정 시 구간 전체를 스트리밍 조회, 미지정 시 최근 데이터 일부)
         """
         print(f"--- Analyzing Delay Hotspots (Dwell Time) for Line {line_id} ---")
         
-        # 1. 데이터 가져오기
-        data = self.db.fetch_train_data(line_id, limit=3000)
-        if not data:
+        # 1~4. 역별 체류 시간 통계 (스냅샷/이벤트 스트림에서 계산 또는 서버 측 집계 조회)
+        stats = self.dwell_stats(line_id, start, end)
+        if stats is None:
             print("No data found.")
             return
+        if stats.empty:
+            print("No valid dwell time data found (need arrival->departure pairs).")
+            return
+        
+        print("\n[Analysis Result: Station Dwell Times]")
+        for station, row in stats.iterrows():
+            mean_sec = row['mean']
+            max_sec = row['max']
+            count = int(row['count'])
+            share = row.get('above_usual')
+            usual = "" if share is None or share != share else f" ({share:.0%} above usual p95)"
+            
+            print(f"- {station}: Avg {mean_sec:.1f}s (Max {max_sec:.1f}s) [n={count}]{usual}")
+            
+            # 평시 기준선(역·방향·시간대별 p95)이 있으면 초과 비율로, 없으면 평균 60초 기준으로 판단
+            slower = slower_than_usual(share)
+            if slower or (slower is None and mean_sec > 60):
+                print(f"  >>> WARNING: Long dwell time at {station}!")
+
+    def dwell_stats(self, line_id: str, start=None, end=None, frame=None):
+        """
+        역별 체류 시간 통계(index: station_name, mean/max/count)를 평균 내림차순으로 반환합니다. 데이터가 없으면 None
+        평시 기준선이 있으면 above_usual(시간대별 p95를 넘은 체류 비율) 컬럼을 함께 반환합니다.
+        :param frame: 이미 load_positions_frame으로 불러온 위치 데이터 (지정 시 DB를 다시 조회하지 않음)
+        """
+        if Config.ANALYSIS_SOURCE == "aggregates":
+            # 서버 측 집계: 역·방향별 집계 행을 역 단위로 합산
+            agg = self.db.fetch_station_stats("dwell", line_id, start, end)
+            if agg.empty:
+                return None
+            stats = agg.groupby('station_name').agg(total=('total_seconds', 'sum'), max=('max', 'max'), count=('count', 'sum'))
+            stats['mean'] = stats['total'] / stats['count']
+            return stats[['mean', 'max', 'count']].sort_values(by='mean', ascending=False)
+
+        # 1~3. 도착→출발 쌍의 체류 시간 (스냅샷 또는 이벤트 스트림)
+        departures = self._load_dwell_times(line_id, start, end, frame)
+        if departures is None:
+            return None
+        
+        # 4. 통계 산출
+        stats = departures.groupby('station_name', observed=True)['dwell_seconds'].agg(['mean', 'max', 'count'])
+
+        # 5. 평시 기준선 대비 (이력을 다시 읽지 않고 저장된 스케치의 분위수와 비교)
+        store = shared_store()
+        if store is not None:
+            time_column = 'event_time' if Config.ANALYSIS_SOURCE == "events" else 'created_at'
+            share = store.share_above(METRIC_DWELL, line_id, departures, 'dwell_seconds', ['station_name'], time_column)
+            if share is not None and share.notna().any():
+                stats['above_usual'] = share
+        return stats.sort_values(by='mean', ascending=False)
 
-        df = pd.DataFrame(data)
-        df['created_at'] = pd.to_datetime(df['created_at'])
+    def _load_dwell_times(self, line_id: str, start=None, end=None, frame=None):
+        """
+        역별 체류 시간(station_name, dwell_seconds)을 반환합니다. 데이터가 없으면 None
+        """
+        if Config.ANALYSIS_SOURCE == "events":
+            # 이벤트 스트림: 출발 이벤트에 같은 방문(visit_id)의 도착→출발 체류 시간이 들어 있음
+            events = load_events(line_id, (EVENT_DEPART,), self.db, start, end)
+            if not events:
+                return None
+            departures = pd.DataFrame(events)
+            return departures[departures['dwell_seconds'].notnull()].copy()
+
+        # 1. 데이터 가져오기
+        if frame is not None:
+            df = frame
+        else:
+            # 필요한 컬럼만 조회
+            df = self.db.fetch_train_frame(line_id, start, end, columns=['station_id', 'station_name', 'direction_type', 'train_number', 'train_status_code'], limit=3000)
+            if df.empty:
+                return None
+            # 전처리: 시각은 한 번만 파싱, 상태 코드는 int8로 변환
+            df = load_positions_frame(df)
+        if df.empty:
+            return None
         
         # 2. 도착(1) 및 출발(2) 데이터만 필터링
-        dwell_events = df[df['train_status_code'].isin(['1', '2'])].copy()
+        dwell_events = df[df['train_status_code'].isin([1, 2])].copy()
         
-        # 정렬: 열차번호, 시간순
-        dwell_events = dwell_events.sort_values(by=['train_number', 'created_at'])
+        # 정렬: 열차번호, 시간순 (미리 계산된 정수 키 사용)
+        dwell_events = dwell_events.sort_values(by=['train_key', 'created_at'])
         
         # 3. 체류 시간 계산 로직
         # 동일 열차가 동일 역에서 '도착' 후 '출발'한 시간 차이를 계산해야 함
         # 이를 위해 pivot 또는 shift 사용. 여기서는 단순화하여 shift 사용
         
-        dwell_events['prev_status'] = dwell_events.groupby(['train_number', 'station_name'])['train_status_code'].shift(1)
-        dwell_events['prev_time'] = dwell_events.groupby(['train_number', 'station_name'])['created_at'].shift(1)
+        dwell_events['prev_status'] = dwell_events.groupby(['train_key', 'station_name'], observed=True)['train_status_code'].shift(1)
+        dwell_events['prev_time'] = dwell_events.groupby(['train_key', 'station_name'], observed=True)['created_at'].shift(1)
         
-        # 조건: 이전 상태가 '1'(도착)이고 현재 상태가 '2'(출발)인 경우
+        # 조건: 이전 상태가 1(도착)이고 현재 상태가 2(출발)인 경우
         departures = dwell_events[
-            (dwell_events['train_status_code'] == '2') & 
-            (dwell_events['prev_status'] == '1')
+            (dwell_events['train_status_code'] == 2) & 
+            (dwell_events['prev_status'] == 1)
         ].copy()
         
-        if departures.empty:
-            print("No valid dwell time data found (need arrival->departure pairs).")
-            return
-            
         departures['dwell_seconds'] = (departures['created_at'] - departures['prev_time']).dt.total_seconds()
-        
-        # 4. 통계 산출
-        stats = departures.groupby('station_name')['dwell_seconds'].agg(['mean', 'max', 'count']).sort_values(by='mean', ascending=False)
-        
-        print("\n[Analysis Result: Station Dwell Times]")
-        for station, row in stats.iterrows():
-            mean_sec = row['mean']
-            max_sec = row['max']
-            count = int(row['count'])
-            
-            print(f"- {station}: Avg {mean_sec:.1f}s (Max {max_sec:.1f}s) [n={count}]")
-            
-            if mean_sec > 60: # 평균 60초 이상 정차 시 경고
-                print(f"  >>> WARNING: Long dwell time at {station}!")
+
+        return departures
 
 if __name__ == "__main__":
     analyzer = DelayAnalyzer()
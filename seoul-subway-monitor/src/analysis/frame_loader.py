@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+# 사전(dictionary) 인코딩할 ID/이름 컬럼
+CATEGORY_COLUMNS = [
+    "line_id", "line_name", "station_id", "station_name", "train_number",
+    "destination_station_id", "destination_station_name",
+]
+# int8로 저장할 코드 컬럼 (결측은 -1)
+CODE_COLUMNS = ["train_status_code", "direction_type"]
+# 불리언 플래그 컬럼: is_express는 저장된 코드(1:급행, 7:특급)를 급행 여부로 변환 (과거 문자열/불리언 데이터 포함)
+FLAG_COLUMNS = {"is_express": ("1", "7", "true"), "is_last_train": ("1", "true")}
+# 한 번만 파싱할 시각 컬럼
+TIME_COLUMNS = ["created_at", "last_received_time"]
+
+def load_positions_frame(data) -> pd.DataFrame:
+    """
+    위치 데이터를 메모리 효율적인 타입의 DataFrame으로 변환합니다.
+    - ID/이름: category (사전 인코딩)
+    - 상태/방향 코드: int8 (결측 -1)
+    - 급행/막차 여부: bool
+    - 시각: datetime64[ns, UTC] (int64 기반, 한 번만 파싱)
+    - 자주 쓰는 그룹 키(train_key, station_dir_key) 미리 계산, (created_at, id) 순으로 정렬
+
+    Args:
+        data (list | DataFrame): fetch_train_data 결과(dict 리스트) 또는 DataFrame
+
+    Returns:
+        DataFrame: 변환된 프레임 (원본 DataFrame은 변경하지 않음)
+    """
+    df = data.copy() if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    if df.empty:
+        return df
+
+    for column in TIME_COLUMNS:
+        if column in df and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            parsed = pd.to_datetime(df[column], errors="coerce", format="ISO8601")
+            if parsed.dt.tz is None:
+                # 시간대가 없는 API 시각(recptnDt)은 한국 표준시
+                parsed = parsed.dt.tz_localize("Asia/Seoul")
+            df[column] = parsed.dt.tz_convert("UTC")
+
+    for column in CATEGORY_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("category")
+
+    for column in CODE_COLUMNS:
+        if column in df and df[column].dtype != np.int8:
+            df[column] = pd.to_numeric(df[column], errors="coerce").fillna(-1).astype(np.int8)
+
+    for column, true_values in FLAG_COLUMNS.items():
+        if column in df and df[column].dtype != bool:
+            df[column] = df[column].astype(str).str.lower().isin(true_values)
+
+    # 그룹/정렬 키 미리 계산 (category 코드 기반 정수)
+    if "train_number" in df:
+        df["train_key"] = df["train_number"].cat.codes.astype(np.int32)
+    if "station_name" in df and "direction_type" in df:
+        df["station_dir_key"] = (df["station_name"].cat.codes.astype(np.int32) * 2
+                                 + df["direction_type"].clip(lower=0).astype(np.int32))
+
+    sort_columns = [column for column in ("created_at", "id") if column in df]
+    if sort_columns:
+        df = df.sort_values(sort_columns, kind="stable").reset_index(drop=True)
+    return df
@@ -1,54 +1,31 @@
 from datetime import datetime
 import pandas as pd
+from ..config import Config
+from ..baselines import METRIC_HEADWAY, shared_store, slower_than_usual
 from ..db_client import SubwayDB
+from ..events import EVENT_ARRIVE, load_events
+from ..logger import get_logger
+from .frame_loader import load_positions_frame
+
+log = get_logger("Interval")
 
 class IntervalAnalyzer:
-    def __init__(self):
-        self.db = SubwayDB()
+    def __init__(self, db: SubwayDB = None):
+        # 배치 실행기(runner)에서는 호선별로 DB 클라이언트 하나를 공유
+        self.db = db or SubwayDB()
 
-    def analyze_interval(self, line_id: str):
+    def analyze_interval(self, line_id: str, start=None, end=None):
         """
         배차 간격 정기성 분석
         :param line_id: 분석할 호선 ID
+        :param start, end: 분석 구간 (지정 시 구간 전체를 스트리밍 조회, 미지정 시 최근 데이터 일부)
         """
         print(f"--- Analyzing Interval Regularity for Line {line_id} ---")
         
-        # 1. 데이터 가져오기
-        data = self.db.fetch_train_data(line_id, limit=2000)
-        if not data:
-            print("No data found.")
-            return
-
-        df = pd.DataFrame(data)
-        
-        # 2. 필요한 컬럼 선택 및 전처리
-        # created_at을 datetime 객체로 변환
-        df['created_at'] = pd.to_datetime(df['created_at'])
-        
-        # 분석 대상: "특정 역"에 도착(train_status_code='1')한 데이터
-        # 역별, 방향별로 그룹화
-        # train_status_code: 0:진입, 1:도착, 2:출발
-        # 데이터 타입 안전성을 위해 문자열로 변환
-        df['train_status_code'] = df['train_status_code'].astype(str)
-        
-        arrivals = df[df['train_status_code'] == '1'].copy()
-        print(f"[Debug] Total records: {len(df)}, Arrivals(1): {len(arrivals)}")
-        
-        if arrivals.empty:
+        stats = self.interval_stats(line_id, start, end)
+        if stats is None:
             print("No arrival data found.")
             return
-            
-        # 정렬: 역, 방향, 시간순
-        arrivals = arrivals.sort_values(by=['station_name', 'direction_type', 'created_at'])
-        
-        # 3. 배차 간격 계산
-        # 이전 열차와의 시간 차이 계산 (초 단위)
-        arrivals['prev_arrival'] = arrivals.groupby(['station_name', 'direction_type'])['created_at'].shift(1)
-        arrivals['interval_seconds'] = (arrivals['created_at'] - arrivals['prev_arrival']).dt.total_seconds()
-        
-        # 4. 통계 산출
-        # 역별, 방향별 평균 간격 및 표준편차
-        stats = arrivals.groupby(['station_name', 'direction_type'])['interval_seconds'].agg(['mean', 'std', 'count']).reset_index()
         
         # 결과 출력 (NaN 제외)
         stats = stats.dropna()
@@ -56,17 +33,92 @@ class IntervalAnalyzer:
         print("\n[Analysis Result: Station Intervals]")
         for _, row in stats.iterrows():
             station = row['station_name']
-            direction = "Up/Inner" if row['direction_type'] == '0' else "Down/Outer"
+            direction = "Up/Inner" if int(row['direction_type']) == 0 else "Down/Outer"
             mean_min = row['mean'] / 60
             std_min = row['std'] / 60
             count = int(row['count'])
+            share = row.get('above_usual')
+            usual = "" if share is None or share != share else f" ({share:.0%} above usual p95)"
             
-            print(f"- {station} ({direction}): Avg {mean_min:.1f} min (+/- {std_min:.1f} min) [n={count}]")
+            print(f"- {station} ({direction}): Avg {mean_min:.1f} min (+/- {std_min:.1f} min) [n={count}]{usual}")
             
             # 간단한 이상치 탐지 (Bunching)
-            if std_min > 5.0: # 표준편차가 5분 이상이면 불규칙하다고 판단 (임의 기준)
+            # 평시 기준선(역·방향·시간대별 p95)이 있으면 초과 비율로, 없으면 표준편차 5분 기준(임의 기준)으로 판단
+            slower = slower_than_usual(share)
+            if slower or (slower is None and std_min > 5.0):
                 print(f"  >>> WARNING: Irregular intervals detected at {station}!")
 
+    def interval_stats(self, line_id: str, start=None, end=None, frame=None):
+        """
+        역별, 방향별 배차 간격 통계(station_name, direction_type, mean, std, count)를 반환합니다. 데이터가 없으면 None
+        평시 기준선이 있으면 above_usual(시간대별 p95를 넘은 간격 비율) 컬럼을 함께 반환합니다.
+        :param frame: 이미 load_positions_frame으로 불러온 위치 데이터 (지정 시 DB를 다시 조회하지 않음)
+        """
+        if Config.ANALYSIS_SOURCE == "aggregates":
+            # 서버 측 집계: 원본 도착 데이터 대신 역·방향별 집계 행만 조회
+            stats = self.db.fetch_station_stats("headway", line_id, start, end)
+            return None if stats.empty else stats
+
+        # 1. 도착 데이터 가져오기 (스냅샷 또는 이벤트 스트림)
+        arrivals = self._load_arrivals(line_id, start, end, frame)
+        if arrivals is None or arrivals.empty:
+            return None
+        
+        # 정렬: 역, 방향, 시간순
+        arrivals = arrivals.sort_values(by=['station_name', 'direction_type', 'created_at'])
+        
+        # 3. 배차 간격 계산
+        # 이전 열차와의 시간 차이 계산 (초 단위)
+        arrivals['prev_arrival'] = arrivals.groupby(['station_name', 'direction_type'], observed=True)['created_at'].shift(1)
+        arrivals['interval_seconds'] = (arrivals['created_at'] - arrivals['prev_arrival']).dt.total_seconds()
+        
+        # 4. 통계 산출
+        # 역별, 방향별 평균 간격 및 표준편차
+        stats = arrivals.groupby(['station_name', 'direction_type'], observed=True)['interval_seconds'].agg(['mean', 'std', 'count'])
+
+        # 5. 평시 기준선 대비 (이력을 다시 읽지 않고 저장된 스케치의 분위수와 비교)
+        store = shared_store()
+        if store is not None:
+            share = store.share_above(METRIC_HEADWAY, line_id, arrivals.dropna(subset=['interval_seconds']),
+                                      'interval_seconds', ['station_name', 'direction_type'])
+            if share is not None and share.notna().any():
+                stats['above_usual'] = share
+        return stats.reset_index()
+
+    def _load_arrivals(self, line_id: str, start=None, end=None, frame=None):
+        """
+        도착(train_status_code=1) 데이터를 created_at 컬럼과 함께 반환합니다.
+        """
+        if Config.ANALYSIS_SOURCE == "events":
+            # 이벤트 스트림: 같은 도착이 여러 번 폴링되어도 도착 이벤트는 한 번만 존재
+            events = load_events(line_id, (EVENT_ARRIVE,), self.db, start, end)
+            if not events:
+                return None
+            arrivals = pd.DataFrame(events)
+            arrivals['created_at'] = pd.to_datetime(arrivals['event_time'])
+            log.debug("Arrival events: {arrivals}", arrivals=len(arrivals), line_id=line_id)
+            return arrivals
+
+        if frame is not None:
+            df = frame
+        else:
+            # 필요한 컬럼만 조회
+            df = self.db.fetch_train_frame(line_id, start, end, columns=['station_id', 'station_name', 'direction_type', 'train_status_code', 'train_number'], limit=2000)
+            if df.empty:
+                return None
+
+            # 2. 전처리: 시각은 한 번만 파싱, 코드 컬럼은 int8, ID/이름은 category로 변환
+            df = load_positions_frame(df)
+        if df.empty:
+            return None
+        
+        # 분석 대상: "특정 역"에 도착(train_status_code=1)한 데이터
+        # 역별, 방향별로 그룹화
+        # train_status_code: 0:진입, 1:도착, 2:출발
+        arrivals = df[df['train_status_code'] == 1].copy()
+        log.debug("Total records: {rows}, Arrivals(1): {arrivals}", rows=len(df), arrivals=len(arrivals), line_id=line_id)
+        return arrivals
+
 if __name__ == "__main__":
     analyzer = IntervalAnalyzer()
     # 예시: 2호선(ID: 1002) 테스트
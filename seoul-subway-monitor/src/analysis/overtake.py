@@ -0,0 +1,300 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from ..config import Config
+from ..logger import get_logger
+from .frame_loader import load_positions_frame
+from .topology import FORWARD_DIRECTION, TopologyIndex, build_topology
+
+log = get_logger("Analysis")
+
+# 상태별 역 기준 위치 보정 (운행 방향 기준, 역 단위): 진입은 역 직전, 출발은 역 직후
+STATUS_OFFSETS = {0: -0.3, 1: 0.0, 2: 0.2}
+# 같은 열차의 관측 간격이 이보다 길면 다른 운행(run)으로 분리
+RUN_BREAK_SECONDS = 1200
+# 감속률을 보고할 최소 추종 표본 수 (격자 간격 단위)
+MIN_FOLLOWING_SAMPLES = 3
+
+def build_trajectories(df: pd.DataFrame, topology) -> pd.DataFrame:
+    """
+    위치 스냅샷을 열차 운행(run)별 시간-노선 위치 궤적으로 변환합니다.
+    coord는 운행 방향으로 증가하는 좌표(역 단위)이며, 순환선은 한 바퀴를 넘어가도 이어지도록 풀어 씁니다.
+
+    Returns:
+        DataFrame: run_id, train_number, direction_type, is_express, branch, t(초), coord
+    """
+    if 'train_key' not in df:
+        df = load_positions_frame(df)
+    station = df['station_id'].astype(str)
+    position = station.map(topology.lookup_table())
+    branch = station.map({station_id: topology.branch(station_id) for station_id in topology.lookup_table()})
+    df = df.assign(position=position, branch=branch)
+    df = df[df['position'].notna() & df['direction_type'].ge(0)]
+    if df.empty:
+        return pd.DataFrame(columns=['run_id', 'train_number', 'direction_type', 'is_express', 'branch', 't', 'coord'])
+    df = df.sort_values(['train_key', 'created_at'], kind='stable')
+
+    sign = np.where(df['direction_type'].to_numpy() == FORWARD_DIRECTION, 1.0, -1.0)
+    offset = (df['train_status_code'].map(STATUS_OFFSETS).fillna(0.0).to_numpy()
+              if 'train_status_code' in df else 0.0)
+    coord = sign * df['position'].to_numpy(dtype=float) + offset
+    t = df['created_at'].to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+
+    train_key = df['train_key'].to_numpy()
+    direction = df['direction_type'].to_numpy()
+    new_run = np.ones(len(df), dtype=bool)
+    new_run[1:] = ((train_key[1:] != train_key[:-1])
+                   | (direction[1:] != direction[:-1])
+                   | (np.diff(t) > RUN_BREAK_SECONDS))
+    run_id = np.cumsum(new_run) - 1
+
+    if topology.is_loop and topology.loop_length:
+        # 순환선: 한 바퀴 경계에서 좌표가 튀는 부분을 누적 보정
+        jump = np.zeros(len(df))
+        jump[1:] = np.where(new_run[1:], 0.0, np.diff(coord))
+        wraps = -np.round(jump / topology.loop_length) * topology.loop_length
+        wraps = pd.Series(wraps).groupby(run_id).cumsum().to_numpy()
+        coord = coord + wraps
+
+    return pd.DataFrame({
+        'run_id': run_id,
+        'train_number': df['train_number'].astype(str).to_numpy(),
+        'direction_type': direction,
+        'is_express': df['is_express'].to_numpy(dtype=bool),
+        'branch': df['branch'].to_numpy(dtype=np.int16),
+        't': t,
+        'coord': coord,
+    })
+
+def _grid_runs(traj: pd.DataFrame, grid: np.ndarray) -> list:
+    """
+    운행별 궤적을 공통 시간 격자에 선형 보간합니다. 운행마다 자기 구간만 저장하므로
+    메모리는 분석 기간이 아니라 전체 관측 시간에 비례합니다.
+
+    Returns:
+        list: (train_number, direction_type, is_express, 시작 격자, 끝 격자, 좌표 배열, 지선 배열)
+    """
+    # build_trajectories 결과는 run_id 순으로 정렬되어 있으므로 경계만 찾아 배열 조각으로 처리
+    t_all = traj['t'].to_numpy()
+    coord_all = traj['coord'].to_numpy()
+    branch_all = traj['branch'].to_numpy()
+    train_all = traj['train_number'].to_numpy()
+    direction_all = traj['direction_type'].to_numpy()
+    express_all = traj['is_express'].to_numpy()
+    bounds = np.flatnonzero(np.diff(traj['run_id'].to_numpy())) + 1
+
+    runs = []
+    for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(traj)]):
+        t = t_all[lo:hi]
+        start, stop = np.searchsorted(grid, t[0], 'left'), np.searchsorted(grid, t[-1], 'right')
+        if stop - start < 2:
+            continue
+        window = grid[start:stop]
+        coords = np.interp(window, t, coord_all[lo:hi]).astype(np.float32)
+        # 지선 번호는 직전 관측 기준 (계단형)
+        last = np.searchsorted(t, window, 'right') - 1
+        branches = branch_all[lo:hi][last]
+        runs.append((train_all[lo], int(direction_all[lo]), bool(express_all[lo]), start, stop, coords, branches))
+    return runs
+
+def _overlapping(runs: list, candidates: np.ndarray, start: int, stop: int):
+    """
+    [start, stop) 격자 구간에서 후보 운행들의 좌표/지선 행렬 (운행 구간 밖은 NaN / -1)
+    """
+    coords = np.full((len(candidates), stop - start), np.nan, dtype=np.float32)
+    branches = np.full((len(candidates), stop - start), -1, dtype=np.int16)
+    for row, index in enumerate(candidates):
+        _, _, _, run_start, run_stop, run_coords, run_branches = runs[index]
+        lo, hi = max(run_start, start), min(run_stop, stop)
+        coords[row, lo - start:hi - start] = run_coords[lo - run_start:hi - run_start]
+        branches[row, lo - start:hi - start] = run_branches[lo - run_start:hi - run_start]
+    return coords, branches
+
+def detect_overtakes(traj: pd.DataFrame, topology, grid_seconds: float = None, follow_stations: float = None):
+    """
+    급행/일반 열차의 추월 지점과 선행 일반 열차로 인한 급행 감속을 계산합니다.
+
+    Returns:
+        tuple: (추월 DataFrame, 감속 표본 DataFrame)
+    """
+    grid_seconds = grid_seconds or Config.OVERTAKE_GRID_SECONDS
+    follow_stations = follow_stations or Config.OVERTAKE_FOLLOW_STATIONS
+    empty = pd.DataFrame(), pd.DataFrame()
+    if traj.empty or not traj['is_express'].any() or traj['is_express'].all():
+        return empty
+
+    grid = np.arange(np.floor(traj['t'].min() / grid_seconds) * grid_seconds,
+                     traj['t'].max() + grid_seconds, grid_seconds)
+    runs = _grid_runs(traj, grid)
+    run_starts = np.array([run[3] for run in runs], dtype=np.int64)
+    run_stops = np.array([run[4] for run in runs], dtype=np.int64)
+
+    overtakes, samples = [], []
+    for direction in (0, 1):
+        express = [i for i, run in enumerate(runs) if run[1] == direction and run[2]]
+        local = np.array([i for i, run in enumerate(runs) if run[1] == direction and not run[2]], dtype=int)
+        if not express or not len(local):
+            continue
+        sign = 1.0 if direction == FORWARD_DIRECTION else -1.0
+        for e in express:
+            express_train, _, _, start, stop, x_e, branch_e = runs[e]
+            # 급행 운행 구간과 겹치는 일반 열차만 비교
+            candidates = local[(run_starts[local] < stop) & (run_stops[local] > start)]
+            if not len(candidates):
+                continue
+            x_l, branch_l = _overlapping(runs, candidates, start, stop)
+            gap = x_l - x_e          # 양수: 일반 열차가 앞
+            valid = ~np.isnan(gap) & (branch_l == branch_e)
+            gap = np.where(valid, gap, np.nan)
+
+            # 추월: 일반 열차가 앞(gap > 0)에서 뒤(gap <= 0)로 바뀐 시점.
+            # 위치 보고 오차로 앞뒤가 여러 번 바뀌면 마지막 교차만, 그 뒤로 다시 앞서지 않은 경우에만 인정
+            crossing = valid[:, :-1] & valid[:, 1:] & (gap[:, :-1] > 0) & (gap[:, 1:] <= 0)
+            pairs = np.nonzero(crossing.any(axis=1))[0]
+            last = crossing.shape[1] - 1 - np.argmax(crossing[pairs, ::-1], axis=1)
+            for pair, k in zip(pairs, last):
+                if (gap[pair, k + 2:] > 0).any():
+                    continue
+                g0, g1 = gap[pair, k], gap[pair, k + 1]
+                frac = g0 / (g0 - g1) if g0 != g1 else 0.0
+                coord = x_e[k] + frac * (x_e[k + 1] - x_e[k])
+                overtakes.append((direction, express_train, runs[candidates[pair]][0],
+                                  grid[start + k] + frac * grid_seconds, sign * coord, int(branch_e[k])))
+
+            # 감속: 앞선 일반 열차와의 거리(역 단위)가 follow_stations 이내인 시점의 급행 속도
+            ahead = np.where(gap > 0, gap, np.nan)
+            has_leader = (~np.isnan(ahead)).any(axis=0)
+            lead_gap = np.full(stop - start, np.inf)
+            lead_gap[has_leader] = np.nanmin(ahead[:, has_leader], axis=0)
+            speed = np.gradient(x_e) / grid_seconds * 60  # 역/분
+            ok = ~np.isnan(x_e) & ~np.isnan(speed)
+            samples.append(pd.DataFrame({
+                'direction_type': direction,
+                't': grid[start:stop][ok],
+                'position': sign * np.floor(x_e[ok]),  # 마지막으로 지난 역
+                'branch': branch_e[ok],
+                'speed': speed[ok],
+                'following': lead_gap[ok] <= follow_stations,
+            }))
+
+    overtake_df = pd.DataFrame(overtakes, columns=['direction_type', 'express_train', 'local_train', 't', 'position', 'branch'])
+    sample_df = pd.concat(samples, ignore_index=True) if samples else pd.DataFrame()
+    return overtake_df, sample_df
+
+def _station_labels(topology):
+    # (지선, 위치) -> 역명. 지선에 없는 위치는 본선 역명 사용
+    names = {}
+    for station_id, name, position, branch in topology.stations:
+        names[(branch, position)] = name or station_id
+    return names
+
+def _label(names, branch, position, loop_length=0):
+    if loop_length and branch == 0:
+        position %= loop_length
+    return names.get((branch, position)) or names.get((0, position))
+
+def summarize(line_id: str, overtakes: pd.DataFrame, samples: pd.DataFrame, topology) -> dict:
+    """
+    추월 지점(역·시간대별)과 구간·시간대별 급행 감속률을 정리합니다.
+    """
+    names = _station_labels(topology)
+    result = {'line_id': line_id, 'overtakes': pd.DataFrame(), 'overtake_stations': pd.DataFrame(), 'slowdowns': pd.DataFrame()}
+
+    if not overtakes.empty:
+        overtakes = overtakes.copy()
+        overtakes['time'] = pd.to_datetime(overtakes['t'], unit='s', utc=True).dt.tz_convert('Asia/Seoul')
+        overtakes['hour'] = overtakes['time'].dt.hour
+        nearest = overtakes['position'].round().astype(int)
+        overtakes['station_name'] = [_label(names, b, p, topology.loop_length) for b, p in zip(overtakes['branch'], nearest)]
+        overtakes.insert(0, 'line_id', line_id)
+        result['overtakes'] = overtakes.drop(columns=['t'])
+        result['overtake_stations'] = (overtakes.groupby(['direction_type', 'station_name', 'hour'])
+                                       .size().rename('overtakes').reset_index()
+                                       .sort_values('overtakes', ascending=False, kind='stable'))
+
+    if not samples.empty:
+        samples = samples.copy()
+        samples['hour'] = pd.to_datetime(samples['t'], unit='s', utc=True).dt.tz_convert('Asia/Seoul').dt.hour
+        step = np.where(samples['direction_type'] == FORWARD_DIRECTION, 1, -1)
+        position = samples['position'].astype(int)
+        # 구간 이름은 (지선, 역, 방향) 조합별로 한 번만 만듦
+        keys = pd.MultiIndex.from_arrays([samples['branch'], position, step])
+        codes, unique = pd.factorize(keys)
+        labels = np.array([f"{_label(names, b, p, topology.loop_length)} -> {_label(names, b, p + s, topology.loop_length)}"
+                           for b, p, s in unique], dtype=object)
+        samples['segment'] = labels[codes]
+        speeds = (samples.groupby(['direction_type', 'segment', 'hour', 'following'])['speed']
+                  .agg(['mean', 'count']).unstack('following'))
+        slowdowns = pd.DataFrame({
+            'free_speed': speeds.get(('mean', False)),
+            'following_speed': speeds.get(('mean', True)),
+            'following_samples': speeds.get(('count', True)),
+        }).dropna(subset=['free_speed', 'following_speed'])
+        slowdowns = slowdowns[(slowdowns['free_speed'] > 0) & (slowdowns['following_samples'] >= MIN_FOLLOWING_SAMPLES)]
+        slowdowns['slowdown_pct'] = (1 - slowdowns['following_speed'] / slowdowns['free_speed']) * 100
+        result['slowdowns'] = (slowdowns.reset_index()
+                               .sort_values('slowdown_pct', ascending=False, kind='stable'))
+    return result
+
+def analyze_line(line_id: str, start=None, end=None, df: pd.DataFrame = None, topology=None, db=None) -> dict:
+    """
+    한 호선의 추월/감속 분석 (프로세스 풀에서 호선별로 실행)
+    df가 없으면 DB에서 start~end 구간을, start/end도 없으면 최근 Config.OVERTAKE_HISTORY_HOURS 시간을 조회합니다.
+    """
+    if df is None:
+        if db is None:
+            from ..db_client import SubwayDB
+            db = SubwayDB()
+        if start is None and end is None:
+            start = datetime.now(timezone.utc) - timedelta(hours=Config.OVERTAKE_HISTORY_HOURS)
+        df = db.fetch_train_frame(line_id, start, end,
+                                  columns=['line_id', 'train_number', 'direction_type', 'station_id', 'station_name',
+                                           'train_status_code', 'is_express'])
+    if df.empty:
+        return {'line_id': line_id, 'error': 'no data'}
+
+    df = load_positions_frame(df)
+    if topology is None:
+        index = TopologyIndex()
+        if db is None:
+            # DB 없이 프레임만 주어진 경우: 유효한 캐시만 사용
+            topology = None if index.is_stale(line_id) else index.lines[line_id]
+        else:
+            try:
+                topology = index.get(line_id, db=db)
+            except Exception as e:
+                log.warning("Topology cache unavailable for line {line_id}: {error}", line_id=line_id, error=str(e))
+        # 캐시를 만들 수 없으면 분석 데이터로 바로 학습
+        topology = topology or build_topology(df).get(line_id)
+    if topology is None:
+        return {'line_id': line_id, 'error': 'no topology'}
+
+    traj = build_trajectories(df, topology)
+    overtakes, samples = detect_overtakes(traj, topology)
+    result = summarize(line_id, overtakes, samples, topology)
+    result['express_runs'] = int(traj.loc[traj['is_express'], 'run_id'].nunique()) if not traj.empty else 0
+    result['local_runs'] = int(traj.loc[~traj['is_express'], 'run_id'].nunique()) if not traj.empty else 0
+    return result
+
+def analyze_lines(line_ids: list = None, start=None, end=None, max_workers: int = None) -> dict:
+    """
+    급행 운영 호선들을 프로세스 풀에서 병렬로 분석합니다.
+
+    Returns:
+        dict: line_id -> analyze_line 결과
+    """
+    line_ids = line_ids or Config.EXPRESS_LINE_IDS
+    max_workers = max_workers or min(len(line_ids), Config.ANALYSIS_MAX_WORKERS)
+    if max_workers <= 1:
+        return {line_id: analyze_line(line_id, start, end) for line_id in line_ids}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {line_id: executor.submit(analyze_line, line_id, start, end) for line_id in line_ids}
+        results = {}
+        for line_id, future in futures.items():
+            try:
+                results[line_id] = future.result()
+            except Exception as e:
+                log.error("Overtake analysis failed for line {line_id}: {error}", line_id=line_id, error=str(e))
+                results[line_id] = {'line_id': line_id, 'error': str(e)}
+        return results
@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from ..config import Config
+from ..db_client import SubwayDB
+from ..logger import get_logger
+from .congestion_overtake import CongestionAnalyzer
+from .delay_hotspots import DelayAnalyzer
+from .frame_loader import load_positions_frame
+from .interval_regularity import IntervalAnalyzer
+from .overtake import analyze_line as analyze_overtakes
+from .turnaround_efficiency import TurnaroundAnalyzer
+from .turnaround_engine import summarize_turnarounds
+
+log = get_logger("Runner")
+
+# 네 분석기가 쓰는 컬럼의 합집합 (호선별로 한 번만 조회)
+FRAME_COLUMNS = ['line_id', 'train_number', 'station_id', 'station_name', 'direction_type',
+                 'train_status_code', 'is_express', 'destination_station_id']
+TURNAROUND_COLUMNS = ['train_number', 'service_day', 'station_id', 'station_name', 'direction_type',
+                      'departure_direction', 'arrived_at', 'departed_at', 'hour', 'kind',
+                      'turnaround_time_min', 'turnaround_seconds', 'event_time']
+
+def _interval(db, line_id, start, end, frame):
+    stats = IntervalAnalyzer(db).interval_stats(line_id, start, end, frame=frame)
+    return {} if stats is None else {'interval': stats}
+
+def _dwell(db, line_id, start, end, frame):
+    stats = DelayAnalyzer(db).dwell_stats(line_id, start, end, frame=frame)
+    return {} if stats is None else {'dwell': stats.reset_index()}
+
+def _turnaround(db, line_id, start, end, frame):
+    if Config.ANALYSIS_SOURCE == "aggregates":
+        return {'turnaround': db.fetch_station_stats("turnaround", line_id, start, end)}
+    turnarounds = TurnaroundAnalyzer(db).load_turnarounds(line_id, start, end, frame=frame)
+    if turnarounds is None:
+        return {}
+    tables = {'turnaround': turnarounds[[column for column in TURNAROUND_COLUMNS if column in turnarounds]]}
+    if 'kind' in turnarounds:
+        # 종착역·도착 방향·시간대별 회차 시간 분포
+        tables['turnaround_summary'] = summarize_turnarounds(turnarounds)
+    return tables
+
+def _overtake(db, line_id, start, end, frame):
+    # 급행 운영 호선만 분석
+    if line_id not in Config.EXPRESS_LINE_IDS:
+        return {}
+    if frame is None and Config.ANALYSIS_SOURCE == "events":
+        # 이벤트 스트림도 다른 분석기와 같은 [start, end) 구간만 사용 (summary.json의 구간과 일치)
+        frame = CongestionAnalyzer(db).load_event_frame(line_id, start, end)
+        if frame.empty:
+            return {}
+    result = analyze_overtakes(line_id, start, end, df=frame, db=db)
+    if result.get('error'):
+        return {}
+    return {f"overtake_{key}": result[key] for key in ('overtakes', 'overtake_stations', 'slowdowns')}
+
+# 분석기 이름 -> fn(db, line_id, start, end, frame) -> {결과 이름: DataFrame}
+ANALYZERS = {
+    'interval': _interval,
+    'dwell': _dwell,
+    'turnaround': _turnaround,
+    'overtake': _overtake,
+}
+
+def _write_table(table: pd.DataFrame, path: str, output_format: str) -> str:
+    if output_format == "json":
+        path += ".json"
+        table.to_json(path, orient="records", date_format="iso", force_ascii=False)
+    else:
+        path += ".parquet"
+        table.to_parquet(path, index=False)
+    return path
+
+def run_line(line_id: str, start, end, analyzers: list, output_dir: str, output_format: str) -> dict:
+    """
+    한 호선의 데이터를 한 번만 불러와 모든 분석기를 실행하고 결과를 파일로 저장합니다. (프로세스 풀 작업 단위)
+
+    Returns:
+        dict: line_id, rows, timings(초), files, errors
+    """
+    timings, files, errors = {}, [], {}
+    started = time.perf_counter()
+    db = SubwayDB()
+
+    frame = None
+    rows = 0
+    if Config.ANALYSIS_SOURCE == "snapshots":
+        frame = load_positions_frame(db.fetch_train_frame(line_id, start, end, columns=FRAME_COLUMNS))
+        rows = len(frame)
+    timings['load'] = round(time.perf_counter() - started, 3)
+
+    line_dir = os.path.join(output_dir, line_id)
+    os.makedirs(line_dir, exist_ok=True)
+    for name in analyzers:
+        analyzer_started = time.perf_counter()
+        try:
+            tables = ANALYZERS[name](db, line_id, start, end, frame) if frame is None or not frame.empty else {}
+            for table_name, table in tables.items():
+                if table is not None and not table.empty:
+                    files.append(_write_table(table, os.path.join(line_dir, table_name), output_format))
+        except Exception as e:
+            errors[name] = str(e)
+        timings[name] = round(time.perf_counter() - analyzer_started, 3)
+
+    timings['total'] = round(time.perf_counter() - started, 3)
+    return {'line_id': line_id, 'rows': rows, 'timings': timings, 'files': files, 'errors': errors}
+
+def run_all(line_ids: list = None, start=None, end=None, analyzers: list = None, max_workers: int = None,
+            output_dir: str = None, output_format: str = None) -> dict:
+    """
+    전 호선 배치 분석: 호선별 run_line을 프로세스 풀 한 번으로 실행하고 실행 요약(summary.json)을 남깁니다.
+    start/end가 없으면 최근 Config.ANALYSIS_HISTORY_HOURS 시간을 모든 호선에 같은 구간으로 적용합니다.
+
+    Returns:
+        dict: 실행 요약 (구간, 호선별 결과, 전체 소요 시간)
+    """
+    line_ids = line_ids or [Config.LINE_IDS[name] for name in Config.TARGET_LINES if name in Config.LINE_IDS]
+    analyzers = analyzers or list(ANALYZERS)
+    output_format = output_format or Config.ANALYSIS_OUTPUT_FORMAT
+    end = pd.Timestamp(end).to_pydatetime() if end is not None else datetime.now(timezone.utc)
+    if start is None:
+        start = end - timedelta(hours=Config.ANALYSIS_HISTORY_HOURS)
+    run_dir = os.path.join(output_dir or Config.ANALYSIS_OUTPUT_DIR,
+                           "run_" + datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"))
+    os.makedirs(run_dir, exist_ok=True)
+    max_workers = max(1, min(max_workers or Config.ANALYSIS_MAX_WORKERS, len(line_ids)))
+
+    log.info("Analyzing {line_count} lines ({analyzer_names}) with {max_workers} workers -> {run_dir}",
+             line_count=len(line_ids), analyzer_names=", ".join(analyzers), max_workers=max_workers, run_dir=run_dir)
+    started = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_line, line_id, start, end, analyzers, run_dir, output_format): line_id
+                   for line_id in line_ids}
+        for future in as_completed(futures):
+            line_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'line_id': line_id, 'rows': 0, 'timings': {}, 'files': [], 'errors': {'load': str(e)}}
+            results[line_id] = result
+            timing = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result['timings'].items())
+            log.info("{line_id}: {rows} rows, {timing}", line_id=line_id, rows=result['rows'],
+                     timing=timing or 'failed', timings=result['timings'])
+            for name, error in result['errors'].items():
+                log.error("{line_id} {analyzer}: {error}", line_id=line_id, analyzer=name, error=error)
+
+    summary = {
+        'start': pd.Timestamp(start).isoformat(),
+        'end': pd.Timestamp(end).isoformat(),
+        'source': Config.ANALYSIS_SOURCE,
+        'format': output_format,
+        'elapsed_seconds': round(time.perf_counter() - started, 3),
+        'lines': [results[line_id] for line_id in line_ids],
+    }
+    with open(os.path.join(run_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    log.info("Done in {elapsed_seconds:.1f}s ({error_count} errors)", elapsed_seconds=summary['elapsed_seconds'],
+             error_count=sum(len(result['errors']) for result in results.values()))
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all analyzers for every target line in one process pool")
+    parser.add_argument("--lines", nargs="+", default=None, help="호선 ID (기본: Config.TARGET_LINES 전체)")
+    parser.add_argument("--analyzers", nargs="+", default=None, choices=sorted(ANALYZERS), help="실행할 분석기 (기본: 전체)")
+    parser.add_argument("--start", default=None, help="구간 시작 (ISO 8601, 예: 2026-10-17T00:00:00+09:00)")
+    parser.add_argument("--end", default=None, help="구간 끝 (ISO 8601)")
+    parser.add_argument("--workers", type=int, default=None, help="프로세스 수 (기본: Config.ANALYSIS_MAX_WORKERS)")
+    parser.add_argument("--output", default=None, help="결과 디렉터리 (기본: Config.ANALYSIS_OUTPUT_DIR)")
+    parser.add_argument("--format", default=None, choices=["parquet", "json"], help="결과 형식")
+    args = parser.parse_args()
+    run_all(args.lines, args.start, args.end, args.analyzers, args.workers, args.output, args.format)
+
+if __name__ == "__main__":
+    main()
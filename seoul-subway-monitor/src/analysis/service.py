@@ -0,0 +1,338 @@
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from ..config import Config
+from ..logger import get_logger
+from ..metrics import REGISTRY
+from ..status_server import StatusServer
+
+# pandas/supabase/분석기 모듈은 처음 필요할 때 불러옴 (서비스 시작 시간 단축, warm()에서 미리 불러올 수 있음)
+
+log = get_logger("Analysis Service")
+
+ANALYSIS_REQUESTS = REGISTRY.counter(
+    "subway_analysis_requests_total", "Analysis service lookups by cache result (hit, miss)", ("analyzer", "result"))
+ANALYSIS_SECONDS = REGISTRY.histogram(
+    "subway_analysis_compute_seconds", "Time to recompute one analyzer result after the data watermark moved", ("analyzer",))
+WATERMARK_QUERIES = REGISTRY.counter(
+    "subway_analysis_watermark_queries_total", "Watermark lookups that reached the data source", ("source",))
+
+class ResultCache:
+    """
+    분석 결과 LRU 캐시: (분석기, 호선, 구간, 데이터 수위) -> 직렬화된 응답(bytes)
+    수위가 바뀌면 키가 달라지므로 무효화가 필요 없고, 오래된 항목은 max_entries를 넘을 때 밀려납니다.
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or Config.ANALYSIS_CACHE_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+class WarmFrame:
+    """
+    한 (호선, 구간)의 위치 데이터 프레임을 메모리에 유지합니다.
+    처음에는 구간 전체를 불러오고, 이후에는 마지막으로 읽은 id 이후에 적재된 행만 키셋 조회로 이어 붙입니다.
+    (created_at은 수집 시각이라 늦게 반영된 스풀 행이 뒤에 끼어들 수 있으므로 id 기준으로 이어 붙인 뒤 시간순 정렬)
+    최근 hours시간 구간(start/end 미지정)은 이어 붙인 뒤 구간 밖으로 밀려난 행을 잘라냅니다.
+    """
+
+    def __init__(self, line_id: str, start=None, end=None, hours: float = None):
+        self.line_id = line_id
+        self.start = start
+        self.end = end
+        self.hours = hours
+        self.raw = None       # 조회한 원본 행 (created_at은 UTC datetime)
+        self.frame = None     # load_positions_frame 결과 (분석기 입력)
+        self.hwm = None       # 지금까지 읽은 가장 큰 id
+        self.watermark = None # 마지막 갱신 때의 데이터 수위 (같으면 다시 조회하지 않음)
+        self.loaded_at = None
+
+    def refresh(self, db, columns: list, watermark: str = None):
+        import pandas as pd
+        from .frame_loader import load_positions_frame
+
+        if self.frame is not None and watermark is not None and watermark == self.watermark:
+            return self.frame
+        if self.hwm is None:
+            start, end = self.start, self.end
+            if start is None and end is None:
+                start = datetime.now(timezone.utc) - timedelta(hours=self.hours)
+            chunks = [db.fetch_train_frame(self.line_id, start, end, columns=columns)]
+        else:
+            start = self.start
+            if start is None and self.hours is not None:
+                start = datetime.now(timezone.utc) - timedelta(hours=self.hours)
+            chunks = [self.raw] + list(db.iter_train_data(self.line_id, start, self.end, columns, after_id=self.hwm))
+            if len(chunks) == 1 and self.hours is None:
+                return self.frame
+        chunks = [chunk for chunk in chunks if not chunk.empty]
+        raw = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns + ['created_at', 'id'])
+        raw['created_at'] = pd.to_datetime(raw['created_at'], utc=True, format="ISO8601")
+        if self.hours is not None:
+            raw = raw[raw['created_at'] >= pd.Timestamp.now(tz="UTC") - pd.Timedelta(hours=self.hours)]
+        raw = raw.sort_values(['created_at', 'id'], kind="stable").reset_index(drop=True)
+        if not raw.empty:
+            self.hwm = max(int(raw['id'].max()), self.hwm or 0)
+        self.raw = raw
+        self.frame = load_positions_frame(raw)
+        self.watermark = watermark
+        self.loaded_at = datetime.now(timezone.utc)
+        return self.frame
+
+class AnalysisService:
+    """
+    상주 분석 서비스: DB 클라이언트와 위치 프레임을 유지한 채 분석기(runner.ANALYZERS) 결과를 HTTP로 제공합니다.
+    - 요청마다 구간의 데이터 수위(마지막 적재 행)를 확인하고, (분석기, 호선, 구간, 수위)가 같으면 캐시된 응답을 그대로 반환
+    - 수위 조회도 ANALYSIS_WATERMARK_TTL_SECONDS 동안 재사용하므로 몇 초마다 새로 고치는 대시보드는 dict 조회만 함
+    - 수위가 바뀌면 새로 적재된 행만 프레임에 이어 붙이고 다시 계산
+
+    경로:
+        /analysis                                  분석기 목록, 캐시/프레임 상태
+        /analysis/<analyzer>/<line_id>?hours=6     최근 hours시간 (기본: ANALYSIS_HISTORY_HOURS)
+        /analysis/<analyzer>/<line_id>?start=...&end=...
+    """
+
+    def __init__(self, db=None, max_entries: int = None, watermark_ttl: float = None, max_frames: int = None):
+        self._db = db
+        self.results = ResultCache(max_entries)
+        self.watermark_ttl = Config.ANALYSIS_WATERMARK_TTL_SECONDS if watermark_ttl is None else watermark_ttl
+        self.max_frames = max_frames or Config.ANALYSIS_WARM_FRAMES
+        self._frames = OrderedDict()     # (line_id, start, end, hours) -> WarmFrame
+        self._watermarks = {}            # (source, line_id, start, end) -> (확인 시각 monotonic, 수위)
+        self._line_locks = {}            # line_id -> Lock (같은 호선의 프레임 갱신/계산은 한 번에 하나)
+        self._lock = threading.Lock()
+        self._sink = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            from ..db_client import SubwayDB
+            self._db = SubwayDB()
+        return self._db
+
+    def warm(self, line_ids: list = None, analyzers: list = None):
+        """
+        무거운 모듈과 DB 클라이언트를 미리 준비하고, line_ids가 주어지면 최근 구간 결과를 미리 계산합니다.
+        """
+        from .runner import ANALYZERS
+
+        try:
+            self.db  # 클라이언트 생성
+        except Exception as e:
+            log.error("Failed to create DB client: {error}", error=str(e))
+            return
+        for line_id in line_ids or []:
+            for name in analyzers or list(ANALYZERS):
+                try:
+                    self.result(name, line_id)
+                except Exception as e:
+                    log.error("Warm-up {analyzer} for line {line_id} failed: {error}",
+                              analyzer=name, line_id=line_id, error=str(e))
+
+    # ---------- 수위 ----------
+
+    def watermark(self, line_id: str, start=None, end=None):
+        """
+        구간 데이터의 수위. 마지막 확인 후 watermark_ttl초 안에는 다시 조회하지 않습니다.
+        조회에 실패하면 마지막으로 확인한 값을 사용합니다. (캐시된 결과를 계속 제공)
+        """
+        source = "events" if Config.ANALYSIS_SOURCE == "events" else "positions"
+        key = (source, line_id, start, end)
+        now = time.monotonic()
+        checked = self._watermarks.get(key)
+        if checked is not None and now - checked[0] < self.watermark_ttl:
+            return checked[1]
+
+        WATERMARK_QUERIES.inc(source)
+        if source == "events":
+            if self._sink is None:
+                from ..events import create_event_sink
+                self._sink = create_event_sink(self.db)
+            value = self._sink.watermark(line_id)
+        else:
+            value = self.db.fetch_watermark(line_id, start, end)
+        if value is None:
+            if checked is None:
+                return None
+            value = checked[1]
+        self._watermarks[key] = (now, value)
+        return value
+
+    # ---------- 결과 ----------
+
+    def result(self, analyzer: str, line_id: str, start=None, end=None, hours: float = None) -> bytes:
+        """
+        분석 결과 JSON(bytes). 데이터 수위가 그대로면 캐시에서 바로 반환합니다.
+        알 수 없는 분석기면 KeyError
+        """
+        from .runner import ANALYZERS
+
+        if analyzer not in ANALYZERS:
+            raise KeyError(analyzer)
+        if start is None and end is None:
+            hours = float(hours or Config.ANALYSIS_HISTORY_HOURS)
+        else:
+            hours = None
+        watermark = self.watermark(line_id, start, end)
+        key = (analyzer, line_id, start, end, hours, Config.ANALYSIS_SOURCE, watermark)
+        cached = self.results.get(key)
+        if cached is not None:
+            ANALYSIS_REQUESTS.inc(analyzer, "hit")
+            return cached
+
+        with self._line_lock(line_id):
+            # 같은 키를 기다리던 다른 요청이 이미 계산했을 수 있음
+            if key in self.results:
+                return self.results.get(key)
+            ANALYSIS_REQUESTS.inc(analyzer, "miss")
+            started = time.perf_counter()
+            tables, rows = self._compute(ANALYZERS[analyzer], line_id, start, end, hours, watermark)
+            elapsed = time.perf_counter() - started
+            ANALYSIS_SECONDS.observe(elapsed, analyzer)
+            payload = {
+                "analyzer": analyzer,
+                "line_id": line_id,
+                "start": start,
+                "end": end,
+                "hours": hours,
+                "source": Config.ANALYSIS_SOURCE,
+                "watermark": watermark,
+                "rows": rows,
+                "computed_at": datetime.now(timezone.utc).isoformat(),
+                "compute_seconds": round(elapsed, 3),
+                "tables": {name: json.loads(table.to_json(orient="records", date_format="iso", force_ascii=False))
+                           for name, table in tables.items() if table is not None and not table.empty},
+            }
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            if watermark is not None:
+                # 수위를 모르면(조회 실패, 이전 값 없음) 다음 요청에서 다시 계산
+                self.results.put(key, body)
+            return body
+
+    def _compute(self, fn, line_id: str, start, end, hours, watermark):
+        # runner.run_line과 같은 방식: 스냅샷 소스면 위치 프레임 하나를 모든 분석기가 공유
+        from .runner import FRAME_COLUMNS
+
+        frame = None
+        if Config.ANALYSIS_SOURCE == "snapshots":
+            frame = self._frame(line_id, start, end, hours).refresh(self.db, FRAME_COLUMNS, watermark)
+            if frame.empty:
+                return {}, 0
+        if start is None and end is None:
+            end = datetime.now(timezone.utc)
+            start = end - timedelta(hours=hours)
+        return fn(self.db, line_id, start, end, frame), 0 if frame is None else len(frame)
+
+    def _frame(self, line_id: str, start, end, hours) -> WarmFrame:
+        key = (line_id, start, end, hours)
+        with self._lock:
+            warm = self._frames.get(key)
+            if warm is None:
+                warm = self._frames[key] = WarmFrame(line_id, start, end, hours)
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+            return warm
+
+    def _line_lock(self, line_id: str) -> threading.Lock:
+        with self._lock:
+            return self._line_locks.setdefault(line_id, threading.Lock())
+
+    # ---------- 상태/HTTP ----------
+
+    def status(self) -> dict:
+        from .runner import ANALYZERS
+
+        with self._lock:
+            frames = [
+                {"line_id": warm.line_id, "start": warm.start, "end": warm.end, "hours": warm.hours,
+                 "rows": 0 if warm.raw is None else len(warm.raw), "hwm": warm.hwm,
+                 "loaded_at": warm.loaded_at.isoformat() if warm.loaded_at else None}
+                for warm in self._frames.values()
+            ]
+        return {
+            "analyzers": sorted(ANALYZERS),
+            "source": Config.ANALYSIS_SOURCE,
+            "watermark_ttl_seconds": self.watermark_ttl,
+            "cache": self.results.stats(),
+            "frames": frames,
+        }
+
+    def handle_request(self, params: list, query: dict):
+        """
+        StatusServer 핸들러 (결과는 미리 직렬화된 bytes로 반환하므로 캐시 적중 시 JSON 변환도 없음)
+        """
+        if not params:
+            return self.status()
+        if len(params) != 2:
+            raise KeyError("/".join(params))
+        hours = float(query["hours"]) if "hours" in query else None
+        return self.result(params[0], params[1], query.get("start"), query.get("end"), hours)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve analyzer results from a warm process with watermark-keyed caching")
+    parser.add_argument("--host", default=None, help="바인드 주소 (기본: Config.STATUS_SERVER_HOST)")
+    parser.add_argument("--port", type=int, default=None, help="포트 (기본: Config.ANALYSIS_SERVICE_PORT)")
+    parser.add_argument("--warm", nargs="*", default=None, metavar="LINE_ID",
+                        help="시작 직후 최근 구간 결과를 미리 계산할 호선 (값 없이 주면 Config.TARGET_LINES 전체)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    service = AnalysisService()
+    server = StatusServer(args.host, Config.ANALYSIS_SERVICE_PORT if args.port is None else args.port)
+    server.add_route("/analysis", service.handle_request)
+    server.add_route("/metrics", REGISTRY.handle_request)
+    server.start()
+    log.info("Listening on http://{host}:{port}/analysis (started in {startup_seconds:.2f}s)",
+             host=server.host, port=server.port, startup_seconds=time.perf_counter() - started)
+
+    # 모듈/클라이언트 준비와 미리 계산은 백그라운드에서 (그동안 들어온 요청은 필요한 모듈을 직접 불러옴)
+    line_ids = None
+    if args.warm is not None:
+        line_ids = args.warm or [Config.LINE_IDS[name] for name in Config.TARGET_LINES if name in Config.LINE_IDS]
+    threading.Thread(target=service.warm, args=(line_ids,), name="analysis-warm", daemon=True).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        log.info("Stopping.")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+import argparse
+import json
+import os
+import tempfile
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from ..config import Config
+from ..file_lock import file_lock
+from ..logger import get_logger
+from .frame_loader import load_positions_frame
+
+log = get_logger("Topology")
+
+# 위치(position)가 증가하는 운행 방향: 1(하행/외선). 0(상행/내선)은 반대 방향
+FORWARD_DIRECTION = 1
+TOPOLOGY_VERSION = 1
+
+class LineTopology:
+    """
+    한 호선의 역 순서 조회 테이블
+    - position: 기준 역(0)으로부터의 역 수 (지선은 분기역 위치에서 이어짐)
+    - index: 본선 → 지선 순으로 매긴 누적 순번 (역마다 고유)
+    - branch: 0이면 본선(순환선은 순환 구간), 1 이상이면 지선 번호
+    역 ID → (index, position, branch) 조회는 dict 한 번(O(1))입니다.
+    """
+
+    def __init__(self, line_id: str, stations: list, edges: list, is_loop: bool = False, built_at: str = None):
+        self.line_id = line_id
+        self.stations = stations  # [(station_id, station_name, position, branch)] index 순
+        self.edges = edges        # [(from_index, to_index)] 정방향(FORWARD_DIRECTION) 인접 구간
+        self.is_loop = is_loop
+        self.built_at = built_at
+        self.loop_length = sum(1 for station in stations if station[3] == 0) if is_loop else 0
+        self._lookup = {station[0]: (index, station[2], station[3]) for index, station in enumerate(stations)}
+        self._next = defaultdict(list)
+        self._prev = defaultdict(list)
+        for from_index, to_index in edges:
+            self._next[stations[from_index][0]].append(stations[to_index][0])
+            self._prev[stations[to_index][0]].append(stations[from_index][0])
+
+    def __contains__(self, station_id):
+        return station_id in self._lookup
+
+    def __len__(self):
+        return len(self.stations)
+
+    def position(self, station_id):
+        entry = self._lookup.get(station_id)
+        return entry[1] if entry else None
+
+    def index(self, station_id):
+        entry = self._lookup.get(station_id)
+        return entry[0] if entry else None
+
+    def branch(self, station_id):
+        entry = self._lookup.get(station_id)
+        return entry[2] if entry else None
+
+    def station_name(self, station_id):
+        entry = self._lookup.get(station_id)
+        return self.stations[entry[0]][1] if entry else None
+
+    def lookup_table(self) -> dict:
+        """
+        벡터 연산용 매핑 (station_id -> position), pandas Series.map 등에 사용
+        """
+        return {station_id: entry[1] for station_id, entry in self._lookup.items()}
+
+    def distance(self, from_station_id, to_station_id, direction_type: int = FORWARD_DIRECTION):
+        """
+        운행 방향 기준으로 from → to까지의 역 수 (순환선은 한 바퀴 기준으로 감음). 모르는 역이면 None
+        """
+        start, end = self.position(from_station_id), self.position(to_station_id)
+        if start is None or end is None:
+            return None
+        diff = end - start if direction_type == FORWARD_DIRECTION else start - end
+        if self.is_loop and self.loop_length:
+            diff %= self.loop_length
+        return diff
+
+    def next_stations(self, station_id, direction_type: int = FORWARD_DIRECTION) -> list:
+        """
+        운행 방향 기준 다음 역 목록 (분기역이면 여러 개)
+        """
+        return list((self._next if direction_type == FORWARD_DIRECTION else self._prev).get(station_id, ()))
+
+    def terminals(self, direction_type: int = FORWARD_DIRECTION) -> list:
+        """
+        운행 방향 기준 종착역 목록 (다음 역이 없는 역). 순환선 본선에는 종착역이 없음
+        """
+        following = self._next if direction_type == FORWARD_DIRECTION else self._prev
+        return [station[0] for station in self.stations if not following.get(station[0])]
+
+    def to_dict(self) -> dict:
+        return {
+            "built_at": self.built_at,
+            "loop": self.is_loop,
+            "stations": [list(station) for station in self.stations],
+            "edges": [list(edge) for edge in self.edges],
+        }
+
+    @classmethod
+    def from_dict(cls, line_id: str, data: dict):
+        return cls(line_id, [tuple(station) for station in data["stations"]],
+                   [tuple(edge) for edge in data["edges"]], data.get("loop", False), data.get("built_at"))
+
+def extract_transitions(df: pd.DataFrame, max_gap_seconds: float = None) -> pd.DataFrame:
+    """
+    열차별 시간순 관측에서 연속된 서로 다른 역 쌍(구간 이동)을 정방향 기준으로 집계합니다.
+
+    Returns:
+        DataFrame: line_id, from_station_id, to_station_id, count
+    """
+    max_gap_seconds = max_gap_seconds or Config.TOPOLOGY_MAX_GAP_SECONDS
+    if 'train_key' not in df:
+        df = load_positions_frame(df)
+    df = df[['line_id', 'train_key', 'direction_type', 'station_id', 'created_at']].sort_values(
+        ['line_id', 'train_key', 'created_at'], kind='stable')
+
+    station = df['station_id'].astype(str)
+    same_train = (df['line_id'].eq(df['line_id'].shift()) & df['train_key'].eq(df['train_key'].shift()))
+    prev_station = station.shift()
+    moved = (same_train
+             & station.ne(prev_station)
+             & df['direction_type'].eq(df['direction_type'].shift())
+             & (df['created_at'] - df['created_at'].shift()).dt.total_seconds().le(max_gap_seconds)
+             & df['direction_type'].ge(0))
+
+    moves = pd.DataFrame({
+        'line_id': df['line_id'].astype(str)[moved],
+        'prev': prev_station[moved],
+        'cur': station[moved],
+        'forward': df['direction_type'][moved].eq(FORWARD_DIRECTION),
+    })
+    # 역방향 이동은 뒤집어서 정방향 구간으로 합산
+    moves['from_station_id'] = moves['prev'].where(moves['forward'], moves['cur'])
+    moves['to_station_id'] = moves['cur'].where(moves['forward'], moves['prev'])
+    return (moves.groupby(['line_id', 'from_station_id', 'to_station_id']).size()
+            .rename('count').reset_index())
+
+def _strongly_connected(nodes, succ):
+    """
+    강연결 요소 (반복형 Tarjan)
+    """
+    index, low, on_stack, stack, result = {}, {}, set(), [], []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(succ[root]))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            advanced = False
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(succ[child])))
+                    advanced = True
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                low[work[-1][0]] = min(low[work[-1][0]], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                result.append(component)
+    return result
+
+def _reachable(succ, start, target, skip_edge):
+    # start에서 target까지 skip_edge를 쓰지 않고 갈 수 있는지 (급행 통과 구간 제거용)
+    seen, queue = {start}, deque([start])
+    while queue:
+        node = queue.popleft()
+        for child in succ[node]:
+            if (node, child) == skip_edge or child in seen:
+                continue
+            if child == target:
+                return True
+            seen.add(child)
+            queue.append(child)
+    return False
+
+def _longest_path(nodes, succ):
+    """
+    DAG에서 가장 긴 경로 (본선 후보)
+    """
+    indegree = {node: 0 for node in nodes}
+    for node in nodes:
+        for child in succ[node]:
+            if child in indegree:
+                indegree[child] += 1
+    order = []
+    queue = deque(sorted(node for node in nodes if indegree[node] == 0))
+    while queue:
+        node = queue.popleft()
+        order.append(node)
+        for child in sorted(succ[node]):
+            if child in indegree:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    queue.append(child)
+    length = {node: 0 for node in nodes}
+    parent = {}
+    for node in order:
+        for child in succ[node]:
+            if child in length and length[node] + 1 > length[child]:
+                length[child] = length[node] + 1
+                parent[child] = node
+    if not order:
+        return []
+    end = max(order, key=lambda node: (length[node], node))
+    path = [end]
+    while path[-1] in parent:
+        path.append(parent[path[-1]])
+    return path[::-1]
+
+def build_line_topology(line_id: str, transitions: pd.DataFrame, names: dict = None,
+                        min_count: int = None, min_share: float = None) -> LineTopology:
+    """
+    구간 이동 집계로 호선의 역 순서 그래프를 만듭니다.
+    1) 드문 이동/역방향 노이즈 제거  2) 순환 구간 탐지 (2호선 등)  3) 급행 통과 구간 제거
+    4) 가장 긴 경로를 본선으로, 나머지는 분기/합류 지점에서 이어지는 지선으로 위치 부여
+    """
+    min_count = min_count or Config.TOPOLOGY_MIN_COUNT
+    min_share = Config.TOPOLOGY_MIN_SHARE if min_share is None else min_share
+    names = names or {}
+
+    counts = {}
+    for row in transitions.itertuples(index=False):
+        if row.line_id == line_id and row.count >= min_count:
+            counts[(row.from_station_id, row.to_station_id)] = int(row.count)
+
+    # 양방향 모두 관측된 구간은 많이 관측된 쪽만 유지 (방향 코드 오류 등)
+    for (a, b), count in list(counts.items()):
+        reverse = counts.get((b, a))
+        if reverse is not None and (a, b) in counts:
+            if count > reverse:
+                del counts[(b, a)]
+            elif count < reverse:
+                del counts[(a, b)]
+            else:
+                del counts[(a, b)], counts[(b, a)]
+
+    # 역별 최다 진출 구간 대비 비율이 낮은 구간 제거
+    best_out = defaultdict(int)
+    for (a, _), count in counts.items():
+        best_out[a] = max(best_out[a], count)
+    counts = {edge: count for edge, count in counts.items() if count >= best_out[edge[0]] * min_share}
+
+    nodes = sorted({station for edge in counts for station in edge})
+    succ = defaultdict(set)
+    for a, b in counts:
+        succ[a].add(b)
+
+    # 순환 구간: 전체 역의 절반 이상을 포함하는 강연결 요소. 가장 작은 역 ID에서 끊어 순서를 매김
+    is_loop = False
+    loop_closing = []
+    while True:
+        cycles = [component for component in _strongly_connected(nodes, succ) if len(component) > 1]
+        if not cycles:
+            break
+        largest = max(cycles, key=len)
+        if not is_loop and len(largest) >= 3 and len(largest) * 2 >= len(nodes):
+            is_loop = True
+            start = min(largest)
+            members = set(largest)
+            loop_closing = [(node, start) for node in members if start in succ[node]]
+            for node in members:
+                succ[node].discard(start)
+            continue
+        # 그 외 순환은 노이즈: 가장 적게 관측된 구간부터 제거
+        for component in cycles:
+            members = set(component)
+            weakest = min(((a, b) for a in component for b in succ[a] if b in members), key=lambda edge: counts[edge])
+            succ[weakest[0]].discard(weakest[1])
+
+    # 급행 통과 구간(a→c, 중간에 a→b→…→c 경로 존재) 제거
+    for a in nodes:
+        for c in list(succ[a]):
+            if _reachable(succ, a, c, (a, c)):
+                succ[a].discard(c)
+
+    # 본선: 가장 긴 경로
+    position, branch = {}, {}
+    trunk = _longest_path(nodes, succ)
+    for offset, node in enumerate(trunk):
+        position[node], branch[node] = offset, 0
+
+    pred = defaultdict(set)
+    for a in nodes:
+        for b in succ[a]:
+            pred[b].add(a)
+
+    next_branch = 1
+    while len(position) < len(nodes):
+        # 위치가 정해진 역에서 인접 역으로 확장 (진출: +1, 진입: -1)
+        queue = deque(sorted(position))
+        while queue:
+            node = queue.popleft()
+            neighbours = [(child, 1) for child in sorted(succ[node])] + [(parent, -1) for parent in sorted(pred[node])]
+            for neighbour, step in neighbours:
+                if neighbour in position:
+                    continue
+                position[neighbour] = position[node] + step
+                if branch[node] == 0:
+                    branch[neighbour] = next_branch
+                    next_branch += 1
+                else:
+                    branch[neighbour] = branch[node]
+                queue.append(neighbour)
+        # 본선과 연결되지 않은 역 묶음(관측 부족)은 별도 지선으로
+        remaining = [node for node in nodes if node not in position]
+        if remaining:
+            path = _longest_path(remaining, succ) or remaining[:1]
+            for offset, node in enumerate(path):
+                position[node], branch[node] = offset, next_branch
+            next_branch += 1
+
+    ordered = sorted(nodes, key=lambda node: (branch[node], position[node], node))
+    order_index = {node: index for index, node in enumerate(ordered)}
+    stations = [(node, names.get(node), position[node], branch[node]) for node in ordered]
+    edges = sorted((order_index[a], order_index[b]) for a in nodes for b in succ[a])
+    # 순환을 끊기 위해 제거했던 구간(→ 기준 역) 복원
+    edges.extend((order_index[a], order_index[b]) for a, b in loop_closing)
+    built_at = datetime.now(timezone.utc).isoformat()
+    return LineTopology(line_id, stations, edges, is_loop, built_at)
+
+def build_topology(df: pd.DataFrame) -> dict:
+    """
+    위치 데이터 프레임으로 호선별 LineTopology를 만듭니다.
+
+    Returns:
+        dict: line_id -> LineTopology
+    """
+    if df.empty:
+        return {}
+    if 'train_key' not in df:
+        df = load_positions_frame(df)
+    names = dict(zip(df['station_id'].astype(str), df['station_name'].astype(str))) if 'station_name' in df else {}
+    transitions = extract_transitions(df)
+    return {
+        line_id: build_line_topology(line_id, transitions, names)
+        for line_id in sorted(transitions['line_id'].unique())
+    }
+
+class TopologyIndex:
+    """
+    호선별 역 순서 조회 테이블의 JSON 캐시 (Config.TOPOLOGY_CACHE_PATH)
+    분석 프로세스 풀의 작업자들이 같은 파일을 갱신하므로, 저장 시 파일 잠금을 잡고 다시 읽어 병합합니다.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or Config.TOPOLOGY_CACHE_PATH
+        self.lines = {}
+        self._load()
+
+    def _load(self):
+        self.lines.update(self._read())
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == TOPOLOGY_VERSION:
+                return {line_id: LineTopology.from_dict(line_id, line)
+                        for line_id, line in data.get("lines", {}).items()}
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("Ignoring unreadable cache '{path}': {error}", path=self.path, error=str(e))
+        return {}
+
+    def save(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with file_lock(self.path + ".lock"):
+            # 다른 프로세스가 저장한 호선을 잃지 않도록 파일을 다시 읽어 병합 (같은 호선은 더 최근에 만든 쪽)
+            lines = self._read()
+            for line_id, line in self.lines.items():
+                current = lines.get(line_id)
+                if current is None or (line.built_at or "") >= (current.built_at or ""):
+                    lines[line_id] = line
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"version": TOPOLOGY_VERSION,
+                               "lines": {line_id: line.to_dict() for line_id, line in lines.items()}},
+                              f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        self.lines = lines
+
+    def is_stale(self, line_id: str) -> bool:
+        line = self.lines.get(line_id)
+        if line is None or not line.built_at:
+            return True
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(line.built_at)
+        return age > timedelta(hours=Config.TOPOLOGY_MAX_AGE_HOURS)
+
+    def get(self, line_id: str, db=None, refresh: bool = False, hours: float = None):
+        """
+        호선 토폴로지를 반환합니다. 캐시가 없거나 오래되었으면 최근 위치 데이터로 다시 만들어 저장합니다.
+        """
+        if not refresh and self.is_stale(line_id):
+            # 다른 프로세스가 그사이 새로 만들었을 수 있으므로 파일을 다시 확인
+            self._load()
+        if not refresh and not self.is_stale(line_id):
+            return self.lines[line_id]
+        if db is None:
+            from ..db_client import SubwayDB
+            db = SubwayDB()
+        start = datetime.now(timezone.utc) - timedelta(hours=hours or Config.TOPOLOGY_HISTORY_HOURS)
+        df = db.fetch_train_frame(line_id, start=start,
+                                  columns=['line_id', 'train_number', 'direction_type', 'station_id', 'station_name'])
+        built = build_topology(df)
+        if line_id not in built:
+            # 데이터가 부족하면 이전 캐시라도 사용
+            return self.lines.get(line_id)
+        self.lines[line_id] = built[line_id]
+        self.save()
+        return self.lines[line_id]
+
+def get_topology(line_id: str, db=None, refresh: bool = False):
+    """
+    캐시된 호선 토폴로지 (없으면 생성). 분석기에서 역 → 위치 변환에 사용합니다.
+    """
+    return TopologyIndex().get(line_id, db=db, refresh=refresh)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the learned station ordering for a line")
+    parser.add_argument("line_id")
+    parser.add_argument("--hours", type=float, default=None, help="History window used to learn the ordering")
+    parser.add_argument("--refresh", action="store_true")
+    args = parser.parse_args()
+
+    topology = TopologyIndex().get(args.line_id, refresh=args.refresh, hours=args.hours)
+    if topology is None:
+        print("No data found.")
+        return
+    kind = "loop" if topology.is_loop else "linear"
+    print(f"--- Line {args.line_id} topology: {len(topology)} stations ({kind}) ---")
+    for station_id, name, position, branch in topology.stations:
+        label = "trunk" if branch == 0 else f"branch {branch}"
+        print(f"- [{topology.index(station_id):>3}] pos {position:>3} {label:<9} {name} ({station_id})")
+    print(f"Terminals (forward): {', '.join(topology.station_name(s) or s for s in topology.terminals())}")
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,93 @@
-from datetime import datetime
 import pandas as pd
+from ..config import Config
+from ..baselines import METRIC_TURNAROUND, shared_store
 from ..db_client import SubwayDB
+from ..events import EVENT_TURNAROUND, load_events, parse_time
+from .turnaround_engine import KIND_LAYOVER, KIND_MID_LINE, line_terminals, analyze_line, detect_turnarounds, summarize_turnarounds
 
 class TurnaroundAnalyzer:
-    def __init__(self):
-        self.db = SubwayDB()
+    def __init__(self, db: SubwayDB = None):
+        # 배치 실행기(runner)에서는 호선별로 DB 클라이언트 하나를 공유
+        self.db = db or SubwayDB()
 
-    def analyze_turnaround(self, line_id: str):
+    def analyze_turnaround(self, line_id: str, start=None, end=None):
         """
         회차 효율성 분석
         :param line_id: 분석할 호선 ID
+        :param start, end: 분석 구간 (지정 시 구간 전체를 운행일 단위로 조회, 미지정 시 최근 ANALYSIS_HISTORY_HOURS 시간)
         """
         print(f"--- Analyzing Turnaround Efficiency for Line {line_id} ---")
 
-        data = self.db.fetch_train_data(line_id, limit=5000)
-        if not data:
-            print("No data found.")
+        if Config.ANALYSIS_SOURCE == "aggregates":
+            # 서버 측 집계: 개별 회차 대신 회차 역·방향별 요약만 조회
+            stats = self.db.fetch_station_stats("turnaround", line_id, start, end)
+            if stats.empty:
+                print("No turnaround events detected.")
+                return
+            print("\n[Analysis Result: Turnaround Summary]")
+            for _, row in stats.iterrows():
+                direction = "Up/Inner" if int(row['direction_type']) == 0 else "Down/Outer"
+                print(f"- {row['station_name']} ({direction}): Avg {row['mean'] / 60:.1f} min "
+                      f"(Max {row['max'] / 60:.1f} min) [n={int(row['count'])}]")
             return
 
-        df = pd.DataFrame(data)
-        df['created_at'] = pd.to_datetime(df['created_at'])
-
-        # 종착역 근처 데이터만 필요하지만, 일단 전체에서 로직 처리
-        # 로직: 동일 train_number가 방향(direction_type)을 바꾸는 시점 포착
-        
-        df = df.sort_values(by=['train_number', 'created_at'])
-        
-        df['prev_direction'] = df.groupby('train_number')['direction_type'].shift(1)
-        df['prev_time'] = df.groupby('train_number')['created_at'].shift(1)
-        
-        # 방향이 변경된 케이스 (예: 0 -> 1 또는 1 -> 0)
-        # 단, 실제 운행 중 방향 변경은 종착역 회차 외에는 드물다.
-        turnarounds = df[
-            (df['direction_type'] != df['prev_direction']) &
-            (df['prev_direction'].notnull())
-        ].copy()
-        
+        turnarounds = self.load_turnarounds(line_id, start, end)
+        if turnarounds is None:
+            print("No data found.")
+            return
         if turnarounds.empty:
             print("No turnaround events detected.")
             return
 
-        turnarounds['turnaround_time_min'] = (turnarounds['created_at'] - turnarounds['prev_time']).dt.total_seconds() / 60
-        
+        if Config.ANALYSIS_SOURCE == "events":
+            self._print_events(line_id, turnarounds)
+            return
+
+        # 종착역·도착 방향별 분포 (개별 회차 출력 대신 요약)
+        summary = summarize_turnarounds(turnarounds, by_hour=False)
+        kinds = turnarounds['kind'].value_counts()
+        print("\n[Analysis Result: Turnaround Summary]")
+        for _, row in summary.iterrows():
+            direction = "Up/Inner" if int(row['direction_type']) == 0 else "Down/Outer"
+            print(f"- {row['station_name']} ({direction}): Median {row['p50'] / 60:.1f} min, "
+                  f"p90 {row['p90'] / 60:.1f} min (Max {row['max'] / 60:.1f} min) [n={int(row['count'])}]")
+        for kind in (KIND_LAYOVER, KIND_MID_LINE):
+            if kinds.get(kind, 0):
+                print(f"- {kind}: {int(kinds[kind])} direction change(s) excluded")
+
+    def _print_events(self, line_id: str, turnarounds: pd.DataFrame):
+        store = shared_store()
         print("\n[Analysis Result: Turnaround Events]")
-        for _, row in turnarounds.iterrows():
-            train = row['train_number']
-            station = row['station_name'] # 회차 후 첫 식별 역
-            time_diff = row['turnaround_time_min']
-            print(f"- Train {train} at {station}: {time_diff:.1f} min gap between direction change")
-            
+        for row in turnarounds.itertuples(index=False):
+            print(f"- Train {row.train_number} at {row.station_name}: {row.turnaround_time_min:.1f} min gap between direction change")
+
+            # 평시 기준선(회차 역·방향·시간대별 p95)보다 오래 걸린 회차 표시
+            if store is not None and row.direction_type >= 0:
+                found = store.threshold(METRIC_TURNAROUND, line_id, row.station_id, row.direction_type,
+                                        parse_time(row.event_time))
+                if found is not None and row.turnaround_seconds > found[0]:
+                    print(f"  >>> Slower than usual (p95 {found[0] / 60:.1f} min)")
+
+    def load_turnarounds(self, line_id: str, start=None, end=None, frame=None):
+        """
+        방향 전환(회차) 데이터(train_number, station_name, turnaround_time_min)를 반환합니다. 데이터가 없으면 None
+        스냅샷은 turnaround_engine으로 종착역 도착 → 반대 방향 출발 시간을 구하고 kind(terminal/mid_line/layover)를 붙입니다.
+        :param frame: 이미 load_positions_frame으로 불러온 위치 데이터 (지정 시 DB를 다시 조회하지 않음)
+        """
+        if Config.ANALYSIS_SOURCE == "events":
+            # 이벤트 스트림: 회차 이벤트에 이전 방향 마지막 관측 → 새 방향 첫 관측 시간이 들어 있음
+            events = load_events(line_id, (EVENT_TURNAROUND,), self.db, start, end)
+            if not events:
+                return None
+            turnarounds = pd.DataFrame(events)
+            turnarounds['turnaround_time_min'] = turnarounds['turnaround_seconds'] / 60
+            return turnarounds
+
+        if frame is not None:
+            return detect_turnarounds(frame, line_terminals(line_id)) if not frame.empty else None
+        # 구간을 운행일 단위로 나눠 조회 (구간 미지정 시 최근 ANALYSIS_HISTORY_HOURS 시간)
+        return analyze_line(line_id, start, end, db=self.db)
+
 if __name__ == "__main__":
     analyzer = TurnaroundAnalyzer()
     analyzer.analyze_turnaround("1002")
@@ -0,0 +1,198 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from ..config import Config
+from .frame_loader import load_positions_frame
+from .topology import TopologyIndex
+
+# 같은 열차의 관측 간격이 이보다 길면 다른 운행(run)으로 분리 (차량기지 입고 후 재출고 등)
+RUN_BREAK_SECONDS = 1200
+# 종착역 도착 → 반대 방향 출발이 이보다 길면 회차가 아니라 주박/대기로 분류
+MAX_TURNAROUND_SECONDS = 3600
+# 회차 분류
+KIND_TERMINAL = "terminal"   # 운행의 행선지(또는 토폴로지 종착역)에서 방향 전환
+KIND_MID_LINE = "mid_line"   # 행선지가 아닌 역에서 방향 전환 (방향 코드 오류, 비정상 회차)
+KIND_LAYOVER = "layover"     # 종착역에서 MAX_TURNAROUND_SECONDS 넘게 머문 뒤 출발
+# 분위수 요약
+SUMMARY_QUANTILES = (0.5, 0.9, 0.95)
+ENGINE_COLUMNS = ['train_number', 'station_id', 'station_name', 'direction_type', 'destination_station_id',
+                  'train_status_code']
+
+def service_day_offset(service_hours: str = None) -> int:
+    """
+    운행일 경계(초): SERVICE_HOURS의 운행 종료 시각 (예: '05:00-01:30' → 01:30 = 5400초)
+    자정을 넘겨 운행한 열차는 전날 운행일로 묶입니다. (같은 열차 번호가 날마다 다시 쓰이므로 운행일로 구분)
+    """
+    end_text = (service_hours or Config.SERVICE_HOURS).split("-")[1].strip()
+    return int(end_text[:2]) * 3600 + int(end_text[3:5]) * 60
+
+def _service_days(seconds: np.ndarray, offset: int) -> np.ndarray:
+    # 한국 표준시(UTC+9) 기준 운행일 번호 (epoch 일 수)
+    return ((seconds + 9 * 3600 - offset) // 86400).astype(np.int32)
+
+def _codes(df: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in df:
+        return np.full(len(df), -1, dtype=np.int32)
+    values = df[column]
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype("category")
+    return values.cat.codes.to_numpy().astype(np.int32)
+
+def detect_turnarounds(df: pd.DataFrame, terminals: set = None, offset: int = None) -> pd.DataFrame:
+    """
+    위치 스냅샷에서 종착역 회차(종착역 도착 → 반대 방향 출발)를 찾습니다. 모든 단계가 배열 연산입니다.
+
+    1. (열차 번호, 운행일, 시각)으로 정렬하고, 열차/운행일이 바뀌거나 관측 간격이 RUN_BREAK_SECONDS를 넘거나
+       방향/행선지(destination_station_id)가 바뀌는 곳에서 운행(run)을 나눕니다.
+    2. 같은 열차의 연속 운행 중 방향이 바뀐 곳이 회차 후보입니다. 회차 역은 이전 운행의 마지막 관측 역입니다.
+    3. 도착 시각: 이전 운행 마지막 역 구간의 첫 도착(1) 관측 (없으면 그 역 첫 관측)
+       출발 시각: 다음 운행 첫 역 구간이 회차 역이면 그 구간의 첫 출발(2) 관측 (없으면 다음 역 첫 관측),
+       이미 다른 역이면 그 첫 관측
+    4. 회차 역이 이전 운행의 행선지이거나 토폴로지 종착역이면 'terminal', 아니면 'mid_line',
+       회차 시간이 MAX_TURNAROUND_SECONDS를 넘으면 'layover'
+
+    Args:
+        df (DataFrame): load_positions_frame 결과 (created_at, train_number, station_id, direction_type,
+                        train_status_code, 선택: station_name, destination_station_id)
+        terminals (set): 토폴로지 종착역 ID (행선지 정보가 없는 행 보완용)
+
+    Returns:
+        DataFrame: 회차별 train_number, service_day, station_id/station_name(회차 역), direction_type(도착 방향),
+                   departure_direction, arrived_at, departed_at, hour(도착 시각, 한국 시간), turnaround_seconds,
+                   turnaround_time_min, kind
+    """
+    columns = ['train_number', 'service_day', 'station_id', 'station_name', 'direction_type', 'departure_direction',
+               'arrived_at', 'departed_at', 'hour', 'turnaround_seconds', 'turnaround_time_min', 'kind']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    offset = service_day_offset() if offset is None else offset
+
+    # 1. 정수 배열로 변환 후 정렬 (category 코드, int64 ns → 초)
+    seconds = df['created_at'].to_numpy(dtype='datetime64[ns]').view(np.int64) / 1e9
+    day = _service_days(seconds, offset)
+    train = _codes(df, 'train_number')
+    order = np.lexsort((seconds, day, train))
+    seconds, day, train = seconds[order], day[order], train[order]
+    station = _codes(df, 'station_id')[order]
+    destination = _codes(df, 'destination_station_id')[order]
+    direction = df['direction_type'].to_numpy().astype(np.int8)[order]
+    status = df['train_status_code'].to_numpy().astype(np.int8)[order]
+
+    same_train = ((train[1:] == train[:-1]) & (day[1:] == day[:-1])
+                  & (np.diff(seconds) <= RUN_BREAK_SECONDS))
+    train_start = np.r_[True, ~same_train]
+    run_start = train_start | np.r_[False, (direction[1:] != direction[:-1]) | (destination[1:] != destination[:-1])]
+    block_start = run_start | np.r_[False, station[1:] != station[:-1]]  # 한 운행 안에서 같은 역에 머문 구간
+    block_first = np.flatnonzero(block_start)
+    block_id = np.cumsum(block_start) - 1
+
+    # 2. 회차 후보: 같은 열차의 새 운행 첫 행 중 방향이 바뀐 곳
+    first = np.flatnonzero(run_start & ~train_start & np.r_[False, direction[1:] != direction[:-1]])
+    if len(first) == 0:
+        return pd.DataFrame(columns=columns)
+    last = first - 1
+    terminal = station[last]
+
+    # 3. 역 구간별 첫 도착/출발 시각 (reduceat 한 번씩)
+    arrive_times = np.minimum.reduceat(np.where(status == 1, seconds, np.inf), block_first)
+    depart_times = np.minimum.reduceat(np.where(status == 2, seconds, np.inf), block_first)
+
+    arrival_block = block_id[last]
+    arrived = arrive_times[arrival_block]
+    arrived = np.where(np.isinf(arrived), seconds[block_first[arrival_block]], arrived)
+
+    departure_block = block_id[first]
+    next_block = np.minimum(departure_block + 1, len(block_first) - 1)
+    next_first = block_first[next_block]
+    # 다음 역 첫 관측 (같은 열차·운행일의 다음 구간이 있을 때만)
+    left_at = np.where((next_block > departure_block) & ~train_start[next_first], seconds[next_first], np.nan)
+    at_terminal = station[first] == terminal
+    departed = np.where(at_terminal, depart_times[departure_block], seconds[first])
+    departed = np.where(np.isinf(departed), left_at, departed)
+
+    # 4. 분류 (category 코드는 열마다 다르므로 후보 행만 원래 값으로 비교)
+    rows = order[last]
+    def values(column):
+        return df[column].take(rows).to_numpy() if column in df else np.full(len(rows), None, dtype=object)
+    terminal_ids = values('station_id')
+    at_destination = terminal_ids.astype(str) == values('destination_station_id').astype(str)
+    if terminals:
+        at_destination |= np.isin(terminal_ids.astype(str), list(terminals))
+    turnaround_seconds = departed - arrived
+    kind = np.where(~at_destination, KIND_MID_LINE,
+                    np.where(turnaround_seconds > MAX_TURNAROUND_SECONDS, KIND_LAYOVER, KIND_TERMINAL))
+
+    arrived_at = pd.to_datetime(arrived, unit='s', utc=True)
+    result = pd.DataFrame({
+        'train_number': values('train_number'),
+        'service_day': pd.to_datetime(day[last].astype(np.int64), unit='D').date,
+        'station_id': terminal_ids,
+        'station_name': values('station_name') if 'station_name' in df else terminal_ids,
+        'direction_type': direction[last],
+        'departure_direction': direction[first],
+        'arrived_at': arrived_at,
+        'departed_at': pd.to_datetime(departed, unit='s', utc=True),
+        'hour': arrived_at.tz_convert('Asia/Seoul').hour.to_numpy().astype(np.int8),
+        'turnaround_seconds': turnaround_seconds,
+        'turnaround_time_min': turnaround_seconds / 60,
+        'kind': kind,
+    })
+    # 출발을 관측하지 못한 회차(데이터 끝 등)는 제외
+    return result[result['turnaround_seconds'].notna() & (result['turnaround_seconds'] >= 0)].reset_index(drop=True)
+
+def summarize_turnarounds(turnarounds: pd.DataFrame, by_hour: bool = True) -> pd.DataFrame:
+    """
+    종착역 회차('terminal')의 회차 역·도착 방향(·시간대)별 분포: count, mean, p50, p90, p95, max (초)
+    """
+    terminal = turnarounds[turnarounds['kind'] == KIND_TERMINAL]
+    keys = ['station_id', 'station_name', 'direction_type'] + (['hour'] if by_hour else [])
+    if terminal.empty:
+        return pd.DataFrame(columns=keys + ['count', 'mean', 'p50', 'p90', 'p95', 'max'])
+    grouped = terminal.groupby(keys, observed=True, sort=True)['turnaround_seconds']
+    summary = grouped.agg(['count', 'mean', 'max'])
+    quantiles = grouped.quantile(list(SUMMARY_QUANTILES)).unstack()
+    quantiles.columns = [f"p{round(q * 100)}" for q in quantiles.columns]
+    return summary.join(quantiles)[['count', 'mean', 'p50', 'p90', 'p95', 'max']].reset_index()
+
+def line_terminals(line_id: str, topology=None) -> set:
+    # 토폴로지 캐시가 유효할 때만 사용 (회차 분석 때문에 토폴로지를 새로 학습하지 않음)
+    if topology is None:
+        index = TopologyIndex()
+        topology = None if index.is_stale(line_id) else index.lines.get(line_id)
+    if topology is None or topology.is_loop:
+        return set()
+    return {str(station_id) for direction in (0, 1) for station_id in topology.terminals(direction)}
+
+def analyze_line(line_id: str, start=None, end=None, df: pd.DataFrame = None, topology=None, db=None) -> pd.DataFrame:
+    """
+    한 호선의 회차를 찾습니다.
+    df가 없으면 [start, end)를 운행일 단위로 나눠 하루씩 조회/처리하므로 기간이 길어도 메모리는 하루 분량으로 제한됩니다.
+    (운행일 경계는 운행이 없는 시간이라 회차가 경계에 걸치지 않음) start/end도 없으면 최근 ANALYSIS_HISTORY_HOURS 시간
+    """
+    terminals = line_terminals(line_id, topology)
+    if df is not None:
+        return detect_turnarounds(df, terminals)
+
+    if db is None:
+        from ..db_client import SubwayDB
+        db = SubwayDB()
+    end = pd.Timestamp(end).to_pydatetime() if end is not None else datetime.now(timezone.utc)
+    start = pd.Timestamp(start).to_pydatetime() if start is not None else end - timedelta(hours=Config.ANALYSIS_HISTORY_HOURS)
+    offset = service_day_offset()
+    # 운행일 경계(한국 시간 운행 종료 시각)에 맞춘 구간
+    boundary = pd.Timestamp(start).tz_convert('Asia/Seoul').normalize() + pd.Timedelta(seconds=offset)
+    if boundary > pd.Timestamp(start):
+        boundary -= pd.Timedelta(days=1)
+    parts = []
+    while boundary < pd.Timestamp(end):
+        chunk_start = max(boundary, pd.Timestamp(start))
+        chunk_end = min(boundary + pd.Timedelta(days=1), pd.Timestamp(end))
+        frame = db.fetch_train_frame(line_id, chunk_start.to_pydatetime(), chunk_end.to_pydatetime(),
+                                     columns=ENGINE_COLUMNS)
+        turnarounds = detect_turnarounds(load_positions_frame(frame), terminals, offset) if not frame.empty else None
+        if turnarounds is not None and not turnarounds.empty:
+            parts.append(turnarounds)
+        boundary += pd.Timedelta(days=1)
+    if not parts:
+        return detect_turnarounds(pd.DataFrame(), terminals, offset)
+    return pd.concat(parts, ignore_index=True)
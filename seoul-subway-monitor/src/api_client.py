@@ -1,19 +1,32 @@
 import requests
+import time
 import urllib.parse
+from datetime import datetime
 from .config import Config
+from .events import KST
+from .http_client import PooledHttpClient
+from .logger import get_logger
+from .metrics import API_ERRORS, API_LATENCY, API_ROWS, DATA_FRESHNESS, DATA_STALENESS
+
+log = get_logger("API")
 
 class SeoulMetroAPI:
     """
     서울시 실시간 지하철 위치 정보를 가져오는 API 클라이언트
     """
 
-    def __init__(self):
+    def __init__(self, http_client: PooledHttpClient = None, capture=None):
         self.api_key = Config.SEOUL_API_KEY
         self.base_url = Config.SEOUL_API_BASE_URL
+        # 커넥션 풀을 유지하는 공용 HTTP 클라이언트 (tick 간 재사용)
+        self.http = http_client or PooledHttpClient(self.base_url, self.api_key)
+        # 원본 응답 보관소 (CaptureArchive, 재생/백필용). None이면 보관하지 않음
+        self.capture = capture
 
     def get_realtime_position(self, line_name: str):
         """
         특정 호선의 실시간 열차 위치 정보를 가져옵니다.
+        열차 수가 한 페이지(API_PAGE_SIZE)를 넘으면 자동으로 다음 페이지를 조회합니다.
 
         Args:
             line_name (str): 검색할 호선명 (예: '1호선', '2호선')
@@ -23,28 +36,50 @@ class SeoulMetroAPI:
         """
         # 호선명 URL 인코딩 (한글 처리)
         encoded_line_name = urllib.parse.quote(line_name)
-        
-        # API 요청 URL 구성 (인증키/json/서비스명/시작위치/종료위치/호선명)
-        url = f"{self.base_url}/{self.api_key}/json/realtimePosition/0/100/{encoded_line_name}"
 
+        started = time.perf_counter()
         try:
-            response = requests.get(url)
-            response.raise_for_status() # HTTP 오류 발생 시 예외 발생
-            
-            data = response.json()
-            
             # API 응답 상태 확인 ('realtimePosition' 또는 'realtimePositionList' 확인)
-            if 'realtimePosition' in data:
-                return data['realtimePosition']
-            elif 'realtimePositionList' in data:
-                return data['realtimePositionList']
-            else:
-                print(f"[API Warning] No data found for {line_name}. Type: {type(data)}, Response: {data}")
+            rows, data = self.http.fetch_all(
+                "realtimePosition", ("realtimePosition", "realtimePositionList"), encoded_line_name
+            )
+            API_LATENCY.observe(time.perf_counter() - started, line_name)
+            if rows is None:
+                API_ERRORS.inc(line_name, "no_data")
+                log.warning("No data found for {line}. Type: {type}, Response: {response}",
+                            line=line_name, type=type(data).__name__, response=data)
                 return []
+            API_ROWS.observe(len(rows), line_name)
+            record_freshness(line_name, rows)
+            if self.capture is not None:
+                try:
+                    self.capture.record(line_name, rows)
+                except OSError as e:
+                    log.warning("Failed to archive response for {line}: {error}", line=line_name, error=str(e))
+            return rows
 
         except requests.exceptions.RequestException as e:
-            print(f"[API Error] Failed to fetch data for {line_name}: {e}")
+            API_ERRORS.inc(line_name, "request")
+            log.error("Failed to fetch data for {line}: {error}", line=line_name, error=str(e))
             return []
         except Exception as e:
-            print(f"[API Error] Unexpected error for {line_name}: {e}")
+            API_ERRORS.inc(line_name, "unexpected")
+            log.error("Unexpected error for {line}: {error}", line=line_name, error=str(e))
             return []
+
+def record_freshness(line_name: str, rows: list, now: datetime = None):
+    """
+    응답의 수신 시각(recptnDt, 한국 표준시) 중 가장 최근/오래된 값의 경과 시간을 지표로 기록합니다.
+    'YYYY-MM-DD HH:MM:SS' 문자열은 사전순이 곧 시간순이므로 최솟값/최댓값만 한 번씩 해석합니다. (fromisoformat은 C 구현)
+    """
+    received = [row.get("recptnDt") for row in rows if row.get("recptnDt")]
+    if not received:
+        return
+    now = now or datetime.now(KST)
+    try:
+        newest = datetime.fromisoformat(max(received)).replace(tzinfo=KST)
+        oldest = datetime.fromisoformat(min(received)).replace(tzinfo=KST)
+    except ValueError:
+        return
+    DATA_FRESHNESS.set((now - newest).total_seconds(), line_name)
+    DATA_STALENESS.set((now - oldest).total_seconds(), line_name)
@@ -0,0 +1,500 @@
+import argparse
+import glob
+import gzip
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from .config import Config, worker_path
+from .events import (EVENT_ARRIVE, EVENT_DEPART, EVENT_ENTER, EVENT_TURNAROUND, KST, EventExtractor, load_events,
+                     parse_time)
+from .headway_monitor import RECENT_VISITS, VISIT_EVENTS
+from .logger import get_logger
+
+log = get_logger("Baseline")
+
+# 기준선 지표 (이벤트 필드 → 값)
+METRIC_DWELL = "dwell"            # 출발 이벤트의 도착→출발 체류 시간
+METRIC_HEADWAY = "headway"        # 같은 역·방향 연속 도착 간격 (도착 시각 = 역 방문의 첫 관측 시각)
+METRIC_TURNAROUND = "turnaround"  # 회차 이벤트의 방향 전환 소요 시간
+METRICS = (METRIC_DWELL, METRIC_HEADWAY, METRIC_TURNAROUND)
+
+ALL_HOURS = -1         # 역·방향 전체 시간대 슬롯 (시간대 표본이 부족할 때 사용)
+MIN_VALUE = 0.5        # 이보다 작은 값(초)은 0 구간으로 집계
+MAX_BUCKETS = 512      # 스케치당 최대 구간 수 (넘으면 가장 작은 구간부터 병합)
+STORE_VERSION = 1
+# 분석 구간에서 p95 초과 비율이 평시(5%)의 몇 배 이상이면 '평시보다 느림'으로 판단
+SLOWER_SHARE_FACTOR = 2.0
+
+def hour_of_week(at: datetime) -> int:
+    """
+    한국 표준시 기준 요일별 시간대 (월요일 0시 = 0 ... 일요일 23시 = 167)
+    """
+    local = at.astimezone(KST)
+    return local.weekday() * 24 + local.hour
+
+def slower_than_usual(share, q: float = None):
+    """
+    share_above()의 초과 비율이 평시 기대값(1 - q)의 SLOWER_SHARE_FACTOR배 이상인지 여부. 기준선이 없으면(NaN) None
+    """
+    if share is None or share != share:
+        return None
+    q = Config.BASELINE_QUANTILE if q is None else q
+    return share >= SLOWER_SHARE_FACTOR * (1 - q)
+
+class QuantileSketch:
+    """
+    DDSketch 방식의 로그 구간 히스토그램
+    - 구간 i = ceil(log_gamma(값)), gamma = (1 + alpha) / (1 - alpha) → 모든 분위수의 상대 오차 alpha 이하
+    - 병합은 구간별 개수 합이므로 시간대/기간별 스케치를 자유롭게 합칠 수 있습니다. (결과는 한 번에 만든 것과 같음)
+    - 구간 개수는 값의 범위(최대/최소 비율)에만 비례: 1초~3시간, alpha 2%면 약 230개
+    """
+    __slots__ = ("gamma", "offset", "counts", "zero_count", "count")
+
+    def __init__(self, gamma: float):
+        self.gamma = gamma
+        self.offset = 0        # counts[0]의 구간 번호
+        self.counts = []       # 연속 구간별 개수
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float, weight: int = 1):
+        self.count += weight
+        if value <= MIN_VALUE:
+            self.zero_count += weight
+            return
+        index = math.ceil(math.log(value) / math.log(self.gamma))
+        if not self.counts:
+            self.offset = index
+            self.counts = [weight]
+            return
+        if index < self.offset:
+            self.counts[0:0] = [0] * (self.offset - index)
+            self.offset = index
+        elif index >= self.offset + len(self.counts):
+            self.counts.extend([0] * (index - self.offset - len(self.counts) + 1))
+        self.counts[index - self.offset] += weight
+        if len(self.counts) > MAX_BUCKETS:
+            self._collapse()
+
+    def _collapse(self):
+        # 가장 작은 구간들을 합쳐 구간 수 제한 (큰 값 쪽 분위수 정확도 유지: 알림은 상위 분위수 기준)
+        extra = len(self.counts) - MAX_BUCKETS
+        merged = sum(self.counts[:extra + 1])
+        self.counts = [merged] + self.counts[extra + 1:]
+        self.offset += extra
+
+    def merge(self, other: "QuantileSketch"):
+        self.count += other.count
+        self.zero_count += other.zero_count
+        if not other.counts:
+            return
+        if not self.counts:
+            self.offset, self.counts = other.offset, list(other.counts)
+            return
+        start = min(self.offset, other.offset)
+        end = max(self.offset + len(self.counts), other.offset + len(other.counts))
+        counts = [0] * (end - start)
+        for offset, source in ((self.offset, self.counts), (other.offset, other.counts)):
+            for i, value in enumerate(source):
+                counts[offset - start + i] += value
+        self.offset, self.counts = start, counts
+        if len(self.counts) > MAX_BUCKETS:
+            self._collapse()
+
+    def quantile(self, q: float):
+        """
+        q 분위수 추정값 (표본이 없으면 None)
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        cumulative = self.zero_count
+        for i, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative > rank:
+                return 2 * self.gamma ** (self.offset + i) / (self.gamma + 1)
+        return 2 * self.gamma ** (self.offset + len(self.counts) - 1) / (self.gamma + 1)
+
+    def to_list(self) -> list:
+        # 저장 형식: [구간 시작 번호, 0 구간 개수, 구간별 개수...]
+        return [self.offset, self.zero_count, *self.counts]
+
+    @classmethod
+    def from_list(cls, gamma: float, data: list) -> "QuantileSketch":
+        sketch = cls(gamma)
+        sketch.offset, sketch.zero_count, sketch.counts = data[0], data[1], list(data[2:])
+        sketch.count = sketch.zero_count + sum(sketch.counts)
+        return sketch
+
+class BaselineStore:
+    """
+    평시 기준선 저장소: (지표, 호선, 역, 방향, 요일별 시간대)마다 분위수 스케치 하나
+    - add()로 값이 들어올 때마다 해당 시간대 슬롯과 역·방향 전체 슬롯을 함께 갱신 (증분, 재계산 없음)
+    - threshold()/is_above()는 슬롯 조회 + 캐시된 분위수 비교라 수 마이크로초 (슬롯 갱신 시에만 다시 계산)
+    - save()/load(): gzip JSON (스케치당 정수 리스트 하나)
+    """
+
+    def __init__(self, path: str = None, relative_accuracy: float = None, min_samples: int = None):
+        self.path = Config.BASELINE_PATH if path is None else path
+        self.relative_accuracy = relative_accuracy or Config.BASELINE_RELATIVE_ACCURACY
+        self.gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self.min_samples = min_samples or Config.BASELINE_MIN_SAMPLES
+        self._sketches = {}   # (metric, line_id, station_id, direction_type, hour_of_week) -> QuantileSketch
+        self._cache = {}      # 슬롯 키 -> {q: 분위수}
+        self._station_names = {}  # (line_id, station_id) -> station_name
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sketches)
+
+    def add(self, metric: str, line_id, station_id, direction_type, at: datetime, value: float, station_name=None):
+        """
+        값 하나를 시간대 슬롯과 전체 시간 슬롯에 반영합니다.
+        """
+        if value is None or value < 0:
+            return
+        how = hour_of_week(at)
+        station_id, direction_type = str(station_id), int(direction_type)
+        with self._lock:
+            for slot in ((metric, line_id, station_id, direction_type, how),
+                         (metric, line_id, station_id, direction_type, ALL_HOURS)):
+                sketch = self._sketches.get(slot)
+                if sketch is None:
+                    sketch = self._sketches[slot] = QuantileSketch(self.gamma)
+                sketch.add(value)
+                self._cache.pop(slot, None)
+            if station_name is not None:
+                self._station_names[(line_id, station_id)] = station_name
+
+    def threshold(self, metric: str, line_id, station_id, direction_type, at, q: float = None):
+        """
+        슬롯의 q 분위수와 표본 수. 시간대 표본이 min_samples 미만이면 역·방향 전체 시간 슬롯 사용
+
+        Args:
+            at (datetime | int): 시각 또는 hour_of_week 값
+
+        Returns:
+            tuple | None: (분위수, 표본 수, 사용한 hour_of_week(전체 시간이면 -1)), 기준선이 없으면 None
+        """
+        q = Config.BASELINE_QUANTILE if q is None else q
+        how = at if isinstance(at, int) else hour_of_week(at)
+        station_id, direction_type = str(station_id), int(direction_type)
+        for slot in ((metric, line_id, station_id, direction_type, how),
+                     (metric, line_id, station_id, direction_type, ALL_HOURS)):
+            sketch = self._sketches.get(slot)
+            if sketch is None or sketch.count < self.min_samples:
+                continue
+            cached = self._cache.get(slot)
+            if cached is None:
+                cached = self._cache[slot] = {}
+            value = cached.get(q)
+            if value is None:
+                with self._lock:
+                    value = cached[q] = sketch.quantile(q)
+            return value, sketch.count, slot[4]
+        return None
+
+    def is_above(self, metric: str, line_id, station_id, direction_type, at, value: float, q: float = None):
+        """
+        value가 해당 슬롯의 q 분위수(기본 p95)보다 큰지 여부. 기준선이 없으면 None
+        """
+        found = self.threshold(metric, line_id, station_id, direction_type, at, q)
+        if found is None:
+            return None
+        return value > found[0]
+
+    def share_above(self, metric: str, line_id, frame, value_column: str, group_columns: list,
+                    time_column: str = "created_at", q: float = None):
+        """
+        분석기 프레임에서 그룹별로 값이 해당 슬롯 q 분위수(기본 p95)를 넘는 비율을 구합니다.
+        프레임에는 station_id, direction_type, 시각 컬럼이 필요하며 같은 (역, 방향, 시간대)는 한 번만 조회합니다.
+        평시라면 비율은 약 1 - q (p95면 5%)이므로 그 몇 배가 넘으면 '평시보다 느림'으로 볼 수 있습니다.
+
+        Returns:
+            Series | None: 그룹별 초과 비율 (기준선이 있는 행이 없는 그룹은 NaN), 필요한 컬럼이 없으면 None
+        """
+        import pandas as pd
+
+        if frame is None or frame.empty or not {"station_id", "direction_type", time_column} <= set(frame.columns):
+            return None
+        times = pd.to_datetime(frame[time_column], utc=True, format="ISO8601").dt.tz_convert("Asia/Seoul")
+        keys = pd.DataFrame({
+            "station_id": frame["station_id"].astype(str).to_numpy(),
+            "direction_type": pd.to_numeric(frame["direction_type"], errors="coerce").fillna(-1).astype(int).to_numpy(),
+            "how": (times.dt.dayofweek * 24 + times.dt.hour).to_numpy(),
+        })
+        thresholds = {}
+        for key in keys.drop_duplicates().itertuples(index=False, name=None):
+            found = self.threshold(metric, line_id, key[0], key[1], int(key[2]), q)
+            thresholds[key] = found[0] if found is not None else float("nan")
+        limit = pd.Series([thresholds[key] for key in keys.itertuples(index=False, name=None)], index=frame.index)
+        above = (frame[value_column] > limit).astype(float).where(limit.notna())
+        return above.groupby([frame[column] for column in group_columns], observed=True).mean()
+
+    def merge(self, other: "BaselineStore"):
+        """
+        다른 저장소의 스케치를 합칩니다. (여러 수집기/기간별로 만든 기준선 통합)
+        """
+        with self._lock:
+            for slot, sketch in other._sketches.items():
+                mine = self._sketches.get(slot)
+                if mine is None:
+                    mine = self._sketches[slot] = QuantileSketch(self.gamma)
+                mine.merge(sketch)
+                self._cache.pop(slot, None)
+            self._station_names.update(other._station_names)
+
+    def summary(self, metric: str, line_id, q: float = None) -> list:
+        """
+        역·방향별 전체 시간 기준선 (분위수, p50, 표본 수)
+        """
+        q = Config.BASELINE_QUANTILE if q is None else q
+        rows = []
+        with self._lock:
+            items = [(slot, sketch) for slot, sketch in self._sketches.items()
+                     if slot[0] == metric and slot[1] == line_id and slot[4] == ALL_HOURS]
+        for (_, _, station_id, direction_type, _), sketch in sorted(items, key=lambda item: str(item[0][2:4])):
+            rows.append({
+                "station_id": station_id,
+                "station_name": self._station_names.get((line_id, station_id)),
+                "direction_type": direction_type,
+                "p50": sketch.quantile(0.5),
+                f"p{round(q * 100)}": sketch.quantile(q),
+                "count": sketch.count,
+            })
+        return rows
+
+    def save(self, path: str = None):
+        path = path or self.path
+        with self._lock:
+            data = {
+                "version": STORE_VERSION,
+                "relative_accuracy": self.relative_accuracy,
+                "saved_at": datetime.now(KST).isoformat(),
+                "sketches": [[*slot, sketch.to_list()] for slot, sketch in self._sketches.items()],
+                "station_names": [[line_id, station_id, name] for (line_id, station_id), name in self._station_names.items()],
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = None) -> "BaselineStore":
+        """
+        저장된 기준선을 읽습니다. 파일이 없거나 읽을 수 없으면 빈 저장소
+        """
+        path = Config.BASELINE_PATH if path is None else path
+        if not os.path.exists(path):
+            return cls(path)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable baseline file {path}: {error}", path=path, error=str(e))
+            return cls(path)
+        store = cls(path, relative_accuracy=data.get("relative_accuracy"))
+        for *slot, sketch in data.get("sketches", []):
+            store._sketches[tuple(slot)] = QuantileSketch.from_list(store.gamma, sketch)
+        for line_id, station_id, name in data.get("station_names", []):
+            store._station_names[(line_id, station_id)] = name
+        return store
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+def shared_store():
+    """
+    분석기에서 함께 쓰는 기준선 저장소 (프로세스당 한 번만 읽음). BASELINES_ENABLED가 false면 None
+    """
+    global _shared_store
+    if not Config.BASELINES_ENABLED:
+        return None
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = BaselineStore.load()
+            # 분산 수집 작업자별 기준선(baselines.<작업자 ID>.json.gz)도 합쳐서 사용
+            for path in sorted(glob.glob(worker_path(Config.BASELINE_PATH, "*"))):
+                _shared_store.merge(BaselineStore.load(path))
+        return _shared_store
+
+class BaselineMonitor:
+    """
+    이벤트 스트림으로 기준선을 증분 갱신하고, 평시 분위수(BASELINE_ALERT_QUANTILE)를 넘는 값을 알립니다.
+    EventPipeline 리스너로 등록하면 매 tick 새 이벤트만 반영하므로 과거 이력을 다시 읽지 않습니다.
+    (값을 먼저 평가한 뒤 반영하여 자기 자신과 비교하지 않음)
+    """
+
+    def __init__(self, store: BaselineStore = None, alert_quantile: float = None, reset_seconds: float = None,
+                 save_seconds: float = None):
+        self.store = store if store is not None else BaselineStore.load()
+        self.alert_quantile = alert_quantile or Config.BASELINE_ALERT_QUANTILE
+        self.reset_seconds = reset_seconds or Config.HEADWAY_RESET_SECONDS
+        self.save_seconds = Config.BASELINE_SAVE_SECONDS if save_seconds is None else save_seconds
+        self._last_arrivals = {}  # (line_id, station_id, direction_type) -> 마지막 도착 시각
+        self._recent_visits = {}  # (line_id, station_id, direction_type) -> 최근 방문 ID (같은 방문 중복 제거)
+        self._last_saved = time.monotonic()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def __call__(self, events: list) -> list:
+        alerts = self.update(events)
+        for alert in alerts:
+            self._report(alert)
+        if self.save_seconds and time.monotonic() - self._last_saved >= self.save_seconds:
+            self.save()
+        return alerts
+
+    def update(self, events: list, alert: bool = True) -> list:
+        """
+        이벤트를 기준선에 반영합니다. alert=True면 반영 전 값이 평시 분위수를 넘는 경우 알림을 반환합니다.
+        """
+        alerts = []
+        with self._lock:
+            for event in events:
+                for metric, at, value in self._measure(event):
+                    key = (event.get("line_id"), event.get("station_id"), event.get("direction_type"))
+                    if alert:
+                        found = self.store.threshold(metric, *key, at, self.alert_quantile)
+                        if found is not None and value > found[0]:
+                            alerts.append(self._alert(metric, event, at, value, found))
+                    self.store.add(metric, *key, at, value, station_name=event.get("station_name"))
+        return alerts
+
+    def _measure(self, event: dict) -> list:
+        # 이벤트 → [(지표, 시각, 값), ...] (출발 이벤트는 체류 시간과 배차 간격을 함께 낼 수 있음)
+        event_type = event.get("event_type")
+        at = parse_time(event.get("event_time"))
+        if at is None or event.get("direction_type") is None:
+            return []
+        measured = []
+        if event_type == EVENT_DEPART and event.get("dwell_seconds") is not None:
+            measured.append((METRIC_DWELL, at, float(event["dwell_seconds"])))
+        if event_type == EVENT_TURNAROUND and event.get("turnaround_seconds") is not None:
+            measured.append((METRIC_TURNAROUND, at, float(event["turnaround_seconds"])))
+        if event_type in VISIT_EVENTS:
+            headway = self._visit_headway(event, event_type, at)
+            if headway is not None:
+                measured.append((METRIC_HEADWAY, at, headway))
+        return measured
+
+    def _visit_headway(self, event: dict, event_type: str, at):
+        # 역 방문(visit_id)의 첫 관측을 도착 시각으로 사용 (HeadwayMonitor와 같은 규칙, 도착 상태 누락에 강함)
+        key = (event.get("line_id"), event.get("station_id"), event.get("direction_type"))
+        visit_id = event.get("visit_id")
+        if visit_id is None:
+            if event_type != EVENT_ARRIVE:
+                return None  # visit_id가 없는 이전 형식 이벤트는 도착만 사용
+        else:
+            visits = self._recent_visits.setdefault(key, deque(maxlen=RECENT_VISITS))
+            if visit_id in visits:
+                return None  # 같은 방문의 이후 이벤트
+            visits.append(visit_id)
+
+        previous = self._last_arrivals.get(key)
+        if previous is not None and at <= previous:
+            return None  # 순서가 뒤바뀐/중복 도착
+        self._last_arrivals[key] = at
+        if previous is None:
+            return None
+        headway = (at - previous).total_seconds()
+        # 운행 종료 후 첫 도착 등 긴 중단은 배차 간격으로 보지 않음
+        return headway if headway <= self.reset_seconds else None
+
+    def _alert(self, metric, event, at, value, found):
+        threshold, samples, how = found
+        return {
+            "alert_type": f"slow_{metric}",
+            "line_id": event.get("line_id"),
+            "station_id": event.get("station_id"),
+            "station_name": event.get("station_name"),
+            "direction_type": event.get("direction_type"),
+            "train_number": event.get("train_number"),
+            "value_seconds": round(value, 1),
+            "threshold_seconds": round(threshold, 1),
+            "quantile": self.alert_quantile,
+            "hour_of_week": how,
+            "samples": samples,
+            "detected_at": at.isoformat(),
+        }
+
+    def _report(self, alert):
+        direction = "Up/Inner" if alert["direction_type"] == 0 else "Down/Outer"
+        slot = "all hours" if alert["hour_of_week"] == ALL_HOURS else f"hour-of-week {alert['hour_of_week']}"
+        log.warning("Slower than usual: {kind} {line_id} {station_name} ({direction}): "
+                    "{value_seconds:.0f}s > p{percentile} {threshold_seconds:.0f}s ({slot}, n={samples})",
+                    kind=alert['alert_type'].upper(), direction=direction, slot=slot,
+                    percentile=round(alert['quantile'] * 100), **alert)
+        for listener in self._listeners:
+            try:
+                listener(alert)
+            except Exception as e:
+                log.error("Listener {listener} failed: {error}", listener=getattr(listener, '__name__', repr(listener)),
+                          error=str(e))
+
+    def save(self):
+        try:
+            self.store.save()
+        except OSError as e:
+            log.error("Failed to save baselines: {error}", error=str(e), path=self.store.path)
+        self._last_saved = time.monotonic()
+
+def rebuild(line_id: str, start=None, end=None, store: BaselineStore = None, source: str = "positions", db=None) -> int:
+    """
+    과거 데이터로 기준선을 만듭니다. (최초 구축/재구축용, 이후에는 BaselineMonitor가 증분 갱신)
+    - 'positions': 위치 스냅샷을 청크 단위로 스트리밍하여 이벤트로 변환 (events.backfill과 같은 방식)
+    - 'events': 저장된 이벤트 스트림 사용
+
+    Returns:
+        int: 반영한 이벤트 수
+    """
+    from .db_client import SubwayDB
+
+    db = db or SubwayDB()
+    monitor = BaselineMonitor(store if store is not None else BaselineStore.load(), save_seconds=0)
+    if source == "events":
+        events = load_events(line_id, (EVENT_ENTER, EVENT_ARRIVE, EVENT_DEPART, EVENT_TURNAROUND), db, start, end)
+        monitor.update(events, alert=False)
+        return len(events)
+
+    extractor = EventExtractor()
+    total = 0
+    for rows in db.iter_train_data(line_id, start, end, output="records"):
+        events = []
+        for row in rows:
+            events.extend(extractor.process([row], observed_at=parse_time(row.get("created_at"))))
+        monitor.update(events, alert=False)
+        total += len(events)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Build hour-of-week baselines (dwell, headway, turnaround) from history")
+    parser.add_argument("line_ids", nargs="+", help="호선 ID (예: 1002)")
+    parser.add_argument("--start", default=None, help="구간 시작 (ISO 8601)")
+    parser.add_argument("--end", default=None, help="구간 끝 (ISO 8601)")
+    parser.add_argument("--source", choices=("positions", "events"), default="positions")
+    parser.add_argument("--reset", action="store_true", help="기존 기준선을 버리고 새로 만듦 (겹치는 기간 재구축 시 중복 방지)")
+    parser.add_argument("--path", default=None, help="기준선 파일 (기본: Config.BASELINE_PATH)")
+    args = parser.parse_args()
+
+    path = args.path or Config.BASELINE_PATH
+    store = BaselineStore(path) if args.reset else BaselineStore.load(path)
+    for line_id in args.line_ids:
+        started = time.perf_counter()
+        count = rebuild(line_id, args.start, args.end, store, args.source)
+        print(f"[Baseline] Line {line_id}: {count} events in {time.perf_counter() - started:.1f}s")
+    store.save()
+    print(f"[Baseline] Saved {len(store)} sketches to {path} ({os.path.getsize(path) / 1024:.1f} KB)")
+
+if __name__ == "__main__":
+    main()
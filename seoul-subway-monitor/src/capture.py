@@ -0,0 +1,204 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from .config import Config
+from .events import KST, parse_time
+from .logger import get_logger
+
+log = get_logger("Capture")
+
+SEGMENT_PREFIX = "capture-"
+SEGMENT_SUFFIX = ".jsonl.gz"
+SEGMENT_TIME_FORMAT = "%Y%m%d-%H"  # 한 시간 단위 세그먼트 (한국 표준시)
+
+class CaptureArchive:
+    """
+    API 원본 응답(realtimePositionList) 보관소
+    - 레코드 1건 = 한 tick의 한 호선 응답: {"tick", "fetched_at", "line_name", "rows"}
+    - tick 시각 기준 한 시간 단위 세그먼트 파일(capture-YYYYMMDD-HH.jsonl.gz)에 추가 전용으로 기록 (append 1회 = gzip 멤버 1개)
+    - 파일 이름이 시간 색인이므로 구간 재생 시 해당 시간대 세그먼트만 엽니다.
+    """
+
+    def __init__(self, archive_dir: str = None):
+        self.archive_dir = archive_dir or Config.CAPTURE_DIR
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._tick = None
+
+    def begin_tick(self, tick_at: datetime = None):
+        """
+        이번 수집 주기의 시각을 정합니다. (같은 tick에 수집된 호선 응답을 재생 시 한 번에 처리)
+        """
+        self._tick = parse_time(tick_at) or datetime.now(KST)
+
+    def _segment_path(self, tick_at: datetime) -> str:
+        name = SEGMENT_PREFIX + tick_at.astimezone(KST).strftime(SEGMENT_TIME_FORMAT) + SEGMENT_SUFFIX
+        return os.path.join(self.archive_dir, name)
+
+    def record(self, line_name: str, rows: list, fetched_at: datetime = None):
+        """
+        한 호선의 원본 응답 행을 보관합니다. (수집 스레드에서 동시에 호출 가능)
+        """
+        fetched_at = parse_time(fetched_at) or datetime.now(KST)
+        tick_at = self._tick or fetched_at
+        record = {
+            "tick": tick_at.isoformat(),
+            "fetched_at": fetched_at.isoformat(),
+            "line_name": line_name,
+            "rows": rows,
+        }
+        payload = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            with gzip.open(self._segment_path(tick_at), "ab") as f:
+                f.write(payload)
+
+    def segments(self, start: datetime = None, end: datetime = None) -> list:
+        """
+        [start, end) 구간에 걸치는 세그먼트 경로 (시간순)
+        """
+        paths = []
+        for path in sorted(glob.glob(os.path.join(self.archive_dir, SEGMENT_PREFIX + "*" + SEGMENT_SUFFIX))):
+            name = os.path.basename(path)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+            try:
+                hour = datetime.strptime(name, SEGMENT_TIME_FORMAT).replace(tzinfo=KST)
+            except ValueError:
+                continue
+            if start is not None and hour + timedelta(hours=1) <= start:
+                continue
+            if end is not None and hour >= end:
+                continue
+            paths.append(path)
+        return paths
+
+    @staticmethod
+    def read_segment(path: str):
+        """
+        세그먼트의 레코드를 기록 순서대로 읽습니다. 마지막 gzip 멤버가 잘린 경우 읽을 수 있는 곳까지만 반환합니다.
+        """
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        log.warning("Skipping corrupt line in {segment}", segment=os.path.basename(path))
+        except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+            log.warning("Truncated segment {segment}: {error}", segment=os.path.basename(path), error=str(e))
+
+    def iter_ticks(self, start=None, end=None):
+        """
+        [start, end) 구간의 tick을 시간순으로 반환합니다.
+
+        Yields:
+            tuple: (tick 시각, {호선명: 원본 행 리스트})
+        """
+        start, end = parse_time(start), parse_time(end)
+        for path in self.segments(start, end):
+            ticks = {}
+            for record in self.read_segment(path):
+                tick_at = parse_time(record.get("tick"))
+                if tick_at is None:
+                    continue
+                if (start is not None and tick_at < start) or (end is not None and tick_at >= end):
+                    continue
+                # 같은 호선이 한 tick에 두 번 기록되면 나중 응답 사용
+                ticks.setdefault(tick_at, {})[record["line_name"]] = record.get("rows") or []
+            for tick_at in sorted(ticks):
+                yield tick_at, ticks[tick_at]
+
+class ReplayAPI:
+    """
+    보관된 응답을 SeoulMetroAPI 대신 돌려주는 재생용 API 클라이언트 (main.job에 그대로 전달)
+    """
+
+    def __init__(self):
+        self.capture = None
+        self._rows = {}
+
+    def load_tick(self, rows_by_line: dict):
+        self._rows = rows_by_line
+
+    def get_realtime_position(self, line_name: str):
+        return self._rows.get(line_name, [])
+
+def replay(start=None, end=None, speed: float = 0, archive_dir: str = None, insert: bool = True,
+           events: bool = True, heatmap: bool = False) -> dict:
+    """
+    보관된 응답을 실시간 수집과 같은 경로(main.job: 변환 → 이벤트 → 히트맵 → 적재)로 다시 흘려보냅니다.
+
+    Args:
+        start, end: 재생 구간 (None이면 보관된 전체)
+        speed (float): 재생 배속 (예: 10이면 10배속). 0이면 대기 없이 최대 속도
+        insert (bool): False면 DB에 적재하지 않음 (분석/처리량 측정용)
+        events (bool): 이벤트 추출 및 저장 여부
+        heatmap (bool): 히트맵 갱신 여부
+
+    Returns:
+        dict: 재생 결과 (tick 수, 원본 행 수, 소요 시간, 초당 처리 행 수)
+    """
+    from .db_client import SubwayDB
+    from .events import EventPipeline, create_event_sink
+    from .heatmap import SegmentHeatmap
+    from .main import job
+
+    archive = CaptureArchive(archive_dir)
+    api_client = ReplayAPI()
+    db_client = SubwayDB()
+    if not insert:
+        # 적재 단계만 건너뜀 (변환, CDC 필터 등 나머지 경로는 동일)
+        db_client.write_rows = lambda rows: True
+    elif Config.SPOOL_ENABLED:
+        db_client.enable_spool()
+    event_pipeline = EventPipeline(sink=create_event_sink(db_client)) if events else None
+    segment_heatmap = SegmentHeatmap() if heatmap else None
+
+    ticks = rows = 0
+    first_tick = None
+    started = time.monotonic()
+    try:
+        for tick_at, rows_by_line in archive.iter_ticks(start, end):
+            if speed > 0:
+                # 시작 tick 기준 누적 시각으로 대기 (tick마다 처리 시간이 달라도 밀리지 않음)
+                first_tick = first_tick or tick_at
+                delay = started + (tick_at - first_tick).total_seconds() / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            api_client.load_tick(rows_by_line)
+            # 호선별 수집 간격이 달라 tick마다 보관된 호선이 다를 수 있으므로 보관된 호선만 처리
+            job(api_client, db_client, event_pipeline, segment_heatmap, observed_at=tick_at, lines=list(rows_by_line))
+            ticks += 1
+            rows += sum(len(line_rows) for line_rows in rows_by_line.values())
+    finally:
+        db_client.close()
+
+    elapsed = time.monotonic() - started
+    result = {
+        "ticks": ticks,
+        "rows": rows,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else None,
+    }
+    print(f"[Replay] {ticks} ticks, {rows} rows in {elapsed:.1f}s ({result['rows_per_second']} rows/s)")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay archived realtimePosition responses through the collector pipeline")
+    parser.add_argument("--start", default=None, help="구간 시작 (ISO 8601, 예: 2026-10-17T05:00:00+09:00)")
+    parser.add_argument("--end", default=None, help="구간 끝 (ISO 8601)")
+    parser.add_argument("--speed", type=float, default=0, help="재생 배속 (0: 최대 속도)")
+    parser.add_argument("--archive-dir", default=None, help="보관 디렉터리 (기본: Config.CAPTURE_DIR)")
+    parser.add_argument("--no-insert", action="store_true", help="DB에 적재하지 않음")
+    parser.add_argument("--no-events", action="store_true", help="이벤트를 추출하지 않음")
+    parser.add_argument("--heatmap", action="store_true", help="히트맵도 갱신")
+    args = parser.parse_args()
+    replay(args.start, args.end, args.speed, args.archive_dir, insert=not args.no_insert,
+           events=not args.no_events, heatmap=args.heatmap)
+
+if __name__ == "__main__":
+    main()
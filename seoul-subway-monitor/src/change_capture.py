@@ -0,0 +1,101 @@
+import threading
+from .config import Config
+
+# 열차 상태 변화 여부를 판단하는 컬럼 (이 값들이 모두 같으면 동일 상태로 간주)
+STATE_COLUMNS = (
+    "station_id",
+    "train_status_code",
+    "last_received_time",
+    "direction_type",
+    "destination_station_id",
+)
+
+class ChangeTracker:
+    """
+    변경분 수집(Change Data Capture) 상태 테이블
+    (line_id, train_number)별 마지막 상태를 메모리에 보관하고,
+    새 스냅샷 중 상태가 바뀐 열차의 행만 적재 대상으로 남깁니다.
+    """
+
+    def __init__(self, keyframe_interval: int = None):
+        # N번째 스냅샷마다 전체 행을 기록(keyframe). 0이면 사용하지 않음
+        self.keyframe_interval = keyframe_interval if keyframe_interval is not None else Config.CDC_KEYFRAME_INTERVAL
+        self._state = {}            # line_id -> {train_number: 상태 튜플}
+        self._snapshot_counts = {}  # line_id -> 처리한 스냅샷 수
+        self._lock = threading.Lock()
+
+        # 통계 카운터
+        self.rows_written = 0
+        self.rows_suppressed = 0
+        self.keyframes = 0
+
+    @staticmethod
+    def _signature(row: dict):
+        return tuple(row.get(column) for column in STATE_COLUMNS)
+
+    def filter_changed(self, rows: list) -> list:
+        """
+        스냅샷 행 중 직전 상태와 달라진 행만 반환합니다.
+        스냅샷에서 사라진 열차(운행 종료 등)는 상태 테이블에서 제거하여 메모리를 일정하게 유지합니다.
+
+        Args:
+            rows (list): 변환된 행(dict) 리스트 (한 호선 또는 여러 호선)
+
+        Returns:
+            list: 적재할 행 리스트
+        """
+        # 호선별로 스냅샷을 나눠 처리
+        rows_by_line = {}
+        for row in rows:
+            rows_by_line.setdefault(row.get("line_id"), []).append(row)
+
+        changed = []
+        with self._lock:
+            for line_id, line_rows in rows_by_line.items():
+                count = self._snapshot_counts.get(line_id, 0) + 1
+                self._snapshot_counts[line_id] = count
+                is_keyframe = bool(self.keyframe_interval) and count % self.keyframe_interval == 0
+                if is_keyframe:
+                    self.keyframes += 1
+
+                previous = self._state.get(line_id, {})
+                current = {}
+                for row in line_rows:
+                    train_number = row.get("train_number")
+                    signature = self._signature(row)
+                    current[train_number] = signature
+                    if is_keyframe or previous.get(train_number) != signature:
+                        changed.append(row)
+
+                # 이번 스냅샷에 있는 열차만 남김
+                self._state[line_id] = current
+
+            self.rows_written += len(changed)
+            self.rows_suppressed += len(rows) - len(changed)
+
+        return changed
+
+    def invalidate(self, rows: list):
+        """
+        적재에 실패한 행의 호선 상태를 초기화합니다.
+        다음 스냅샷에서 해당 호선이 전체 기록되므로 변화 이벤트가 유실되지 않습니다.
+        """
+        line_ids = {row.get("line_id") for row in rows}
+        with self._lock:
+            for line_id in line_ids:
+                self._state.pop(line_id, None)
+            self.rows_written -= len(rows)
+
+    def stats(self) -> dict:
+        """
+        누적 통계 (기록/생략 행 수, 생략 비율, keyframe 수, 추적 중인 열차 수)
+        """
+        with self._lock:
+            total = self.rows_written + self.rows_suppressed
+            return {
+                "rows_written": self.rows_written,
+                "rows_suppressed": self.rows_suppressed,
+                "suppression_ratio": (self.rows_suppressed / total) if total else 0.0,
+                "keyframes": self.keyframes,
+                "tracked_trains": sum(len(trains) for trains in self._state.values()),
+            }
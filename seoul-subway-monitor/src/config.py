@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 # .env 파일 로드
@@ -11,9 +12,24 @@ class Config:
     SEOUL_API_KEY = os.getenv("SEOUL_API_KEY")
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+    # PostgreSQL 직접 접속 문자열 (COPY 적재 시 필요)
+    DATABASE_URL = os.getenv("DATABASE_URL")
+    # DB 적재 방식 ('rest': supabase-py insert, 'copy': PostgreSQL COPY FROM STDIN)
+    DB_WRITE_MODE = os.getenv("DB_WRITE_MODE", "rest")
 
-    # API Base URL
-    SEOUL_API_BASE_URL = "http://swopenAPI.seoul.go.kr/api/subway"
+    # API Base URL (로컬 스텁 서버로 테스트할 때는 환경 변수로 변경)
+    SEOUL_API_BASE_URL = os.getenv("SEOUL_API_BASE_URL", "http://swopenAPI.seoul.go.kr/api/subway")
+
+    # HTTP 클라이언트 설정 (타임아웃 단위: 초)
+    API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+    API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "10"))
+    # 일시적 오류(연결 실패, 타임아웃, 429/5xx) 시 최대 재시도 횟수 및 백오프 설정
+    API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "2"))
+    API_BACKOFF_BASE = float(os.getenv("API_BACKOFF_BASE", "0.5"))
+    API_BACKOFF_MAX = float(os.getenv("API_BACKOFF_MAX", "4"))
+    # 한 번에 요청할 행 수 및 최대 페이지 수
+    API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "100"))
+    API_MAX_PAGES = int(os.getenv("API_MAX_PAGES", "10"))
     
     # 수집 대상 호선 목록 (필요에 따라 추가/삭제)
     TARGET_LINES = [
@@ -30,6 +46,144 @@ class Config:
         "경의중앙선",
         "공항철도"
     ]
+    # 호선명 -> API 호선 ID (subwayId). 분석은 호선 ID 기준
+    LINE_IDS = {
+        "1호선": "1001",
+        "2호선": "1002",
+        "3호선": "1003",
+        "4호선": "1004",
+        "5호선": "1005",
+        "6호선": "1006",
+        "7호선": "1007",
+        "8호선": "1008",
+        "9호선": "1009",
+        "신분당선": "1077",
+        "경의중앙선": "1063",
+        "공항철도": "1065",
+    }
+
+    # 수집 모드 ('concurrent': 전 호선 병렬 수집, 'sequential': 기존 순차 수집)
+    COLLECT_MODE = os.getenv("COLLECT_MODE", "concurrent")
+    # 병렬 수집 시 동시에 실행할 최대 스레드 수
+    COLLECT_MAX_WORKERS = int(os.getenv("COLLECT_MAX_WORKERS", "12"))
+    # 한 번의 수집 주기(tick)가 끝나야 하는 마감 시간(초). 초과한 호선은 해당 tick에서 제외
+    TICK_DEADLINE_SECONDS = float(os.getenv("TICK_DEADLINE_SECONDS", "10"))
+    # 수집 주기(초). 'fixed' 스케줄러의 전 호선 수집 간격이자 'adaptive'에서 관측 전 호선의 초기 간격
+    COLLECT_INTERVAL_SECONDS = float(os.getenv("COLLECT_INTERVAL_SECONDS", "60"))
+    # 수집 스케줄러 ('adaptive': 호선별 변화율/운행 시간/할당량에 따라 간격 조정, 'fixed': 전 호선 같은 간격)
+    # 두 방식 모두 벽시계 경계(예: 매 15초 정각)에 맞춰 실행하므로 작업이 길어져도 이후 주기가 밀리지 않습니다.
+    SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "adaptive")
+    SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "15"))  # 경계 간격 (수집은 이 경계에서만 실행)
+    SCHEDULER_MIN_SECONDS = float(os.getenv("SCHEDULER_MIN_SECONDS", "15"))  # 호선별 최소 수집 간격
+    SCHEDULER_MAX_SECONDS = float(os.getenv("SCHEDULER_MAX_SECONDS", "300"))  # 운행 중 호선의 최대 수집 간격
+    SCHEDULER_IDLE_SECONDS = float(os.getenv("SCHEDULER_IDLE_SECONDS", "900"))  # 운행 시간 외 열차가 없는 호선의 확인 간격
+    # 한 번 수집할 때 상태(역, 진입/도착/출발, 방향, 행선지)가 바뀌어 있을 것으로 기대하는 열차 비율
+    SCHEDULER_TARGET_CHANGE = float(os.getenv("SCHEDULER_TARGET_CHANGE", "0.5"))
+    SCHEDULER_STATE_PATH = os.getenv("SCHEDULER_STATE_PATH", os.path.join("cache", "scheduler.json"))  # 당일 요청 수 보존
+    # 열차 운행 시간 (한국 표준시, 자정을 넘기면 다음 날 종료 시각)
+    SERVICE_HOURS = os.getenv("SERVICE_HOURS", "05:00-01:30")
+    # 서울시 API 인증키의 하루 요청 한도 (0이면 제한 없음). 기본값은 전 호선 1분 주기 수집과 같은 요청 수
+    API_DAILY_QUOTA = int(os.getenv("API_DAILY_QUOTA", str(len(TARGET_LINES) * 1440)))
+    # 분산 수집: 여러 작업자(프로세스/호스트)가 PostgreSQL 임대 테이블로 호선을 나눠 수집 (DATABASE_URL 필요)
+    SHARDING_ENABLED = os.getenv("SHARDING_ENABLED", "false").lower() == "true"
+    WORKER_ID = os.getenv("WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")  # 작업자 식별자 (작업자별 로컬 경로에도 사용)
+    LEASE_TTL_SECONDS = float(os.getenv("LEASE_TTL_SECONDS", "45"))  # 하트비트/임대 유효 시간 (죽은 작업자의 호선은 이 시간 뒤 재배분)
+    LEASE_RENEW_SECONDS = float(os.getenv("LEASE_RENEW_SECONDS", "15"))  # 임대 갱신 주기 (TTL보다 충분히 짧게)
+
+    # 로그 출력 형식 ('text': [구성요소] 메시지, 'json': 한 줄에 JSON 객체 하나) 및 수준
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    # 파이프라인 지표(Prometheus 텍스트 형식): 상태 서버 /metrics로 제공, 지정 시 매 tick 파일로도 기록
+    # (node_exporter textfile collector 디렉터리의 *.prom 경로 권장)
+    METRICS_TEXTFILE_PATH = os.getenv("METRICS_TEXTFILE_PATH", "")
+
+    # 변경분 수집(CDC): 상태가 바뀐 열차만 적재
+    CDC_ENABLED = os.getenv("CDC_ENABLED", "true").lower() == "true"
+    # N번째 스냅샷마다 전체 행을 기록 (0: 사용 안 함)
+    CDC_KEYFRAME_INTERVAL = int(os.getenv("CDC_KEYFRAME_INTERVAL", "0"))
+
+    # 로컬 쓰기 선행 스풀: 행을 먼저 디스크에 기록하고 백그라운드에서 DB로 반영
+    SPOOL_ENABLED = os.getenv("SPOOL_ENABLED", "true").lower() == "true"
+    SPOOL_DIR = os.getenv("SPOOL_DIR", "spool")
+    SPOOL_SEGMENT_MAX_BYTES = int(os.getenv("SPOOL_SEGMENT_MAX_BYTES", str(8 * 1024 * 1024)))
+    SPOOL_SEGMENT_MAX_SECONDS = float(os.getenv("SPOOL_SEGMENT_MAX_SECONDS", "30"))
+    SPOOL_FLUSH_BATCH_SIZE = int(os.getenv("SPOOL_FLUSH_BATCH_SIZE", "5000"))
+    SPOOL_FLUSH_INTERVAL = float(os.getenv("SPOOL_FLUSH_INTERVAL", "5"))
+
+    # API 원본 응답 보관 (재생/백필/부하 테스트용, python -m src.capture로 재생)
+    CAPTURE_ENABLED = os.getenv("CAPTURE_ENABLED", "false").lower() == "true"
+    CAPTURE_DIR = os.getenv("CAPTURE_DIR", "capture")
+
+    # 이벤트 추출: 스냅샷을 진입/도착/출발/회차 이벤트로 변환하여 저장
+    EVENTS_ENABLED = os.getenv("EVENTS_ENABLED", "true").lower() == "true"
+    EVENTS_SINK = os.getenv("EVENTS_SINK", "file")  # 'file' 또는 'table'(train_events)
+    EVENTS_DIR = os.getenv("EVENTS_DIR", "events")
+    EVENT_IDLE_TIMEOUT_SECONDS = float(os.getenv("EVENT_IDLE_TIMEOUT_SECONDS", "1800"))
+    # 실시간 배차 간격 모니터 (이벤트 추출 활성화 시 도착 이벤트로 동작)
+    HEADWAY_MONITOR_ENABLED = os.getenv("HEADWAY_MONITOR_ENABLED", "true").lower() == "true"
+    HEADWAY_WINDOW = int(os.getenv("HEADWAY_WINDOW", "20"))  # 역·방향별로 유지할 최근 간격 수
+    HEADWAY_BUNCHING_SECONDS = float(os.getenv("HEADWAY_BUNCHING_SECONDS", "120"))  # 2분 미만: 몰림
+    HEADWAY_GAP_SECONDS = float(os.getenv("HEADWAY_GAP_SECONDS", "600"))  # 10분 초과: 공백
+    HEADWAY_RESET_SECONDS = float(os.getenv("HEADWAY_RESET_SECONDS", "7200"))  # 이보다 긴 간격은 운행 중단으로 보고 통계 초기화
+    HEADWAY_MIN_SAMPLES = int(os.getenv("HEADWAY_MIN_SAMPLES", "3"))  # 진행 중 공백 알림에 필요한 최소 간격 수
+    # 평시 기준선: 역·방향·요일별 시간대(hour-of-week)마다 체류/배차 간격/회차 시간 분위수 스케치 (이벤트로 증분 갱신)
+    BASELINES_ENABLED = os.getenv("BASELINES_ENABLED", "true").lower() == "true"
+    BASELINE_PATH = os.getenv("BASELINE_PATH", os.path.join("cache", "baselines.json.gz"))
+    BASELINE_RELATIVE_ACCURACY = float(os.getenv("BASELINE_RELATIVE_ACCURACY", "0.02"))  # 분위수 상대 오차 (2%)
+    BASELINE_MIN_SAMPLES = int(os.getenv("BASELINE_MIN_SAMPLES", "20"))  # 시간대 표본이 적으면 역·방향 전체 시간 기준 사용
+    BASELINE_QUANTILE = float(os.getenv("BASELINE_QUANTILE", "0.95"))  # 분석기의 '평시보다 느림' 기준 분위수
+    BASELINE_ALERT_QUANTILE = float(os.getenv("BASELINE_ALERT_QUANTILE", "0.99"))  # 실시간 알림 기준 분위수
+    BASELINE_SAVE_SECONDS = float(os.getenv("BASELINE_SAVE_SECONDS", "600"))  # 실시간 갱신 중 파일 저장 주기
+    # 구간 밀도 히트맵 (최근 HEATMAP_WINDOW_SECONDS 동안 구간별 고유 열차 수)
+    HEATMAP_ENABLED = os.getenv("HEATMAP_ENABLED", "true").lower() == "true"
+    HEATMAP_WINDOW_SECONDS = float(os.getenv("HEATMAP_WINDOW_SECONDS", "300"))
+    HEATMAP_SNAPSHOT_PATH = os.getenv("HEATMAP_SNAPSHOT_PATH", "")  # 지정 시 매 tick JSON 파일로 저장
+    # 실시간 열차 궤적 저장소 (열차별 링 버퍼, 상태 서버 /trains로 조회)
+    TRAJECTORY_ENABLED = os.getenv("TRAJECTORY_ENABLED", "true").lower() == "true"
+    TRAJECTORY_HOURS = float(os.getenv("TRAJECTORY_HOURS", "6"))  # 이 시간 동안 보이지 않은 열차는 제거
+    TRAJECTORY_CAPACITY = int(os.getenv("TRAJECTORY_CAPACITY", "1024"))  # 열차당 최대 궤적 레코드 수 (역/상태 변경 1건 = 14바이트)
+    # 로컬 상태 HTTP 서버 (0이면 비활성화)
+    STATUS_SERVER_HOST = os.getenv("STATUS_SERVER_HOST", "127.0.0.1")
+    STATUS_SERVER_PORT = int(os.getenv("STATUS_SERVER_PORT", "0"))
+    # 스트리밍 리더 페이지당 행 수
+    READER_CHUNK_SIZE = int(os.getenv("READER_CHUNK_SIZE", "1000"))
+    # 로컬 컬럼형 캐시 (Parquet, pyarrow 필요)
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+    CACHE_RETENTION_DAYS = int(os.getenv("CACHE_RETENTION_DAYS", "14"))
+    CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+    # 캐시가 비어 있을 때 처음 가져올 기간(시간)
+    CACHE_INITIAL_SYNC_HOURS = int(os.getenv("CACHE_INITIAL_SYNC_HOURS", "6"))
+    # 호선 토폴로지 (관측된 역 이동 순서로 학습한 역 순서, JSON 캐시)
+    TOPOLOGY_CACHE_PATH = os.getenv("TOPOLOGY_CACHE_PATH", os.path.join(CACHE_DIR, "topology.json"))
+    TOPOLOGY_HISTORY_HOURS = float(os.getenv("TOPOLOGY_HISTORY_HOURS", "24"))  # 학습에 사용할 최근 기간
+    TOPOLOGY_MAX_AGE_HOURS = float(os.getenv("TOPOLOGY_MAX_AGE_HOURS", "168"))  # 캐시 재생성 주기
+    TOPOLOGY_MIN_COUNT = int(os.getenv("TOPOLOGY_MIN_COUNT", "3"))  # 구간으로 인정할 최소 관측 횟수
+    TOPOLOGY_MIN_SHARE = float(os.getenv("TOPOLOGY_MIN_SHARE", "0.1"))  # 역별 최다 진출 구간 대비 최소 비율
+    TOPOLOGY_MAX_GAP_SECONDS = float(os.getenv("TOPOLOGY_MAX_GAP_SECONDS", "600"))  # 연속 관측으로 볼 최대 간격
+    # 급행/일반 추월 분석 (급행 운영 호선: 9호선, 경의중앙선, 공항철도, 신분당선)
+    EXPRESS_LINE_IDS = [line_id.strip() for line_id in os.getenv("EXPRESS_LINE_IDS", "1009,1063,1065,1077").split(",") if line_id.strip()]
+    OVERTAKE_HISTORY_HOURS = float(os.getenv("OVERTAKE_HISTORY_HOURS", "24"))  # 기간 미지정 시 분석할 최근 기간
+    OVERTAKE_GRID_SECONDS = float(os.getenv("OVERTAKE_GRID_SECONDS", "30"))  # 궤적 보간 시간 간격
+    OVERTAKE_FOLLOW_STATIONS = float(os.getenv("OVERTAKE_FOLLOW_STATIONS", "1.5"))  # 선행 열차를 따라가는 것으로 볼 거리(역 수)
+    ANALYSIS_MAX_WORKERS = int(os.getenv("ANALYSIS_MAX_WORKERS", str(os.cpu_count() or 1)))  # 호선별 병렬 분석 프로세스 수
+    # 배치 분석 결과 저장 위치와 형식 ('parquet' 또는 'json')
+    ANALYSIS_OUTPUT_DIR = os.getenv("ANALYSIS_OUTPUT_DIR", "analysis_output")
+    ANALYSIS_OUTPUT_FORMAT = os.getenv("ANALYSIS_OUTPUT_FORMAT", "parquet")
+    ANALYSIS_HISTORY_HOURS = float(os.getenv("ANALYSIS_HISTORY_HOURS", "24"))  # 배치 분석 기간 미지정 시 최근 기간
+    # 분석 데이터 소스 ('snapshots': 위치 스냅샷, 'events': 이벤트 스트림, 'aggregates': 서버 측 집계)
+    ANALYSIS_SOURCE = os.getenv("ANALYSIS_SOURCE", "snapshots")
+    # 상주 분석 서비스 (python -m src.analysis.service): 결과를 (분석기, 호선, 구간, 데이터 수위)로 캐시
+    ANALYSIS_SERVICE_PORT = int(os.getenv("ANALYSIS_SERVICE_PORT", "8090"))
+    ANALYSIS_CACHE_ENTRIES = int(os.getenv("ANALYSIS_CACHE_ENTRIES", "256"))  # 결과 LRU 최대 항목 수
+    ANALYSIS_WARM_FRAMES = int(os.getenv("ANALYSIS_WARM_FRAMES", "8"))  # 메모리에 유지할 (호선, 구간) 위치 프레임 수
+    ANALYSIS_WATERMARK_TTL_SECONDS = float(os.getenv("ANALYSIS_WATERMARK_TTL_SECONDS", "5"))  # 수위 재조회 최소 간격
+    # 서버 측 집계 갱신 주기(분). 0이면 수집기에서 갱신하지 않음 (pg_cron 등 DB에서 갱신)
+    AGGREGATE_REFRESH_MINUTES = int(os.getenv("AGGREGATE_REFRESH_MINUTES", "0"))
+    # 위치 테이블 파티션 유지보수 (docs/partition_positions.sql 적용 후 사용, pg_cron을 쓰면 false)
+    PARTITION_MAINTENANCE_ENABLED = os.getenv("PARTITION_MAINTENANCE_ENABLED", "false").lower() == "true"
+    # 원본 위치 데이터 보존 기간(일). 지난 파티션은 분 단위 롤업 후 삭제
+    POSITION_RETENTION_DAYS = int(os.getenv("POSITION_RETENTION_DAYS", "30"))
 
     @staticmethod
     def validate_config():
@@ -42,3 +196,41 @@ class Config:
             raise ValueError("SUPABASE_URL is not set in environment variables.")
         if not Config.SUPABASE_KEY:
             raise ValueError("SUPABASE_KEY is not set in environment variables.")
+        if Config.DB_WRITE_MODE == "copy" and not Config.DATABASE_URL:
+            raise ValueError("DATABASE_URL is required when DB_WRITE_MODE is 'copy'.")
+        if Config.SHARDING_ENABLED and not Config.DATABASE_URL:
+            raise ValueError("DATABASE_URL is required when SHARDING_ENABLED is true.")
+        if Config.SHARDING_ENABLED and Config.LEASE_RENEW_SECONDS * 2 > Config.LEASE_TTL_SECONDS:
+            raise ValueError("LEASE_RENEW_SECONDS must be at most half of LEASE_TTL_SECONDS.")
+        if Config.SHARDING_ENABLED and Config.SPOOL_ENABLED and not os.getenv("WORKER_ID"):
+            # 기본값(호스트-PID)은 재시작마다 바뀌어 이전 실행의 작업자별 스풀을 이어서 반영하지 못함
+            raise ValueError("WORKER_ID must be set explicitly when SHARDING_ENABLED and SPOOL_ENABLED are true.")
+
+    # 같은 호스트의 작업자끼리 공유하면 안 되는 로컬 경로 (디렉터리 / 파일)
+    WORKER_SCOPED_DIRS = ("SPOOL_DIR", "CAPTURE_DIR", "EVENTS_DIR")
+    WORKER_SCOPED_FILES = ("SCHEDULER_STATE_PATH", "BASELINE_PATH", "HEATMAP_SNAPSHOT_PATH", "METRICS_TEXTFILE_PATH")
+
+    @staticmethod
+    def scope_worker_paths(worker_id: str = None):
+        """
+        분산 수집(SHARDING_ENABLED) 시 프로세스별 로컬 경로를 작업자 ID로 나눕니다. (수집기 시작 시 한 번 호출)
+        - 디렉터리: spool → spool/<작업자 ID> (스풀 세그먼트와 checkpoint.json을 다른 작업자가 봉인/반영하지 않도록)
+        - 파일: cache/baselines.json.gz → cache/baselines.<작업자 ID>.json.gz
+        """
+        if not Config.SHARDING_ENABLED:
+            return
+        worker_id = worker_id or Config.WORKER_ID
+        for name in Config.WORKER_SCOPED_DIRS:
+            setattr(Config, name, os.path.join(getattr(Config, name), worker_id))
+        for name in Config.WORKER_SCOPED_FILES:
+            setattr(Config, name, worker_path(getattr(Config, name), worker_id))
+
+def worker_path(path: str, worker_id: str) -> str:
+    """
+    파일 이름의 첫 확장자 앞에 작업자 ID를 붙입니다. (빈 경로는 그대로: 기능 비활성화)
+    """
+    if not path:
+        return path
+    directory, name = os.path.split(path)
+    stem, dot, extension = name.partition(".")
+    return os.path.join(directory, f"{stem}.{worker_id}{dot}{extension}" if dot else f"{name}.{worker_id}")
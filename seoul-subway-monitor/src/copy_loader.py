@@ -0,0 +1,66 @@
+import io
+import psycopg2
+from .config import Config
+from .row_codec import COLUMNS, write_csv
+
+class CopyLoader:
+    """
+    PostgreSQL COPY FROM STDIN 기반 대량 적재기
+    행을 메모리 버퍼에 CSV로 쓴 뒤 한 번의 COPY로 전송합니다. (execute_values/REST 대비 행당 비용 최소화)
+    subway_monitoring/copy_loader.py는 Config 의존성을 뺀 사본입니다.
+    """
+
+    def __init__(self, dsn: str = None, table_name: str = "realtime_subway_positions", conn=None):
+        """
+        Args:
+            dsn (str): PostgreSQL 접속 문자열 (기본값: Config.DATABASE_URL)
+            table_name (str): 적재 대상 테이블
+            conn: 이미 연결된 psycopg2 커넥션 (주어지면 dsn 대신 사용)
+        """
+        self.dsn = dsn or Config.DATABASE_URL
+        self.table_name = table_name
+        self.conn = conn
+
+    def _connection(self):
+        # 연결이 없거나 끊어진 경우 재연결
+        if self.conn is None or self.conn.closed:
+            self.conn = psycopg2.connect(self.dsn)
+        return self.conn
+
+    def close(self):
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+
+    def load(self, rows: list, columns: tuple = None) -> int:
+        """
+        행 리스트를 하나의 트랜잭션에서 COPY로 적재합니다.
+
+        Args:
+            rows (list): 튜플(columns 순서) 또는 dict 행 리스트
+            columns (tuple): 적재할 컬럼 (기본값: 표준 스키마 컬럼, dict 행에 created_at이 있으면 포함)
+
+        Returns:
+            int: 적재한 행 수
+
+        Raises:
+            psycopg2.Error: 적재 실패 시 (트랜잭션은 롤백됨)
+        """
+        if not rows:
+            return 0
+        if columns is None:
+            columns = COLUMNS
+            if isinstance(rows[0], dict) and "created_at" in rows[0]:
+                columns = COLUMNS + ("created_at",)
+
+        buffer = write_csv(rows, columns, io.StringIO())
+        sql = f"COPY {self.table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+
+        conn = self._connection()
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert(sql, buffer)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(rows)
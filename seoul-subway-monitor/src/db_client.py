@@ -1,5 +1,22 @@
-from supabase import create_client, Client
+import time
+from datetime import datetime
 from .config import Config
+from .change_capture import ChangeTracker
+from .spool import WriteAheadSpool, SpoolFlusher
+from .row_codec import encode_dicts
+from .copy_loader import CopyLoader
+from .position_cache import PositionCache
+from .logger import get_logger
+from .metrics import CDC_SUPPRESSED, DB_ERRORS, INSERT_BATCH_ROWS, INSERT_ROWS, INSERT_SECONDS, TRANSFORM_SECONDS
+
+log = get_logger("DB")
+
+# 집계 지표 → 서버 측 조회 함수 (docs/schema.sql)
+AGGREGATE_FUNCTIONS = {
+    "dwell": "station_dwell_stats",
+    "headway": "station_headway_stats",
+    "turnaround": "turnaround_stats",
+}
 
 class SubwayDB:
     """
@@ -7,8 +24,54 @@ class SubwayDB:
     """
 
     def __init__(self):
-        self.supabase: Client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+        # supabase(약 0.2초)는 클라이언트를 만들 때 불러옴: 모듈 import만 하는 분석 도구/서비스 시작을 빠르게
+        from supabase import create_client
+
+        self.supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
         self.table_name = "realtime_subway_positions"
+        self.events_table_name = "train_events"
+        # 변경분 수집(CDC) 상태 테이블 (비활성화 시 매 스냅샷 전체 적재)
+        self.change_tracker = ChangeTracker() if Config.CDC_ENABLED else None
+        # COPY 적재기 (DB_WRITE_MODE='copy'일 때만 사용)
+        self.copy_loader = CopyLoader(table_name=self.table_name) if Config.DB_WRITE_MODE == "copy" else None
+        # 분석용 로컬 컬럼형 캐시 (처음 사용할 때 생성)
+        self._cache = None
+        # 쓰기 선행 스풀 (enable_spool() 호출 시 활성화)
+        self.spool = None
+        self.flusher = None
+
+    def enable_spool(self):
+        """
+        쓰기 선행 스풀과 백그라운드 반영 스레드를 시작합니다.
+        이후 insert_positions는 로컬 스풀에만 기록하므로 DB 지연/장애에 막히지 않습니다.
+        """
+        if self.spool is not None:
+            return
+        self.spool = WriteAheadSpool()
+        self.flusher = SpoolFlusher(self.spool, self.write_rows)
+        self.flusher.start()
+        log.info("Write-ahead spool enabled at '{spool_dir}'.", spool_dir=self.spool.spool_dir)
+
+    def close(self):
+        """
+        스풀 반영 스레드를 정리하고 남은 데이터를 DB에 반영합니다.
+        """
+        if self.flusher is not None:
+            self.flusher.stop(flush=True)
+            self.flusher = None
+        if self.copy_loader is not None:
+            self.copy_loader.close()
+
+    def transform_positions(self, data_list: list):
+        """
+        API 원본 데이터를 표준 스키마의 행(dict) 리스트로 변환합니다.
+        (Snake Case 키 매핑 및 데이터 타입 변환은 row_codec에서 일괄 처리)
+        created_at은 DB Default 값 사용 (now()), 스풀 사용 시에는 수집 시각 기록
+        """
+        started = time.perf_counter()
+        rows = encode_dicts(data_list)
+        TRANSFORM_SECONDS.observe(time.perf_counter() - started)
+        return rows
 
     def insert_positions(self, data_list: list):
         """
@@ -22,35 +85,75 @@ class SubwayDB:
         """
         if not data_list:
             return False
+        return self.insert_rows(self.transform_positions(data_list))
 
-        transformed_data = []
-        for item in data_list:
-            # Snake Case로 키 매핑 및 데이터 타입 변환
-            transformed_item = {
-                "line_id": item.get("subwayId"),
-                "line_name": item.get("subwayNm"),
-                "station_id": item.get("statnId"),
-                "station_name": item.get("statnNm"),
-                "train_number": item.get("trainNo"),
-                "last_received_date": item.get("lastRecptnDt"),
-                "last_received_time": item.get("recptnDt"),
-                "direction_type": item.get("updnLine"),
-                "destination_station_id": item.get("statnTid"),
-                "destination_station_name": item.get("statnTnm"),
-                "train_status_code": item.get("trainSttus"),
-                "is_express": item.get("directAt"),
-                "is_last_train": item.get("lstcarAt") == "1", # Boolean 변환
-                # created_at은 DB Default 값 사용 (now())
-            }
-            transformed_data.append(transformed_item)
+    def insert_rows(self, transformed_data: list):
+        """
+        변환된 행(여러 호선 가능)을 한 번에 적재합니다.
+        CDC 필터 → 스풀 기록(활성화 시) 또는 DB 직접 적재 순으로 처리합니다.
 
+        Returns:
+            bool: 성공 여부
+        """
+        if not transformed_data:
+            return False
+
+        # 직전 스냅샷과 상태가 같은 열차는 적재 생략
+        if self.change_tracker is not None:
+            received = len(transformed_data)
+            transformed_data = self.change_tracker.filter_changed(transformed_data)
+            CDC_SUPPRESSED.inc(amount=received - len(transformed_data))
+            if not transformed_data:
+                log.info("No state changes. Skipped insert.")
+                return True
+
+        if self.spool is not None:
+            # 수집 시각을 직접 기록 (스풀에서 늦게 반영되어도 실제 수집 시각 유지, 재생 시에는 보관된 시각)
+            created_at = datetime.now().astimezone().isoformat()
+            for row in transformed_data:
+                row.setdefault("created_at", created_at)
+            try:
+                started = time.perf_counter()
+                self.spool.append(transformed_data)
+                _record_write("spool", len(transformed_data), started)
+                return True
+            except OSError as e:
+                DB_ERRORS.inc("spool")
+                log.error("Failed to write spool, inserting directly: {error}", error=str(e))
+
+        if self.write_rows(transformed_data):
+            return True
+
+        # 적재 실패 시 상태를 되돌려 다음 스냅샷에서 다시 기록되도록 함
+        if self.change_tracker is not None:
+            self.change_tracker.invalidate(transformed_data)
+        return False
+
+    def write_rows(self, rows: list):
+        """
+        변환이 끝난 행을 DB에 일괄 삽입합니다. (스풀 반영 스레드도 사용)
+        DB_WRITE_MODE가 'copy'이면 COPY FROM STDIN으로 한 트랜잭션에 적재합니다.
+
+        Returns:
+            bool: 성공 여부
+        """
+        mode = "copy" if self.copy_loader is not None else "rest"
+        started = time.perf_counter()
         try:
+            if self.copy_loader is not None:
+                self.copy_loader.load(rows)
+                _record_write(mode, len(rows), started)
+                log.info("Successfully copied {rows} records.", rows=len(rows), mode=mode)
+                return True
+
             # 데이터 일괄 삽입 (bulk insert)
-            response = self.supabase.table(self.table_name).insert(transformed_data).execute()
-            print(f"[DB Info] Successfully inserted {len(transformed_data)} records.")
+            response = self.supabase.table(self.table_name).insert(rows).execute()
+            _record_write(mode, len(rows), started)
+            log.info("Successfully inserted {rows} records.", rows=len(rows), mode=mode)
             return True
         except Exception as e:
-            print(f"[DB Error] Failed to insert data: {e}")
+            DB_ERRORS.inc("insert")
+            log.error("Failed to insert data: {error}", error=str(e), rows=len(rows), mode=mode)
             return False
 
     def fetch_train_data(self, line_id: str, limit: int = 1000):
@@ -66,5 +169,276 @@ class SubwayDB:
                 .execute()
             return response.data
         except Exception as e:
-            print(f"[DB Error] Failed to fetch data: {e}")
+            DB_ERRORS.inc("fetch")
+            log.error("Failed to fetch data: {error}", error=str(e), line_id=line_id)
             return []
+
+    def iter_train_data(self, line_id: str, start=None, end=None, columns: list = None,
+                        chunk_size: int = None, output: str = "frame", after_id: int = None):
+        """
+        특정 호선의 [start, end) 구간 데이터를 (created_at, id) 키셋 페이지네이션으로 나눠 가져옵니다.
+        OFFSET을 쓰지 않으므로 뒤쪽 페이지도 일정한 비용으로 조회되며, 한 번에 chunk_size 행만 메모리에 올립니다.
+        created_at은 수집 시각이라 스풀에서 늦게 반영된 행은 이미 읽은 시각 뒤쪽에 끼어들 수 있으므로,
+        증분 동기화는 적재 순서인 id(after_id) 기준으로 조회합니다.
+
+        Args:
+            line_id (str): 호선 ID
+            start, end (datetime | str): 조회 구간 (None이면 제한 없음)
+            columns (list): 가져올 컬럼 (None이면 전체). created_at, id는 항상 포함
+            chunk_size (int): 페이지당 행 수 (기본값: Config.READER_CHUNK_SIZE)
+            output (str): 'frame'(pandas DataFrame), 'arrow'(pyarrow RecordBatch), 'records'(dict 리스트)
+            after_id (int): 주어지면 id가 이보다 큰(이후에 적재된) 행만 id 순으로 조회 (증분 동기화용)
+
+        Yields:
+            청크 단위 데이터 (시간순, after_id가 주어지면 적재순)
+        """
+        chunk_size = chunk_size or Config.READER_CHUNK_SIZE
+        select = "*"
+        if columns:
+            select = ",".join(dict.fromkeys(list(columns) + ["created_at", "id"]))
+
+        last_row = None
+        while True:
+            try:
+                query = self.supabase.table(self.table_name).select(select).eq("line_id", line_id)
+                if start is not None:
+                    query = query.gte("created_at", _to_iso(start))
+                if end is not None:
+                    query = query.lt("created_at", _to_iso(end))
+                if after_id is not None:
+                    # 키셋 조건: id > 마지막 id
+                    rows = query.gt("id", after_id).order("id").limit(chunk_size).execute().data
+                else:
+                    if last_row is not None:
+                        # 키셋 조건: (created_at, id) > (마지막 created_at, 마지막 id)
+                        last_time = last_row["created_at"]
+                        query = query.or_(
+                            f'created_at.gt."{last_time}",and(created_at.eq."{last_time}",id.gt.{last_row["id"]})'
+                        )
+                    rows = query.order("created_at").order("id").limit(chunk_size).execute().data
+            except Exception as e:
+                DB_ERRORS.inc("fetch")
+                log.error("Failed to fetch data chunk: {error}", error=str(e), line_id=line_id)
+                return
+
+            # 서버의 최대 행 수(max_rows) 제한으로 chunk_size보다 적게 올 수 있으므로 빈 페이지에서만 종료
+            if not rows:
+                return
+            yield _convert_chunk(rows, output)
+            last_row = rows[-1]
+            if after_id is not None:
+                after_id = last_row["id"]
+
+    def fetch_watermark(self, line_id: str, start=None, end=None, source: str = "positions"):
+        """
+        [start, end) 구간에 마지막으로 적재된 행의 수위(watermark)를 가져옵니다. (limit 1 조회 한 번)
+        값이 같으면 그 구간의 데이터가 바뀌지 않은 것이므로 분석 결과를 다시 계산할 필요가 없습니다.
+        마지막 적재 행은 id 기준 (수집 시각 기준이면 늦게 반영된 스풀 행이 수위를 바꾸지 못함)
+
+        Args:
+            source (str): 'positions'(위치 스냅샷: created_at, id) 또는 'events'(이벤트: event_time, id)
+
+        Returns:
+            str | None: 'created_at/id' 형식 문자열, 데이터가 없으면 '', 실패 시 None
+        """
+        table, time_column = (self.events_table_name, "event_time") if source == "events" else (self.table_name, "created_at")
+        try:
+            query = self.supabase.table(table).select(f"{time_column},id").eq("line_id", line_id)
+            if start is not None:
+                query = query.gte(time_column, _to_iso(start))
+            if end is not None:
+                query = query.lt(time_column, _to_iso(end))
+            rows = query.order("id", desc=True).limit(1).execute().data
+        except Exception as e:
+            DB_ERRORS.inc("fetch_watermark")
+            log.error("Failed to fetch watermark: {error}", error=str(e), line_id=line_id)
+            return None
+        return f"{rows[0][time_column]}/{rows[0]['id']}" if rows else ""
+
+    @property
+    def cache(self):
+        """
+        로컬 위치 이력 캐시 (CACHE_ENABLED=false이거나 pyarrow가 없으면 None)
+        """
+        if self._cache is None and Config.CACHE_ENABLED:
+            try:
+                self._cache = PositionCache(self)
+            except ImportError as e:
+                log.warning("Local cache disabled: {error}", error=str(e))
+                Config.CACHE_ENABLED = False
+        return self._cache
+
+    def fetch_train_frame(self, line_id: str, start=None, end=None, columns: list = None, limit: int = None):
+        """
+        분석용 DataFrame을 가져옵니다.
+        start/end가 주어지면 해당 구간 전체를 스트리밍 리더로, 아니면 최근 limit건을 가져옵니다.
+        로컬 캐시가 활성화되어 있으면 새로 적재된 행만 동기화한 뒤 캐시에서 읽습니다.
+        """
+        import pandas as pd
+
+        if self.cache is not None:
+            self.cache.sync(line_id, since=start)
+            frame = self.cache.read(line_id, start, end, columns)
+            if start is None and end is None:
+                frame = frame.tail(limit or 1000).reset_index(drop=True)
+            return frame
+
+        if start is None and end is None:
+            return pd.DataFrame(self.fetch_train_data(line_id, limit=limit or 1000))
+
+        chunks = list(self.iter_train_data(line_id, start, end, columns))
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True)
+
+    def refresh_aggregates(self):
+        """
+        서버 측 집계 테이블(agg_station_hourly, agg_turnaround_hourly)을 증분 갱신합니다.
+        (docs/schema.sql의 refresh_position_aggregates 함수 호출)
+
+        Returns:
+            int | None: 다시 계산한 시간대 수, 실패 시 None
+        """
+        try:
+            response = self.supabase.rpc("refresh_position_aggregates", {}).execute()
+            return response.data
+        except Exception as e:
+            DB_ERRORS.inc("refresh_aggregates")
+            log.error("Failed to refresh aggregates: {error}", error=str(e))
+            return None
+
+    def maintain_partitions(self, keep_days: int = None):
+        """
+        위치 테이블 파티션 유지보수: 향후 파티션 생성, 보존 기간이 지난 파티션 롤업 후 삭제
+        (docs/partition_positions.sql의 maintain_position_partitions 함수 호출)
+
+        Returns:
+            dict | None: {"created": 생성 확인한 파티션 수, "dropped": 삭제한 파티션 수}, 실패 시 None
+        """
+        params = {"p_keep_days": keep_days or Config.POSITION_RETENTION_DAYS}
+        try:
+            response = self.supabase.rpc("maintain_position_partitions", params).execute()
+            log.info("Partition maintenance: {result}", result=response.data)
+            return response.data
+        except Exception as e:
+            DB_ERRORS.inc("maintain_partitions")
+            log.error("Failed to maintain partitions: {error}", error=str(e))
+            return None
+
+    def fetch_station_stats(self, metric: str, line_id: str, start=None, end=None, by_hour: bool = False):
+        """
+        서버 측 집계에서 역·방향별 통계(count, total_seconds, mean, std, max)를 가져옵니다.
+        원본 위치 데이터 대신 수백 건 수준의 집계 행만 전송됩니다.
+
+        Args:
+            metric (str): 'dwell'(체류 시간), 'headway'(배차 간격), 'turnaround'(회차 시간)
+            line_id (str): 호선 ID
+            start, end: 조회 구간 (시간대 단위, None이면 전체)
+            by_hour (bool): True면 시간대(hour_start)별 행을 유지
+
+        Returns:
+            DataFrame: 통계 프레임 (실패 시 빈 프레임)
+        """
+        import pandas as pd
+
+        params = {
+            "p_line_id": line_id,
+            "p_start": _to_iso(start) if start is not None else None,
+            "p_end": _to_iso(end) if end is not None else None,
+            "p_by_hour": by_hour,
+        }
+        try:
+            response = self.supabase.rpc(AGGREGATE_FUNCTIONS[metric], params).execute()
+            stats = pd.DataFrame(response.data)
+        except Exception as e:
+            DB_ERRORS.inc("fetch_stats")
+            log.error("Failed to fetch {metric} stats: {error}", metric=metric, error=str(e), line_id=line_id)
+            return pd.DataFrame()
+
+        if stats.empty:
+            return stats
+        if by_hour:
+            stats['hour_start'] = pd.to_datetime(stats['hour_start'], utc=True)
+            return stats
+        return stats.drop(columns=['hour_start'])
+
+    def insert_events(self, events: list):
+        """
+        열차 이벤트(진입/도착/출발/회차)를 train_events 테이블에 적재합니다.
+
+        Returns:
+            bool: 성공 여부
+        """
+        if not events:
+            return True
+        try:
+            self.supabase.table(self.events_table_name).insert(events).execute()
+            return True
+        except Exception as e:
+            DB_ERRORS.inc("insert_events")
+            log.error("Failed to insert events: {error}", error=str(e), events=len(events))
+            return False
+
+    def fetch_events(self, line_id: str, event_types: tuple = None, limit: int = 5000, start=None, end=None):
+        """
+        분석을 위해 특정 호선의 이벤트를 시간순으로 가져옵니다.
+        start/end가 없으면 최근 limit개, 주어지면 event_time이 [start, end)인 이벤트 전체를
+        (event_time, id) 키셋 페이지네이션으로 나눠 가져옵니다. (iter_train_data와 같은 방식)
+        """
+        def base_query():
+            query = self.supabase.table(self.events_table_name)\
+                .select("*")\
+                .eq("line_id", line_id)
+            if event_types:
+                query = query.in_("event_type", list(event_types))
+            if start is not None:
+                query = query.gte("event_time", _to_iso(start))
+            if end is not None:
+                query = query.lt("event_time", _to_iso(end))
+            return query
+
+        try:
+            if start is None and end is None:
+                response = base_query().order("event_time", desc=True).limit(limit).execute()
+                return list(reversed(response.data))
+
+            events = []
+            last_row = None
+            while True:
+                query = base_query()
+                if last_row is not None:
+                    last_time = last_row["event_time"]
+                    query = query.or_(
+                        f'event_time.gt."{last_time}",and(event_time.eq."{last_time}",id.gt.{last_row["id"]})'
+                    )
+                rows = query.order("event_time").order("id").limit(Config.READER_CHUNK_SIZE).execute().data
+                if not rows:
+                    return events
+                events.extend(rows)
+                last_row = rows[-1]
+        except Exception as e:
+            DB_ERRORS.inc("fetch_events")
+            log.error("Failed to fetch events: {error}", error=str(e), line_id=line_id)
+            return []
+
+def _record_write(mode: str, rows: int, started: float):
+    # 적재 지표: 소요 시간, 배치 크기, 누적 행 수
+    INSERT_SECONDS.observe(time.perf_counter() - started, mode)
+    INSERT_BATCH_ROWS.observe(rows, mode)
+    INSERT_ROWS.inc(mode, amount=rows)
+
+def _to_iso(value):
+    # datetime은 ISO 문자열로, 문자열은 그대로 사용
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+def _convert_chunk(rows: list, output: str):
+    """
+    조회한 dict 리스트를 요청한 형식으로 변환합니다.
+    """
+    if output == "records":
+        return rows
+    if output == "arrow":
+        import pyarrow as pa
+        return pa.RecordBatch.from_pylist(rows)
+    import pandas as pd
+    return pd.DataFrame(rows)
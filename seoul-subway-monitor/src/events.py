@@ -0,0 +1,397 @@
+import argparse
+import glob
+import heapq
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from .config import Config
+from .logger import get_logger
+
+log = get_logger("Events")
+
+# API 시각(recptnDt)은 시간대 정보가 없는 한국 표준시
+KST = timezone(timedelta(hours=9))
+
+# 이벤트 종류
+EVENT_ENTER = "enter"            # 진입 (train_status_code 0)
+EVENT_ARRIVE = "arrive"          # 도착 (train_status_code 1)
+EVENT_DEPART = "depart"          # 출발 (train_status_code 2)
+EVENT_TURNAROUND = "turnaround"  # 운행 방향 전환 (회차)
+
+STATUS_EVENTS = {0: EVENT_ENTER, 1: EVENT_ARRIVE, 2: EVENT_DEPART}
+
+def parse_time(value):
+    """
+    '2026-10-18 08:00:00', ISO 문자열, datetime 객체를 시간대가 있는 datetime으로 변환합니다.
+    시간대 정보가 없으면 한국 표준시로 간주합니다.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    return value if value.tzinfo is not None else value.replace(tzinfo=KST)
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+class TrainState:
+    """
+    열차 한 대의 상태 머신 상태 (마지막 역, 상태, 방향, 현재 역 방문 정보)
+    """
+    __slots__ = ("station_id", "status", "direction", "visit_id", "arrived_at", "last_seen_at")
+
+    def __init__(self, station_id, status, direction, visit_id, seen_at):
+        self.station_id = station_id
+        self.status = status
+        self.direction = direction
+        self.visit_id = visit_id
+        self.arrived_at = None
+        self.last_seen_at = seen_at
+
+class EventExtractor:
+    """
+    위치 스냅샷 스트림을 열차별 상태 머신으로 처리하여 이벤트(진입/도착/출발/회차)로 변환합니다.
+    같은 상태가 여러 번 폴링되어도 이벤트는 한 번만 발생하며,
+    실시간(main.job)과 과거 데이터 백필에서 동일하게 사용합니다.
+    """
+
+    def __init__(self, idle_timeout_seconds: float = None):
+        # 일정 시간 보이지 않은 열차는 상태를 제거 (운행 종료, 메모리 제한)
+        self.idle_timeout_seconds = idle_timeout_seconds or Config.EVENT_IDLE_TIMEOUT_SECONDS
+        self._trains = {}  # (line_id, train_number) -> TrainState
+        self._last_evicted_at = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _visit_id(line_id, train_number, station_id, started_at):
+        # 온라인/백필 어디서 계산해도 같은 값이 나오도록 방문 시작 시각 기반으로 생성
+        return f"{line_id}:{train_number}:{station_id}:{int(started_at.timestamp())}"
+
+    @staticmethod
+    def _event(event_type, row, state, event_time, **extra):
+        event = {
+            "event_type": event_type,
+            "line_id": row.get("line_id"),
+            "train_number": row.get("train_number"),
+            "station_id": row.get("station_id"),
+            "station_name": row.get("station_name"),
+            "direction_type": state.direction,
+            "is_express": row.get("is_express"),
+            "destination_station_id": row.get("destination_station_id"),
+            "visit_id": state.visit_id,
+            "event_time": event_time.isoformat(),
+            "dwell_seconds": None,
+            "turnaround_seconds": None,
+            "from_station_id": None,
+        }
+        event.update(extra)
+        return event
+
+    def process(self, rows: list, observed_at: datetime = None) -> list:
+        """
+        스냅샷 행들을 처리하여 새로 발생한 이벤트 리스트를 반환합니다.
+
+        Args:
+            rows (list): 표준 스키마 행(dict) 리스트 (시간순)
+            observed_at (datetime): 행에 시각 정보가 없을 때 사용할 관측 시각
+
+        Returns:
+            list: 이벤트(dict) 리스트
+        """
+        events = []
+        observed_at = parse_time(observed_at) or datetime.now(KST)
+
+        with self._lock:
+            for row in rows:
+                # 열차가 실제로 보고한 시각(recptnDt) 우선, 없으면 적재/관측 시각 사용
+                event_time = (parse_time(row.get("last_received_time"))
+                              or parse_time(row.get("created_at"))
+                              or observed_at)
+                key = (row.get("line_id"), row.get("train_number"))
+                station_id = row.get("station_id")
+                status = _to_int(row.get("train_status_code"))
+                direction = _to_int(row.get("direction_type"))
+
+                state = self._trains.get(key)
+                if state is None:
+                    state = TrainState(station_id, None, direction,
+                                       self._visit_id(key[0], key[1], station_id, event_time), event_time)
+                    self._trains[key] = state
+                else:
+                    if event_time < state.last_seen_at:
+                        continue # 이미 처리한 시각보다 이전 보고는 무시
+
+                    if direction != state.direction:
+                        # 방향 전환: 이전 방향 마지막 관측 → 새 방향 첫 관측
+                        turnaround_seconds = (event_time - state.last_seen_at).total_seconds()
+                        from_station_id = state.station_id
+                        state.direction = direction
+                        self._start_visit(state, key, station_id, event_time)
+                        events.append(self._event(EVENT_TURNAROUND, row, state, event_time,
+                                                  turnaround_seconds=turnaround_seconds,
+                                                  from_station_id=from_station_id))
+                    elif station_id != state.station_id:
+                        self._start_visit(state, key, station_id, event_time)
+                    elif status == state.status:
+                        # 같은 상태의 반복 폴링: 이벤트 없음
+                        state.last_seen_at = event_time
+                        continue
+
+                state.status = status
+                state.last_seen_at = event_time
+
+                event_type = STATUS_EVENTS.get(status)
+                if event_type == EVENT_ARRIVE:
+                    state.arrived_at = event_time
+                    events.append(self._event(event_type, row, state, event_time))
+                elif event_type == EVENT_DEPART:
+                    dwell_seconds = None
+                    if state.arrived_at is not None:
+                        dwell_seconds = (event_time - state.arrived_at).total_seconds()
+                    events.append(self._event(event_type, row, state, event_time, dwell_seconds=dwell_seconds))
+                elif event_type is not None:
+                    events.append(self._event(event_type, row, state, event_time))
+
+            self._evict_idle(observed_at)
+
+        return events
+
+    def _start_visit(self, state, key, station_id, event_time):
+        state.station_id = station_id
+        state.visit_id = self._visit_id(key[0], key[1], station_id, event_time)
+        state.arrived_at = None
+
+    def _evict_idle(self, now: datetime):
+        # 상태 정리는 관측 시각 기준 1분에 한 번만 수행
+        if self._last_evicted_at is not None and (now - self._last_evicted_at).total_seconds() < 60:
+            return
+        self._last_evicted_at = now
+        stale = [key for key, state in self._trains.items()
+                 if (now - state.last_seen_at).total_seconds() > self.idle_timeout_seconds]
+        for key in stale:
+            del self._trains[key]
+
+    def tracked_trains(self) -> int:
+        return len(self._trains)
+
+class EventFileSink:
+    """
+    이벤트를 일자별 JSONL 파일(events-YYYYMMDD.jsonl)로 저장합니다.
+    호선별 수위(마지막으로 기록한 일자 파일과 그 끝 위치)는 _watermarks.json에 함께 기록합니다.
+    """
+    WATERMARKS_FILE = "_watermarks.json"
+
+    def __init__(self, events_dir: str = None):
+        self.events_dir = events_dir or Config.EVENTS_DIR
+        os.makedirs(self.events_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._watermarks = self._read_watermarks(os.path.join(self.events_dir, self.WATERMARKS_FILE))
+
+    def write(self, events: list) -> bool:
+        if not events:
+            return True
+        by_day = {}
+        for event in events:
+            by_day.setdefault(event["event_time"][:10].replace("-", ""), []).append(event)
+        with self._lock:
+            for day, day_events in by_day.items():
+                path = os.path.join(self.events_dir, f"events-{day}.jsonl")
+                with open(path, "a", encoding="utf-8") as f:
+                    for event in day_events:
+                        f.write(json.dumps(event, ensure_ascii=False) + "\n")
+                    offset = f.tell()
+                for line_id in {event["line_id"] for event in day_events}:
+                    # 파일 끝 위치는 기록할 때마다 커지므로, 늦게 도착한 이전 일자 이벤트도 값을 바꿈
+                    self._watermarks[line_id] = f"{day}/{offset}"
+            self._save_watermarks()
+        return True
+
+    @staticmethod
+    def _read_watermarks(path: str) -> dict:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_watermarks(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.events_dir, prefix=self.WATERMARKS_FILE + ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._watermarks, f)
+        os.replace(tmp_path, os.path.join(self.events_dir, self.WATERMARKS_FILE))
+
+    def _paths_by_day(self) -> dict:
+        # 일자 파일 이름 -> 경로 목록 (분산 수집 시 작업자별 하위 디렉터리 events/<작업자 ID>/도 함께 읽음)
+        paths = glob.glob(os.path.join(self.events_dir, "events-*.jsonl"))
+        paths += glob.glob(os.path.join(self.events_dir, "*", "events-*.jsonl"))
+        by_day = {}
+        for path in paths:
+            by_day.setdefault(os.path.basename(path), []).append(path)
+        return dict(sorted(by_day.items()))
+
+    @staticmethod
+    def _read_file(path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def read(self, line_id: str = None, event_types: tuple = None, start=None, end=None):
+        """
+        저장된 이벤트를 시간순으로 읽습니다. (같은 날짜의 작업자별 파일은 event_time 순으로 병합)
+        start/end가 주어지면 event_time이 [start, end)인 이벤트만 반환하고, 구간 밖 일자 파일은 열지 않습니다.
+        """
+        start, end = parse_time(start), parse_time(end)
+        # 파일 일자는 event_time 문자열의 날짜이므로 시간대 차이를 고려해 앞뒤로 하루씩 여유를 둠
+        first_day = (start - timedelta(days=1)).strftime("%Y%m%d") if start is not None else None
+        last_day = (end + timedelta(days=1)).strftime("%Y%m%d") if end is not None else None
+        for name, paths in self._paths_by_day().items():
+            day = name[len("events-"):-len(".jsonl")]
+            if (first_day is not None and day < first_day) or (last_day is not None and day > last_day):
+                continue
+            if len(paths) == 1:
+                events = self._read_file(paths[0])
+            else:
+                events = heapq.merge(*(self._read_file(path) for path in sorted(paths)),
+                                     key=lambda event: parse_time(event["event_time"]))
+            for event in events:
+                if line_id is not None and event["line_id"] != line_id:
+                    continue
+                if event_types is not None and event["event_type"] not in event_types:
+                    continue
+                if start is not None or end is not None:
+                    event_time = parse_time(event["event_time"])
+                    if (start is not None and event_time < start) or (end is not None and event_time >= end):
+                        continue
+                yield event
+
+    def watermark(self, line_id: str = None) -> str:
+        """
+        저장소가 바뀌었는지 판단하는 값 (추가 기록만 하므로 같으면 변경 없음)
+        - line_id가 주어지면 그 호선 이벤트를 마지막으로 기록한 일자 파일과 끝 위치 (작업자별 하위 디렉터리 포함)
+          다른 호선의 기록은 값을 바꾸지 않습니다.
+        - 없으면 가장 최근 일자 파일들의 이름과 크기
+        """
+        if line_id is not None:
+            paths = [os.path.join(self.events_dir, self.WATERMARKS_FILE)]
+            paths += sorted(glob.glob(os.path.join(self.events_dir, "*", self.WATERMARKS_FILE)))
+            values = [self._read_watermarks(path).get(line_id, "") for path in paths]
+            return "|".join(values) if any(values) else ""
+
+        by_day = self._paths_by_day()
+        if not by_day:
+            return ""
+        day, paths = list(by_day.items())[-1]
+        return f"{day}/{sum(os.path.getsize(path) for path in paths)}"
+
+class EventTableSink:
+    """
+    이벤트를 DB의 train_events 테이블에 저장합니다. (docs/schema.sql 참고)
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def write(self, events: list) -> bool:
+        return self.db.insert_events(events)
+
+    def read(self, line_id: str = None, event_types: tuple = None, start=None, end=None):
+        return iter(self.db.fetch_events(line_id, event_types, start=start, end=end))
+
+    def watermark(self, line_id: str = None):
+        return self.db.fetch_watermark(line_id, source="events")
+
+class EventPipeline:
+    """
+    스냅샷 → 이벤트 변환, 저장, 후속 처리(리스너)를 묶은 실시간 처리 파이프라인 (main.job에서 사용)
+    """
+
+    def __init__(self, extractor: EventExtractor = None, sink=None):
+        self.extractor = extractor or EventExtractor()
+        self.sink = sink or create_event_sink()
+        self.listeners = []  # 이벤트 리스트를 인자로 받는 함수
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def process(self, rows: list) -> list:
+        events = self.extractor.process(rows)
+        if events:
+            self.sink.write(events)
+            for listener in self.listeners:
+                try:
+                    listener(events)
+                except Exception as e:
+                    log.error("Listener {listener} failed: {error}",
+                              listener=getattr(listener, '__name__', repr(listener)), error=str(e))
+        return events
+
+def create_event_sink(db=None):
+    """
+    Config.EVENTS_SINK 설정에 따라 이벤트 저장소를 생성합니다. ('file' 또는 'table')
+    """
+    if Config.EVENTS_SINK == "table":
+        if db is None:
+            from .db_client import SubwayDB
+            db = SubwayDB()
+        return EventTableSink(db)
+    return EventFileSink()
+
+def load_events(line_id: str, event_types: tuple = None, db=None, start=None, end=None) -> list:
+    """
+    설정된 저장소(file/table)에서 특정 호선의 이벤트를 읽어옵니다. (분석기에서 사용)
+    start/end가 주어지면 event_time이 [start, end)인 이벤트만 읽습니다.
+    """
+    return list(create_event_sink(db).read(line_id, event_types, start, end))
+
+def backfill(line_id: str, limit: int = 5000, sink=None, db=None, start=None, end=None) -> int:
+    """
+    과거 스냅샷 행을 시간순으로 재생하여 이벤트를 생성/저장합니다.
+    start/end가 주어지면 구간 전체를 청크 단위로 스트리밍 처리하므로 메모리 사용량이 일정합니다.
+
+    Returns:
+        int: 저장한 이벤트 수
+    """
+    from .db_client import SubwayDB
+
+    db = db or SubwayDB()
+    sink = sink or create_event_sink(db)
+    extractor = EventExtractor()
+
+    if start is None and end is None:
+        rows = db.fetch_train_data(line_id, limit=limit)
+        # fetch_train_data는 최신순이므로 시간순으로 뒤집어서 처리
+        chunks = [sorted(rows, key=lambda row: (row.get("created_at") or "", row.get("id") or 0))]
+    else:
+        chunks = db.iter_train_data(line_id, start, end, output="records")
+
+    total_rows = 0
+    total_events = 0
+    for rows in chunks:
+        events = []
+        for row in rows:
+            events.extend(extractor.process([row], observed_at=parse_time(row.get("created_at"))))
+        sink.write(events)
+        total_rows += len(rows)
+        total_events += len(events)
+
+    log.info("Backfilled {events} events from {rows} rows for line {line_id}.",
+             events=total_events, rows=total_rows, line_id=line_id)
+    return total_events
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill train events from historical position rows")
+    parser.add_argument("line_ids", nargs="+", help="호선 ID (예: 1002)")
+    parser.add_argument("--limit", type=int, default=5000, help="구간 미지정 시 최근 N건")
+    parser.add_argument("--start", default=None, help="구간 시작 (ISO 8601, 예: 2026-10-17T00:00:00+09:00)")
+    parser.add_argument("--end", default=None, help="구간 끝 (ISO 8601)")
+    args = parser.parse_args()
+    for target_line_id in args.line_ids:
+        backfill(target_line_id, args.limit, start=args.start, end=args.end)
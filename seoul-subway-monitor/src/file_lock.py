@@ -0,0 +1,37 @@
+import contextlib
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 잠금 없이 동작 (운영 환경은 POSIX)
+    fcntl = None
+
+@contextlib.contextmanager
+def file_lock(path: str, shared: bool = False, blocking: bool = True):
+    """
+    프로세스 간 파일 잠금 (fcntl.flock). 같은 캐시 디렉터리를 여러 프로세스(분석 프로세스 풀, 분석 서비스)가
+    함께 쓸 때 사용합니다. 잠금 파일은 지우지 않고 재사용합니다.
+
+    Args:
+        path (str): 잠금 파일 경로 (상위 디렉터리는 자동 생성)
+        shared (bool): True면 공유 잠금(여러 프로세스 동시 보유), False면 배타 잠금
+        blocking (bool): False면 바로 얻을 수 없을 때 기다리지 않고 False를 돌려줌
+
+    Yields:
+        bool: 잠금을 얻었는지 여부 (blocking=True면 항상 True)
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is None:
+            yield True
+            return
+        flags = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(f.fileno(), flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
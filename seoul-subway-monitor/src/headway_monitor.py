@@ -0,0 +1,235 @@
+import math
+import threading
+from collections import deque
+from .config import Config
+from .events import EVENT_ARRIVE, EVENT_DEPART, EVENT_ENTER, parse_time
+from .logger import get_logger
+
+log = get_logger("Headway")
+
+# 알림 종류 (analysis_projects.md 기준)
+ALERT_BUNCHING = "bunching"  # 직전 열차와 간격이 너무 짧음 (열차 몰림)
+ALERT_GAP = "gap"            # 간격이 너무 김 (배차 공백)
+
+# 역 방문의 첫 관측 이벤트를 도착 시각으로 사용 (30초 폴링에서는 도착 상태가 자주 누락되므로 진입/출발도 포함)
+VISIT_EVENTS = (EVENT_ENTER, EVENT_ARRIVE, EVENT_DEPART)
+# 역·방향별로 기억하는 최근 방문 수 (같은 방문의 진입/도착/출발 중복 제거용)
+RECENT_VISITS = 16
+
+class RollingStats:
+    """
+    최근 N개 값의 평균/분산 (Welford 방식 추가/제거, 값 하나당 O(1))
+    """
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value: float):
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        self.count -= 1
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (value - self.mean)
+
+    @property
+    def std(self) -> float:
+        # 표본 표준편차 (부동소수 오차로 음수가 되지 않도록 보정)
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(max(self.m2 / (self.count - 1), 0.0))
+
+class StationHeadway:
+    """
+    역·방향 하나의 최근 도착 시각 링 버퍼와 배차 간격 통계
+    """
+    __slots__ = ("station_name", "arrivals", "stats", "gap_alerted", "recent_visits")
+
+    def __init__(self, station_name, window: int):
+        self.station_name = station_name
+        # 간격 window개를 계산하려면 도착 시각 window+1개가 필요
+        self.arrivals = deque(maxlen=window + 1)
+        self.stats = RollingStats()
+        self.gap_alerted = False  # 현재 열린 공백에 대해 이미 알림을 보냈는지
+        self.recent_visits = deque(maxlen=RECENT_VISITS)
+
+    def first_visit(self, visit_id) -> bool:
+        """
+        이 방문(visit_id)의 첫 관측이면 True를 반환하고 기록합니다. (visit_id가 없으면 항상 True)
+        """
+        if visit_id is None:
+            return True
+        if visit_id in self.recent_visits:
+            return False
+        self.recent_visits.append(visit_id)
+        return True
+
+    def add_arrival(self, arrived_at, reset_seconds: float):
+        """
+        도착 시각을 추가하고 직전 도착과의 간격(초)을 반환합니다. (첫 도착, 운행 중단 후 재개 시 None)
+        """
+        if self.arrivals:
+            headway = (arrived_at - self.arrivals[-1]).total_seconds()
+            if headway <= 0:
+                # 순서가 뒤바뀐/중복 도착은 무시
+                return None
+            if headway > reset_seconds:
+                # 심야 운행 종료 등 긴 중단: 통계를 새로 시작
+                self.arrivals.clear()
+                self.stats = RollingStats()
+                self.arrivals.append(arrived_at)
+                return None
+            if len(self.arrivals) == self.arrivals.maxlen:
+                # 가장 오래된 간격을 통계에서 제거 (링 버퍼에서 밀려나는 도착 시각)
+                self.stats.remove((self.arrivals[1] - self.arrivals[0]).total_seconds())
+            self.arrivals.append(arrived_at)
+            self.stats.add(headway)
+            return headway
+        self.arrivals.append(arrived_at)
+        return None
+
+class HeadwayMonitor:
+    """
+    이벤트 스트림으로 역·방향별 배차 간격을 실시간 추적하고 몰림/공백 알림을 발생시킵니다.
+    열차의 도착 시각은 역 방문(visit_id)의 첫 관측(진입/도착/출발 중 먼저 보인 이벤트) 시각입니다.
+    EventPipeline 리스너로 등록하면 main.job의 매 tick마다 호출되므로, 도착 후 한 번의 수집 주기 안에 알림이 나갑니다.
+    역·방향마다 최근 N개 간격만 유지하므로 메모리 사용량은 운행 시간과 무관하게 일정합니다.
+    """
+
+    def __init__(self, window: int = None, bunching_seconds: float = None, gap_seconds: float = None,
+                 reset_seconds: float = None, min_samples: int = None):
+        self.window = window or Config.HEADWAY_WINDOW
+        self.bunching_seconds = bunching_seconds or Config.HEADWAY_BUNCHING_SECONDS
+        self.gap_seconds = gap_seconds or Config.HEADWAY_GAP_SECONDS
+        self.reset_seconds = reset_seconds or Config.HEADWAY_RESET_SECONDS
+        # 진행 중인 공백 알림은 평소 간격이 공백 기준보다 짧은 역에서만 (배차가 원래 드문 시간대 제외)
+        self.min_samples = min_samples or Config.HEADWAY_MIN_SAMPLES
+        self._stations = {}  # (line_id, station_id, direction_type) -> StationHeadway
+        self._listeners = []  # 알림 리스트를 인자로 받는 함수
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def __call__(self, events: list) -> list:
+        """
+        EventPipeline 리스너: 역 방문 이벤트를 반영하고 발생한 알림 리스트를 반환합니다.
+        """
+        alerts = []
+        latest = None
+        with self._lock:
+            for event in events:
+                event_type = event.get("event_type")
+                # visit_id가 없는 이벤트(이전 형식)는 도착만 사용
+                if event_type not in VISIT_EVENTS or (event.get("visit_id") is None and event_type != EVENT_ARRIVE):
+                    continue
+                arrived_at = parse_time(event.get("event_time"))
+                if arrived_at is None or event.get("direction_type") is None:
+                    continue
+                latest = arrived_at if latest is None else max(latest, arrived_at)
+                alert = self._observe(event, arrived_at)
+                if alert is not None:
+                    alerts.append(alert)
+            if latest is not None:
+                alerts.extend(self._check_open_gaps(latest))
+
+        for alert in alerts:
+            self._report(alert)
+        return alerts
+
+    def _observe(self, event, arrived_at):
+        key = (event["line_id"], event.get("station_id"), event["direction_type"])
+        station = self._stations.get(key)
+        if station is None:
+            station = self._stations[key] = StationHeadway(event.get("station_name"), self.window)
+        if not station.first_visit(event.get("visit_id")):
+            return None  # 같은 방문의 이후 이벤트
+
+        headway = station.add_arrival(arrived_at, self.reset_seconds)
+        already_alerted = station.gap_alerted
+        station.gap_alerted = False
+        if headway is None:
+            return None
+        if headway < self.bunching_seconds:
+            return self._alert(ALERT_BUNCHING, key, station, headway, arrived_at, event.get("train_number"))
+        if headway > self.gap_seconds and not already_alerted:
+            return self._alert(ALERT_GAP, key, station, headway, arrived_at, event.get("train_number"))
+        return None
+
+    def _check_open_gaps(self, now):
+        """
+        아직 다음 열차가 도착하지 않았지만 공백 기준을 넘긴 역을 찾습니다. (역 수에 비례, tick당 1회)
+        """
+        alerts = []
+        for key, station in self._stations.items():
+            if station.gap_alerted or not station.arrivals or station.stats.count < self.min_samples:
+                continue
+            if station.stats.mean >= self.gap_seconds:
+                continue
+            waiting = (now - station.arrivals[-1]).total_seconds()
+            if self.gap_seconds < waiting <= self.reset_seconds:
+                station.gap_alerted = True
+                alerts.append(self._alert(ALERT_GAP, key, station, waiting, now, None))
+        return alerts
+
+    @staticmethod
+    def _alert(alert_type, key, station, headway, detected_at, train_number):
+        line_id, station_id, direction_type = key
+        return {
+            "alert_type": alert_type,
+            "line_id": line_id,
+            "station_id": station_id,
+            "station_name": station.station_name,
+            "direction_type": direction_type,
+            "train_number": train_number,  # 진행 중인 공백이면 None
+            "headway_seconds": round(headway, 1),
+            "mean_seconds": round(station.stats.mean, 1),
+            "std_seconds": round(station.stats.std, 1),
+            "samples": station.stats.count,
+            "detected_at": detected_at.isoformat(),
+        }
+
+    def _report(self, alert):
+        direction = "Up/Inner" if alert["direction_type"] == 0 else "Down/Outer"
+        log.warning("{kind} {line_id} {station_name} ({direction}): {headway_min:.1f} min "
+                    "(avg {mean_min:.1f} +/- {std_min:.1f} min, n={samples})",
+                    kind=alert['alert_type'].upper(), direction=direction, headway_min=alert['headway_seconds'] / 60,
+                    mean_min=alert['mean_seconds'] / 60, std_min=alert['std_seconds'] / 60, **alert)
+        for listener in self._listeners:
+            try:
+                listener(alert)
+            except Exception as e:
+                log.error("Listener {listener} failed: {error}", listener=getattr(listener, '__name__', repr(listener)),
+                          error=str(e))
+
+    def snapshot(self, line_id: str = None) -> list:
+        """
+        현재 역·방향별 배차 간격 통계를 반환합니다. (IntervalAnalyzer 결과와 같은 형식)
+        """
+        with self._lock:
+            return [
+                {
+                    "line_id": key[0],
+                    "station_id": key[1],
+                    "station_name": station.station_name,
+                    "direction_type": key[2],
+                    "mean": station.stats.mean,
+                    "std": station.stats.std,
+                    "count": station.stats.count,
+                }
+                for key, station in self._stations.items()
+                if station.stats.count and (line_id is None or key[0] == line_id)
+            ]
+
+    def tracked_stations(self) -> int:
+        return len(self._stations)
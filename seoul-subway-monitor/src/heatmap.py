@@ -0,0 +1,150 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from .config import Config
+from .events import KST, parse_time
+
+class SegmentHeatmap:
+    """
+    실시간 혼잡/병목 히트맵: 최근 window 동안 구간(이전 역 → 현재 역)별로 관측된 고유 열차 수
+    (analysis_projects.md 3. Real-time Congestion/Bottleneck Heatmap)
+
+    - 구간은 열차가 마지막으로 보고한 역과 그 직전에 보고한 역으로 정합니다. (처음 본 열차는 '? → 현재 역')
+    - 구간을 옮긴(또는 사라진) 열차만 갱신하고, 떠난 열차는 window가 지나면 만료 힙에서 제거하므로
+      tick당 비용은 변경된 열차 수에 비례합니다. (window 내 전체 관측을 다시 세지 않음)
+    """
+
+    def __init__(self, window_seconds: float = None):
+        self.window = timedelta(seconds=window_seconds or Config.HEATMAP_WINDOW_SECONDS)
+        self._positions = {}   # (line_id, train_number) -> (이전 역 ID, 현재 역 ID)
+        self._line_trains = {}  # line_id -> 현재 스냅샷에 있는 열차 번호 set
+        self._segments = {}    # line_id -> {(from_station_id, to_station_id): {train_number: 만료 시각 또는 None(현재 위치)}}
+        self._station_names = {}  # station_id -> station_name
+        self._expiry = []      # (만료 시각, 순번, line_id, segment, train_number) 최소 힙
+        self._counter = itertools.count()
+        self._updated_at = None
+        self._lock = threading.Lock()
+
+    def update(self, rows: list, observed_at: datetime = None) -> int:
+        """
+        한 tick의 스냅샷 행들을 반영합니다. 행이 있는 호선만 갱신하며, 해당 호선에서 사라진 열차는 구간을 떠난 것으로 처리합니다.
+
+        Returns:
+            int: 구간이 바뀐(새로 나타나거나 사라진 열차 포함) 열차 수
+        """
+        now = parse_time(observed_at) or datetime.now(KST)
+        rows_by_line = {}
+        for row in rows:
+            rows_by_line.setdefault(row.get("line_id"), []).append(row)
+
+        changed = 0
+        with self._lock:
+            for line_id, line_rows in rows_by_line.items():
+                segments = self._segments.setdefault(line_id, {})
+                seen = set()
+                for row in line_rows:
+                    train_number = row.get("train_number")
+                    station_id = row.get("station_id")
+                    seen.add(train_number)
+                    if station_id not in self._station_names:
+                        self._station_names[station_id] = row.get("station_name")
+
+                    key = (line_id, train_number)
+                    position = self._positions.get(key)
+                    if position is not None and position[1] == station_id:
+                        continue  # 같은 구간: 변경 없음
+
+                    if position is not None:
+                        self._leave(line_id, segments, position, train_number, now)
+                    segment = (position[1] if position is not None else None, station_id)
+                    self._positions[key] = segment
+                    segments.setdefault(segment, {})[train_number] = None
+                    changed += 1
+
+                # 이번 스냅샷에서 사라진 열차 (운행 종료 등)
+                for train_number in self._line_trains.get(line_id, set()) - seen:
+                    position = self._positions.pop((line_id, train_number), None)
+                    if position is not None:
+                        self._leave(line_id, segments, position, train_number, now)
+                        changed += 1
+                self._line_trains[line_id] = seen
+
+            self._expire(now)
+            self._updated_at = now
+        return changed
+
+    def _leave(self, line_id, segments, segment, train_number, now):
+        # 구간을 떠난 열차는 window 동안 계속 집계
+        until = now + self.window
+        trains = segments.setdefault(segment, {})
+        trains[train_number] = until
+        heapq.heappush(self._expiry, (until, next(self._counter), line_id, segment, train_number))
+
+    def _expire(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            until, _, line_id, segment, train_number = heapq.heappop(self._expiry)
+            trains = self._segments.get(line_id, {}).get(segment)
+            # 그 사이 구간에 다시 들어왔으면(None 또는 더 늦은 만료) 유지
+            if trains is None or trains.get(train_number) != until:
+                continue
+            del trains[train_number]
+            if not trains:
+                del self._segments[line_id][segment]
+
+    def snapshot(self, line_id: str = None) -> dict:
+        """
+        호선별 구간 밀도 행렬(희소 형식)을 반환합니다. 구간은 열차 수 내림차순입니다.
+        """
+        with self._lock:
+            lines = {}
+            for current_line, segments in self._segments.items():
+                if line_id is not None and current_line != line_id:
+                    continue
+                cells = []
+                for (from_station_id, to_station_id), trains in segments.items():
+                    cells.append({
+                        "from_station_id": from_station_id,
+                        "from_station_name": self._station_names.get(from_station_id),
+                        "to_station_id": to_station_id,
+                        "to_station_name": self._station_names.get(to_station_id),
+                        "trains": len(trains),
+                        "present": sum(1 for until in trains.values() if until is None),
+                    })
+                cells.sort(key=lambda cell: cell["trains"], reverse=True)
+                lines[current_line] = {
+                    "active_trains": len(self._line_trains.get(current_line, ())),
+                    "max_density": cells[0]["trains"] if cells else 0,
+                    "segments": cells,
+                }
+            return {
+                "generated_at": self._updated_at.isoformat() if self._updated_at else None,
+                "window_seconds": self.window.total_seconds(),
+                "lines": lines,
+            }
+
+    def write_snapshot(self, path: str = None):
+        """
+        현재 히트맵을 JSON 파일로 저장합니다. (임시 파일에 쓴 뒤 교체하므로 읽는 쪽에서 반쯤 쓰인 파일을 보지 않음)
+        """
+        path = path or Config.HEATMAP_SNAPSHOT_PATH
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def handle_request(self, params: list, query: dict) -> dict:
+        """
+        StatusServer 핸들러: /heatmap (전체), /heatmap/<line_id> (호선별)
+        """
+        if params:
+            snapshot = self.snapshot(params[0])
+            if params[0] not in snapshot["lines"]:
+                raise KeyError(params[0])
+            return snapshot
+        return self.snapshot()
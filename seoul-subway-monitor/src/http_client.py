@@ -0,0 +1,162 @@
+import random
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from .config import Config
+from .logger import get_logger
+from .metrics import API_RESPONSE_BYTES, API_RETRIES
+
+log = get_logger("API")
+
+# 재시도할 HTTP 상태 코드 (요청 과다 및 서버 측 일시 오류)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class PooledHttpClient:
+    """
+    서울시 Open API 호출용 공용 HTTP 클라이언트
+    - requests.Session 기반 keep-alive 커넥션 풀링
+    - 연결/읽기 타임아웃 분리
+    - 일시적인 오류에 한해 지터(jitter)가 포함된 지수 백오프로 제한 횟수만큼 재시도
+    - list_total_count 기준 자동 페이지 조회
+    """
+
+    def __init__(self, base_url: str = None, api_key: str = None, pool_size: int = None,
+                 connect_timeout: float = None, read_timeout: float = None,
+                 max_retries: int = None, backoff_base: float = None, backoff_max: float = None,
+                 page_size: int = None):
+        self.base_url = (base_url or Config.SEOUL_API_BASE_URL).rstrip("/")
+        self.api_key = api_key or Config.SEOUL_API_KEY
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else Config.API_CONNECT_TIMEOUT,
+            read_timeout if read_timeout is not None else Config.API_READ_TIMEOUT,
+        )
+        self.max_retries = max_retries if max_retries is not None else Config.API_MAX_RETRIES
+        self.backoff_base = backoff_base if backoff_base is not None else Config.API_BACKOFF_BASE
+        self.backoff_max = backoff_max if backoff_max is not None else Config.API_BACKOFF_MAX
+        self.page_size = page_size or Config.API_PAGE_SIZE
+
+        # 병렬 수집 스레드 수만큼 커넥션을 유지하도록 풀 크기 설정
+        pool_size = pool_size or Config.COLLECT_MAX_WORKERS
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        """
+        세션과 커넥션 풀을 정리합니다.
+        """
+        self.session.close()
+
+    def _backoff_seconds(self, attempt: int) -> float:
+        """
+        attempt번째 재시도 전 대기 시간 (full jitter 방식)
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get_json(self, url: str):
+        """
+        URL을 GET 요청하여 JSON을 반환합니다.
+        연결 오류, 타임아웃, 429/5xx 응답일 때만 재시도하고 그 외 오류는 즉시 예외를 발생시킵니다.
+
+        Raises:
+            requests.exceptions.RequestException: 재시도 후에도 실패한 경우
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                    raise _RetryableStatus(response.status_code)
+                response.raise_for_status() # HTTP 오류 발생 시 예외 발생
+                API_RESPONSE_BYTES.observe(len(response.content), _service(url))
+                return response.json()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, _RetryableStatus) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_seconds(attempt)
+                attempt += 1
+                reason = f"http_{e.status_code}" if isinstance(e, _RetryableStatus) else type(e).__name__
+                API_RETRIES.inc(_service(url), reason)
+                log.warning("Retry {attempt}/{max_retries} in {delay:.2f}s: {error}", attempt=attempt,
+                            max_retries=self.max_retries, delay=delay, reason=reason, error=str(e))
+                time.sleep(delay)
+
+    def build_url(self, service: str, start_index: int, end_index: int, *params: str) -> str:
+        """
+        서울시 API URL 구성 (인증키/json/서비스명/시작위치/종료위치/추가 파라미터)
+        """
+        path = "/".join(params)
+        return f"{self.base_url}/{self.api_key}/json/{service}/{start_index}/{end_index}/{path}"
+
+    def fetch_all(self, service: str, list_keys: tuple, *params: str):
+        """
+        응답의 전체 건수(list_total_count)를 확인하며 모든 페이지를 조회합니다.
+
+        Args:
+            service (str): 서비스명 (예: 'realtimePosition')
+            list_keys (tuple): 결과 리스트가 담긴 응답 키 후보
+            *params (str): URL 인코딩된 추가 파라미터 (예: 호선명)
+
+        Returns:
+            tuple: (전체 행 리스트 또는 None(결과 키 없음), 마지막 원본 응답)
+        """
+        rows = []
+        start_index, end_index = 0, self.page_size
+        total = None
+        data = None
+
+        # 무한 루프 방지를 위한 최대 페이지 수
+        for _ in range(Config.API_MAX_PAGES):
+            data = self.get_json(self.build_url(service, start_index, end_index, *params))
+
+            page = None
+            for key in list_keys:
+                if key in data:
+                    page = data[key]
+                    break
+            if page is None:
+                # 첫 페이지에 결과가 없으면 None, 이후 페이지라면 지금까지의 결과 반환
+                return (rows if rows else None), data
+
+            rows.extend(page)
+            if total is None:
+                total = extract_total_count(data, page)
+
+            if not page or total is None or len(rows) >= total:
+                break
+
+            start_index, end_index = end_index + 1, end_index + self.page_size
+
+        return rows, data
+
+def _service(url: str) -> str:
+    # .../{인증키}/json/{서비스명}/... 에서 서비스명 (지표 레이블용)
+    parts = url.split("/json/", 1)
+    return parts[1].split("/", 1)[0] if len(parts) == 2 else "unknown"
+
+class _RetryableStatus(Exception):
+    """
+    재시도 대상 HTTP 상태 코드를 표시하기 위한 내부 예외
+    """
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+def extract_total_count(data: dict, page: list):
+    """
+    응답에서 전체 건수를 찾습니다.
+    서비스에 따라 list_total_count, errorMessage.total, 각 행의 totalCount 중 하나로 내려옵니다.
+    """
+    if isinstance(data.get("list_total_count"), (int, str)):
+        return int(data["list_total_count"])
+
+    error_message = data.get("errorMessage")
+    if isinstance(error_message, dict) and error_message.get("total") is not None:
+        return int(error_message["total"])
+
+    if page and isinstance(page[0], dict) and page[0].get("totalCount") is not None:
+        return int(page[0]["totalCount"])
+
+    return None
@@ -0,0 +1,110 @@
+import json
+import logging
+import sys
+import threading
+from datetime import datetime
+from .config import Config
+
+ROOT_LOGGER = "subway"
+LEVEL_SUFFIX = {logging.WARNING: "Warning", logging.ERROR: "Error", logging.CRITICAL: "Critical"}
+
+class _TextFormatter(logging.Formatter):
+    """
+    기존 출력과 같은 '[구성요소 수준] 메시지' 형식 (INFO는 '[구성요소] 메시지')
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        suffix = LEVEL_SUFFIX.get(record.levelno)
+        tag = f"{record.component} {suffix}" if suffix else record.component
+        return f"[{tag}] {_message(record)}"
+
+class _JsonFormatter(logging.Formatter):
+    """
+    한 줄에 JSON 객체 하나 (ts, level, component, msg + 필드). 로그 수집기에서 필드별로 조회할 수 있습니다.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "component": record.component,
+            "msg": _message(record),
+        }
+        entry.update(record.fields)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def _message(record: logging.LogRecord) -> str:
+    # 메시지 템플릿은 출력할 때만 채움 (수준 미달로 버려지는 로그는 포맷 비용 없음)
+    if not record.fields:
+        return str(record.msg)
+    try:
+        return str(record.msg).format(**record.fields)
+    except (KeyError, IndexError, ValueError):
+        return str(record.msg)
+
+_configure_lock = threading.Lock()
+
+def configure(log_format: str = None, level: str = None, stream=None):
+    """
+    수집기 로거의 출력 형식('text' 또는 'json')과 수준을 설정합니다. 여러 번 호출하면 마지막 설정을 사용합니다.
+    """
+    log_format = log_format or Config.LOG_FORMAT
+    logger = logging.getLogger(ROOT_LOGGER)
+    with _configure_lock:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(_JsonFormatter() if log_format == "json" else _TextFormatter())
+        logger.addHandler(handler)
+        logger.setLevel((level or Config.LOG_LEVEL).upper())
+        # 애플리케이션의 루트 로거 설정과 섞이지 않도록 전파하지 않음
+        logger.propagate = False
+    return logger
+
+class StructuredLogger:
+    """
+    구성요소별 구조화 로거
+    메시지는 str.format 템플릿이고 키워드 인자는 JSON 출력에서 필드로 남습니다.
+
+    예:
+        log = get_logger("DB")
+        log.info("Successfully inserted {rows} records.", rows=len(rows))
+        → text: [DB] Successfully inserted 120 records.
+        → json: {"ts": ..., "level": "info", "component": "DB", "msg": "...", "rows": 120}
+    """
+    __slots__ = ("component", "_logger")
+
+    def __init__(self, component: str):
+        self.component = component
+        self._logger = logging.getLogger(f"{ROOT_LOGGER}.{component.lower().replace(' ', '_')}")
+
+    def _log(self, level: int, msg: str, fields: dict):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, msg, extra={"component": self.component, "fields": fields})
+
+    def debug(self, msg: str, **fields):
+        self._log(logging.DEBUG, msg, fields)
+
+    def info(self, msg: str, **fields):
+        self._log(logging.INFO, msg, fields)
+
+    def warning(self, msg: str, **fields):
+        self._log(logging.WARNING, msg, fields)
+
+    def error(self, msg: str, **fields):
+        self._log(logging.ERROR, msg, fields)
+
+    def critical(self, msg: str, **fields):
+        self._log(logging.CRITICAL, msg, fields)
+
+def get_logger(component: str) -> StructuredLogger:
+    """
+    구성요소 로거를 반환합니다. 아직 설정되지 않았으면 Config 기준으로 한 번 설정합니다.
+    (분석 CLI 등 main()을 거치지 않는 실행에서도 INFO 로그가 보이도록)
+    """
+    if not logging.getLogger(ROOT_LOGGER).handlers:
+        with _configure_lock:
+            needs_setup = not logging.getLogger(ROOT_LOGGER).handlers
+        if needs_setup:
+            configure()
+    return StructuredLogger(component)
@@ -1,58 +1,328 @@
 import schedule
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from .config import Config
 from .api_client import SeoulMetroAPI
+from .capture import CaptureArchive
 from .db_client import SubwayDB
+from .events import EventPipeline, create_event_sink
+from .headway_monitor import HeadwayMonitor
+from .baselines import BaselineMonitor
+from .heatmap import SegmentHeatmap
+from .logger import configure as configure_logging, get_logger
+from .metrics import REGISTRY, TICK_INTERVAL, TICK_LAST, TICK_MISSED, TICK_ROWS, TICK_SCHEDULE, TICK_SECONDS
+from .scheduler import PollScheduler
+from .sharding import LeaseCoordinator
+from .status_server import StatusServer
+from .trajectory import TrajectoryStore
 
-def job():
+log = get_logger("System")
+events_log = get_logger("Events")
+heatmap_log = get_logger("Heatmap")
+trajectory_log = get_logger("Trajectory")
+cdc_log = get_logger("CDC")
+# 직전 tick 시작 시각 (tick 간격 지표용, 재생 시에는 보관된 tick 시각)
+_last_tick_start = None
+
+def collect_line(line_name, api_client, db_client):
+    """
+    한 호선의 데이터를 수집하여 적재할 형식으로 변환합니다.
+    (적재는 tick 단위로 모아서 job()에서 한 번에 수행)
+
+    Args:
+        line_name (str): 수집할 호선명
+        api_client (SeoulMetroAPI): API 클라이언트
+        db_client (SubwayDB): DB 클라이언트 (행 변환에 사용)
+
+    Returns:
+        list: 변환된 행 리스트 (데이터가 없거나 API 오류 시 빈 리스트)
+    """
+    data = api_client.get_realtime_position(line_name)
+    if not data:
+        return []
+    return db_client.transform_positions(data)
+
+def collect_sequential(api_client, db_client, lines=None):
+    """
+    기존 방식: 호선을 하나씩 순서대로 수집합니다.
+
+    Args:
+        lines (list): 수집할 호선 (None이면 Config.TARGET_LINES 전체)
+
+    Returns:
+        tuple: (호선별 변환 행 dict, 마감을 놓친 호선 리스트)
+    """
+    rows_by_line = {}
+    for line_name in lines or Config.TARGET_LINES:
+        rows_by_line[line_name] = collect_line(line_name, api_client, db_client)
+    return rows_by_line, []
+
+def collect_concurrent(api_client, db_client, deadline=None, lines=None):
+    """
+    전 호선을 스레드 풀에서 병렬로 수집합니다.
+    마감 시간(deadline) 안에 끝나지 않은 호선은 이번 tick에서 제외(skip)합니다.
+
+    Args:
+        deadline (float): tick 마감 시간(초). None이면 Config.TICK_DEADLINE_SECONDS 사용
+        lines (list): 수집할 호선 (None이면 Config.TARGET_LINES 전체)
+
+    Returns:
+        tuple: (호선별 변환 행 dict, 마감을 놓친 호선 리스트)
+    """
+    if deadline is None:
+        deadline = Config.TICK_DEADLINE_SECONDS
+    lines = lines or Config.TARGET_LINES
+
+    executor = ThreadPoolExecutor(
+        max_workers=min(Config.COLLECT_MAX_WORKERS, len(lines)) or 1,
+        thread_name_prefix="collector",
+    )
+    futures = {
+        executor.submit(collect_line, line_name, api_client, db_client): line_name
+        for line_name in lines
+    }
+
+    done, not_done = wait(futures, timeout=deadline)
+
+    # 마감: 아직 시작하지 않은 작업은 취소하고, 실행 중인 작업은 기다리지 않음
+    # (마감 이후 도착한 응답은 결과에 포함되지 않으므로 다음 tick과 섞이지 않음)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    rows_by_line = {}
+    for future in done:
+        line_name = futures[future]
+        try:
+            rows_by_line[line_name] = future.result()
+        except Exception as e:
+            log.error("Unexpected error while collecting {line}: {error}", line=line_name, error=str(e))
+            rows_by_line[line_name] = []
+
+    # 설정 순서대로 정렬하여 기록
+    missed_lines = {futures[future] for future in not_done}
+    missed = [line_name for line_name in lines if line_name in missed_lines]
+    return rows_by_line, missed
+
+def job(api_client=None, db_client=None, event_pipeline=None, heatmap=None, observed_at=None, lines=None,
+        trajectories=None, coordinator=None):
     """
     주기적으로 실행될 작업:
     1. 각 호선별 API 데이터 수집
-    2. DB 적재
+    2. 이벤트 추출 (event_pipeline이 주어진 경우)
+    3. 구간 밀도 히트맵, 열차 궤적 갱신 (heatmap, trajectories가 주어진 경우)
+    4. 전 호선 데이터를 한 번에 DB 적재 (COPY 모드에서는 하나의 트랜잭션)
+
+    observed_at이 주어지면(보관 응답 재생) 행의 created_at과 히트맵 시각으로 사용합니다.
+    lines가 주어지면 해당 호선만 수집합니다. (스케줄러가 이번 경계에 수집할 호선)
+    coordinator가 주어지면(분산 수집) 적재 직전에 임대가 유지된 호선의 행만 적재합니다.
+
+    Returns:
+        dict: tick 실행 결과 (시작 시각, 소요 시간, 호선별 결과와 변환 행, 마감을 놓친 호선)
     """
-    print(f"[System] Starting data collection job at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    global _last_tick_start
+    started_at = time.strftime('%Y-%m-%d %H:%M:%S')
+    log.info("Starting data collection job at {started_at}", started_at=started_at)
     
-    api_client = SeoulMetroAPI()
-    db_client = SubwayDB()
+    # 클라이언트가 주어지지 않으면 새로 생성 (단독 실행 호환)
+    api_client = api_client or SeoulMetroAPI()
+    db_client = db_client or SubwayDB()
+
+    tick_start = time.monotonic()
+    # tick 간격 (경계 대비 시작 지연은 스케줄러에서 기록)
+    tick_at = observed_at.timestamp() if observed_at is not None else time.time()
+    if _last_tick_start is not None:
+        TICK_INTERVAL.observe(tick_at - _last_tick_start)
+    _last_tick_start = tick_at
+    # 원본 응답 보관 중이면 이번 tick 시각 기록
+    capture = getattr(api_client, "capture", None)
+    if capture is not None:
+        capture.begin_tick(observed_at)
+
+    # 1. 데이터 수집
+    if Config.COLLECT_MODE == "concurrent":
+        rows_by_line, missed = collect_concurrent(api_client, db_client, lines=lines)
+    else:
+        rows_by_line, missed = collect_sequential(api_client, db_client, lines=lines)
+
+    tick_rows = [row for rows in rows_by_line.values() for row in rows]
+    if observed_at is not None:
+        created_at = observed_at.isoformat()
+        for row in tick_rows:
+            row["created_at"] = created_at
+
+    # 2. 이벤트 추출 (CDC 필터 전의 전체 스냅샷 기준)
+    if event_pipeline is not None and tick_rows:
+        try:
+            events = event_pipeline.process(tick_rows)
+            events_log.info("{events} new events ({trains} trains tracked)",
+                            events=len(events), trains=event_pipeline.extractor.tracked_trains())
+        except Exception as e:
+            events_log.error("Failed to extract events: {error}", error=str(e))
+
+    # 3. 히트맵 갱신 (변경된 열차만 반영)
+    if heatmap is not None and tick_rows:
+        try:
+            heatmap.update(tick_rows, observed_at)
+            if Config.HEATMAP_SNAPSHOT_PATH:
+                heatmap.write_snapshot()
+        except Exception as e:
+            heatmap_log.error("Failed to update heatmap: {error}", error=str(e))
+    if trajectories is not None and tick_rows:
+        try:
+            trajectories.update(tick_rows, observed_at)
+        except Exception as e:
+            trajectory_log.error("Failed to update trajectories: {error}", error=str(e))
 
+    # 4. 데이터 적재
+    # 분산 수집 중 임대를 잃은 호선은 새 소유자가 이미 수집하고 있으므로 적재하지 않음 (중복 방지)
+    lost = [line_name for line_name in rows_by_line if coordinator is not None and not coordinator.holds(line_name)]
+    if lost:
+        log.warning("Lease lost during tick; dropping rows for {lines}", lines=", ".join(lost), lost=lost)
+        tick_rows = [row for line_name, rows in rows_by_line.items() if line_name not in lost for row in rows]
+    inserted = db_client.insert_rows(tick_rows) if tick_rows else False
+    elapsed = time.monotonic() - tick_start
+    TICK_SECONDS.observe(elapsed)
+    TICK_ROWS.set(len(tick_rows))
+    TICK_LAST.set(time.time())
+
+    results = {}
     for line_name in Config.TARGET_LINES:
-        # 1. 데이터 수집
-        data = api_client.get_realtime_position(line_name)
-        
-        if data:
-            # 2. 데이터 적재
-            success = db_client.insert_positions(data)
-            if success:
-                print(f" -> {line_name}: Success")
-            else:
-                print(f" -> {line_name}: Failed to insert DB")
+        if line_name not in rows_by_line:
+            continue
+        if not rows_by_line[line_name]:
+            results[line_name] = "no_data"
+        elif line_name in lost:
+            results[line_name] = "lease_lost"
+        elif inserted:
+            results[line_name] = "success"
         else:
-            print(f" -> {line_name}: No data or API Error")
+            results[line_name] = "db_failed"
+    # 호선별 결과는 한 줄로 요약 (json 형식에서는 results 필드)
+    failed = [f"{line_name}={result}" for line_name, result in results.items() if result != "success"]
+    log.info("Lines: {succeeded}/{total} succeeded{failed}",
+             succeeded=len(results) - len(failed), total=len(results),
+             failed=f" ({', '.join(failed)})" if failed else "", results=results)
+
+    if missed:
+        for line_name in missed:
+            TICK_MISSED.inc(line_name)
+        log.warning("{count} line(s) missed the tick deadline: {lines}", count=len(missed),
+                    lines=", ".join(missed), missed=missed)
+
+    if db_client.change_tracker is not None:
+        cdc = db_client.change_tracker.stats()
+        cdc_log.info("written={rows_written} suppressed={rows_suppressed} "
+                     "({suppression_ratio:.0%} suppressed, {tracked_trains} trains tracked)", **cdc)
+
+    log.info("Job finished in {elapsed:.2f}s.", elapsed=elapsed, rows=len(tick_rows))
+
+    if Config.METRICS_TEXTFILE_PATH:
+        try:
+            REGISTRY.write_textfile()
+        except OSError as e:
+            log.warning("Failed to write metrics file: {error}", error=str(e))
 
-    print("[System] Job finished.\n")
+    return {
+        "started_at": started_at,
+        "elapsed_seconds": elapsed,
+        "results": results,
+        "rows_by_line": rows_by_line,
+        "missed_lines": missed,
+    }
 
 def main():
-    print("=== Seoul Subway Monitoring System Started ===")
+    configure_logging()
+    log.info("=== Seoul Subway Monitoring System Started ===")
     
     # 설정 검증
     try:
         Config.validate_config()
     except ValueError as e:
-        print(f"[Critical Error] Configuration failed: {e}")
+        log.critical("Configuration failed: {error}", error=str(e))
         return
+    # 분산 수집: 스풀/스케줄러 상태/기준선/보관 파일 등 로컬 경로를 작업자별로 분리 (같은 호스트의 작업자끼리 겹치지 않도록)
+    Config.scope_worker_paths()
+
+    # 클라이언트는 한 번만 생성하여 매 tick 재사용
+    api_client = SeoulMetroAPI(capture=CaptureArchive() if Config.CAPTURE_ENABLED else None)
+    db_client = SubwayDB()
+    if Config.SPOOL_ENABLED:
+        db_client.enable_spool()
+    event_pipeline = EventPipeline(sink=create_event_sink(db_client)) if Config.EVENTS_ENABLED else None
+    # 실시간 배차 간격 모니터: 매 tick 도착 이벤트로 몰림/공백 알림
+    if event_pipeline is not None and Config.HEADWAY_MONITOR_ENABLED:
+        event_pipeline.add_listener(HeadwayMonitor())
+    # 요일별 시간대 기준선: 체류/배차 간격/회차 시간을 증분 반영하고 평시보다 느린 값 알림
+    baseline_monitor = None
+    if event_pipeline is not None and Config.BASELINES_ENABLED:
+        baseline_monitor = BaselineMonitor()
+        event_pipeline.add_listener(baseline_monitor)
+    heatmap = SegmentHeatmap() if Config.HEATMAP_ENABLED else None
+    trajectories = TrajectoryStore() if Config.TRAJECTORY_ENABLED else None
+
+    # 벽시계 경계에 맞춘 호선별 수집 스케줄러 (변화율/운행 시간/하루 할당량 기준)
+    scheduler = PollScheduler()
+    TICK_SCHEDULE.set(scheduler.tick_seconds)
+
+    # 분산 수집: 임대를 가진 호선만 수집 (작업자가 늘거나 죽으면 호선 재배분)
+    coordinator = None
+    if Config.SHARDING_ENABLED:
+        coordinator = LeaseCoordinator()
+        coordinator.ensure_schema()
+        scheduler.assign([])
+        coordinator.add_listener(lambda acquired, released: scheduler.assign(coordinator.owned_lines()))
+        coordinator.start()
 
-    # 초기 1회 실행
-    job()
+    # 로컬 상태 서버: /heatmap, /heatmap/<line_id>, /trains[/<line_id>[/<train_number>|/window]], /metrics (Prometheus), /scheduler, /shard
+    status_server = None
+    if Config.STATUS_SERVER_PORT > 0:
+        status_server = StatusServer()
+        status_server.add_route("/metrics", REGISTRY.handle_request)
+        status_server.add_route("/scheduler", scheduler.handle_request)
+        if coordinator is not None:
+            status_server.add_route("/shard", coordinator.handle_request)
+        if heatmap is not None:
+            status_server.add_route("/heatmap", heatmap.handle_request)
+        if trajectories is not None:
+            status_server.add_route("/trains", trajectories.handle_request)
+        status_server.start()
 
-    # 스케줄 설정 (1분마다 실행)
-    schedule.every(1).minutes.do(job)
+    # 부가 작업 스케줄 (수집은 PollScheduler가 담당)
+    # 서버 측 집계 증분 갱신 (DB에서 pg_cron으로 갱신하는 경우 0)
+    if Config.AGGREGATE_REFRESH_MINUTES > 0:
+        schedule.every(Config.AGGREGATE_REFRESH_MINUTES).minutes.do(db_client.refresh_aggregates)
+    # 파티션 유지보수 (시작 시 1회 + 매일 새벽, 향후 7일 파티션을 미리 생성하므로 하루 한 번이면 충분)
+    if Config.PARTITION_MAINTENANCE_ENABLED:
+        db_client.maintain_partitions()
+        schedule.every().day.at("03:30").do(db_client.maintain_partitions)
 
+    log.info("Scheduler: mode={mode}, boundary every {tick:g}s, daily quota {quota}",
+             mode=scheduler.mode, tick=scheduler.tick_seconds, quota=scheduler.daily_quota or "unlimited")
     try:
+        # 첫 경계에서 전 호선 수집 후 호선별 간격 적용
         while True:
+            boundary = scheduler.wait_next()
+            if boundary is None:
+                break
             schedule.run_pending()
-            time.sleep(1)
+            lines = scheduler.due_lines(boundary)
+            if coordinator is not None:
+                # 갱신 실패로 임대가 만료된 호선 제외 (스케줄러에는 다음 갱신 때 반영)
+                lines = [line_name for line_name in lines if coordinator.holds(line_name)]
+            if not lines:
+                continue
+            result = job(api_client, db_client, event_pipeline, heatmap, lines=lines, trajectories=trajectories,
+                         coordinator=coordinator)
+            scheduler.observe(boundary, lines, result["rows_by_line"])
     except KeyboardInterrupt:
-        print("\n[System] Monitoring stopped by user.")
+        log.info("Monitoring stopped by user.")
+    finally:
+        if coordinator is not None:
+            coordinator.stop()
+        if status_server is not None:
+            status_server.stop()
+        if baseline_monitor is not None:
+            baseline_monitor.save()
+        db_client.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,254 @@
+import os
+import tempfile
+import threading
+from bisect import bisect_left
+from .config import Config
+
+# 기본 히스토그램 구간(초): API 응답 ~ tick 전체 소요 시간 범위
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 행 수(배치 크기, 응답 행 수) 구간
+SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class _Metric:
+    """
+    레이블 값 튜플별로 값을 보관하는 지표 공통 부분
+    - 갱신은 지표별 잠금 하나와 dict 조회 한 번뿐이라 수집 경로(hot path)에 부담이 거의 없습니다.
+    - 레이블 값은 선언 순서대로 위치 인자로 전달합니다. 예: API_LATENCY.observe(0.12, "2호선")
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def collect(self) -> list:
+        """
+        Prometheus 텍스트 형식의 줄 리스트 (HELP/TYPE 포함)
+        """
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in items:
+            lines.extend(self._sample_lines(key, value))
+        return lines
+
+    def _sample_lines(self, key: tuple, value) -> list:
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}"]
+
+class Counter(_Metric):
+    """
+    누적 증가 값 (오류/재시도 횟수 등)
+    """
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+class Gauge(_Metric):
+    """
+    현재 값 (데이터 신선도, 마지막 tick 시각 등)
+    """
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, *labels):
+        return self._values.get(labels)
+
+class Histogram(_Metric):
+    """
+    고정 구간 히스토그램 (구간별 개수, 합계, 관측 수)
+    구간 탐색은 bisect 한 번이며 누적 개수는 출력할 때 계산합니다.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [구간별 개수(+Inf 포함), 합계, 관측 수]
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, *labels) -> dict:
+        """
+        레이블 조합의 관측 수와 합계 (요약 출력용)
+        """
+        state = self._values.get(labels)
+        if state is None:
+            return {"count": 0, "sum": 0.0}
+        return {"count": state[2], "sum": state[1]}
+
+    def _sample_lines(self, key: tuple, value) -> list:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+    def collect(self) -> list:
+        # 구간별 개수 리스트를 복사해 두고 잠금 밖에서 출력
+        with self._lock:
+            items = sorted((key, [list(state[0]), state[1], state[2]]) for key, state in self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in items:
+            lines.extend(self._sample_lines(key, value))
+        return lines
+
+class MetricsRegistry:
+    """
+    지표 등록부: Prometheus 텍스트 노출 형식(text/plain; version=0.0.4)으로 출력합니다.
+    - 상태 서버(/metrics) 또는 node_exporter textfile collector용 파일(METRICS_TEXTFILE_PATH)로 내보냅니다.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # 모듈 재로딩 등으로 같은 이름을 다시 선언하면 기존 지표 사용
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def clear(self):
+        """
+        모든 지표 값을 초기화합니다. (벤치마크/재생 구간별 측정용)
+        """
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].collect())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str = None):
+        """
+        지표를 파일로 기록합니다. 임시 파일에 쓴 뒤 교체하므로 수집기가 읽는 중간 상태가 보이지 않습니다.
+        """
+        path = path or Config.METRICS_TEXTFILE_PATH
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".prom.tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def handle_request(self, params: list, query: dict) -> str:
+        """
+        StatusServer 핸들러: GET /metrics (문자열 응답은 text/plain으로 전송)
+        """
+        return self.render()
+
+REGISTRY = MetricsRegistry()
+
+# 1. API 수집 (SeoulMetroAPI, PooledHttpClient)
+API_LATENCY = REGISTRY.histogram(
+    "subway_api_fetch_seconds", "Time to fetch all pages of one line's realtime positions", ("line",))
+API_ROWS = REGISTRY.histogram(
+    "subway_api_rows", "Rows returned per line fetch", ("line",), buckets=SIZE_BUCKETS)
+API_RESPONSE_BYTES = REGISTRY.histogram(
+    "subway_api_response_bytes", "Size of each API response body", ("service",),
+    buckets=(1024, 4096, 16384, 65536, 262144, 1048576))
+API_ERRORS = REGISTRY.counter(
+    "subway_api_errors_total", "Failed line fetches by kind (no_data, request, unexpected)", ("line", "kind"))
+API_RETRIES = REGISTRY.counter(
+    "subway_api_retries_total", "HTTP retries by reason", ("service", "reason"))
+DATA_FRESHNESS = REGISTRY.gauge(
+    "subway_data_freshness_seconds", "Age of the newest recptnDt in the last response (now - recptnDt)", ("line",))
+DATA_STALENESS = REGISTRY.gauge(
+    "subway_data_staleness_seconds", "Age of the oldest recptnDt in the last response (now - recptnDt)", ("line",))
+
+# 2. 변환/적재 (SubwayDB)
+TRANSFORM_SECONDS = REGISTRY.histogram(
+    "subway_transform_seconds", "Time to encode raw API rows into table rows",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+INSERT_SECONDS = REGISTRY.histogram(
+    "subway_insert_seconds", "Time to write one batch (spool append, COPY or REST insert)", ("mode",))
+INSERT_BATCH_ROWS = REGISTRY.histogram(
+    "subway_insert_batch_rows", "Rows per written batch", ("mode",), buckets=SIZE_BUCKETS)
+INSERT_ROWS = REGISTRY.counter(
+    "subway_inserted_rows_total", "Rows written", ("mode",))
+DB_ERRORS = REGISTRY.counter(
+    "subway_db_errors_total", "Database/spool failures by operation", ("operation",))
+CDC_SUPPRESSED = REGISTRY.counter(
+    "subway_cdc_suppressed_rows_total", "Rows skipped because the train state did not change")
+
+# 3. 수집 주기 (main.job)
+TICK_SECONDS = REGISTRY.histogram(
+    "subway_tick_seconds", "Duration of one collection tick")
+TICK_INTERVAL = REGISTRY.histogram(
+    "subway_tick_interval_seconds", "Time between consecutive tick starts",
+    buckets=(15, 30, 45, 55, 59, 60, 61, 65, 75, 90, 120, 300))
+TICK_DRIFT = REGISTRY.gauge(
+    "subway_tick_drift_seconds", "Seconds the last tick started after its wall-clock boundary")
+TICK_SCHEDULE = REGISTRY.gauge(
+    "subway_tick_schedule_seconds", "Scheduler boundary interval")
+TICK_LAST = REGISTRY.gauge(
+    "subway_tick_last_timestamp_seconds", "Unix time the last tick finished")
+TICK_ROWS = REGISTRY.gauge(
+    "subway_tick_rows", "Rows collected in the last tick")
+TICK_MISSED = REGISTRY.counter(
+    "subway_tick_missed_lines_total", "Lines that missed the tick deadline", ("line",))
@@ -0,0 +1,250 @@
+import glob
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from .config import Config
+from .file_lock import file_lock
+from .logger import get_logger
+
+log = get_logger("Cache")
+
+class PositionCache:
+    """
+    위치 이력의 로컬 컬럼형(Parquet) 캐시
+    - 호선/일자별 파티션: {cache_dir}/line_id={호선}/date={YYYY-MM-DD}/part-*.parquet
+    - 호선별 최고 수위(high-water mark: created_at, id) 이후의 행만 DB에서 증분 동기화
+    - 읽기는 필요한 날짜 파티션만 memory-map으로 열어서 처리
+    - 여러 프로세스가 같은 캐시를 쓸 수 있음: 동기화/읽기는 캐시 공유 잠금(+ 동기화는 호선 배타 잠금),
+      파티션 삭제(보관 정책)는 캐시 배타 잠금을 잡은 상태에서만 수행
+    """
+
+    # 파티션의 part 파일이 이 수를 넘으면 하나로 합침
+    MAX_PARTS_PER_PARTITION = 16
+
+    def __init__(self, db, cache_dir: str = None, retention_days: int = None, max_bytes: int = None):
+        try:
+            import pyarrow  # noqa: F401 (선택 의존성 확인)
+        except ImportError as e:
+            raise ImportError("PositionCache requires 'pyarrow'. Install it with: pip install pyarrow") from e
+
+        self.db = db
+        self.cache_dir = cache_dir or Config.CACHE_DIR
+        self.retention_days = retention_days if retention_days is not None else Config.CACHE_RETENTION_DAYS
+        self.max_bytes = max_bytes if max_bytes is not None else Config.CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+
+    # ---------- 메타데이터 ----------
+
+    def _line_dir(self, line_id: str) -> str:
+        return os.path.join(self.cache_dir, f"line_id={line_id}")
+
+    def _cache_lock(self, shared: bool = True, blocking: bool = True):
+        return file_lock(os.path.join(self.cache_dir, ".lock"), shared=shared, blocking=blocking)
+
+    def _line_lock(self, line_id: str):
+        return file_lock(os.path.join(self._line_dir(line_id), ".lock"))
+
+    def _load_meta(self, line_id: str) -> dict:
+        path = os.path.join(self._line_dir(line_id), "_meta.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_meta(self, line_id: str, meta: dict):
+        path = os.path.join(self._line_dir(line_id), "_meta.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+    # ---------- 동기화 ----------
+
+    def sync(self, line_id: str, since=None) -> int:
+        """
+        DB에서 캐시 이후에 적재된 행만 가져와 파티션에 추가합니다.
+
+        Args:
+            since (datetime): 캐시가 이 시각 이전 데이터를 포함하지 않으면 그 구간을 먼저 채움
+
+        Returns:
+            int: 새로 캐시에 추가한 행 수
+        """
+        with self._lock:
+            with self._cache_lock(shared=True), self._line_lock(line_id):
+                added = self._sync_locked(line_id, since)
+            self._enforce_limits()
+
+        if added:
+            log.info("Synced {rows} new rows for line {line_id}.", rows=added, line_id=line_id)
+        return added
+
+    def _sync_locked(self, line_id: str, since=None) -> int:
+        # 호선 잠금을 잡은 상태에서 메타 읽기 → 증분 조회/기록 → 메타 저장 (다른 프로세스의 같은 호선 동기화와 겹치지 않음)
+        os.makedirs(self._line_dir(line_id), exist_ok=True)
+        meta = self._load_meta(line_id)
+        added = 0
+
+        if since is not None:
+            since = _as_utc(_timestamp(since))
+
+        if not meta:
+            # 최초 동기화: since(없으면 최근 CACHE_INITIAL_SYNC_HOURS) 이후 데이터부터
+            start = since if since is not None else _as_utc(
+                _timestamp(datetime.now() - timedelta(hours=Config.CACHE_INITIAL_SYNC_HOURS)))
+            meta = {"synced_from": start.isoformat(), "hwm": None}
+        elif since is not None and since < _timestamp(meta["synced_from"]):
+            # 캐시 시작 시점 이전 구간 채우기
+            added += self._fetch_range(line_id, start=since.isoformat(), end=meta["synced_from"])
+            meta["synced_from"] = since.isoformat()
+
+        # 증분 조회는 id(적재 순서) 기준: 스풀에서 늦게 반영된 행은 수집 시각(created_at)이 과거라도 id는 큼
+        # (이전 형식 메타의 hwm {'created_at', 'id'}도 id만 사용)
+        after_id = meta["hwm"]["id"] if meta["hwm"] else None
+        for chunk in self.db.iter_train_data(line_id, start=meta["synced_from"], after_id=after_id):
+            self._write_chunk(line_id, chunk)
+            after_id = int(chunk["id"].max())
+            meta["hwm"] = {"id": after_id}
+            added += len(chunk)
+
+        self._save_meta(line_id, meta)
+        return added
+
+    def _fetch_range(self, line_id: str, start, end) -> int:
+        added = 0
+        for chunk in self.db.iter_train_data(line_id, start=start, end=end):
+            self._write_chunk(line_id, chunk)
+            added += len(chunk)
+        return added
+
+    def _write_chunk(self, line_id: str, chunk):
+        """
+        DataFrame 청크를 일자(KST)별 파티션에 새 part 파일로 기록합니다.
+        """
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        chunk = chunk.copy()
+        chunk["created_at"] = pd.to_datetime(chunk["created_at"], utc=True, format="ISO8601")
+        dates = chunk["created_at"].dt.tz_convert("Asia/Seoul").dt.strftime("%Y-%m-%d")
+
+        for date, part in chunk.groupby(dates):
+            partition_dir = os.path.join(self._line_dir(line_id), f"date={date}")
+            os.makedirs(partition_dir, exist_ok=True)
+            name = f"part-{int(part['id'].iloc[0]):012d}-{int(part['id'].iloc[-1]):012d}.parquet"
+            pq.write_table(pa.Table.from_pandas(part, preserve_index=False), os.path.join(partition_dir, name))
+            self._compact(partition_dir)
+
+    def _compact(self, partition_dir: str):
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parts = sorted(glob.glob(os.path.join(partition_dir, "part-*.parquet")))
+        if len(parts) <= self.MAX_PARTS_PER_PARTITION:
+            return
+        frame = pd.concat([pq.read_table(path).to_pandas() for path in parts], ignore_index=True)
+        first_id, last_id = int(frame["id"].min()), int(frame["id"].max())
+        target = os.path.join(partition_dir, f"part-{first_id:012d}-{last_id:012d}.parquet")
+        tmp_path = target + ".tmp"
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), tmp_path)
+        for path in parts:
+            os.remove(path)
+        os.replace(tmp_path, target)
+
+    # ---------- 읽기 ----------
+
+    def read(self, line_id: str, start=None, end=None, columns: list = None):
+        """
+        캐시된 파티션에서 [start, end) 구간 데이터를 DataFrame으로 읽습니다. (DB 접근 없음)
+        """
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        start_ts = _timestamp(start) if start is not None else None
+        end_ts = _timestamp(end) if end is not None else None
+        read_columns = None
+        if columns:
+            read_columns = list(dict.fromkeys(list(columns) + ["created_at", "id"]))
+
+        frames = []
+        # 읽는 동안 다른 프로세스가 파티션을 삭제하지 못하도록 공유 잠금
+        with self._cache_lock(shared=True):
+            for partition_dir in self._partitions(line_id):
+                date = pd.Timestamp(partition_dir.rsplit("date=", 1)[1]).tz_localize("Asia/Seoul")
+                # 구간 밖 파티션은 열지 않음
+                if start_ts is not None and date + pd.Timedelta(days=1) <= _as_utc(start_ts):
+                    continue
+                if end_ts is not None and date >= _as_utc(end_ts):
+                    continue
+                for path in sorted(glob.glob(os.path.join(partition_dir, "part-*.parquet"))):
+                    frames.append(pq.read_table(path, columns=read_columns, memory_map=True).to_pandas())
+
+        if not frames:
+            return pd.DataFrame(columns=read_columns or [])
+        frame = pd.concat(frames, ignore_index=True)
+        if start_ts is not None:
+            frame = frame[frame["created_at"] >= _as_utc(start_ts)]
+        if end_ts is not None:
+            frame = frame[frame["created_at"] < _as_utc(end_ts)]
+        return frame.sort_values(["created_at", "id"]).reset_index(drop=True)
+
+    def _partitions(self, line_id: str) -> list:
+        return sorted(glob.glob(os.path.join(self._line_dir(line_id), "date=*")))
+
+    # ---------- 보관 정책 ----------
+
+    def _enforce_limits(self):
+        """
+        보관 기간이 지난 파티션을 지우고, 전체 크기가 max_bytes를 넘으면 오래된 파티션부터 삭제합니다.
+        캐시 배타 잠금을 얻지 못하면(다른 프로세스가 동기화/읽기/삭제 중) 이번에는 건너뛰고 다음 동기화에서 수행합니다.
+        """
+        with self._cache_lock(shared=False, blocking=False) as locked:
+            if not locked:
+                log.debug("Cache is in use by another process; skipping eviction.")
+                return
+            self._evict()
+
+    def _evict(self):
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        evicted = {}  # 호선 디렉터리 -> 삭제한 가장 최근 날짜
+        partitions = []
+        for partition_dir in glob.glob(os.path.join(self.cache_dir, "line_id=*", "date=*")):
+            line_dir, date = partition_dir.rsplit(os.sep + "date=", 1)
+            if date < cutoff:
+                shutil.rmtree(partition_dir, ignore_errors=True)
+                evicted[line_dir] = max(date, evicted.get(line_dir, date))
+                continue
+            size = sum(os.path.getsize(path) for path in glob.glob(os.path.join(partition_dir, "*")))
+            partitions.append((date, line_dir, partition_dir, size))
+
+        total = sum(size for _, _, _, size in partitions)
+        for date, line_dir, partition_dir, size in sorted(partitions):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(partition_dir, ignore_errors=True)
+            evicted[line_dir] = max(date, evicted.get(line_dir, date))
+            total -= size
+            log.info("Evicted partition {partition} (cache size limit).", partition=partition_dir, bytes=size)
+
+        # 삭제한 구간은 캐시 범위에서 제외하여, 다시 필요하면 DB에서 채우도록 함
+        for line_dir, date in evicted.items():
+            line_id = line_dir.rsplit("line_id=", 1)[1]
+            meta = self._load_meta(line_id)
+            if meta:
+                next_day = _as_utc(_timestamp(date) + timedelta(days=1))
+                meta["synced_from"] = max(_timestamp(meta["synced_from"]), next_day).isoformat()
+                self._save_meta(line_id, meta)
+
+def _timestamp(value):
+    import pandas as pd
+    return pd.Timestamp(value)
+
+def _as_utc(timestamp):
+    # 시간대가 없으면 한국 표준시로 간주
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize("Asia/Seoul")
+    return timestamp.tz_convert("UTC")
@@ -0,0 +1,113 @@
+"""
+서울시 실시간 위치 API 응답 → 표준 스키마(realtime_subway_positions) 행 변환 코덱
+
+subway_monitoring/collector.py는 이 모듈의 사본(subway_monitoring/row_codec.py)을 사용하므로
+FIELD_SPECS나 변환 규칙을 바꾸면 사본도 함께 바꿉니다. (표준 라이브러리만 사용)
+"""
+import csv
+import io
+import logging
+
+# 표준 logging만 사용: logger.configure()가 설정한 'subway' 핸들러로 출력 (component/fields는 StructuredLogger와 같은 형식)
+log = logging.getLogger("subway.codec")
+
+# 변환 종류별 파이썬 식 템플릿 ({field}: API 필드명)
+# - text: 빈 문자열은 NULL로 통일
+# - int_or_zero / int_or_none: 숫자 문자열이 아니면 0 / NULL
+# - flag: '1' → True
+_EXPRESSIONS = {
+    "text": "(get({field!r}) or None)",
+    "int_or_zero": "(int(v) if (v := get({field!r})) and v.isdigit() else 0)",
+    "int_or_none": "(int(v) if (v := get({field!r})) and v.isdigit() else None)",
+    "flag": "(get({field!r}) == '1')",
+}
+
+# (DB 컬럼명, API 필드명, 변환 종류) — 표준 스키마의 컬럼 순서
+FIELD_SPECS = (
+    ("line_id", "subwayId", "text"),
+    ("line_name", "subwayNm", "text"),
+    ("station_id", "statnId", "text"),
+    ("station_name", "statnNm", "text"),
+    ("train_number", "trainNo", "text"),
+    ("last_received_date", "lastRecptnDt", "text"),
+    ("last_received_time", "recptnDt", "text"),
+    ("direction_type", "updnLine", "int_or_zero"),
+    ("destination_station_id", "statnTid", "text"),
+    ("destination_station_name", "statnTnm", "text"),
+    ("train_status_code", "trainSttus", "int_or_none"),
+    ("is_express", "directAt", "int_or_zero"),  # 0:일반, 1:급행, 7:특급 (코드 그대로 보존)
+    ("is_last_train", "lstcarAt", "flag"),
+)
+
+COLUMNS = tuple(column for column, _, _ in FIELD_SPECS)
+
+def _compile_encoders():
+    """
+    FIELD_SPECS로부터 행 단위 반복문/함수 호출이 없는 변환 함수를 모듈 로드 시 한 번 생성합니다.
+    """
+    expressions = [_EXPRESSIONS[kind].format(field=field) for _, field, kind in FIELD_SPECS]
+    tuple_body = ", ".join(expressions)
+    dict_body = ", ".join(f"{column!r}: {expr}" for (column, _, _), expr in zip(FIELD_SPECS, expressions))
+    source = (
+        "def encode_row(item):\n"
+        "    get = item.get\n"
+        f"    return ({tuple_body},)\n"
+        "def encode_dict(item):\n"
+        "    get = item.get\n"
+        f"    return {{{dict_body}}}\n"
+    )
+    namespace = {}
+    exec(compile(source, "<row_codec>", "exec"), namespace)
+    return namespace["encode_row"], namespace["encode_dict"]
+
+_encode_row, _encode_dict = _compile_encoders()
+
+def encode_row(item: dict) -> tuple:
+    """
+    API 응답 한 건을 COLUMNS 순서의 튜플로 변환합니다.
+    """
+    return _encode_row(item)
+
+def encode_rows(items: list) -> list:
+    """
+    API 응답 리스트를 튜플 리스트로 변환합니다. 변환할 수 없는 항목은 건너뜁니다.
+    """
+    return _encode_all(_encode_row, items)
+
+def encode_dicts(items: list) -> list:
+    """
+    API 응답 리스트를 {컬럼명: 값} dict 리스트로 변환합니다. (REST 적재용)
+    """
+    return _encode_all(_encode_dict, items)
+
+def _encode_all(encoder, items: list) -> list:
+    try:
+        return [encoder(item) for item in items]
+    except (AttributeError, TypeError, ValueError):
+        pass
+
+    # 변환할 수 없는 항목이 섞인 경우에만 한 건씩 처리
+    rows = []
+    for item in items:
+        try:
+            rows.append(encoder(item))
+        except (AttributeError, TypeError, ValueError) as e:
+            log.warning(f"Skipping unparsable item {item}: {e}", extra={"component": "Codec", "fields": {"error": str(e)}})
+    return rows
+
+def write_csv(rows, columns: tuple, buffer=None):
+    """
+    행(튜플 또는 dict)을 COPY ... WITH (FORMAT csv)용 CSV로 버퍼에 씁니다.
+    None은 따옴표 없는 빈 값으로 기록되어 NULL로 적재됩니다.
+
+    Returns:
+        io.StringIO: 처음 위치로 되감긴 버퍼
+    """
+    buffer = buffer if buffer is not None else io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for row in rows:
+        if isinstance(row, dict):
+            row = [row.get(column) for column in columns]
+        writer.writerow(row)
+    buffer.seek(0)
+    return buffer
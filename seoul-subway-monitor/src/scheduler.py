@@ -0,0 +1,344 @@
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from .config import Config
+from .events import KST
+from .logger import get_logger
+from .metrics import REGISTRY, TICK_DRIFT
+
+log = get_logger("Scheduler")
+
+# 상태 변화 판단 컬럼 (수신 시각은 매 보고마다 바뀌므로 제외)
+CHANGE_COLUMNS = ("station_id", "train_status_code", "direction_type", "destination_station_id")
+# 관측 변화 비율 상한 (모든 열차가 바뀐 경우에도 변화율이 무한대가 되지 않도록)
+MAX_CHANGE_FRACTION = 0.95
+# 변화율 지수이동평균 가중치 (새 관측값 비중)
+RATE_SMOOTHING = 0.3
+
+POLL_INTERVAL = REGISTRY.gauge(
+    "subway_poll_interval_seconds", "Current polling interval per line", ("line",))
+POLL_CHANGE_RATE = REGISTRY.gauge(
+    "subway_poll_change_rate", "Estimated state changes per train per second", ("line",))
+QUOTA_USED = REGISTRY.gauge(
+    "subway_api_quota_used", "API requests spent today (KST)")
+QUOTA_LIMIT = REGISTRY.gauge(
+    "subway_api_quota_limit", "Daily API request quota (0: unlimited)")
+BUDGET_SCALE = REGISTRY.gauge(
+    "subway_scheduler_budget_scale", "Factor applied to polling intervals to stay within the daily quota")
+TICKS_SKIPPED = REGISTRY.counter(
+    "subway_scheduler_skipped_ticks_total", "Wall-clock boundaries skipped because the previous tick overran")
+POLLS_DEFERRED = REGISTRY.counter(
+    "subway_scheduler_deferred_polls_total", "Due polls deferred because the daily quota ran out", ("line",))
+
+def parse_service_hours(value: str) -> list:
+    """
+    'HH:MM-HH:MM' → 하루 중 운행 구간 리스트 [(시작 초, 끝 초)] (자정을 넘기면 두 구간)
+    """
+    start_text, end_text = value.split("-")
+    start, end = (int(text[:2]) * 3600 + int(text[3:5]) * 60 for text in (start_text.strip(), end_text.strip()))
+    if start < end:
+        return [(start, end)]
+    return [(0, end), (start, 86400)]
+
+class _LineState:
+    """
+    호선별 수집 상태
+    """
+    __slots__ = ("next_due", "interval", "desired", "last_polled", "rate", "trains", "requests_per_poll", "signatures")
+
+    def __init__(self, interval: float):
+        self.next_due = 0.0          # 다음 수집 예정 시각 (epoch 초, 이 시각 이후 첫 경계에서 수집)
+        self.interval = interval     # 현재 적용 간격
+        self.desired = interval      # 할당량 조정 전 간격
+        self.last_polled = None
+        self.rate = None             # 열차당 초당 상태 변화율 (지수이동평균)
+        self.trains = None           # 마지막 수집 열차 수 (None: 아직 수집 전)
+        self.requests_per_poll = 1   # 페이지 수 (= 한 번 수집에 드는 API 요청 수)
+        self.signatures = {}         # 열차 번호 -> 상태 튜플
+
+class PollScheduler:
+    """
+    벽시계 경계에 맞춘 호선별 수집 스케줄러
+    - 경계는 epoch 기준 tick_seconds 배수(예: 매 15초 정각)이고, 작업이 경계를 넘기면 밀린 경계는 건너뜁니다.
+      (작업 시간이 누적되어 주기가 밀리지 않음)
+    - 'adaptive': 호선별 간격 = 목표 변화 비율 / 관측 변화율 (SCHEDULER_MIN~MAX_SECONDS, 수집은 경계에서만)
+        - 운행 시간 외에 열차가 없는 호선은 SCHEDULER_IDLE_SECONDS마다 확인만 합니다.
+        - 남은 하루 할당량을 남은 운행 시간으로 나눈 요청 속도를 넘으면 전 호선 간격을 같은 비율로 늘립니다.
+    - 'fixed': 전 호선 COLLECT_INTERVAL_SECONDS 간격 (할당량 소진 시에만 수집 중단)
+
+    사용 예:
+        scheduler = PollScheduler()
+        while True:
+            boundary = scheduler.wait_next()
+            lines = scheduler.due_lines(boundary)
+            result = job(..., lines=lines)
+            scheduler.observe(boundary, lines, result["rows_by_line"])
+    """
+
+    def __init__(self, lines: list = None, mode: str = None, tick_seconds: float = None,
+                 daily_quota: int = None, state_path: str = None, clock=time.time):
+        self.all_lines = list(lines or Config.TARGET_LINES)
+        self.lines = list(self.all_lines)   # 이 작업자가 수집할 호선 (분산 수집 시 assign()으로 변경)
+        self.mode = mode or Config.SCHEDULER_MODE
+        if tick_seconds is None:
+            tick_seconds = Config.SCHEDULER_TICK_SECONDS if self.mode == "adaptive" else Config.COLLECT_INTERVAL_SECONDS
+        self.tick_seconds = tick_seconds
+        self.total_quota = Config.API_DAILY_QUOTA if daily_quota is None else daily_quota
+        self.daily_quota = self.total_quota
+        self.state_path = Config.SCHEDULER_STATE_PATH if state_path is None else state_path
+        self.service_windows = parse_service_hours(Config.SERVICE_HOURS)
+        self._clock = clock
+        initial = max(Config.COLLECT_INTERVAL_SECONDS, tick_seconds)
+        self._states = {line_name: _LineState(initial) for line_name in self.all_lines}
+        self._day, self.requests_today = self._load_usage()
+        self.budget_scale = 1.0
+        self._last_boundary = None
+        self._quota_warned = False
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        QUOTA_LIMIT.set(self.daily_quota)
+        QUOTA_USED.set(self.requests_today)
+
+    # 1. 경계 대기
+    def next_boundary(self, now: float = None) -> float:
+        now = self._clock() if now is None else now
+        return (math.floor(now / self.tick_seconds) + 1) * self.tick_seconds
+
+    def wait_next(self):
+        """
+        다음 벽시계 경계까지 대기한 뒤 경계 시각(epoch 초)을 반환합니다. stop() 호출 시 None
+        """
+        boundary = self.next_boundary()
+        if self._last_boundary is not None:
+            skipped = round((boundary - self._last_boundary) / self.tick_seconds) - 1
+            if skipped > 0:
+                TICKS_SKIPPED.inc(amount=skipped)
+                log.warning("Previous tick overran; skipped {skipped} boundary(ies).", skipped=skipped)
+        delay = boundary - self._clock()
+        if delay > 0 and self._stop.wait(delay):
+            return None
+        self._last_boundary = boundary
+        # 경계 대비 실제 시작 지연 (sleep 오차, 스레드 스케줄링)
+        TICK_DRIFT.set(self._clock() - boundary)
+        return boundary
+
+    def stop(self):
+        self._stop.set()
+
+    # 2. 수집 대상 선택
+    def assign(self, lines: list):
+        """
+        이 작업자가 수집할 호선을 바꿉니다. (분산 수집: 임대를 가진 호선)
+        새로 맡은 호선은 다음 경계에서 바로 수집하고, 하루 할당량은 전체 호선 중 맡은 비율만큼만 씁니다.
+        """
+        with self._lock:
+            added = [line_name for line_name in lines if line_name not in self.lines]
+            self.lines = [line_name for line_name in self.all_lines if line_name in lines]
+            for line_name in added:
+                if line_name in self._states:
+                    self._states[line_name].next_due = 0.0
+            if self.total_quota:
+                self.daily_quota = max(1, round(self.total_quota * len(self.lines) / len(self.all_lines)))
+            QUOTA_LIMIT.set(self.daily_quota)
+
+    def due_lines(self, boundary: float) -> list:
+        """
+        경계 시각에 수집할 호선 (설정 순서). 남은 할당량을 넘는 호선은 다음 경계로 미룹니다.
+        """
+        with self._lock:
+            self._roll_day(boundary)
+            due = [line_name for line_name in self.lines if self._states[line_name].next_due <= boundary + 1e-6]
+            if not self.daily_quota:
+                return due
+
+            remaining = self.daily_quota - self.requests_today
+            selected = []
+            for line_name in due:
+                cost = self._states[line_name].requests_per_poll
+                if cost > remaining:
+                    POLLS_DEFERRED.inc(line_name)
+                    continue
+                remaining -= cost
+                selected.append(line_name)
+            if len(selected) < len(due) and not self._quota_warned:
+                self._quota_warned = True
+                log.warning("Daily API quota nearly exhausted ({used}/{quota}); deferring {count} line(s).",
+                            used=self.requests_today, quota=self.daily_quota, count=len(due) - len(selected))
+            return selected
+
+    # 3. 수집 결과 반영
+    def observe(self, boundary: float, polled: list, rows_by_line: dict):
+        """
+        수집 결과로 요청 수, 호선별 변화율, 다음 수집 경계를 갱신합니다.
+
+        Args:
+            boundary (float): 이번 tick 경계
+            polled (list): 요청한 호선 (마감을 놓친 호선 포함)
+            rows_by_line (dict): 호선명 -> 변환된 행 리스트 (응답을 받은 호선만)
+        """
+        with self._lock:
+            for line_name in polled:
+                state = self._states.get(line_name)
+                if state is None:
+                    continue
+                rows = rows_by_line.get(line_name)
+                if rows is None:
+                    # 마감 초과: 요청은 보냈으므로 비용만 반영하고 같은 간격 유지
+                    self.requests_today += state.requests_per_poll
+                    self._schedule_next(state, boundary)
+                    continue
+                state.requests_per_poll = max(1, math.ceil(len(rows) / Config.API_PAGE_SIZE))
+                self.requests_today += state.requests_per_poll
+                self._update_rate(state, rows, boundary)
+                state.last_polled = boundary
+                state.trains = len(rows)
+                state.desired = self._desired_interval(state, boundary)
+
+            self._update_budget(boundary)
+            for line_name in polled:
+                state = self._states.get(line_name)
+                if state is None:
+                    continue
+                if line_name in rows_by_line:
+                    # 열차가 없는 호선의 확인 간격은 할당량 조정에서 제외 (운행 시작을 늦게 알아채지 않도록)
+                    scale = self.budget_scale if state.trains else 1.0
+                    state.interval = max(state.desired * scale, self.tick_seconds)
+                    self._schedule_next(state, boundary)
+                POLL_INTERVAL.set(state.interval, line_name)
+                if state.rate is not None:
+                    POLL_CHANGE_RATE.set(state.rate, line_name)
+            QUOTA_USED.set(self.requests_today)
+            BUDGET_SCALE.set(self.budget_scale)
+        self._save_usage()
+
+    def _update_rate(self, state: _LineState, rows: list, boundary: float):
+        signatures = {row.get("train_number"): tuple(row.get(column) for column in CHANGE_COLUMNS) for row in rows}
+        previous = state.signatures
+        state.signatures = signatures
+        if state.last_polled is None or not previous or not signatures:
+            return
+        elapsed = boundary - state.last_polled
+        common = [train for train in signatures if train in previous]
+        if elapsed <= 0 or not common:
+            return
+        changed = sum(1 for train in common if signatures[train] != previous[train])
+        # 열차별 상태 변화를 포아송 과정으로 보고 변화율 추정: P(변화) = 1 - exp(-rate * elapsed)
+        fraction = min(changed / len(common), MAX_CHANGE_FRACTION)
+        rate = -math.log(1 - fraction) / elapsed
+        state.rate = rate if state.rate is None else (1 - RATE_SMOOTHING) * state.rate + RATE_SMOOTHING * rate
+
+    def _desired_interval(self, state: _LineState, now: float) -> float:
+        if self.mode != "adaptive":
+            return Config.COLLECT_INTERVAL_SECONDS
+        if not state.trains:
+            # 열차가 없는 호선: 운행 시간 외에는 확인만, 운행 시간 중이면(API 오류일 수 있으므로) 기본 간격
+            return Config.COLLECT_INTERVAL_SECONDS if self.in_service(now) else Config.SCHEDULER_IDLE_SECONDS
+        if state.rate is None:
+            return Config.COLLECT_INTERVAL_SECONDS
+        if state.rate <= 0:
+            return Config.SCHEDULER_MAX_SECONDS
+        # 목표 비율만큼 상태가 바뀌는 데 걸리는 시간
+        desired = -math.log(1 - Config.SCHEDULER_TARGET_CHANGE) / state.rate
+        return min(max(desired, Config.SCHEDULER_MIN_SECONDS), Config.SCHEDULER_MAX_SECONDS)
+
+    def _schedule_next(self, state: _LineState, boundary: float):
+        # 수집은 경계에서만 하되 예정 시각은 경계에 맞춰 올리지 않고 이어서 계산
+        # (예: 간격 20초, 경계 15초 → 15/30초 간격이 섞여 평균 20초. 올림하면 매번 30초가 되어 할당량이 남음)
+        base = state.next_due if 0 <= boundary - state.next_due < self.tick_seconds else boundary
+        state.next_due = base + state.interval
+
+    # 4. 하루 할당량
+    def _update_budget(self, now: float):
+        if self.mode != "adaptive" or not self.daily_quota:
+            self.budget_scale = 1.0
+            return
+        remaining = self.daily_quota - self.requests_today
+        planned_rate = sum(self._states[line_name].requests_per_poll / self._states[line_name].desired
+                           for line_name in self.lines)
+        seconds_left = self.service_seconds_left(now)
+        if remaining <= 0:
+            self.budget_scale = Config.SCHEDULER_IDLE_SECONDS / Config.SCHEDULER_MIN_SECONDS
+            return
+        # 남은 운행 시간 동안 남은 할당량을 고르게 쓰는 요청 속도
+        allowed_rate = remaining / max(seconds_left, self.tick_seconds)
+        self.budget_scale = max(1.0, planned_rate / allowed_rate)
+
+    def in_service(self, at: float) -> bool:
+        local = datetime.fromtimestamp(at, KST)
+        second = local.hour * 3600 + local.minute * 60 + local.second
+        return any(start <= second < end for start, end in self.service_windows)
+
+    def service_seconds_left(self, at: float) -> float:
+        """
+        at부터 할당량이 초기화되는 자정(KST)까지 남은 운행 시간(초)
+        """
+        local = datetime.fromtimestamp(at, KST)
+        second = local.hour * 3600 + local.minute * 60 + local.second
+        return sum(max(0, end - max(start, second)) for start, end in self.service_windows)
+
+    def _roll_day(self, at: float):
+        day = datetime.fromtimestamp(at, KST).strftime("%Y-%m-%d")
+        if day != self._day:
+            if self._day is not None:
+                log.info("New quota day {day}: {used} requests used on {previous}.",
+                         day=day, used=self.requests_today, previous=self._day)
+            self._day = day
+            self.requests_today = 0
+            self._quota_warned = False
+
+    def _load_usage(self):
+        # 재시작해도 당일 사용량을 이어서 계산
+        today = datetime.fromtimestamp(self._clock(), KST).strftime("%Y-%m-%d")
+        if not self.state_path or not os.path.exists(self.state_path):
+            return today, 0
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable scheduler state: {error}", error=str(e))
+            return today, 0
+        if state.get("date") != today:
+            return today, 0
+        return today, int(state.get("requests", 0))
+
+    def _save_usage(self):
+        if not self.state_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"date": self._day, "requests": self.requests_today}, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            log.warning("Failed to save scheduler state: {error}", error=str(e))
+
+    # 5. 상태 조회
+    def status(self) -> dict:
+        with self._lock:
+            lines = {}
+            for line_name in self.lines:
+                state = self._states[line_name]
+                lines[line_name] = {
+                    "interval_seconds": state.interval,
+                    "next_due": datetime.fromtimestamp(state.next_due, KST).isoformat() if state.next_due else None,
+                    "trains": state.trains,
+                    "change_rate": round(state.rate, 5) if state.rate is not None else None,
+                    "requests_per_poll": state.requests_per_poll,
+                }
+            return {
+                "mode": self.mode,
+                "tick_seconds": self.tick_seconds,
+                "quota": {"date": self._day, "used": self.requests_today, "limit": self.daily_quota},
+                "budget_scale": round(self.budget_scale, 3),
+                "lines": lines,
+            }
+
+    def handle_request(self, params: list, query: dict) -> dict:
+        """
+        StatusServer 핸들러: GET /scheduler
+        """
+        return self.status()
@@ -0,0 +1,268 @@
+import hashlib
+import math
+import threading
+import time
+import psycopg2
+from .config import Config
+from .logger import get_logger
+from .metrics import REGISTRY
+
+log = get_logger("Shard")
+
+# 임대 테이블 (docs/schema.sql과 같은 정의, 로컬 검증용으로 ensure_schema()에서 생성)
+LEASE_DDL = """
+    CREATE TABLE IF NOT EXISTS collector_workers (
+        worker_id TEXT PRIMARY KEY,
+        started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    CREATE TABLE IF NOT EXISTS collector_line_leases (
+        line_name TEXT PRIMARY KEY,
+        worker_id TEXT,
+        lease_until TIMESTAMPTZ NOT NULL DEFAULT '-infinity',
+        acquired_at TIMESTAMPTZ,
+        generation BIGINT NOT NULL DEFAULT 0
+    );
+"""
+
+# 하트비트 갱신 + 살아 있는 작업자 목록 (하트비트가 TTL 안에 갱신된 작업자)
+HEARTBEAT_SQL = """
+    INSERT INTO collector_workers (worker_id) VALUES (%(worker_id)s)
+    ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = now()
+"""
+LIVE_WORKERS_SQL = """
+    SELECT worker_id FROM collector_workers
+    WHERE heartbeat_at > now() - make_interval(secs => %(ttl)s) ORDER BY worker_id
+"""
+# 임대 획득/연장: 비어 있거나 만료된 임대, 또는 이미 내 임대인 호선만 (한 문장으로 원자적 처리)
+CLAIM_SQL = """
+    INSERT INTO collector_line_leases AS lease (line_name, worker_id, lease_until, acquired_at, generation)
+    SELECT line_name, %(worker_id)s, now() + make_interval(secs => %(ttl)s), now(), 1
+    FROM unnest(%(lines)s::text[]) AS line_name
+    ON CONFLICT (line_name) DO UPDATE SET
+        worker_id = excluded.worker_id,
+        lease_until = excluded.lease_until,
+        acquired_at = CASE WHEN lease.worker_id = excluded.worker_id THEN lease.acquired_at ELSE now() END,
+        generation = lease.generation + CASE WHEN lease.worker_id = excluded.worker_id THEN 0 ELSE 1 END
+    WHERE lease.worker_id = excluded.worker_id OR lease.lease_until < now()
+    RETURNING line_name
+"""
+# 임대 반납: 다른 작업자가 다음 주기에 바로 가져갈 수 있도록 만료 처리
+RELEASE_SQL = """
+    UPDATE collector_line_leases SET lease_until = now()
+    WHERE worker_id = %(worker_id)s AND line_name = ANY(%(lines)s::text[])
+"""
+DEREGISTER_SQL = "DELETE FROM collector_workers WHERE worker_id = %(worker_id)s"
+
+OWNED_LINES = REGISTRY.gauge(
+    "subway_shard_owned_lines", "Lines this worker currently holds a lease for")
+LIVE_WORKERS = REGISTRY.gauge(
+    "subway_shard_live_workers", "Workers with a fresh heartbeat")
+LEASE_CHANGES = REGISTRY.counter(
+    "subway_shard_lease_changes_total", "Leases acquired or given up by this worker", ("line", "change"))
+LEASE_ERRORS = REGISTRY.counter(
+    "subway_shard_lease_errors_total", "Failed lease renewal rounds")
+
+def _rank(line_name: str, worker_id: str) -> int:
+    # 호선-작업자 쌍의 고정 점수 (프로세스마다 값이 달라지는 hash() 대신 md5)
+    return int.from_bytes(hashlib.md5(f"{line_name}|{worker_id}".encode("utf-8")).digest()[:8], "big")
+
+def assign_lines(lines: list, workers: list) -> dict:
+    """
+    호선을 살아 있는 작업자에게 나눕니다. (같은 입력이면 모든 작업자가 같은 결과를 계산)
+    - 작업자당 최대 ceil(호선 수 / 작업자 수)개로 균등하게 배분
+    - 호선마다 점수(rendezvous hashing)가 높은 작업자부터 배정하므로 작업자가 늘거나 줄어도
+      대부분의 호선은 기존 작업자에 남습니다.
+
+    Returns:
+        dict: 작업자 ID -> 호선 리스트 (lines 순서)
+    """
+    workers = sorted(set(workers))
+    assignment = {worker_id: [] for worker_id in workers}
+    if not workers:
+        return assignment
+    capacity = math.ceil(len(lines) / len(workers))
+    for line_name in lines:
+        for worker_id in sorted(workers, key=lambda worker_id: _rank(line_name, worker_id), reverse=True):
+            if len(assignment[worker_id]) < capacity:
+                assignment[worker_id].append(line_name)
+                break
+    return assignment
+
+class LeaseCoordinator:
+    """
+    PostgreSQL 임대(lease) 테이블로 여러 수집 작업자(프로세스/호스트)가 호선을 나눠 맡도록 조정합니다.
+    - 작업자는 renew_seconds마다 하트비트를 남기고, 살아 있는 작업자 목록으로 assign_lines() 배분을 계산해
+      자기 몫의 호선 임대를 획득/연장하고 남의 몫이 된 호선은 반납합니다. (백그라운드 스레드)
+    - 작업자가 죽으면 하트비트와 임대가 ttl_seconds 뒤 만료되어 남은 작업자에게 재배분됩니다.
+    - 임대 유효 시각은 갱신 요청을 보내기 직전의 로컬 monotonic 시각 + TTL로 보수적으로 잡습니다.
+      (DB의 임대 만료보다 항상 먼저 끝나므로, 갱신이 실패하거나 늦어지면 새 소유자가 생기기 전에 수집/적재를 멈춤)
+    - advisory lock 대신 임대 테이블을 쓰는 이유: 세션 단위 잠금은 연결 풀러(트랜잭션 모드)에서 유지되지 않고,
+      테이블은 현재 소유자/획득 시각을 SQL로 바로 조회할 수 있습니다.
+
+    사용 예:
+        coordinator = LeaseCoordinator()
+        coordinator.start()
+        lines = [line for line in scheduler.due_lines(boundary) if coordinator.holds(line)]
+    """
+
+    def __init__(self, worker_id: str = None, lines: list = None, dsn: str = None,
+                 ttl_seconds: float = None, renew_seconds: float = None):
+        self.worker_id = worker_id or Config.WORKER_ID
+        self.lines = list(lines or Config.TARGET_LINES)
+        self.dsn = dsn or Config.DATABASE_URL
+        self.ttl_seconds = ttl_seconds or Config.LEASE_TTL_SECONDS
+        self.renew_seconds = renew_seconds or Config.LEASE_RENEW_SECONDS
+        self.live_workers = []
+        self._valid_until = {}  # 호선명 -> 임대 유효 시각 (로컬 monotonic)
+        self._conn = None
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # 연결이 없거나 끊어진 경우 재연결 (문장마다 자동 커밋)
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(self.dsn)
+            self._conn.autocommit = True
+        return self._conn
+
+    def ensure_schema(self):
+        with self._connection().cursor() as cur:
+            cur.execute(LEASE_DDL)
+
+    def add_listener(self, listener):
+        """
+        보유 호선이 바뀔 때 listener(acquired: list, released: list)를 호출합니다.
+        """
+        self._listeners.append(listener)
+
+    # 1. 조회 (수집 경로에서 호출, DB 접근 없음)
+    def holds(self, line_name: str) -> bool:
+        valid_until = self._valid_until.get(line_name)
+        return valid_until is not None and time.monotonic() < valid_until
+
+    def owned_lines(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [line_name for line_name in self.lines if self._valid_until.get(line_name, 0) > now]
+
+    # 2. 임대 갱신
+    def renew(self) -> list:
+        """
+        하트비트 → 배분 계산 → 임대 반납/획득을 한 번 수행하고 보유 호선을 반환합니다.
+        DB 오류 시 기존 임대는 로컬 유효 시각까지만 유지됩니다.
+        """
+        started = time.monotonic()
+        params = {"worker_id": self.worker_id, "ttl": self.ttl_seconds}
+        try:
+            with self._connection().cursor() as cur:
+                cur.execute(HEARTBEAT_SQL, params)
+                cur.execute(LIVE_WORKERS_SQL, params)
+                live = [row[0] for row in cur.fetchall()]
+                if self.worker_id not in live:
+                    live.append(self.worker_id)
+                target = assign_lines(self.lines, live)[self.worker_id]
+
+                # 남의 몫이 된 호선은 로컬에서 먼저 내려놓은 뒤 반납 (반납 후에도 적재하는 일이 없도록)
+                with self._lock:
+                    released = [line_name for line_name in self._valid_until if line_name not in target]
+                    for line_name in released:
+                        del self._valid_until[line_name]
+                if released:
+                    cur.execute(RELEASE_SQL, {**params, "lines": released})
+
+                cur.execute(CLAIM_SQL, {**params, "lines": target})
+                claimed = {row[0] for row in cur.fetchall()}
+        except psycopg2.Error as e:
+            LEASE_ERRORS.inc()
+            log.error("Lease renewal failed: {error}", error=str(e).strip())
+            if self._conn is not None:
+                self._conn.close()
+            return self.owned_lines()
+
+        with self._lock:
+            # 임대가 만료되어 다른 작업자가 가져간 호선(갱신 지연 등)은 claimed에 없으므로 내려놓음
+            lost = [line_name for line_name in self._valid_until if line_name not in claimed]
+            for line_name in lost:
+                del self._valid_until[line_name]
+            acquired = [line_name for line_name in claimed if line_name not in self._valid_until]
+            for line_name in claimed:
+                self._valid_until[line_name] = started + self.ttl_seconds
+            self.live_workers = live
+
+        LIVE_WORKERS.set(len(live))
+        OWNED_LINES.set(len(claimed))
+        given_up = released + lost
+        for line_name in acquired:
+            LEASE_CHANGES.inc(line_name, "acquired")
+        for line_name in given_up:
+            LEASE_CHANGES.inc(line_name, "released")
+        if acquired or given_up:
+            log.info("Worker {worker_id}: {owned} line(s) of {total} with {workers} live worker(s) "
+                     "(+{acquired} -{released}), waiting for {pending}",
+                     worker_id=self.worker_id, owned=len(claimed), total=len(self.lines), workers=len(live),
+                     acquired=len(acquired), released=len(given_up), pending=len(set(target) - claimed),
+                     acquired_lines=acquired, released_lines=given_up)
+            for listener in self._listeners:
+                try:
+                    listener(acquired, given_up)
+                except Exception as e:
+                    log.error("Lease listener failed: {error}", error=str(e))
+        return self.owned_lines()
+
+    # 3. 백그라운드 실행
+    def start(self):
+        if self._thread is not None:
+            return
+        self.renew()
+        self._thread = threading.Thread(target=self._run, name="lease-coordinator", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.renew_seconds):
+            self.renew()
+
+    def stop(self, release: bool = True):
+        """
+        갱신을 멈추고 (release=True면) 보유 임대와 하트비트를 반납하여 남은 작업자가 바로 가져가게 합니다.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.renew_seconds + 5)
+            self._thread = None
+        with self._lock:
+            lines = list(self._valid_until)
+            self._valid_until.clear()
+        OWNED_LINES.set(0)
+        if release:
+            try:
+                with self._connection().cursor() as cur:
+                    if lines:
+                        cur.execute(RELEASE_SQL, {"worker_id": self.worker_id, "lines": lines})
+                    cur.execute(DEREGISTER_SQL, {"worker_id": self.worker_id})
+                log.info("Worker {worker_id} released {count} line(s).", worker_id=self.worker_id, count=len(lines))
+            except psycopg2.Error as e:
+                log.warning("Failed to release leases (they expire in {ttl:g}s): {error}",
+                            ttl=self.ttl_seconds, error=str(e).strip())
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "worker_id": self.worker_id,
+                "live_workers": list(self.live_workers),
+                "ttl_seconds": self.ttl_seconds,
+                "renew_seconds": self.renew_seconds,
+                "lines": {line_name: round(valid_until - now, 1)
+                          for line_name, valid_until in self._valid_until.items() if valid_until > now},
+            }
+
+    def handle_request(self, params: list, query: dict) -> dict:
+        """
+        StatusServer 핸들러: GET /shard (보유 호선별 남은 임대 시간)
+        """
+        return self.status()
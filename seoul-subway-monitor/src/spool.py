@@ -0,0 +1,203 @@
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime
+from .config import Config
+from .logger import get_logger
+from .metrics import DB_ERRORS
+
+log = get_logger("Spool")
+
+ACTIVE_SUFFIX = ".jsonl.gz.open"   # 기록 중인 세그먼트
+SEALED_SUFFIX = ".jsonl.gz"        # 기록이 끝나 DB 반영 대기 중인 세그먼트
+CHECKPOINT_FILE = "checkpoint.json"
+
+class WriteAheadSpool:
+    """
+    DB 적재 전에 변환된 행을 먼저 기록하는 로컬 쓰기 선행(write-ahead) 스풀
+    - 세그먼트 파일 단위 추가 전용(append-only) 압축 JSONL (append 1회 = gzip 멤버 1개)
+    - 크기/시간 기준으로 세그먼트를 교체(rotate)하고, 닫힌 세그먼트만 DB로 반영
+    - DB 반영 진행 상황은 checkpoint.json에 기록하여 재시작 시 이어서 처리
+    """
+
+    def __init__(self, spool_dir: str = None, segment_max_bytes: int = None, segment_max_seconds: float = None):
+        self.spool_dir = spool_dir or Config.SPOOL_DIR
+        self.segment_max_bytes = segment_max_bytes or Config.SPOOL_SEGMENT_MAX_BYTES
+        self.segment_max_seconds = segment_max_seconds or Config.SPOOL_SEGMENT_MAX_SECONDS
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._active_path = None
+        self._active_opened_at = None
+        self._sequence = 0
+
+        # 이전 실행에서 닫히지 못한 세그먼트는 바로 반영 대상으로 전환
+        for path in glob.glob(os.path.join(self.spool_dir, "*" + ACTIVE_SUFFIX)):
+            os.replace(path, path[:-len(".open")])
+
+    def _new_segment_path(self):
+        self._sequence += 1
+        name = f"segment-{datetime.now().strftime('%Y%m%d%H%M%S')}-{self._sequence:06d}"
+        return os.path.join(self.spool_dir, name + ACTIVE_SUFFIX)
+
+    def append(self, rows: list):
+        """
+        행 묶음을 현재 세그먼트에 추가합니다. (DB 상태와 무관하게 로컬 디스크에만 기록)
+        """
+        if not rows:
+            return
+        payload = "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+        with self._lock:
+            if self._active_path is None:
+                self._active_path = self._new_segment_path()
+                self._active_opened_at = time.monotonic()
+            with gzip.open(self._active_path, "ab") as f:
+                f.write(payload.encode("utf-8"))
+            if os.path.getsize(self._active_path) >= self.segment_max_bytes:
+                self._seal_locked()
+
+    def _seal_locked(self):
+        if self._active_path is not None:
+            os.replace(self._active_path, self._active_path[:-len(".open")])
+            self._active_path = None
+            self._active_opened_at = None
+
+    def seal(self, force: bool = False):
+        """
+        현재 세그먼트가 오래되었거나 force=True이면 닫아서 반영 대상으로 넘깁니다.
+        """
+        with self._lock:
+            if self._active_path is None:
+                return
+            if force or time.monotonic() - self._active_opened_at >= self.segment_max_seconds:
+                self._seal_locked()
+
+    def sealed_segments(self) -> list:
+        """
+        반영 대기 중인 세그먼트 경로 (생성 순서대로)
+        """
+        return sorted(glob.glob(os.path.join(self.spool_dir, "*" + SEALED_SUFFIX)))
+
+    def backlog_bytes(self) -> int:
+        return sum(os.path.getsize(path) for path in self.sealed_segments())
+
+    @staticmethod
+    def read_segment(path: str):
+        """
+        세그먼트의 행을 순서대로 읽습니다.
+        비정상 종료로 마지막 gzip 멤버가 잘린 경우 읽을 수 있는 곳까지만 반환합니다.
+        """
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        log.warning("Skipping corrupt line in {segment}", segment=os.path.basename(path))
+        except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+            log.warning("Truncated segment {segment}: {error}", segment=os.path.basename(path), error=str(e))
+
+    def load_checkpoint(self) -> dict:
+        path = os.path.join(self.spool_dir, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return {"segment": None, "rows_done": 0}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_checkpoint(self, segment: str, rows_done: int):
+        # 임시 파일에 쓴 뒤 교체하여 checkpoint가 깨지지 않도록 함
+        path = os.path.join(self.spool_dir, CHECKPOINT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segment": segment, "rows_done": rows_done}, f)
+        os.replace(tmp_path, path)
+
+class SpoolFlusher(threading.Thread):
+    """
+    스풀에 쌓인 세그먼트를 백그라운드에서 대량(batch)으로 DB에 반영하는 스레드
+    DB 장애 중에는 대기 후 재시도하며, 복구되면 밀린 세그먼트를 순서대로 일괄 적재합니다.
+    """
+
+    def __init__(self, spool: WriteAheadSpool, write_rows, batch_size: int = None, interval: float = None):
+        """
+        Args:
+            spool (WriteAheadSpool): 대상 스풀
+            write_rows (callable): 행 리스트를 DB에 적재하고 성공 여부(bool)를 반환하는 함수
+            batch_size (int): 한 번에 적재할 최대 행 수
+            interval (float): 반영 주기(초)
+        """
+        super().__init__(name="spool-flusher", daemon=True)
+        self.spool = spool
+        self.write_rows = write_rows
+        self.batch_size = batch_size or Config.SPOOL_FLUSH_BATCH_SIZE
+        self.interval = interval or Config.SPOOL_FLUSH_INTERVAL
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.flush_once()
+            except Exception as e:
+                DB_ERRORS.inc("spool_flush")
+                log.error("Flush failed: {error}", error=str(e))
+            self._stop_event.wait(self.interval)
+
+    def stop(self, flush: bool = True):
+        """
+        스레드를 멈추고, flush=True이면 남은 데이터를 마지막으로 한 번 반영합니다.
+        """
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        if flush:
+            self.spool.seal(force=True)
+            self.flush_once()
+
+    def flush_once(self) -> int:
+        """
+        닫힌 세그먼트를 순서대로 DB에 반영합니다.
+
+        Returns:
+            int: 이번에 적재한 행 수
+        """
+        self.spool.seal()
+        flushed = 0
+        checkpoint = self.spool.load_checkpoint()
+
+        for path in self.spool.sealed_segments():
+            segment = os.path.basename(path)
+            rows_done = checkpoint["rows_done"] if checkpoint["segment"] == segment else 0
+
+            batch = []
+            position = 0
+            for row in self.spool.read_segment(path):
+                position += 1
+                if position <= rows_done:
+                    continue # 이미 반영된 행은 건너뜀
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    if not self.write_rows(batch):
+                        return flushed # DB 장애: 다음 주기에 checkpoint부터 재시도
+                    flushed += len(batch)
+                    rows_done = position
+                    self.spool.save_checkpoint(segment, rows_done)
+                    batch = []
+
+            if batch:
+                if not self.write_rows(batch):
+                    return flushed
+                flushed += len(batch)
+                self.spool.save_checkpoint(segment, position)
+
+            # 세그먼트 전체 반영 완료
+            os.remove(path)
+            self.spool.save_checkpoint(None, 0)
+            checkpoint = {"segment": None, "rows_done": 0}
+
+        if flushed:
+            log.info("Flushed {rows} spooled records to DB.", rows=flushed)
+        return flushed
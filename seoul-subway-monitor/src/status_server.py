@@ -0,0 +1,91 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from .config import Config
+from .logger import get_logger
+
+log = get_logger("Status")
+
+class StatusServer:
+    """
+    수집기 내부 상태(히트맵 등)를 JSON으로 제공하는 로컬 HTTP 서버 (백그라운드 스레드)
+    경로별 핸들러를 등록하여 사용합니다: handler(path_params: list, query: dict) -> JSON 직렬화 가능한 객체
+    (문자열을 반환하면 text/plain으로 전송: Prometheus 지표 등)
+    """
+
+    def __init__(self, host: str = None, port: int = None):
+        self.host = host or Config.STATUS_SERVER_HOST
+        self.port = Config.STATUS_SERVER_PORT if port is None else port
+        self._routes = {}  # 경로 접두사 -> 핸들러
+        self._server = None
+        self._thread = None
+
+    def add_route(self, prefix: str, handler):
+        """
+        prefix로 시작하는 GET 요청을 handler로 처리합니다.
+        예: add_route("/heatmap", fn) → /heatmap, /heatmap/1002 (path_params=['1002'])
+        """
+        self._routes[prefix.rstrip("/")] = handler
+
+    def _resolve(self, path: str):
+        # 가장 긴 접두사 우선
+        for prefix in sorted(self._routes, key=len, reverse=True):
+            if path == prefix or path.startswith(prefix + "/"):
+                rest = path[len(prefix):].strip("/")
+                return self._routes[prefix], [part for part in rest.split("/") if part]
+        return None, None
+
+    def start(self):
+        if self._server is not None:
+            return
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                handler, params = server._resolve(url.path.rstrip("/") or "/")
+                if handler is None:
+                    self._send(404, {"error": "not found", "routes": sorted(server._routes)})
+                    return
+                try:
+                    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                    self._send(200, handler(params, query))
+                except KeyError as e:
+                    self._send(404, {"error": f"not found: {e}"})
+                except Exception as e:
+                    self._send(500, {"error": str(e)})
+
+            def _send(self, status, payload):
+                content_type = "application/json; charset=utf-8"
+                if isinstance(payload, str):
+                    body = payload.encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif isinstance(payload, bytes):
+                    body = payload
+                else:
+                    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 요청마다 로그를 남기지 않음
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="status-server", daemon=True)
+        self._thread.start()
+        log.info("Serving {routes} on http://{host}:{port}", routes=", ".join(sorted(self._routes)),
+                 host=self.host, port=self.port)
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
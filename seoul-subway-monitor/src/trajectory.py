@@ -0,0 +1,259 @@
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from .config import Config
+from .events import KST, parse_time
+
+# 궤적 레코드 한 건: (보고 시각 unix 초, 호선 내 역 번호, 상태 코드, 방향) = 14바이트
+RECORD_DTYPE = np.dtype([("t", "f8"), ("station", "i4"), ("status", "i1"), ("direction", "i1")])
+# 스냅샷/조회 응답에 함께 싣는 마지막 행의 필드
+CURRENT_FIELDS = ("station_id", "station_name", "train_status_code", "direction_type", "destination_station_id",
+                  "destination_station_name", "is_express", "is_last_train", "last_received_time")
+
+def _to_code(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+class TrainTrack:
+    """
+    열차 한 대의 궤적 링 버퍼 (NumPy 구조화 배열, 용량을 넘으면 가장 오래된 레코드부터 덮어씀)
+    역/상태/방향이 바뀔 때만 레코드를 추가하고, 같은 상태의 반복 폴링은 last_seen만 갱신합니다.
+    """
+    __slots__ = ("train_number", "records", "head", "size", "last_seen", "current")
+
+    def __init__(self, train_number, capacity: int):
+        self.train_number = train_number
+        self.records = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self.head = 0      # 다음에 쓸 위치
+        self.size = 0
+        self.last_seen = None  # 마지막 관측 시각 (unix 초)
+        self.current = None    # 마지막 행의 CURRENT_FIELDS
+
+    def append(self, t: float, station: int, status: int, direction: int) -> bool:
+        if self.size:
+            last = self.records[self.head - 1]
+            if last["station"] == station and last["status"] == status and last["direction"] == direction:
+                return False
+        self.records[self.head] = (t, station, status, direction)
+        self.head = (self.head + 1) % len(self.records)
+        self.size = min(self.size + 1, len(self.records))
+        return True
+
+    def ordered(self) -> np.ndarray:
+        """
+        오래된 순으로 정렬된 레코드 (버퍼가 한 바퀴 돌지 않았으면 복사 없는 view)
+        """
+        if self.size < len(self.records):
+            return self.records[:self.size]
+        return np.concatenate((self.records[self.head:], self.records[:self.head]))
+
+    def window(self, start: float = None, end: float = None) -> np.ndarray:
+        """
+        [start, end) 구간 레코드. 구간 시작 시점의 위치를 알 수 있도록 start 직전 레코드 하나를 포함합니다.
+        """
+        records = self.ordered()
+        lo = 0 if start is None else max(int(np.searchsorted(records["t"], start, side="right")) - 1, 0)
+        hi = len(records) if end is None else int(np.searchsorted(records["t"], end, side="left"))
+        return records[lo:hi]
+
+class TrajectoryStore:
+    """
+    실시간 열차 궤적 저장소: main.job이 매 tick 스냅샷 행을 넣고, 상태 서버가 DB 조회 없이 응답합니다.
+    - 열차별 링 버퍼(TrainTrack)에 최근 TRAJECTORY_HOURS 동안의 (시각, 역, 상태, 방향) 변경 이력 보관
+    - 역 ID/이름은 호선별 역 번호(int32)로 사전 인코딩
+    - 호선별 현재 스냅샷은 갱신될 때만 다시 만들어 두므로 조회는 dict 조회 한 번
+
+    조회:
+        train(line_id, train_number)  열차 현재 위치 + 최근 궤적 ("X 열차 지금 어디?")
+        snapshot(line_id)             호선 현재 운행 열차 목록
+        window(line_id, start, end)   구간 내 호선 전체 궤적 ("최근 30분간 2호선")
+    """
+
+    def __init__(self, hours: float = None, capacity: int = None):
+        self.retention = timedelta(hours=hours or Config.TRAJECTORY_HOURS)
+        self.capacity = capacity or Config.TRAJECTORY_CAPACITY
+        self._tracks = {}         # line_id -> {train_number: TrainTrack}
+        self._line_trains = {}    # line_id -> 마지막 스냅샷에 있던 열차 번호 set
+        self._stations = {}       # line_id -> {station_id: 역 번호}
+        self._station_rows = {}   # line_id -> [(station_id, station_name)] (역 번호 순)
+        self._snapshots = {}      # line_id -> 현재 스냅샷 캐시 (호선 갱신 시 무효화)
+        self._updated_at = {}     # line_id -> 마지막 갱신 시각
+        self._last_evicted_at = None
+        self._lock = threading.Lock()
+
+    def update(self, rows: list, observed_at: datetime = None) -> int:
+        """
+        한 tick의 스냅샷 행들을 반영합니다. 행이 있는 호선만 갱신합니다.
+
+        Returns:
+            int: 추가된 궤적 레코드 수 (역/상태/방향이 바뀐 열차 수)
+        """
+        now = parse_time(observed_at) or datetime.now(KST)
+        rows_by_line = {}
+        for row in rows:
+            rows_by_line.setdefault(row.get("line_id"), []).append(row)
+
+        appended = 0
+        with self._lock:
+            for line_id, line_rows in rows_by_line.items():
+                tracks = self._tracks.setdefault(line_id, {})
+                seen = set()
+                for row in line_rows:
+                    train_number = row.get("train_number")
+                    seen.add(train_number)
+                    # 열차가 실제로 보고한 시각(recptnDt) 우선 (EventExtractor와 같은 기준)
+                    at = parse_time(row.get("last_received_time")) or parse_time(row.get("created_at")) or now
+                    track = tracks.get(train_number)
+                    if track is None:
+                        track = tracks[train_number] = TrainTrack(train_number, self.capacity)
+                    t = at.timestamp()
+                    if track.last_seen is not None and t < track.last_seen:
+                        continue  # 이미 반영한 시각보다 이전 보고
+                    station = self._station_index(line_id, row.get("station_id"), row.get("station_name"))
+                    if track.append(t, station, _to_code(row.get("train_status_code")), _to_code(row.get("direction_type"))):
+                        appended += 1
+                    track.last_seen = t
+                    track.current = {field: row.get(field) for field in CURRENT_FIELDS}
+                self._line_trains[line_id] = seen
+                self._snapshots.pop(line_id, None)
+                self._updated_at[line_id] = now
+            self._evict(now)
+        return appended
+
+    def _station_index(self, line_id, station_id, station_name) -> int:
+        stations = self._stations.setdefault(line_id, {})
+        index = stations.get(station_id)
+        if index is None:
+            station_rows = self._station_rows.setdefault(line_id, [])
+            index = stations[station_id] = len(station_rows)
+            station_rows.append((station_id, station_name))
+        return index
+
+    def _evict(self, now: datetime):
+        # 보관 기간 동안 보이지 않은 열차 제거 (관측 시각 기준 1분에 한 번)
+        if self._last_evicted_at is not None and (now - self._last_evicted_at).total_seconds() < 60:
+            return
+        self._last_evicted_at = now
+        cutoff = (now - self.retention).timestamp()
+        for tracks in self._tracks.values():
+            for train_number in [number for number, track in tracks.items() if track.last_seen < cutoff]:
+                del tracks[train_number]
+
+    def _current(self, line_id, track: TrainTrack) -> dict:
+        entry = {"train_number": track.train_number, **track.current,
+                 "last_seen": datetime.fromtimestamp(track.last_seen, KST).isoformat()}
+        if track.size:
+            # 현재 역/상태에 머문 시작 시각
+            entry["since"] = datetime.fromtimestamp(float(track.records[track.head - 1]["t"]), KST).isoformat()
+        return entry
+
+    def lines(self) -> dict:
+        """
+        호선별 운행 열차 수, 보관 열차/레코드 수, 마지막 갱신 시각
+        """
+        with self._lock:
+            return {
+                line_id: {
+                    "active_trains": len(self._line_trains.get(line_id, ())),
+                    "tracked_trains": len(tracks),
+                    "records": sum(track.size for track in tracks.values()),
+                    "updated_at": self._updated_at[line_id].isoformat() if line_id in self._updated_at else None,
+                }
+                for line_id, tracks in self._tracks.items()
+            }
+
+    def snapshot(self, line_id: str) -> dict:
+        """
+        호선의 현재 운행 열차(마지막 스냅샷에 있던 열차) 위치. 호선 데이터가 없으면 KeyError
+        """
+        with self._lock:
+            cached = self._snapshots.get(line_id)
+            if cached is not None:
+                return cached
+            if line_id not in self._tracks:
+                raise KeyError(line_id)
+            tracks = self._tracks[line_id]
+            trains = [self._current(line_id, tracks[number])
+                      for number in sorted(self._line_trains.get(line_id, ())) if number in tracks]
+            cached = self._snapshots[line_id] = {
+                "line_id": line_id,
+                "updated_at": self._updated_at[line_id].isoformat(),
+                "trains": trains,
+            }
+            return cached
+
+    def train(self, line_id: str, train_number: str, minutes: float = None) -> dict:
+        """
+        열차 한 대의 현재 위치와 최근 minutes분(기본: 보관 기간 전체) 궤적. 열차가 없으면 KeyError
+        """
+        with self._lock:
+            track = self._tracks.get(line_id, {}).get(train_number)
+            if track is None:
+                raise KeyError(f"{line_id}/{train_number}")
+            start = None if minutes is None else track.last_seen - minutes * 60
+            records = track.window(start)
+            return {
+                "line_id": line_id,
+                "active": train_number in self._line_trains.get(line_id, ()),
+                **self._current(line_id, track),
+                "trajectory": self._columns(line_id, records),
+            }
+
+    def window(self, line_id: str, start=None, end=None, minutes: float = None) -> dict:
+        """
+        [start, end) 구간의 호선 전체 궤적 (열차별 열 형식). minutes가 주어지면 마지막 갱신 기준 최근 minutes분
+        """
+        with self._lock:
+            if line_id not in self._tracks:
+                raise KeyError(line_id)
+            end_at = parse_time(end)
+            start_at = parse_time(start)
+            if minutes is not None:
+                end_at = end_at or self._updated_at[line_id]
+                start_at = end_at - timedelta(minutes=minutes)
+            start_t = start_at.timestamp() if start_at is not None else None
+            end_t = end_at.timestamp() if end_at is not None else None
+            trains = []
+            for number, track in sorted(self._tracks[line_id].items()):
+                if start_t is not None and track.last_seen < start_t:
+                    continue
+                records = track.window(start_t, end_t)
+                if len(records):
+                    trains.append({"train_number": number, **self._columns(line_id, records)})
+            return {
+                "line_id": line_id,
+                "start": start_at.isoformat() if start_at is not None else None,
+                "end": end_at.isoformat() if end_at is not None else None,
+                "trains": trains,
+            }
+
+    def _columns(self, line_id, records: np.ndarray) -> dict:
+        # 열 형식 응답 (times는 unix 초, 역은 ID와 이름)
+        station_rows = self._station_rows.get(line_id, [])
+        stations = records["station"].tolist()
+        return {
+            "times": records["t"].tolist(),
+            "station_ids": [station_rows[index][0] for index in stations],
+            "station_names": [station_rows[index][1] for index in stations],
+            "status": records["status"].tolist(),
+            "direction": records["direction"].tolist(),
+        }
+
+    def handle_request(self, params: list, query: dict):
+        """
+        StatusServer 핸들러
+        - /trains: 호선별 요약
+        - /trains/<line_id>: 호선 현재 스냅샷
+        - /trains/<line_id>/<train_number>?minutes=30: 열차 현재 위치 + 궤적
+        - /trains/<line_id>/window?minutes=30 또는 ?start=...&end=...: 호선 구간 궤적
+        """
+        minutes = float(query["minutes"]) if "minutes" in query else None
+        if not params:
+            return self.lines()
+        if len(params) == 1:
+            return self.snapshot(params[0])
+        if params[1] == "window":
+            return self.window(params[0], query.get("start"), query.get("end"), minutes)
+        return self.train(params[0], params[1], minutes)
@@ -0,0 +1,69 @@
+import random
+from datetime import datetime
+from src.baselines import METRIC_DWELL, BaselineStore, QuantileSketch
+from src.events import KST
+
+ALPHA = 0.02
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+
+def _exact_quantile(values, q):
+    # QuantileSketch.quantile과 같은 순위 정의 (rank = q * (n - 1)의 아래쪽 표본)
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+def test_quantile_relative_error():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(4, 1) for _ in range(20000)]
+    sketch = QuantileSketch(GAMMA)
+    for value in values:
+        sketch.add(value)
+
+    assert sketch.count == len(values)
+    for q in (0.5, 0.9, 0.95, 0.99):
+        exact = _exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= ALPHA * exact
+
+def test_quantile_small_values_and_empty():
+    assert QuantileSketch(GAMMA).quantile(0.5) is None
+    sketch = QuantileSketch(GAMMA)
+    for value in (0, 0.1, 0.2, 100):
+        sketch.add(value)
+    assert sketch.quantile(0.5) == 0.0
+    assert abs(sketch.quantile(1.0) - 100) <= ALPHA * 100
+
+def test_merge_equals_single_sketch():
+    rng = random.Random(11)
+    values = [rng.uniform(1, 600) for _ in range(5000)] + [0.0] * 50
+    whole = QuantileSketch(GAMMA)
+    parts = [QuantileSketch(GAMMA) for _ in range(3)]
+    for i, value in enumerate(values):
+        whole.add(value)
+        parts[i % 3].add(value)
+
+    merged = QuantileSketch(GAMMA)
+    for part in parts:
+        merged.merge(part)
+
+    assert merged.to_list() == whole.to_list()
+    assert merged.count == whole.count
+    for q in (0.01, 0.5, 0.95):
+        assert merged.quantile(q) == whole.quantile(q)
+
+def test_store_round_trip(tmp_path):
+    path = str(tmp_path / "baselines.json.gz")
+    store = BaselineStore(path, relative_accuracy=ALPHA, min_samples=5)
+    monday_8am = datetime(2026, 10, 19, 8, 15, tzinfo=KST)
+    for i in range(40):
+        store.add(METRIC_DWELL, "1002", "1002000201", 0, monday_8am, 20 + i, station_name="시청")
+    store.save()
+
+    loaded = BaselineStore.load(path)
+    assert len(loaded) == len(store)
+    assert loaded.relative_accuracy == ALPHA
+    assert (loaded.threshold(METRIC_DWELL, "1002", "1002000201", 0, monday_8am, 0.95)
+            == store.threshold(METRIC_DWELL, "1002", "1002000201", 0, monday_8am, 0.95))
+    assert loaded.summary(METRIC_DWELL, "1002")[0]["station_name"] == "시청"
+
+def test_load_missing_file_is_empty(tmp_path):
+    store = BaselineStore.load(str(tmp_path / "missing.json.gz"))
+    assert len(store) == 0
@@ -0,0 +1,54 @@
+import random
+import statistics
+from collections import deque
+from datetime import datetime, timedelta
+from src.events import EVENT_ARRIVE, EVENT_DEPART, EVENT_ENTER, KST
+from src.headway_monitor import ALERT_BUNCHING, HeadwayMonitor, RollingStats
+
+def test_rolling_stats_matches_window():
+    rng = random.Random(3)
+    stats, window = RollingStats(), deque()
+    for _ in range(500):
+        value = rng.uniform(60, 600)
+        window.append(value)
+        stats.add(value)
+        if len(window) > 20:
+            stats.remove(window.popleft())
+        assert stats.count == len(window)
+        assert abs(stats.mean - statistics.fmean(window)) < 1e-6
+        expected_std = statistics.stdev(window) if len(window) > 1 else 0.0
+        assert abs(stats.std - expected_std) < 1e-6
+
+def test_rolling_stats_remove_last_value_resets():
+    stats = RollingStats()
+    stats.add(120.0)
+    stats.remove(120.0)
+    assert (stats.count, stats.mean, stats.std) == (0, 0.0, 0.0)
+
+def _event(event_type, train, minute, second=0):
+    at = datetime(2026, 10, 19, 8, 0, tzinfo=KST) + timedelta(minutes=minute, seconds=second)
+    return {"event_type": event_type, "line_id": "1002", "station_id": "S", "station_name": "역S",
+            "direction_type": 0, "train_number": str(train),
+            "visit_id": f"1002:{train}:S:{int(at.timestamp())}", "event_time": at.isoformat()}
+
+def test_headway_uses_first_observation_of_each_visit():
+    monitor = HeadwayMonitor(window=10, bunching_seconds=60, gap_seconds=900, reset_seconds=3600, min_samples=3)
+    events = []
+    for train in range(4):
+        enter = _event(EVENT_ENTER, train, train * 5)
+        events.append(enter)
+        # 30초 폴링에서 도착 상태가 누락된 열차(2번)도 진입/출발로 간격 계산
+        if train != 2:
+            events.append(dict(_event(EVENT_ARRIVE, train, train * 5, 30), visit_id=enter["visit_id"]))
+        events.append(dict(_event(EVENT_DEPART, train, train * 5, 50), visit_id=enter["visit_id"]))
+
+    assert monitor(events) == []
+    (snapshot,) = monitor.snapshot()
+    assert snapshot["count"] == 3
+    assert snapshot["mean"] == 300.0
+
+def test_headway_bunching_alert():
+    monitor = HeadwayMonitor(window=10, bunching_seconds=60, gap_seconds=900, reset_seconds=3600, min_samples=3)
+    alerts = monitor([_event(EVENT_ARRIVE, 1, 0), _event(EVENT_ARRIVE, 2, 0, 40)])
+    assert [alert["alert_type"] for alert in alerts] == [ALERT_BUNCHING]
+    assert alerts[0]["headway_seconds"] == 40.0
@@ -0,0 +1,35 @@
+from src.sharding import assign_lines
+
+LINES = ["1호선", "2호선", "3호선", "4호선", "5호선", "6호선", "7호선", "8호선", "9호선",
+         "경의중앙선", "공항철도", "경춘선", "수인분당선", "신분당선"]
+
+def test_assign_lines_is_balanced_and_complete():
+    for worker_count in range(1, 6):
+        workers = [f"worker-{i}" for i in range(worker_count)]
+        assignment = assign_lines(LINES, workers)
+
+        assigned = [line for lines in assignment.values() for line in lines]
+        assert sorted(assigned) == sorted(LINES)
+        # 작업자당 최대 ceil(호선 수 / 작업자 수)개
+        assert max(len(lines) for lines in assignment.values()) <= -(-len(LINES) // worker_count)
+
+def test_assign_lines_fills_every_worker_when_divisible():
+    assignment = assign_lines(LINES, ["a", "b"])
+    assert [len(lines) for lines in assignment.values()] == [7, 7]
+    assignment = assign_lines(LINES[:12], ["a", "b", "c", "d"])
+    assert [len(lines) for lines in assignment.values()] == [3, 3, 3, 3]
+
+def test_assign_lines_is_deterministic():
+    workers = ["b", "a", "c"]
+    assert assign_lines(LINES, workers) == assign_lines(LINES, list(reversed(workers)))
+
+def test_assign_lines_keeps_most_lines_when_a_worker_leaves():
+    before = assign_lines(LINES, ["a", "b", "c", "d"])
+    after = assign_lines(LINES, ["a", "b", "c"])
+    owner = {line: worker for worker, lines in after.items() for line in lines}
+    kept = sum(owner[line] == worker for worker, lines in before.items() if worker != "d" for line in lines)
+    moved_from_survivors = sum(len(lines) for worker, lines in before.items() if worker != "d") - kept
+    assert moved_from_survivors <= 2
+
+def test_assign_lines_without_workers():
+    assert assign_lines(LINES, []) == {}
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from src.analysis.topology import FORWARD_DIRECTION, TopologyIndex, build_topology
+
+START = datetime(2026, 10, 19, 6, 0, tzinfo=timezone.utc)
+
+def _positions(routes: list, line_id: str = "1002", repeat: int = 5) -> pd.DataFrame:
+    """
+    열차마다 route의 역을 1분 간격으로 지나는 위치 스냅샷 (정방향은 route 순서, 역방향은 뒤집어서)
+    """
+    rows = []
+    train = 0
+    for route in routes:
+        for _ in range(repeat):
+            for direction, stations in ((FORWARD_DIRECTION, route), (1 - FORWARD_DIRECTION, route[::-1])):
+                train += 1
+                for step, station_id in enumerate(stations):
+                    rows.append({
+                        "line_id": line_id,
+                        "train_number": str(train),
+                        "direction_type": direction,
+                        "station_id": station_id,
+                        "station_name": f"역{station_id}",
+                        "created_at": (START + timedelta(minutes=train * 100 + step)).isoformat(),
+                    })
+    return pd.DataFrame(rows)
+
+def test_linear_line_with_fork():
+    trunk = ["A", "B", "C", "D", "E", "F"]
+    branch = ["A", "B", "C", "X", "Y"]
+    topology = build_topology(_positions([trunk, branch]))["1002"]
+
+    assert not topology.is_loop
+    assert len(topology) == 8
+    assert [topology.position(station) for station in trunk] == [0, 1, 2, 3, 4, 5]
+    assert {topology.branch(station) for station in trunk} == {0}
+    assert topology.branch("X") == topology.branch("Y") > 0
+    assert (topology.position("X"), topology.position("Y")) == (3, 4)
+    assert sorted(topology.next_stations("C")) == ["D", "X"]
+    assert sorted(topology.terminals()) == ["F", "Y"]
+    assert topology.terminals(1 - FORWARD_DIRECTION) == ["A"]
+    assert topology.distance("B", "Y") == 3
+
+def test_loop_line():
+    stations = [f"S{i:02d}" for i in range(1, 11)]
+    # 순환선 열차는 한 바퀴를 넘어 계속 운행
+    topology = build_topology(_positions([stations + stations[:3]]))["1002"]
+
+    assert topology.is_loop
+    assert len(topology) == 10
+    assert topology.loop_length == 10
+    assert topology.terminals() == []
+    assert topology.next_stations("S10") == ["S01"]
+    assert topology.distance("S10", "S01") == 1
+    assert topology.distance("S01", "S10", 1 - FORWARD_DIRECTION) == 1
+
+def test_index_save_merges_lines_from_other_instances(tmp_path):
+    path = str(tmp_path / "topology.json")
+    first, second = TopologyIndex(path), TopologyIndex(path)
+    first.lines.update(build_topology(_positions([["A", "B", "C"]], line_id="1001")))
+    second.lines.update(build_topology(_positions([["P", "Q", "R"]], line_id="1003")))
+    first.save()
+    second.save()
+
+    assert sorted(TopologyIndex(path).lines) == ["1001", "1003"]
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from src.analysis.frame_loader import load_positions_frame
+from src.analysis.turnaround_engine import KIND_LAYOVER, KIND_MID_LINE, KIND_TERMINAL, detect_turnarounds
+
+START = datetime(2026, 10, 19, 0, 0, tzinfo=timezone.utc)  # 한국 시간 09:00
+
+def _row(train, minute, station_id, direction, status, destination):
+    return {"train_number": train, "station_id": station_id, "station_name": f"역{station_id}",
+            "direction_type": direction, "train_status_code": status, "destination_station_id": destination,
+            "created_at": (START + timedelta(minutes=minute)).isoformat()}
+
+def _trip(train, start_minute, stations, direction, destination):
+    # 역마다 도착(1) → 1분 뒤 출발(2)
+    rows = []
+    minute = start_minute
+    for station_id in stations:
+        rows.append(_row(train, minute, station_id, direction, 1, destination))
+        rows.append(_row(train, minute + 1, station_id, direction, 2, destination))
+        minute += 2
+    return rows
+
+def test_terminal_turnaround():
+    rows = _trip("1001", 0, ["A", "B", "C"], 1, "C")[:-1]           # C 도착 (출발 전)
+    rows.append(_row("1001", 10, "C", 0, 1, "A"))                    # 방향 전환 (회차 대기)
+    rows.append(_row("1001", 12, "C", 0, 2, "A"))                    # 반대 방향 출발
+    rows += _trip("1001", 14, ["B", "A"], 0, "A")
+    result = detect_turnarounds(load_positions_frame(rows), offset=5400)
+
+    assert len(result) == 1
+    turnaround = result.iloc[0]
+    assert turnaround["station_id"] == "C"
+    assert turnaround["kind"] == KIND_TERMINAL
+    assert (turnaround["direction_type"], turnaround["departure_direction"]) == (1, 0)
+    assert turnaround["turnaround_seconds"] == 8 * 60  # 4분 도착 → 12분 출발
+    assert turnaround["hour"] == 9
+
+def test_mid_line_and_layover():
+    mid_line = _trip("2001", 0, ["A", "B"], 1, "D") + _trip("2001", 6, ["B", "A"], 0, "A")
+    # 종착역에서 방향을 바꾼 뒤 1시간 넘게 대기 (대기 중에도 10분마다 관측되므로 운행은 끊기지 않음)
+    layover = (_trip("3001", 0, ["A", "B", "C"], 1, "C")[:-1]
+               + [_row("3001", minute, "C", 0, 1, "A") for minute in range(10, 80, 10)]
+               + _trip("3001", 80, ["C", "B"], 0, "A"))
+    result = detect_turnarounds(load_positions_frame(mid_line + layover), offset=5400)
+
+    kinds = dict(zip(result["train_number"], result["kind"]))
+    assert kinds == {"2001": KIND_MID_LINE, "3001": KIND_LAYOVER}
+
+def test_terminal_from_topology_without_destination():
+    rows = _trip("4001", 0, ["A", "B"], 1, None) + _trip("4001", 6, ["B", "A"], 0, None)
+    result = detect_turnarounds(load_positions_frame(rows), terminals={"B"}, offset=5400)
+    assert list(result["kind"]) == [KIND_TERMINAL]
+
+def test_no_direction_change():
+    rows = _trip("5001", 0, ["A", "B", "C"], 1, "C")
+    assert detect_turnarounds(load_positions_frame(rows), offset=5400).empty
+    assert detect_turnarounds(pd.DataFrame(), offset=5400).empty
@@ -1,11 +1,22 @@
 import os
+import glob
+import gzip
+import json
+import random
+import zlib
 import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote
 import psycopg2
-from psycopg2.extras import execute_values
 from datetime import datetime
 from dotenv import load_dotenv
 import time
 
+# Vendored copies of seoul-subway-monitor's row codec and COPY loader, so both
+# collectors write the same canonical schema without importing each other.
+from row_codec import COLUMNS, encode_rows
+from copy_loader import CopyLoader
+
 # Load environment variables
 load_dotenv()
 
@@ -13,7 +24,7 @@ API_KEY = os.getenv("SUBWAY_API_KEY", "sample")
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 # API Configuration
-BASE_URL = "http://swopenapi.seoul.go.kr/api/subway"
+BASE_URL = os.getenv("SUBWAY_API_BASE_URL", "http://swopenapi.seoul.go.kr/api/subway")
 SERVICE = "realtimePosition"
 TYPE = "json"
 
@@ -24,82 +35,269 @@ TARGET_LINES = [
     "경의중앙선", "공항철도", "경춘선", "수인분당선", "신분당선", "우이신설선"
 ]
 
+# HTTP client configuration
+CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "10"))
+MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "2"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 4.0
+PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "100"))
+MAX_PAGES = 10
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Shared keep-alive session so every line reuses the same pooled connection.
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=0))
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=0))
+
+def get_json(url):
+    """
+    GET a URL with explicit connect/read timeouts.
+    Retries only on connection errors, timeouts and 429/5xx responses,
+    sleeping with full-jitter exponential backoff between attempts.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        try:
+            response = session.get(url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            if response.status_code not in RETRYABLE_STATUS_CODES or last_attempt:
+                response.raise_for_status()
+                return response.json()
+            reason = f"HTTP {response.status_code}"
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if last_attempt:
+                raise
+            reason = str(e)
+
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+        print(f"Retrying after {reason} (attempt {attempt + 1}/{MAX_RETRIES}, sleeping {delay:.2f}s)")
+        time.sleep(delay)
+
+def extract_total_count(data, page):
+    """
+    Total row count of the result set. Depending on the service it is reported as
+    list_total_count, errorMessage.total or a per-row totalCount.
+    """
+    if data.get("list_total_count") is not None:
+        return int(data["list_total_count"])
+    error_message = data.get("errorMessage")
+    if isinstance(error_message, dict) and error_message.get("total") is not None:
+        return int(error_message["total"])
+    if page and page[0].get("totalCount") is not None:
+        return int(page[0]["totalCount"])
+    return None
+
 def fetch_realtime_data(line_name):
     """
     Fetch real-time position data for a specific line.
+    Pages through the result set until the reported total count is reached,
+    so lines with more than PAGE_SIZE trains are not truncated.
     """
-    # Requesting 0 to 100 items (assuming usually < 100 trains per line at once)
-    # If total count > 100, might need paging, but realtimePosition usually fits in one batch per line or allows large request.
     start_index = 0
-    end_index = 100
-    
-    # URL Encoding for line name might be handled by requests, but let's be safe.
-    url = f"{BASE_URL}/{API_KEY}/{TYPE}/{SERVICE}/{start_index}/{end_index}/{line_name}"
-    
+    end_index = PAGE_SIZE
+    rows = []
+    total = None
+
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        if "realtimePositionList" in data:
-            return data["realtimePositionList"]
-        else:
-            if "RESULT" in data:
-                 print(f"Info for {line_name}: {data['RESULT']['MESSAGE']}")
-            return []
+        for _ in range(MAX_PAGES):
+            # URL Encoding for line name might be handled by requests, but let's be safe.
+            url = f"{BASE_URL}/{API_KEY}/{TYPE}/{SERVICE}/{start_index}/{end_index}/{quote(line_name)}"
+            data = get_json(url)
+
+            if "realtimePositionList" not in data:
+                if not rows and "RESULT" in data:
+                    print(f"Info for {line_name}: {data['RESULT']['MESSAGE']}")
+                break
+
+            page = data["realtimePositionList"]
+            rows.extend(page)
+            if total is None:
+                total = extract_total_count(data, page)
+            if not page or total is None or len(rows) >= total:
+                break
+
+            start_index, end_index = end_index + 1, end_index + PAGE_SIZE
+
+        return rows
             
     except Exception as e:
         print(f"Error fetching data for {line_name}: {e}")
         return []
 
+# Change-data-capture: only rows whose train state changed since the previous
+# snapshot are written. State is kept per line as {train_number: signature}.
+# Each run collects one tick and exits, so the state is saved to a small file
+# next to the spool and loaded again by the next run.
+CDC_ENABLED = os.getenv("CDC_ENABLED", "true").lower() == "true"
+CDC_KEYFRAME_INTERVAL = int(os.getenv("CDC_KEYFRAME_INTERVAL", "0"))  # 0 = no keyframes
+# Tuple positions of station_id, last_received_time, direction_type,
+# destination_station_id and train_status_code in a parsed row.
+STATE_FIELDS = (2, 6, 7, 8, 10)
+
+train_state = {}
+snapshot_counts = {}
+cdc_stats = {"written": 0, "suppressed": 0, "keyframes": 0}
+
+def filter_changed(values):
+    """
+    Drop rows whose (station, status, receive time, direction, destination)
+    is identical to the last snapshot of the same (line_id, train_number).
+    Every CDC_KEYFRAME_INTERVAL-th snapshot of a line is written in full.
+    """
+    rows_by_line = {}
+    for row in values:
+        rows_by_line.setdefault(row[0], []).append(row)
+
+    changed = []
+    for line_id, rows in rows_by_line.items():
+        snapshot_counts[line_id] = snapshot_counts.get(line_id, 0) + 1
+        keyframe = bool(CDC_KEYFRAME_INTERVAL) and snapshot_counts[line_id] % CDC_KEYFRAME_INTERVAL == 0
+        if keyframe:
+            cdc_stats["keyframes"] += 1
+
+        previous = train_state.get(line_id, {})
+        current = {}
+        for row in rows:
+            signature = tuple(row[i] for i in STATE_FIELDS)
+            current[row[4]] = signature
+            if keyframe or previous.get(row[4]) != signature:
+                changed.append(row)
+        # Trains missing from this snapshot are forgotten, keeping state bounded.
+        train_state[line_id] = current
+
+    cdc_stats["written"] += len(changed)
+    cdc_stats["suppressed"] += len(values) - len(changed)
+    return changed
+
+def load_cdc_state():
+    """
+    Restore the train state and snapshot counters saved by the previous run.
+    A missing or unreadable file starts from empty state (the next snapshot is
+    then written in full).
+    """
+    path = os.path.join(SPOOL_DIR, CDC_STATE_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable CDC state {path}: {e}")
+        return
+    train_state.clear()
+    for line_id, trains in saved.get("train_state", {}).items():
+        train_state[line_id] = {train: tuple(signature) for train, signature in trains.items()}
+    snapshot_counts.clear()
+    snapshot_counts.update(saved.get("snapshot_counts", {}))
+
+def save_cdc_state():
+    """
+    Save the train state for the next run. Written to a temporary file and then
+    renamed, so a crash never leaves a half-written state file.
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    path = os.path.join(SPOOL_DIR, CDC_STATE_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"train_state": train_state, "snapshot_counts": snapshot_counts}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+# Local write-ahead spool used while the database is unreachable.
+# One gzip member per append, one segment file per collector run.
+SPOOL_DIR = os.getenv("SPOOL_DIR", "spool")
+CDC_STATE_FILE = "cdc_state.json"
+spool_segment = None
+
+def parse_rows(raw_data):
+    """
+    Parse raw API data into insert tuples (column order of row_codec.COLUMNS).
+    """
+    return encode_rows(raw_data)
+
+def spool_rows(values):
+    """
+    Append rows to the local spool, stamped with the collection time so that
+    created_at reflects when the data was fetched, not when it is replayed.
+    """
+    global spool_segment
+    if not values:
+        return
+    if spool_segment is None:
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        spool_segment = os.path.join(SPOOL_DIR, f"segment-{datetime.now().strftime('%Y%m%d%H%M%S')}.jsonl.gz")
+
+    created_at = datetime.now().astimezone().isoformat()
+    payload = "".join(json.dumps(list(row) + [created_at], ensure_ascii=False) + "\n" for row in values)
+    with gzip.open(spool_segment, "ab") as f:
+        f.write(payload.encode("utf-8"))
+    print(f"Spooled {len(values)} records to {spool_segment}.")
+
+def replay_spool(conn):
+    """
+    Bulk-load every spooled segment, oldest first. A segment is deleted only
+    after its rows are committed, so an interrupted replay is simply retried.
+    Returns the number of rows replayed.
+    """
+    loader = CopyLoader(conn=conn)
+    replayed = 0
+    for path in sorted(glob.glob(os.path.join(SPOOL_DIR, "segment-*.jsonl.gz"))):
+        rows = []
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    rows.append(tuple(json.loads(line)))
+        except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError) as e:
+            # A crash mid-append leaves a truncated tail; keep what was readable.
+            print(f"Truncated spool segment {path}: {e}")
+
+        loader.load(rows, COLUMNS + ("created_at",))
+        os.remove(path)
+        replayed += len(rows)
+        print(f"Replayed {len(rows)} spooled records from {path}.")
+    return replayed
+
+def insert_rows(conn, values):
+    """
+    Load parsed rows with a single COPY in one transaction. Returns True on success.
+    """
+    try:
+        CopyLoader(conn=conn).load(values)
+    except Exception as e:
+        print(f"Insert failed: {e}")
+        return False
+    print(f"Inserted {len(values)} records.")
+    return True
+
 def parse_and_insert(conn, raw_data):
     """
     Parse raw API data and insert into the database.
+    Returns the number of rows written (inserted or spooled).
     """
     if not raw_data:
-        return
+        return 0
+    return write_values(conn, parse_rows(raw_data))
 
-    query = """
-        INSERT INTO realtime_subway_positions (
-            line_id, line_name, station_id, station_name, train_number,
-            last_received_date, last_received_time, direction_type,
-            destination_station_id, destination_station_name, train_status_code,
-            is_express, is_last_train
-        ) VALUES %s
-    """
-    
-    values = []
-    for item in raw_data:
-        try:
-            # Map fields
-            recptn_dt = item.get("recptnDt") 
-            # API returns generic date string, sometimes needs parsing or is DB compatible directly if ISO.
-            # Seoul API usually returns '2024-01-01 12:00:00'. Postgres TIMESTAMP handles this fine.
-            
-            row = (
-                item.get("subwayId"),
-                item.get("subwayNm"),
-                item.get("statnId"),
-                item.get("statnNm"),
-                item.get("trainNo"),
-                item.get("lastRecptnDt"),
-                recptn_dt,
-                int(item.get("updnLine")) if item.get("updnLine").isdigit() else 0,
-                item.get("statnTid"),
-                item.get("statnTnm"),
-                int(item.get("trainSttus")) if item.get("trainSttus") and item.get("trainSttus").isdigit() else None,
-                True if item.get("directAt") == "1" or item.get("directAt") == "7" else False,
-                True if item.get("lstcarAt") == "1" else False
-            )
-            values.append(row)
-        except Exception as e:
-            print(f"Error parsing item {item}: {e}")
-
-    if values:
-        with conn.cursor() as cur:
-            execute_values(cur, query, values)
-            conn.commit()
-        print(f"Inserted {len(values)} records.")
+def write_values(conn, values):
+    """
+    Apply the CDC filter and load the rows. When there is no connection or the
+    load fails, rows go to the local spool instead.
+    Returns the number of rows written (inserted or spooled).
+    """
+    if CDC_ENABLED:
+        parsed_count = len(values)
+        values = filter_changed(values)
+        if parsed_count and not values:
+            print("No state changes, nothing to insert.")
+
+    if values and (conn is None or not insert_rows(conn, values)):
+        spool_rows(values)
+
+    # Saved only after the rows are inserted or spooled, so a crash before that
+    # point leaves the previous state and the next run writes the rows again.
+    if CDC_ENABLED:
+        save_cdc_state()
+
+    return len(values)
 
 def main():
     if not DATABASE_URL:
@@ -110,25 +308,41 @@ def main():
         conn = psycopg2.connect(DATABASE_URL)
         print("Connected to Database.")
     except Exception as e:
-        print(f"Database connection failed: {e}")
-        return
+        # Keep collecting: rows are spooled locally and replayed on the next run.
+        print(f"Database connection failed, spooling locally: {e}")
+        conn = None
 
     try:
-        total_records = 0
+        if conn is not None:
+            try:
+                replay_spool(conn)
+            except Exception as e:
+                print(f"Spool replay failed, will retry next run: {e}")
+                conn.rollback()
+
+        if CDC_ENABLED:
+            load_cdc_state()
+
+        # Collect every line first, then load the whole tick in one transaction.
+        tick_values = []
         for line in TARGET_LINES:
             print(f"Fetching {line}...")
             data = fetch_realtime_data(line)
             if data:
-                parse_and_insert(conn, data)
-                total_records += len(data)
-            # Sleep briefly to avoid hitting rate limits if any
-            time.sleep(0.5)
-            
+                tick_values.extend(parse_rows(data))
+            # No pause between lines: request volume is bounded by how often this
+            # script runs, and a fixed sleep only spread one tick over ~7 seconds.
+
+        total_records = write_values(conn, tick_values) if tick_values else 0
+
         print(f"Job Initialized. Total records inserted: {total_records}")
+        if CDC_ENABLED:
+            print(f"CDC: {cdc_stats['written']} rows written, {cdc_stats['suppressed']} unchanged rows suppressed.")
 
     finally:
-        conn.close()
-        print("Database connection closed.")
+        if conn is not None:
+            conn.close()
+            print("Database connection closed.")
 
 if __name__ == "__main__":
     main()
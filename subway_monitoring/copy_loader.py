@@ -0,0 +1,58 @@
+"""
+PostgreSQL COPY FROM STDIN bulk loader.
+
+Vendored copy of seoul-subway-monitor/src/copy_loader.py without its Config
+dependency: pass a DSN or an open connection.
+"""
+import io
+import os
+import psycopg2
+from row_codec import COLUMNS, write_csv
+
+class CopyLoader:
+    """
+    Writes rows to an in-memory CSV buffer and sends them with a single COPY,
+    which keeps the per-row cost far below execute_values.
+    """
+
+    def __init__(self, dsn=None, table_name="realtime_subway_positions", conn=None):
+        self.dsn = dsn or os.getenv("DATABASE_URL")
+        self.table_name = table_name
+        self.conn = conn
+
+    def _connection(self):
+        # Reconnect when there is no connection or it was closed.
+        if self.conn is None or self.conn.closed:
+            self.conn = psycopg2.connect(self.dsn)
+        return self.conn
+
+    def close(self):
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+
+    def load(self, rows, columns=None):
+        """
+        Load rows (tuples in `columns` order, or dicts) with one COPY in one
+        transaction. Defaults to the canonical columns, plus created_at when
+        dict rows carry it. Returns the number of rows loaded; on failure the
+        transaction is rolled back and the error is raised.
+        """
+        if not rows:
+            return 0
+        if columns is None:
+            columns = COLUMNS
+            if isinstance(rows[0], dict) and "created_at" in rows[0]:
+                columns = COLUMNS + ("created_at",)
+
+        buffer = write_csv(rows, columns, io.StringIO())
+        sql = f"COPY {self.table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+
+        conn = self._connection()
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert(sql, buffer)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(rows)
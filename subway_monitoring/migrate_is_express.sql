@@ -0,0 +1,19 @@
+-- Convert realtime_subway_positions.is_express from BOOLEAN to the SMALLINT
+-- directAt code (0: local, 1: express, 7: special express) written by row_codec.py.
+-- Rows stored as BOOLEAN no longer know express from special express; true becomes 1.
+--
+-- Stop the collector and let it replay its spool first: spooled rows from the
+-- previous version carry true/false and cannot be COPYed into SMALLINT.
+--   psql "$DATABASE_URL" -f migrate_is_express.sql
+-- Safe to run more than once.
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'realtime_subway_positions'
+          AND column_name = 'is_express') = 'boolean' THEN
+        ALTER TABLE realtime_subway_positions
+            ALTER COLUMN is_express TYPE SMALLINT USING CASE WHEN is_express THEN 1 ELSE 0 END;
+        RAISE NOTICE 'Converted realtime_subway_positions.is_express to SMALLINT';
+    END IF;
+END;
+$$;
@@ -0,0 +1,89 @@
+"""
+Seoul realtime position API item -> realtime_subway_positions row codec.
+
+Vendored copy of seoul-subway-monitor/src/row_codec.py (the two collectors are
+deployed separately). Keep FIELD_SPECS and the conversion rules in sync with it
+so both collectors write the same canonical schema. Standard library only.
+"""
+import csv
+import io
+
+# Python expression template per conversion kind ({field}: API field name)
+# - text: empty strings become NULL
+# - int_or_zero / int_or_none: non-numeric strings become 0 / NULL
+# - flag: '1' -> True
+_EXPRESSIONS = {
+    "text": "(get({field!r}) or None)",
+    "int_or_zero": "(int(v) if (v := get({field!r})) and v.isdigit() else 0)",
+    "int_or_none": "(int(v) if (v := get({field!r})) and v.isdigit() else None)",
+    "flag": "(get({field!r}) == '1')",
+}
+
+# (DB column, API field, conversion kind) in canonical column order
+FIELD_SPECS = (
+    ("line_id", "subwayId", "text"),
+    ("line_name", "subwayNm", "text"),
+    ("station_id", "statnId", "text"),
+    ("station_name", "statnNm", "text"),
+    ("train_number", "trainNo", "text"),
+    ("last_received_date", "lastRecptnDt", "text"),
+    ("last_received_time", "recptnDt", "text"),
+    ("direction_type", "updnLine", "int_or_zero"),
+    ("destination_station_id", "statnTid", "text"),
+    ("destination_station_name", "statnTnm", "text"),
+    ("train_status_code", "trainSttus", "int_or_none"),
+    ("is_express", "directAt", "int_or_zero"),  # 0: local, 1: express, 7: special express (code kept as is)
+    ("is_last_train", "lstcarAt", "flag"),
+)
+
+COLUMNS = tuple(column for column, _, _ in FIELD_SPECS)
+
+def _compile_encoder():
+    """
+    Build a row encoder from FIELD_SPECS once at import time, so encoding a row
+    is a single tuple expression with no per-field loop or function calls.
+    """
+    expressions = [_EXPRESSIONS[kind].format(field=field) for _, field, kind in FIELD_SPECS]
+    source = (
+        "def encode_row(item):\n"
+        "    get = item.get\n"
+        f"    return ({', '.join(expressions)},)\n"
+    )
+    namespace = {}
+    exec(compile(source, "<row_codec>", "exec"), namespace)
+    return namespace["encode_row"]
+
+encode_row = _compile_encoder()
+
+def encode_rows(items):
+    """
+    Encode API items into tuples in COLUMNS order. Items that cannot be parsed are skipped.
+    """
+    try:
+        return [encode_row(item) for item in items]
+    except (AttributeError, TypeError, ValueError):
+        pass
+
+    # Only fall back to one item at a time when a bad item is mixed in.
+    rows = []
+    for item in items:
+        try:
+            rows.append(encode_row(item))
+        except (AttributeError, TypeError, ValueError) as e:
+            print(f"Skipping unparsable item {item}: {e}")
+    return rows
+
+def write_csv(rows, columns, buffer=None):
+    """
+    Write rows (tuples or dicts) as CSV for COPY ... WITH (FORMAT csv).
+    None is written as an unquoted empty value, which COPY loads as NULL.
+    Returns the buffer rewound to the start.
+    """
+    buffer = buffer if buffer is not None else io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for row in rows:
+        if isinstance(row, dict):
+            row = [row.get(column) for column in columns]
+        writer.writerow(row)
+    buffer.seek(0)
+    return buffer
@@ -1,4 +1,5 @@
 -- Table: realtime_subway_positions
+-- Existing tables created with is_express BOOLEAN: run migrate_is_express.sql first.
 
 CREATE TABLE public.realtime_subway_positions (
     id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
@@ -13,7 +14,7 @@ CREATE TABLE public.realtime_subway_positions (
     destination_station_id VARCHAR(50), -- statnTid
     destination_station_name VARCHAR(50),-- statnTnm
     train_status_code INTEGER,          -- trainSttus: 0:Enter, 1:Arrive, 2:Depart
-    is_express BOOLEAN,                 -- directAt: 1:Express, 0:No
+    is_express SMALLINT,                -- directAt: 0:Local, 1:Express, 7:Special express
     is_last_train BOOLEAN,              -- lstcarAt: 1:Yes, 0:No
     created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('Asia/Seoul', now())
 );